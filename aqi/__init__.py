@@ -0,0 +1 @@
+"""AQI 儀表板的共用模組 (查詢定義等)，供 dashboard_api.py 與 scripts/ 下的工具共用。"""
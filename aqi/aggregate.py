@@ -0,0 +1,94 @@
+# =============================================================================
+# 歷史資料的通用彙總引擎 (/api/historical/aggregate)
+#
+# 其他歷史分析端點各自對應一個手寫的 AQI 查詢；本模組以同一套程式處理任意指標
+# (METRICS：AQI 與 aqi/pollutants.py 的污染物濃度) 的「縣市 x 年 / 月 / 日」統計：
+#   1. 讀取：queries.aggregate_readings 只取出請求需要的欄位，欄位清單由 METRICS 產生，新增指標不需新的 SQL；
+#      多個指標共用同一次掃描。資料庫只負責欄位投影與 (縣市, 時間範圍) 篩選，可使用主鍵與分區裁剪
+#   2. 彙總：aqi/aggregation.py 的 Aggregation 逐批 (BATCH_ROWS 列) 以 NumPy 將讀數歸約為每日的總和、
+#      筆數與最大值，最後合併各批並依年 / 月 / 日分組；p95 需要原始讀數，只在請求時保留
+# 統計 (stat，可用逗號指定多個)：
+#   mean             所有測站逐時讀數的平均 (與 rollup_* 的 SUM / COUNT 相同)
+#   max              最大的逐時讀數
+#   p95              逐時讀數的第 95 百分位數 (線性內插，與 numpy.percentile 預設相同)
+#   exceedance_days  超過 EXCEEDANCE 門檻的日數：AQI、PM2.5、PM10 以縣市日平均判定
+#                    (AQI 與 rollup_* 的不健康日數相同)，其餘污染物以當日最大的逐時讀數對照小時標準
+# 回應：{"county", "group", "year", "periods": [...], "metrics": {指標: {"unit", "limit", 統計: [與 periods 對應]}}}
+# periods 只列出至少一個指標有讀數的期間；某指標在該期間沒有讀數時為 null。
+#
+# 欄式儲存 (HISTORICAL_BACKEND=columnar) 只有 AQI，只請求 AQI 時改由 aqi/columnar.py 逐批提供讀數。
+#
+# 本模組只有查詢參數的解析與 SQL，不匯入 numpy；API 在第一次請求時才載入 aqi/aggregation.py。
+# =============================================================================
+
+from datetime import datetime
+from . import queries
+from .pollutants import POLLUTANTS, COLUMNS as POLLUTANT_COLUMNS
+
+# 查詢參數 -> 資料表欄位
+METRICS = {column.lower(): column for column in ['AQI'] + POLLUTANT_COLUMNS}
+UNITS = {column: unit for column, (_, _, unit) in POLLUTANTS.items()}
+
+# 超標門檻與判定方式 ('mean' 日平均 / 'max' 當日最大逐時值)，依環境部空氣品質標準：
+# PM2.5、PM10 為 24 小時值，O3、NO2、SO2、CO 為小時值；AQI 為「對敏感族群不健康」等級的下限
+EXCEEDANCE = {
+    'AQI': (100, 'mean'),
+    'PM2_5': (35, 'mean'),
+    'PM10': (100, 'mean'),
+    'O3': (120, 'max'),
+    'NO2': (100, 'max'),
+    'SO2': (75, 'max'),
+    'CO': (35, 'max'),
+}
+
+GROUPS = ('year', 'month', 'day')
+STATS = ('mean', 'max', 'p95', 'exceedance_days')
+PERCENTILE = 0.95
+DIGITS = 2
+BATCH_ROWS = 10000
+
+# 未指定 year 時的查詢範圍
+ALL_START = datetime(1970, 1, 1)
+ALL_END = datetime(2100, 1, 1)
+
+QUERY_ERROR = (f"metric must be one or more of {', '.join(METRICS)} (comma-separated); county is required; "
+               f"group must be {', '.join(GROUPS)}; stat one or more of {', '.join(STATS)}; "
+               f"year is required when group=day")
+
+
+def _names(value, allowed):
+    names = list(dict.fromkeys(part.strip().lower() for part in (value or '').split(',') if part.strip()))
+    if not names or any(name not in allowed for name in names):
+        raise ValueError(value)
+    return names
+
+def parse_aggregate_query(args):
+    """解析 metric、county、group (預設 month)、stat (預設 mean)、year 查詢參數，格式錯誤時拋出 ValueError"""
+    county = (args.get('county') or '').strip()
+    metrics = _names(args.get('metric'), METRICS)
+    group = (args.get('group') or 'month').strip().lower()
+    stats = _names(args.get('stat') or 'mean', STATS)
+    year = int(args['year']) if args.get('year') else None
+    if not county or group not in GROUPS or (group == 'day' and year is None) or not (year is None or 1970 <= year < 2100):
+        raise ValueError(args)
+    return {'county': county, 'metrics': metrics, 'group': group, 'stats': stats, 'year': year}
+
+def columns_of(query):
+    """請求的資料表欄位，依 METRICS 的順序排列 (指標順序不同的請求共用同一個查詢)"""
+    requested = {METRICS[name] for name in query['metrics']}
+    return [column for column in METRICS.values() if column in requested]
+
+_READINGS_SQL = {}
+
+def readings_sql(query):
+    columns = tuple(columns_of(query))
+    if columns not in _READINGS_SQL:
+        _READINGS_SQL[columns] = queries.aggregate_readings(columns)
+    return _READINGS_SQL[columns]
+
+def query_params(query):
+    start, end = queries.year_range(query['year']) if query['year'] is not None else (ALL_START, ALL_END)
+    return {'county': query['county'], 'start': start, 'end': end}
+
+def columnar_supported(query):
+    return columns_of(query) == ['AQI']
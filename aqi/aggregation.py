@@ -0,0 +1,147 @@
+# =============================================================================
+# 歷史資料通用彙總的 NumPy 運算 (查詢參數、指標與 SQL 見 aqi/aggregate.py)
+#
+# Aggregation 逐批加入讀數：每批以 np.unique / bincount 歸約為每日的總和、筆數與最大值，
+# 結束時合併各批、依年 / 月 / 日分組並計算請求的統計。資料來源可為 SQL 查詢結果 (add_rows)
+# 或欄式儲存的 AQI 矩陣 (from_columnar)，兩者結果相同。
+#
+# 本模組需要 NumPy，dashboard_api.py / dashboard_asgi.py 只在處理 /api/historical/aggregate 時載入。
+# =============================================================================
+
+import numpy as np
+from .aggregate import METRICS, UNITS, EXCEEDANCE, PERCENTILE, DIGITS, columns_of
+from .rolling import number
+
+
+def _reduce_max(index, values, n):
+    maxima = np.full(n, -np.inf)
+    np.maximum.at(maxima, index, values)
+    return maxima
+
+def _percentiles(groups, values, n, q=PERCENTILE):
+    """每組的第 q 分位數 (線性內插)；以 (組別, 值) 排序後一次計算所有組別，沒有值的組別為 NaN"""
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n)
+    starts = np.cumsum(counts) - counts
+    result = np.full(n, np.nan)
+    present = counts > 0
+    position = starts[present] + q * (counts[present] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, starts[present] + counts[present] - 1)
+    result[present] = values[low] + (values[high] - values[low]) * (position - low)
+    return result
+
+def _output(values, present):
+    """NumPy 陣列 -> JSON 清單：沒有讀數的期間為 None，整數值輸出為 int"""
+    return [number(round(float(value), DIGITS)) if ok else None for value, ok in zip(values.tolist(), present.tolist())]
+
+
+class Aggregation:
+    """逐批加入讀數 (add / add_rows)，最後以 result() 組出回應"""
+
+    def __init__(self, query):
+        self.query = query
+        self.columns = columns_of(query)
+        self.rows = 0
+        self.partials = []      # 每批的 (日序號, {欄位: (總和, 筆數, 最大值)})
+        # p95 需要原始讀數：每個欄位保留各批的 (日序號, 值)
+        self.samples = {column: [] for column in self.columns} if 'p95' in query['stats'] else None
+
+    def add_rows(self, rows):
+        """SQL 結果的一批列 (DataCreationDate, 各欄位依 columns_of 的順序)"""
+        if not rows:
+            return
+        fields = list(zip(*rows))
+        # None 轉為 NaN；SQLite 替身回傳的時間為字串，datetime64 同樣可以解析
+        self.add(np.array(fields[0], dtype='datetime64[h]'),
+                 {column: np.array(values, dtype=np.float64) for column, values in zip(self.columns, fields[1:])})
+
+    def add(self, times, values):
+        """times：datetime64 陣列；values：{欄位: 與 times 等長的 float 陣列，缺值為 NaN}"""
+        if len(times) == 0:
+            return
+        days = times.astype('datetime64[D]').astype(np.int64)
+        unique_days, index = np.unique(days, return_inverse=True)
+        n = len(unique_days)
+        totals = {}
+        for column in self.columns:
+            column_values = values[column]
+            valid = ~np.isnan(column_values)
+            totals[column] = (
+                np.bincount(index, weights=np.where(valid, column_values, 0.0), minlength=n),
+                np.bincount(index[valid], minlength=n),
+                _reduce_max(index[valid], column_values[valid], n),
+            )
+            if self.samples is not None:
+                self.samples[column].append((days[valid], column_values[valid]))
+        self.partials.append((unique_days, totals))
+        self.rows += len(times)
+
+    def _daily(self):
+        """合併各批：回傳 (日序號, {欄位: (總和, 筆數, 最大值)})，只保留至少一個欄位有讀數的日期"""
+        days, index = np.unique(np.concatenate([batch_days for batch_days, _ in self.partials]), return_inverse=True)
+        n = len(days)
+        daily = {}
+        for column in self.columns:
+            parts = [totals[column] for _, totals in self.partials]
+            daily[column] = (
+                np.bincount(index, weights=np.concatenate([sums for sums, _, _ in parts]), minlength=n),
+                np.bincount(index, weights=np.concatenate([counts for _, counts, _ in parts]), minlength=n),
+                _reduce_max(index, np.concatenate([maxima for _, _, maxima in parts]), n),
+            )
+        keep = np.any([counts > 0 for _, counts, _ in daily.values()], axis=0)
+        return days[keep], {column: tuple(values[keep] for values in totals) for column, totals in daily.items()}
+
+    def _periods(self, days):
+        """日序號 -> (期間標籤, 每日所屬的期間索引)"""
+        dates = days.astype('datetime64[D]')
+        unit = {'year': 'Y', 'month': 'M', 'day': 'D'}[self.query['group']]
+        periods, index = np.unique(dates.astype(f'datetime64[{unit}]'), return_inverse=True)
+        return np.datetime_as_string(periods).tolist(), index
+
+    def _metric(self, column, days, totals, period_index, n):
+        sums, counts, maxima = totals
+        period_counts = np.bincount(period_index, weights=counts, minlength=n)
+        present = period_counts > 0
+        limit, basis = EXCEEDANCE.get(column, (None, None))
+        result = {'unit': UNITS.get(column), 'limit': limit}
+        for stat in self.query['stats']:
+            if stat == 'mean':
+                values = np.bincount(period_index, weights=sums, minlength=n) / np.where(present, period_counts, 1)
+            elif stat == 'max':
+                values = _reduce_max(period_index, maxima, n)
+            elif stat == 'p95':
+                sample_days = np.concatenate([d for d, _ in self.samples[column]])
+                sample_values = np.concatenate([v for _, v in self.samples[column]])
+                values = _percentiles(period_index[np.searchsorted(days, sample_days)], sample_values, n)
+            elif limit is None:
+                result[stat] = [None] * n
+                continue
+            else:
+                # 日平均 > 門檻 等價於 總和 > 門檻 x 筆數，與 rollup_* 的整數比較相同
+                exceeded = (counts > 0) & ((sums > limit * counts) if basis == 'mean' else (maxima > limit))
+                values = np.bincount(period_index, weights=exceeded, minlength=n)
+            result[stat] = _output(values, present)
+        return result
+
+    def result(self):
+        query = self.query
+        response = {'county': query['county'], 'group': query['group'], 'year': query['year']}
+        if not self.partials:
+            return {**response, 'periods': [],
+                    'metrics': {name: {'unit': UNITS.get(METRICS[name]), 'limit': EXCEEDANCE.get(METRICS[name], (None,))[0],
+                                       **{stat: [] for stat in query['stats']}} for name in query['metrics']}}
+        days, daily = self._daily()
+        periods, period_index = self._periods(days)
+        return {**response, 'periods': periods,
+                'metrics': {name: self._metric(METRICS[name], days, daily[METRICS[name]], period_index, len(periods))
+                            for name in query['metrics']}}
+
+
+def from_columnar(snapshot, query):
+    """以欄式儲存 (aqi/columnar.py StoreSnapshot) 的 AQI 矩陣計算，結果與 SQL 來源相同"""
+    aggregation = Aggregation(query)
+    for times, values in snapshot.hourly_readings(query['county'], query['year'], query['year']):
+        aggregation.add(times, {'AQI': values})
+    return aggregation.result()
@@ -0,0 +1,208 @@
+# =============================================================================
+# API 回應快取
+#
+# 即時資料只在 crawler.py 執行後改變，歷史資料只在匯入 / 重建彙總表後改變，
+# 兩者都會遞增 data_versions 資料表中對應資料集的版本號 (水位)。
+#
+# 快取鍵 = 端點 + 正規化後的查詢參數 + 資料集版本，因此版本一變，
+# 舊的快取自然失效，不需要主動清除。回應附帶 ETag / Last-Modified，
+# 瀏覽器帶 If-None-Match / If-Modified-Since 回來時，若版本未變即直接回 304。
+#
+# 兩層快取：
+#   1. 行程內 LRU (有上限，CACHE_MAX_ENTRIES)
+#   2. 選用的共用後端 (CACHE_SHARED_BACKEND=redis 或 memory)，讓多個 Gunicorn worker 共用；
+#      memory 為不需外部服務的本機替身，介面與 redis 相同。
+# =============================================================================
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app
+
+
+class LRUCache:
+    """執行緒安全、有容量上限的 LRU 快取"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class InMemorySharedBackend:
+    """共用快取後端的本機替身 (單一行程內有效)，介面與 RedisSharedBackend 相同"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+
+
+class RedisSharedBackend:
+    """以 Redis 作為多個 worker 共用的快取後端 (需安裝 redis 套件)"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=ttl)
+
+
+def create_shared_backend():
+    """依環境變數 CACHE_SHARED_BACKEND (none / memory / redis) 建立共用後端"""
+    backend = os.getenv('CACHE_SHARED_BACKEND', 'none').lower()
+    if backend == 'memory':
+        return InMemorySharedBackend()
+    if backend == 'redis':
+        try:
+            return RedisSharedBackend(os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        except ImportError:
+            logging.warning("未安裝 redis 套件，改用本機記憶體替身作為共用快取。")
+            return InMemorySharedBackend()
+    return None
+
+
+class ResponseCache:
+    """以資料版本水位失效的 API 回應快取，並處理 ETag / 304"""
+
+    def __init__(self, load_versions, max_entries=512, version_ttl=5.0, shared_backend=None, shared_ttl=86400):
+        # load_versions() 回傳 {資料集名稱: (版本號, 更新時間 datetime)}
+        self._load_versions = load_versions
+        self._version_ttl = version_ttl
+        self._versions = None
+        self._versions_loaded_at = 0.0
+        self._versions_lock = threading.Lock()
+        self.local = LRUCache(max_entries)
+        self.shared = shared_backend
+        self.shared_ttl = shared_ttl
+
+    # --- 資料版本水位 ---
+    def get_versions(self):
+        """回傳目前的資料版本；在 version_ttl 秒內重複使用，避免每個請求都查詢資料庫"""
+        with self._versions_lock:
+            if self._versions is None or time.monotonic() - self._versions_loaded_at > self._version_ttl:
+                self._versions = self._load_versions()
+                self._versions_loaded_at = time.monotonic()
+            return self._versions
+
+    def invalidate_versions(self):
+        """強制下一個請求重新讀取資料版本 (爬蟲 / 匯入完成時呼叫)"""
+        with self._versions_lock:
+            self._versions = None
+
+    # --- 快取鍵與 ETag ---
+    @staticmethod
+    def make_key(endpoint, view_args, query_args):
+        """端點 + 正規化後的參數：路徑參數與查詢參數皆依名稱排序，忽略空白值"""
+        normalized = sorted(
+            [(k, str(v)) for k, v in (view_args or {}).items()] +
+            [(k, v.strip()) for k, values in query_args.lists() for v in values if v.strip()]
+        )
+        return f"{endpoint}?{json.dumps(normalized, ensure_ascii=False)}"
+
+    @staticmethod
+    def make_etag(dataset, version, key):
+        return f"{dataset}-{version}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+    def combined_version(self, datasets):
+        """多個資料集的版本號串成一個版本 (任一個改變即失效)，更新時間取最晚者"""
+        versions = self.get_versions()
+        entries = [versions.get(name, (0, None)) for name in datasets]
+        updated = [updated_at for _, updated_at in entries if updated_at]
+        return '.'.join(str(version) for version, _ in entries), max(updated, default=None)
+
+    def cached(self, *datasets):
+        """路由裝飾器：datasets 為 data_versions 中的資料集名稱 (realtime / historical)，可同時依賴多個"""
+        dataset = '+'.join(datasets)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    version, updated_at = self.combined_version(datasets)
+                except Exception as e:
+                    # 版本表無法讀取時直接略過快取，不影響正常查詢
+                    logging.warning(f"讀取資料版本失敗，略過快取: {e}")
+                    return view(*args, **kwargs)
+
+                key = self.make_key(request.endpoint, request.view_args, request.args)
+                etag = self.make_etag(dataset, version, key)
+
+                # 版本未變：不需查詢資料庫也不需讀取快取內容，直接回 304
+                # 弱比較：回應經壓縮後 ETag 會改為 W/"..." (aqi/compression.py)
+                if request.if_none_match.contains_weak(etag) or (
+                        not request.if_none_match and updated_at and request.if_modified_since
+                        and request.if_modified_since >= updated_at.replace(microsecond=0)):
+                    return self._finalize(current_app.response_class(status=304), etag, updated_at)
+
+                versioned_key = f"{key}#{dataset}={version}"
+                entry = self.local.get(versioned_key)
+                if entry is None and self.shared is not None:
+                    raw = self.shared.get(versioned_key)
+                    if raw is not None:
+                        entry = json.loads(raw)
+                        self.local.set(versioned_key, entry)
+
+                if entry is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    entry = {'body': response.get_data(as_text=True), 'mimetype': response.mimetype}
+                    self.local.set(versioned_key, entry)
+                    if self.shared is not None:
+                        self.shared.set(versioned_key, json.dumps(entry, ensure_ascii=False), self.shared_ttl)
+
+                response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+                return self._finalize(response, etag, updated_at)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _finalize(response, etag, updated_at):
+        response.set_etag(etag)
+        if updated_at:
+            response.last_modified = updated_at
+        # 允許瀏覽器保留回應，但每次使用前都必須以 ETag 向伺服器確認
+        response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,387 @@
+# =============================================================================
+# 歷史 AQI 欄式儲存 (小時 × 測站 的 int16 矩陣，以 NumPy memmap 讀取)
+#
+# historical_aqi_analysis 以列為單位存放 (SiteId, DataCreationDate, AQI, StatusId) 並維護多個索引，
+# 但歷史分析只需要「哪個測站、哪個小時、AQI 多少」，因此另存一份稠密矩陣：
+#   - aqi_hourly.<代號>.int16：形狀 (小時數, 測站容量)，以小時為主序，新的小時直接附加在檔尾
+#   - meta.json：起始日、小時數、測站容量、測站 (SiteId / SiteName / County / 所在欄) 與版本號
+# 缺值以 MISSING (-1，檔案位元組 0xFFFF) 表示。起點對齊午夜、小時數一律為整日，
+# 可直接 reshape 為 (日, 24) 計算日平均；八十個測站十年的資料約 14 MB。
+#
+# 寫入端 (scripts/columnar_store.py 建立 / 重算、crawler.py 附加) 最後才以 os.replace 原子地更新
+# meta.json；讀取端 (ColumnarStore) 看到 meta.json 改變時才重新對應。可見性依寫入方式而不同：
+#   - 建立、重算 (--refresh)、測站數超過容量：寫入新代號的資料檔，commit() 之前讀取端仍讀舊檔，
+#     不會看到清除到一半或重算到一半的日期
+#   - 附加：直接寫入目前的資料檔。時間軸以整日延伸，當天尚未到來的小時已在讀取端對應的範圍內
+#     (值為 MISSING)，因此同一天內附加的讀數在 commit() 之前就可能被讀到；每格是完整的一筆讀數，
+#     不會出現半筆，但同一批附加可能只看到一部分。新增整日的部分則要等 meta.json 更新後才看得到
+#
+# 統計規則與 rollup_* 彙總表相同 (SUM/COUNT 平均、以日平均 AQI 判定天數等級)，
+# 唯一差別是縣市取自測站的所屬縣市 (meta.json)，而非每一列各自的 County 欄位。
+#
+# 本模組需要 NumPy，只在 HISTORICAL_BACKEND=columnar 或執行建立 / 附加工具時載入。
+# =============================================================================
+
+import os
+import json
+import glob
+import threading
+import numpy as np
+from . import responses
+
+MISSING = -1
+DTYPE = np.int16
+META_FILE = 'meta.json'
+STATION_CAPACITY_STEP = 32      # 預留的測站欄數，新增測站時不必改寫資料檔
+HOURS_PER_DAY = 24
+
+# --- AQI 等級門檻 (與 scripts/rollups.py 相同) ---
+GOOD_MAX_AQI = 50
+MODERATE_MAX_AQI = 100
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_store_dir():
+    return os.getenv('COLUMNAR_STORE_DIR', os.path.join(PROJECT_ROOT, 'columnar_store'))
+
+def read_meta(path):
+    """讀取 meta.json；尚未建立時回傳 None"""
+    try:
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_meta(path, meta):
+    tmp_path = os.path.join(path, f"{META_FILE}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+def _write_missing(f, n_bytes, block_size=1 << 20):
+    """以 0xFF 填滿 n_bytes (每個 int16 即為 MISSING)"""
+    block = b'\xff' * min(n_bytes, block_size)
+    while n_bytes > 0:
+        f.write(block[:n_bytes])
+        n_bytes -= len(block)
+
+
+class StoreConflict(Exception):
+    """附加期間儲存已被重建 (代號改變)，本次附加作廢"""
+
+
+class StoreWriter:
+    """建立或附加欄式儲存；改寫既有讀數前先以 stage() 複製到新代號 (可見性見模組說明)"""
+
+    def __init__(self, path, meta, rebuild=False):
+        self.path = path
+        self.meta = meta
+        self.rebuild = rebuild
+        self.opened_generation = meta['generation']
+        self.opened_version = meta['version']
+        self.columns = {station['SiteId']: station['column'] for station in meta['stations']}
+        self.origin = np.datetime64(meta['origin'], 'h')
+        self.dropped = 0
+        self.unregistered = 0
+        self._open_matrix()
+
+    @classmethod
+    def create(cls, path, origin_day):
+        """建立新代號的空白儲存 (重建用)；舊代號的資料檔在 commit() 後刪除"""
+        os.makedirs(path, exist_ok=True)
+        previous = read_meta(path)
+        generation = previous['generation'] + 1 if previous else 1
+        meta = {
+            'format': 1, 'origin': origin_day.isoformat(), 'hours': 0,
+            'station_capacity': STATION_CAPACITY_STEP, 'generation': generation,
+            'data_file': f'aqi_hourly.{generation}.int16',
+            'version': previous['version'] if previous else 0, 'stations': [],
+        }
+        open(os.path.join(path, meta['data_file']), 'wb').close()
+        return cls(path, meta, rebuild=True)
+
+    @classmethod
+    def open(cls, path):
+        """開啟既有儲存以附加資料；尚未建立時回傳 None"""
+        meta = read_meta(path)
+        return cls(path, meta) if meta else None
+
+    @property
+    def data_path(self):
+        return os.path.join(self.path, self.meta['data_file'])
+
+    def _open_matrix(self):
+        hours, capacity = self.meta['hours'], self.meta['station_capacity']
+        self.matrix = np.memmap(self.data_path, dtype=DTYPE, mode='r+', shape=(hours, capacity)) if hours else None
+
+    def _close_matrix(self):
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+
+    def ensure_hours(self, hours):
+        """將時間軸延伸至至少 hours 小時 (以整日為單位，新區段填入 MISSING)"""
+        if hours <= self.meta['hours']:
+            return
+        new_hours = -(-hours // HOURS_PER_DAY) * HOURS_PER_DAY
+        self._close_matrix()
+        with open(self.data_path, 'ab') as f:
+            _write_missing(f, (new_hours - self.meta['hours']) * self.meta['station_capacity'] * DTYPE().itemsize)
+        self.meta['hours'] = new_hours
+        self._open_matrix()
+
+    def _copy_to_new_generation(self, new_capacity):
+        """逐段複製到新代號的資料檔 (欄數為 new_capacity)，之後的寫入都只影響新檔"""
+        old_matrix, old_capacity = self.matrix, self.meta['station_capacity']
+        self.meta['generation'] += 1
+        self.meta['data_file'] = f"aqi_hourly.{self.meta['generation']}.int16"
+        with open(self.data_path, 'wb') as f:
+            for start in range(0, self.meta['hours'], 24 * 366):
+                block = np.full((min(24 * 366, self.meta['hours'] - start), new_capacity), MISSING, dtype=DTYPE)
+                block[:, :old_capacity] = old_matrix[start:start + len(block)]
+                f.write(block.tobytes())
+        self.meta['station_capacity'] = new_capacity
+        self._close_matrix()
+        self._open_matrix()
+
+    def _grow_capacity(self):
+        """測站容量不足：每列多預留 STATION_CAPACITY_STEP 欄"""
+        self._copy_to_new_generation(self.meta['station_capacity'] + STATION_CAPACITY_STEP)
+
+    def stage(self):
+        """改寫既有讀數 (clear 後重新載入) 前呼叫：複製到新代號，commit() 之前讀取端仍讀舊檔"""
+        if not self.rebuild and self.meta['generation'] == self.opened_generation:
+            self._copy_to_new_generation(self.meta['station_capacity'])
+
+    def add_station(self, site_id, site_name, county):
+        """登記測站 (已存在時更新名稱與縣市)，回傳所在欄"""
+        site_id = int(site_id)
+        if site_id in self.columns:
+            station = next(s for s in self.meta['stations'] if s['SiteId'] == site_id)
+            station.update(SiteName=site_name, County=county)
+            return station['column']
+        column = len(self.meta['stations'])
+        if column >= self.meta['station_capacity']:
+            self._grow_capacity()
+        self.meta['stations'].append({'SiteId': site_id, 'SiteName': site_name, 'County': county, 'column': column})
+        self.columns[site_id] = column
+        return column
+
+    def hour_index(self, times):
+        return (np.asarray(times, dtype='datetime64[h]') - self.origin).astype(np.int64)
+
+    def write(self, site_ids, times, values):
+        """寫入讀數，回傳寫入筆數；早於起始日的讀數略過並計入 dropped，
+        未以 add_station 登記的測站略過並計入 unregistered (不可對應到其他測站的欄)"""
+        hours = self.hour_index(times)
+        site_ids = np.asarray(site_ids, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        keys = np.array(sorted(self.columns), dtype=np.int64)
+        known = np.isin(site_ids, keys)
+        keep = hours >= 0
+        self.dropped += int((~keep).sum())
+        self.unregistered += int((keep & ~known).sum())
+        keep &= known
+        hours, site_ids, values = hours[keep], site_ids[keep], values[keep]
+        if len(hours) == 0:
+            return 0
+
+        self.ensure_hours(int(hours.max()) + 1)
+        columns = np.array([self.columns[k] for k in keys], dtype=np.int64)[np.searchsorted(keys, site_ids)]
+        valid = (values >= 0) & (values <= np.iinfo(DTYPE).max)
+        self.matrix[hours, columns] = np.where(valid, values, MISSING).astype(DTYPE)
+        return len(hours)
+
+    def clear(self, start, end):
+        """將 [start, end) 的所有讀數設為 MISSING (重算某段日期前使用)"""
+        h0, h1 = (max(0, min(int(h), self.meta['hours'])) for h in self.hour_index([start, end]))
+        if self.matrix is not None and h1 > h0:
+            self.matrix[h0:h1] = MISSING
+
+    def commit(self):
+        """寫入資料檔後原子地更新 meta.json，並刪除不再使用的舊代號資料檔"""
+        self._close_matrix()
+        current = read_meta(self.path)
+        if not self.rebuild and current and current['generation'] != self.opened_generation:
+            raise StoreConflict(f"欄式儲存已被重建 (代號 {current['generation']})")
+        if (not self.rebuild and current and self.meta['generation'] != self.opened_generation
+                and current['version'] != self.opened_version):
+            # 複製到新代號之後其他寫入端附加到舊檔的讀數不在新檔中，切換會遺失它們
+            raise StoreConflict(f"複製到新代號期間儲存已被更新 (版本 {current['version']})")
+        self.meta['version'] = (current['version'] if current else self.meta['version']) + 1
+        _write_meta(self.path, self.meta)
+        self.opened_generation = self.meta['generation']
+        self.opened_version = self.meta['version']
+        for data_file in glob.glob(os.path.join(self.path, 'aqi_hourly.*.int16')):
+            if os.path.basename(data_file) != self.meta['data_file']:
+                try:
+                    os.remove(data_file)
+                except OSError:
+                    pass    # Windows 上仍被讀取端對應中的檔案，下次 commit 再刪除
+        self._open_matrix()
+
+    def close(self):
+        self._close_matrix()
+
+
+class StoreSnapshot:
+    """某一版 meta.json 與其唯讀資料矩陣"""
+
+    def __init__(self, path, meta):
+        self.meta = meta
+        self.hours = meta['hours']
+        self.origin = np.datetime64(meta['origin'], 'D')
+        shape = (self.hours, meta['station_capacity'])
+        self.matrix = (np.memmap(os.path.join(path, meta['data_file']), dtype=DTYPE, mode='r', shape=shape)
+                       if self.hours else np.empty(shape, dtype=DTYPE))
+        columns = {}
+        for station in meta['stations']:
+            if station['County']:
+                columns.setdefault(station['County'], []).append(station['column'])
+        self.county_columns = {county: np.array(sorted(cols)) for county, cols in columns.items()}
+
+    def hour_range(self, first_year=None, last_year=None):
+        """[first_year, last_year] 在矩陣中的小時區間 [h0, h1)，省略時為全部"""
+        def offset(year):
+            return int((np.datetime64(f'{year:04d}-01-01', 'D') - self.origin).astype(np.int64)) * HOURS_PER_DAY
+        h0 = 0 if first_year is None else offset(first_year)
+        h1 = self.hours if last_year is None else offset(last_year + 1)
+        return min(max(h0, 0), self.hours), min(max(h1, 0), self.hours)
+
+    def daily_totals(self, county, h0, h1):
+        """縣市每日的 AQI 總和與筆數 (所有測站合計)，等同 rollup_county_daily"""
+        columns = self.county_columns.get(county)
+        if columns is None or h1 <= h0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        block = self.matrix[h0:h1, columns]
+        valid = block != MISSING
+        sums = np.where(valid, block, 0).sum(axis=1, dtype=np.int64).reshape(-1, HOURS_PER_DAY).sum(axis=1)
+        counts = valid.sum(axis=1, dtype=np.int64).reshape(-1, HOURS_PER_DAY).sum(axis=1)
+        return sums, counts
+
+    def hourly_readings(self, county, first_year=None, last_year=None, batch_hours=24 * 31):
+        """逐批產生縣市所有測站的逐時讀數 (時間 datetime64[h]、AQI float，MISSING 為 NaN)，供 aqi/aggregation.py 使用"""
+        columns = self.county_columns.get(county)
+        if columns is None:
+            return
+        h0, h1 = self.hour_range(first_year, last_year)
+        for start in range(h0, h1, batch_hours):
+            block = self.matrix[start:min(start + batch_hours, h1), columns]
+            hours = self.origin.astype('datetime64[h]') + np.arange(start, start + len(block))
+            yield np.repeat(hours, len(columns)), np.where(block != MISSING, block, np.nan).ravel()
+
+    def monthly(self, county, first_year=None, last_year=None):
+        """縣市每個有讀數的月份，欄位與 queries.COUNTY_REPORT (rollup_county_monthly) 相同"""
+        h0, h1 = self.hour_range(first_year, last_year)
+        sums, counts = self.daily_totals(county, h0, h1)
+        if len(sums) == 0:
+            return []
+        days = self.origin + h0 // HOURS_PER_DAY + np.arange(len(sums))
+        month_numbers = days.astype('datetime64[M]').astype(np.int64)   # 自 1970-01 起的月數
+        first_month = int(month_numbers[0])
+        index = month_numbers - first_month
+        n = int(index[-1]) + 1
+
+        def per_month(weights):
+            return np.bincount(index, weights=weights, minlength=n).round().astype(np.int64)
+        # 日平均 <= 50 等價於 總和 <= 50 * 筆數，與 rollups.py 的整數比較相同
+        totals = {
+            'aqi_sum': per_month(sums),
+            'aqi_count': per_month(counts),
+            'good_days': per_month((counts > 0) & (sums <= GOOD_MAX_AQI * counts)),
+            'moderate_days': per_month((sums > GOOD_MAX_AQI * counts) & (sums <= MODERATE_MAX_AQI * counts)),
+            'unhealthy_days': per_month(sums > MODERATE_MAX_AQI * counts),
+        }
+        return [
+            {'year': 1970 + (first_month + m) // 12, 'month': (first_month + m) % 12 + 1,
+             **{key: int(values[m]) for key, values in totals.items()}}
+            for m in np.flatnonzero(totals['aqi_count']).tolist()
+        ]
+
+    def county_averages(self, year):
+        """某年份各縣市的平均 AQI，等同 queries.ANNUAL_MAP"""
+        h0, h1 = self.hour_range(year, year)
+        block = self.matrix[h0:h1]
+        valid = block != MISSING
+        column_sums = np.where(valid, block, 0).sum(axis=0, dtype=np.int64)
+        column_counts = valid.sum(axis=0, dtype=np.int64)
+        rows = []
+        for county, columns in self.county_columns.items():
+            count = int(column_counts[columns].sum())
+            if count:
+                rows.append({'County': county, 'average_aqi': responses.round_average(column_sums[columns].sum(), count)})
+        return rows
+
+
+# --- 歷史分析端點：回傳與 aqi/queries.py 對應查詢相同形狀的列 ---
+def _annual_trend(store, params):
+    yearly, _ = responses.monthly_totals(store.monthly(params['county_param']))
+    return responses.average_rows('year', yearly)
+
+def _annual_map(store, params):
+    return store.county_averages(int(params['year_param']))
+
+def _seasonal_trend(store, params):
+    _, monthly = responses.monthly_totals(store.monthly(params['county_param']))
+    return responses.average_rows('month', monthly)
+
+def _monthly_distribution(store, params):
+    year = int(params['year_param'])
+    return [
+        {key: row[key] for key in ('month', 'good_days', 'moderate_days', 'unhealthy_days')}
+        for row in store.monthly(params['county_param'], year, year)
+    ]
+
+def _unhealthy_days_count(store, params):
+    rows = store.monthly(params['county_param'], int(params['previous_year_param']), int(params['year_param']))
+    yearly, _ = responses.monthly_totals(rows)
+    return [{'year': y, 'unhealthy_days_count': t['unhealthy_days']} for y, t in sorted(yearly.items())]
+
+def _county_report(store, params):
+    return store.monthly(params['county_param'])
+
+ENDPOINT_QUERIES = {
+    'annual-trend': _annual_trend,
+    'annual-map': _annual_map,
+    'seasonal-trend': _seasonal_trend,
+    'monthly-distribution': _monthly_distribution,
+    'unhealthy-days-count': _unhealthy_days_count,
+    'county-report': _county_report,
+}
+
+
+class ColumnarStore:
+    """唯讀存取欄式儲存；meta.json 改變 (附加或重建) 時自動重新對應"""
+
+    def __init__(self, path=None):
+        self.path = path or default_store_dir()
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._snapshot = None
+
+    def snapshot(self):
+        """目前的 StoreSnapshot；尚未建立儲存時回傳 None"""
+        try:
+            stat = os.stat(os.path.join(self.path, META_FILE))
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    meta = read_meta(self.path)
+                    self._snapshot = StoreSnapshot(self.path, meta) if meta else None
+                    self._stamp = stamp
+        return self._snapshot
+
+    def available(self):
+        snapshot = self.snapshot()
+        return snapshot is not None and snapshot.hours > 0
+
+    def supports(self, name):
+        return name in ENDPOINT_QUERIES
+
+    def query(self, name, params):
+        """以向量化運算取代 SQL，回傳與 aqi/queries.py 對應查詢相同的列"""
+        return ENDPOINT_QUERIES[name](self.snapshot(), params)
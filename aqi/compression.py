@@ -0,0 +1,92 @@
+# =============================================================================
+# 回應壓縮 (gzip / brotli) 的協商與編碼
+#
+# dashboard_api.py (after_request)、dashboard_asgi.py (CompressionMiddleware) 與
+# aqi/snapshots.py (預先壓縮的靜態快照) 共用：
+#   1. choose_encoding：依 Accept-Encoding (含 q 值) 選擇編碼，brotli 優先於 gzip
+#   2. ResponseCompressor：即時壓縮 API 回應；小於門檻 (COMPRESSION_MIN_BYTES) 的回應不壓縮，
+#      壓縮標頭與 TCP 封包的額外成本已抵銷節省的位元組
+# brotli 為選用套件，未安裝時只提供 gzip。
+# =============================================================================
+
+import os
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 優先順序由前至後
+ENCODINGS = ('br', 'gzip')
+
+# 即時壓縮的預設等級：在壓縮率與 CPU 時間之間取平衡 (靜態快照於匯出時使用最高等級)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain')
+
+
+def available_encodings():
+    return [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+
+def compress(body, encoding, level=None):
+    if encoding == 'gzip':
+        # mtime=0：內容相同時壓縮結果也相同
+        return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+    return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+
+def choose_encoding(accept_encoding, encodings):
+    """依 Accept-Encoding 選擇 encodings 中的編碼；都不接受時回傳 None (未壓縮)"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if encoding in encodings and accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+def compressible(mimetype):
+    return (mimetype or '').split(';')[0].strip() in COMPRESSIBLE_MIMETYPES
+
+
+class ResponseCompressor:
+    """依 Accept-Encoding 壓縮回應內容；min_bytes 以下的內容原樣回傳"""
+
+    def __init__(self, min_bytes=1024, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+        self.min_bytes = min_bytes
+        self.levels = {'gzip': gzip_level, 'br': brotli_quality}
+        self.encodings = available_encodings()
+
+    @classmethod
+    def from_env(cls):
+        """COMPRESSION_MIN_BYTES (0 代表停用)、COMPRESSION_GZIP_LEVEL、COMPRESSION_BROTLI_QUALITY"""
+        min_bytes = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+        if min_bytes <= 0:
+            return None
+        return cls(min_bytes, int(os.getenv('COMPRESSION_GZIP_LEVEL', GZIP_LEVEL)),
+                   int(os.getenv('COMPRESSION_BROTLI_QUALITY', BROTLI_QUALITY)))
+
+    def encode(self, body, accept_encoding):
+        """回傳 (內容, 編碼或 None)"""
+        if len(body) < self.min_bytes:
+            return body, None
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            return body, None
+        return compress(body, encoding, self.levels[encoding]), encoding
+
+    @staticmethod
+    def weak_etag(etag):
+        """壓縮後內容與未壓縮版本不同，強 ETag 改為弱 ETag (與 nginx gzip 相同)；If-None-Match 以弱比較判斷"""
+        if not etag or etag.startswith('W/'):
+            return etag
+        return f"W/{etag}"
@@ -0,0 +1,155 @@
+# =============================================================================
+# 測站維度表與字典編碼 (stations / counties / aqi_statuses)
+#
+# 讀數資料表 (air_quality_records、historical_aqi_analysis、latest_station_readings) 每列只存
+# (SiteId, DataCreationDate, AQI, StatusId)；測站名稱、縣市與座標存於 stations，
+# 縣市與 AQI 狀態名稱存於 counties / aqi_statuses 兩張小型對照表 (見 migrations/0007)。
+#
+# 1. DimensionEncoder：寫入端 (crawler.py、import_lean_data.py) 在記憶體中快取 名稱 -> 代碼
+#    與各測站目前的屬性，只有遇到新名稱或測站屬性變更時才寫入維度表。
+#    以 DB-API cursor 與 %s 參數操作，MySQLdb 與 mysql-connector 皆可使用。
+# 2. Dimensions：讀取端 (dashboard_api.py、dashboard_asgi.py) 代碼 -> 名稱的唯讀快照，
+#    API 查詢只取出代碼，回傳前再解碼為原本的 SiteName / County / Status / 座標欄位。
+#    代碼一經配發即不再改變；爬蟲新增或更新測站時必定遞增 realtime 版本，快照以此判斷是否過期。
+# =============================================================================
+
+from aqi.rolling import parse_summary
+
+LOAD_COUNTIES_SQL = "SELECT CountyId, Name FROM counties"
+LOAD_STATUSES_SQL = "SELECT StatusId, Name FROM aqi_statuses"
+LOAD_STATIONS_SQL = "SELECT SiteId, SiteName, CountyId, Latitude, Longitude FROM stations"
+
+# 爬蟲：API 的名稱、縣市與座標為準 (座標為 NULL 時保留原值)
+UPSERT_STATION_SQL = """
+    INSERT INTO stations (SiteId, SiteName, CountyId, Latitude, Longitude)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        SiteName = VALUES(SiteName), CountyId = VALUES(CountyId),
+        Latitude = COALESCE(VALUES(Latitude), Latitude), Longitude = COALESCE(VALUES(Longitude), Longitude)
+"""
+# 歷史檔案：只新增未知的測站，不以舊檔案中的名稱覆寫
+INSERT_STATION_SQL = """
+    INSERT IGNORE INTO stations (SiteId, SiteName, CountyId, Latitude, Longitude)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+# 名稱對照表：(資料表, 代碼欄位)
+COUNTY_TABLE = ('counties', 'CountyId')
+STATUS_TABLE = ('aqi_statuses', 'StatusId')
+
+
+def _coordinate(value):
+    return None if value is None else round(float(value), 7)
+
+def _station_values(site_name, county_id, latitude, longitude):
+    """正規化後的測站屬性，避免 Decimal / float 的型別差異被誤判為變更"""
+    return (site_name or '', county_id, _coordinate(latitude), _coordinate(longitude))
+
+
+class DimensionEncoder:
+    """寫入端的字典快取；寫入維度表的交易回滾時需呼叫 invalidate()"""
+
+    def __init__(self):
+        self.counties = None    # 名稱 -> CountyId；None 代表尚未載入
+        self.statuses = {}      # 名稱 -> StatusId
+        self.stations = {}      # SiteId -> (SiteName, CountyId, Latitude, Longitude)
+
+    def invalidate(self):
+        self.counties = None
+
+    def _ensure_loaded(self, cursor):
+        if self.counties is not None:
+            return
+        cursor.execute(LOAD_COUNTIES_SQL)
+        counties = {name: county_id for county_id, name in cursor.fetchall()}
+        cursor.execute(LOAD_STATUSES_SQL)
+        self.statuses = {name: status_id for status_id, name in cursor.fetchall()}
+        cursor.execute(LOAD_STATIONS_SQL)
+        self.stations = {int(row[0]): _station_values(*row[1:]) for row in cursor.fetchall()}
+        self.counties = counties
+
+    def _ensure_names(self, cursor, table, mapping, names):
+        """將尚未配發代碼的名稱寫入對照表，並讀回代碼"""
+        missing = sorted({name for name in names if name and name not in mapping})
+        if not missing:
+            return
+        table_name, id_column = table
+        cursor.executemany(f"INSERT IGNORE INTO {table_name} (Name) VALUES (%s)", [(name,) for name in missing])
+        # 鎖定讀取：其他連線剛配發的代碼也讀得到 (一般 SELECT 只看得到交易開始時的快照)
+        placeholders = ', '.join(['%s'] * len(missing))
+        cursor.execute(f"SELECT {id_column}, Name FROM {table_name} WHERE Name IN ({placeholders}) LOCK IN SHARE MODE",
+                       missing)
+        mapping.update({name: code for code, name in cursor.fetchall()})
+
+    def status_codes(self, cursor, names):
+        """回傳與 names 逐一對應的 StatusId (None 與空字串為 None)；新的狀態名稱先寫入 aqi_statuses"""
+        self._ensure_loaded(cursor)
+        names = list(names)
+        self._ensure_names(cursor, STATUS_TABLE, self.statuses, names)
+        return [self.statuses.get(name) if name else None for name in names]
+
+    def register_stations(self, cursor, stations, update=True):
+        """stations 為 (SiteId, SiteName, County, Latitude, Longitude)，每個測站一筆
+
+        新測站一律寫入；update=True 時名稱、縣市或座標有變更的測站也一併更新。回傳寫入的測站數。
+        """
+        self._ensure_loaded(cursor)
+        stations = list(stations)
+        self._ensure_names(cursor, COUNTY_TABLE, self.counties, [station[2] for station in stations])
+        rows = []
+        for site_id, site_name, county, latitude, longitude in stations:
+            site_id = int(site_id)
+            current = self.stations.get(site_id)
+            values = _station_values(site_name, self.counties.get(county), latitude, longitude)
+            if current is not None:
+                if not update:
+                    continue
+                # 沒有座標的來源不覆寫既有座標，與 UPSERT_STATION_SQL 相同
+                values = values[:2] + tuple(new if new is not None else old for new, old in zip(values[2:], current[2:]))
+                if values == current:
+                    continue
+            rows.append((site_id, *values))
+            self.stations[site_id] = values
+        if rows:
+            cursor.executemany(UPSERT_STATION_SQL if update else INSERT_STATION_SQL, rows)
+        return len(rows)
+
+
+class Dimensions:
+    """代碼 -> 名稱的唯讀快照；version 為載入時的 realtime 資料版本"""
+
+    def __init__(self, version=None, stations=(), counties=(), statuses=()):
+        self.version = version
+        self.stations = {row['SiteId']: row for row in stations}
+        self.counties = {row['CountyId']: row['Name'] for row in counties}
+        self.county_ids = {name: county_id for county_id, name in self.counties.items()}
+        self.statuses = {row['StatusId']: row['Name'] for row in statuses}
+
+    def stale(self, version, county=None):
+        """realtime 版本改變，或查詢的縣市不在快照中時需重新載入"""
+        return version != self.version or (county is not None and county not in self.county_ids)
+
+    def county_id(self, name):
+        return self.county_ids.get(name)
+
+    def decode_readings(self, rows):
+        """(SiteId, AQI, StatusId, DataCreationDate[, Rolling]) 的列 -> 與原本 latest_station_readings 相同的欄位
+
+        另附 Rolling：8 / 24 小時平均與最大值 (aqi/rolling.py)，尚未計算時為 None。
+        """
+        decoded = []
+        for row in rows:
+            station = self.stations.get(row['SiteId'], {})
+            decoded.append({
+                'SiteId': row['SiteId'], 'SiteName': station.get('SiteName'),
+                'County': self.counties.get(station.get('CountyId')), 'AQI': row['AQI'],
+                'Status': self.statuses.get(row['StatusId']), 'DataCreationDate': row['DataCreationDate'],
+                'Latitude': station.get('Latitude'), 'Longitude': station.get('Longitude'),
+                'Rolling': parse_summary(row.get('Rolling')),
+            })
+        return decoded
+
+    def decode_counties(self, rows):
+        """CountyId 欄位 -> County (名稱)，其餘欄位不變"""
+        return [{'County': self.counties.get(row['CountyId']),
+                 **{key: value for key, value in row.items() if key != 'CountyId'}} for row in rows]
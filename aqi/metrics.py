@@ -0,0 +1,277 @@
+# =============================================================================
+# 執行時間與計數指標
+#
+# 1. MetricsRegistry：直方圖、計數器與即時讀取的量測值，輸出 Prometheus 文字格式
+#    (dashboard_api.py 的 /metrics)。只使用標準函式庫，不需安裝 prometheus_client。
+#    指標存在各行程的記憶體中：多個 worker 時 Prometheus 需分別抓取每個 worker。
+# 2. SlowQueryLog：超過門檻的查詢記錄 SQL、參數與耗時，並在背景執行緒補上 EXPLAIN；
+#    同一查詢在 explain_interval 秒內只 EXPLAIN 一次，避免慢查詢時再加重資料庫負擔。
+# 3. StageTimer：累計各階段的呼叫次數、筆數與秒數 (crawler.py、import_lean_data.py 共用)，
+#    可寫出 JSON 摘要 (--summary-json)。
+# =============================================================================
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# 秒；涵蓋快取命中 (數毫秒) 到查詢逾時 (數十秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 查詢回傳列數
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+# 回應大小 (bytes)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                     for labels, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}   # labels -> [各區間的次數 (非累計), 總和, 次數]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items())
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                label_text = _format_labels(self.labelnames, labels, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class Gauge:
+    """輸出時才呼叫 callback 讀取目前的值；callback 回傳數值，或 [(標籤值 tuple, 數值)]"""
+
+    def __init__(self, name, help_text, callback, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.callback = callback
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        try:
+            value = self.callback()
+        except Exception as e:
+            logging.warning(f"讀取指標 {self.name} 失敗: {e}")
+            return lines
+        samples = value if isinstance(value, list) else [((), value)]
+        lines.extend(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}'
+                     for labels, v in samples if v is not None)
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, callback, labelnames=()):
+        return self._register(Gauge(name, help_text, callback, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# --- 慢查詢紀錄 ---
+class SlowQueryLog:
+    """記錄耗時超過 threshold 秒的查詢；explain 為 callable(sql, params) -> list[dict]，在背景執行"""
+
+    def __init__(self, threshold, explain=None, log_file=None, explain_interval=300.0):
+        self.threshold = threshold
+        self.explain = explain
+        self.log_file = log_file
+        self.explain_interval = explain_interval
+        self.logger = logging.getLogger('aqi.slow_query')
+        self._last_explained = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def _should_explain(self, name):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_explained.get(name, -math.inf) < self.explain_interval:
+                return False
+            self._last_explained[name] = now
+            return True
+
+    def record(self, name, sql, params, seconds, rows):
+        """耗時未達門檻時不做任何事；回傳是否列為慢查詢"""
+        if not self.enabled or seconds < self.threshold:
+            return False
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'), 'query': name,
+            'seconds': round(seconds, 4), 'rows': rows,
+            'sql': ' '.join(str(sql).split()), 'params': params,
+        }
+        if self.explain is not None and self._should_explain(name):
+            self._executor.submit(self._explain_and_write, entry)
+        else:
+            self._write(entry)
+        return True
+
+    def _explain_and_write(self, entry):
+        try:
+            entry['explain'] = self.explain(entry['sql'], entry['params'])
+        except Exception as e:
+            entry['explain_error'] = str(e)
+        self._write(entry)
+
+    def _write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        self.logger.warning(f"慢查詢 {entry['query']} ({entry['seconds'] * 1000:.0f} ms, {entry['rows']} 列): {line}")
+        if self.log_file:
+            try:
+                with self._lock, open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError as e:
+                self.logger.error(f"無法寫入慢查詢紀錄檔 {self.log_file}: {e}")
+
+
+# --- 批次工具的階段計時 ---
+class _StageRun:
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+
+class StageTimer:
+    """累計各階段的呼叫次數、筆數與秒數；依第一次出現的順序輸出"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds, count=0, calls=1):
+        totals = self.stages.setdefault(stage, {'calls': 0, 'count': 0, 'seconds': 0.0})
+        totals['calls'] += calls
+        totals['count'] += count
+        totals['seconds'] += seconds
+
+    @contextmanager
+    def stage(self, stage):
+        """with timer.stage('fetch') as run: ...; run.count = 筆數 (例外時仍記錄耗時)"""
+        run = _StageRun()
+        started = time.perf_counter()
+        try:
+            yield run
+        finally:
+            self.add(stage, time.perf_counter() - started, run.count)
+
+    def merge(self, other):
+        for stage, totals in other.stages.items():
+            self.add(stage, totals['seconds'], totals['count'], totals['calls'])
+
+    def describe(self):
+        """單行文字摘要，例如 fetch 1.20s (4800 筆)、write 0.35s"""
+        parts = []
+        for stage, totals in self.stages.items():
+            count = f" ({totals['count']} 筆)" if totals['count'] else ''
+            parts.append(f"{stage} {totals['seconds']:.2f}s{count}")
+        return '、'.join(parts)
+
+    def summary(self, **extra):
+        wall_seconds = time.perf_counter() - self._started
+        return {
+            'name': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'wall_seconds': round(wall_seconds, 3),
+            'stages': {
+                stage: {**totals, 'seconds': round(totals['seconds'], 3),
+                        'per_sec': round(totals['count'] / totals['seconds']) if totals['count'] and totals['seconds'] else None}
+                for stage, totals in self.stages.items()
+            },
+            **extra,
+        }
+
+    def write_summary(self, path, **extra):
+        """寫出 JSON 摘要 (先寫暫存檔再取代)；失敗時只記錄錯誤"""
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.summary(**extra), f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"無法寫入執行摘要 {path}: {e}")
@@ -0,0 +1,42 @@
+# =============================================================================
+# 污染物濃度欄位定義
+#
+# 環境部 aqx_p_488 除 AQI 外另提供各污染物的逐時濃度。crawler.py 與 import_lean_data.py 將其寫入
+# air_quality_records / historical_aqi_analysis 的同名欄位 (見 migrations/0009)：
+#   DECIMAL(5,1) 或 DECIMAL(5,2)，可為 NULL，每欄 3 bytes
+# API 的 'nan'、空字串、'-'、'ND' 等非數值與超出欄位範圍的值一律存為 NULL，不會以字串寫入。
+#
+# 新增污染物只需在 POLLUTANTS 加一列並新增對應欄位；歷史分析的彙總引擎 (aqi/aggregate.py)
+# 依此產生查詢欄位，不需要新的 SQL。
+# =============================================================================
+
+# 資料表欄位 -> (API 欄位, 小數位數, 單位)
+POLLUTANTS = {
+    'PM2_5': ('pm2.5', 1, 'μg/m3'),
+    'PM10': ('pm10', 1, 'μg/m3'),
+    'O3': ('o3', 1, 'ppb'),
+    'NO2': ('no2', 1, 'ppb'),
+    'SO2': ('so2', 1, 'ppb'),
+    'CO': ('co', 2, 'ppm'),
+}
+# DECIMAL(PRECISION, 小數位數)
+PRECISION = 5
+
+COLUMNS = list(POLLUTANTS)
+# API 欄位 -> 資料表欄位
+API_COLUMNS = {api_column: column for column, (api_column, _, _) in POLLUTANTS.items()}
+
+
+def decimals(column):
+    return POLLUTANTS[column][1]
+
+def upper_bound(column):
+    """欄位可存放的上限 (不含)，例如 DECIMAL(5,1) 為 10000；須與四捨五入後的值比較"""
+    return 10 ** (PRECISION - decimals(column))
+
+def normalize(column, value):
+    """與資料庫中的 DECIMAL 值比較前的正規化：None / NaN 為 None，其餘依欄位小數位數四捨五入為 float"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if value != value else round(value, decimals(column))
@@ -0,0 +1,160 @@
+# =============================================================================
+# API 查詢定義
+#
+# 所有 /api/* 路由使用的 SQL 集中於此，dashboard_api.py 與
+# scripts/explain_queries.py (印出 EXPLAIN 執行計畫) 共用同一份定義。
+#
+# 原則：查詢條件不可對欄位套用函式 (例如 YEAR(DataCreationDate) = 2024)，
+# 否則 MySQL 無法使用索引與分區裁剪；日期一律改寫為半開區間
+# DataCreationDate >= :start AND DataCreationDate < :end (見 year_range)。
+# =============================================================================
+
+from datetime import datetime
+from sqlalchemy import text
+from .pollutants import COLUMNS as POLLUTANT_COLUMNS
+
+
+def year_range(year):
+    """回傳某年份的半開區間 [當年 1/1, 隔年 1/1)，供 DataCreationDate 範圍查詢使用"""
+    year = int(year)
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+# --- 即時資料 (latest_station_readings 每站僅一列，由 crawler.py 維護) ---
+# 只取出代碼，回傳前以 aqi/dimensions.py 的維度快照解碼為縣市、測站名稱與狀態
+COUNTY_SUMMARY = text("""
+    SELECT s.CountyId, ROUND(AVG(l.AQI)) as average_aqi
+    FROM latest_station_readings l JOIN stations s ON s.SiteId = l.SiteId
+    WHERE l.AQI IS NOT NULL GROUP BY s.CountyId;
+""")
+
+COUNTY_DATA = text("""
+    SELECT l.SiteId, l.AQI, l.StatusId, l.DataCreationDate, r.Summary AS Rolling
+    FROM latest_station_readings l JOIN stations s ON s.SiteId = l.SiteId
+    LEFT JOIN station_rolling_windows r ON r.SiteId = l.SiteId
+    WHERE s.CountyId = :county_id;
+""")
+
+# 即時推播 (aqi/realtime_feed.py)：先讀版本號，改變時才讀出所有測站 (每站一列，約百列)
+REALTIME_VERSION = text("""
+    SELECT version FROM data_versions WHERE name = 'realtime';
+""")
+
+# Rolling：crawler.py 增量維護的 8 / 24 小時統計 (aqi/rolling.py)，以 JSON 文字存放
+LATEST_STATIONS = text("""
+    SELECT l.SiteId, l.AQI, l.StatusId, l.DataCreationDate, r.Summary AS Rolling
+    FROM latest_station_readings l LEFT JOIN station_rolling_windows r ON r.SiteId = l.SiteId;
+""")
+
+# --- 維度表 (數十至數百列，整份載入記憶體，見 aqi/dimensions.py) ---
+STATIONS_DIMENSION = text("""
+    SELECT SiteId, SiteName, CountyId, Latitude, Longitude FROM stations;
+""")
+
+COUNTIES_DIMENSION = text("""
+    SELECT CountyId, Name FROM counties;
+""")
+
+STATUSES_DIMENSION = text("""
+    SELECT StatusId, Name FROM aqi_statuses;
+""")
+
+# 依 Dimensions(version, stations, counties, statuses) 的參數順序
+DIMENSION_QUERIES = (STATIONS_DIMENSION, COUNTIES_DIMENSION, STATUSES_DIMENSION)
+
+# --- 歷史分析 (rollup_* 彙總表，由 scripts/rollups.py 維護) ---
+ANNUAL_TREND = text("""
+    SELECT Year as year, ROUND(AqiSum / AqiCount) as average_aqi
+    FROM rollup_county_yearly
+    WHERE County = :county_param
+    ORDER BY year;
+""")
+
+ANNUAL_MAP = text("""
+    SELECT County, ROUND(AqiSum / AqiCount) as average_aqi
+    FROM rollup_county_yearly
+    WHERE Year = :year_param;
+""")
+
+SEASONAL_TREND = text("""
+    SELECT Month as month, ROUND(SUM(AqiSum) / SUM(AqiCount)) as average_aqi
+    FROM rollup_county_monthly
+    WHERE County = :county_param
+    GROUP BY Month ORDER BY month;
+""")
+
+MONTHLY_DISTRIBUTION = text("""
+    SELECT Month as month, GoodDays as good_days,
+        ModerateDays as moderate_days, UnhealthyDays as unhealthy_days
+    FROM rollup_county_monthly
+    WHERE County = :county_param AND Year = :year_param
+    ORDER BY month;
+""")
+
+# 兩個年份的不健康日數一次從年彙總表取出
+UNHEALTHY_DAYS_COUNT = text("""
+    SELECT Year as year, UnhealthyDays as unhealthy_days_count
+    FROM rollup_county_yearly
+    WHERE County = :county_param AND Year IN (:year_param, :previous_year_param);
+""")
+
+# 縣市報表：一次讀出該縣市所有年份的月彙總，年度趨勢、季節趨勢、月分佈與不健康日皆由此計算
+COUNTY_REPORT = text("""
+    SELECT Year as year, Month as month, AqiSum as aqi_sum, AqiCount as aqi_count,
+        GoodDays as good_days, ModerateDays as moderate_days, UnhealthyDays as unhealthy_days
+    FROM rollup_county_monthly
+    WHERE County = :county_param
+    ORDER BY year, month;
+""")
+
+# --- 單一測站逐時序列 (aqi/series.py)：兩張表皆以主鍵 (SiteId, DataCreationDate) 做範圍掃描 ---
+# 同一小時兩張表都有資料時以 air_quality_records (爬蟲) 為準，與欄式儲存相同
+STATION_SERIES = text("""
+    SELECT DataCreationDate, AQI FROM air_quality_records
+    WHERE SiteId = :site_id AND DataCreationDate >= :start AND DataCreationDate < :end
+    UNION ALL
+    SELECT h.DataCreationDate, h.AQI FROM historical_aqi_analysis h
+    WHERE h.SiteId = :site_id AND h.DataCreationDate >= :start AND h.DataCreationDate < :end
+      AND NOT EXISTS (SELECT 1 FROM air_quality_records r
+                      WHERE r.SiteId = h.SiteId AND r.DataCreationDate = h.DataCreationDate)
+    ORDER BY DataCreationDate
+    LIMIT :limit;
+""")
+
+# --- 通用彙總 (aqi/aggregate.py)：縣市所有測站在時間範圍內的逐時讀數，只取出請求的欄位 ---
+# columns 只來自 aggregate.METRICS 的欄位名稱 (不含使用者輸入)；新增指標不需新的查詢。
+# 與 STATION_SERIES 相同，同一小時兩張表都有資料時以 air_quality_records 為準；彙總與順序無關，不排序
+def aggregate_readings(columns):
+    def select(alias):
+        return ', '.join(f'{alias}.{column}' for column in columns)
+    return text(f"""
+    SELECT r.DataCreationDate, {select('r')} FROM air_quality_records r
+    JOIN stations s ON s.SiteId = r.SiteId JOIN counties c ON c.CountyId = s.CountyId
+    WHERE c.Name = :county AND r.DataCreationDate >= :start AND r.DataCreationDate < :end
+    UNION ALL
+    SELECT h.DataCreationDate, {select('h')} FROM historical_aqi_analysis h
+    JOIN stations s ON s.SiteId = h.SiteId JOIN counties c ON c.CountyId = s.CountyId
+    WHERE c.Name = :county AND h.DataCreationDate >= :start AND h.DataCreationDate < :end
+      AND NOT EXISTS (SELECT 1 FROM air_quality_records r2
+                      WHERE r2.SiteId = h.SiteId AND r2.DataCreationDate = h.DataCreationDate);
+""")
+
+# --- 資料版本水位 (回應快取用，見 aqi/cache.py) ---
+DATA_VERSIONS = text("""
+    SELECT name, version, UNIX_TIMESTAMP(updated_at) as updated_ts FROM data_versions;
+""")
+
+# 名稱 -> 查詢，供 EXPLAIN 工具逐一檢查
+ENDPOINT_QUERIES = {
+    'county-summary': COUNTY_SUMMARY,
+    'county-data': COUNTY_DATA,
+    'historical/annual-trend': ANNUAL_TREND,
+    'historical/annual-map': ANNUAL_MAP,
+    'historical/seasonal-trend': SEASONAL_TREND,
+    'historical/monthly-distribution': MONTHLY_DISTRIBUTION,
+    'historical/unhealthy-days-count': UNHEALTHY_DAYS_COUNT,
+    'historical/county-report': COUNTY_REPORT,
+    'stations/series': STATION_SERIES,
+    # 實際執行時只取出請求的欄位；EXPLAIN 以全部欄位檢查
+    'historical/aggregate': aggregate_readings(['AQI'] + POLLUTANT_COLUMNS),
+}
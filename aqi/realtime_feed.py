@@ -0,0 +1,106 @@
+# =============================================================================
+# 即時資料推播 (Server-Sent Events)
+#
+# 每個服務行程只有一個輪詢者：定期讀取 data_versions 中 realtime 的版本號，
+# 版本改變時才讀取一次 latest_station_readings (每站一列)，在記憶體中與上一份快照比對，
+# 產生「縣市摘要 + 有變更的測站」事件，再分送給所有連線中的瀏覽器。
+# 不論有多少個客戶端，資料庫的負載都只有這一組查詢。
+#
+# 事件 id 即為 realtime 資料版本號 (跨行程、跨重啟皆一致)。瀏覽器重新連線時會帶
+# Last-Event-ID，若錯過的事件仍在緩衝區內即依序補送，否則改送一份完整快照。
+#
+# 同一份測站資料也建立空間索引 (aqi/spatial.py)，供地圖視窗與最近測站查詢使用。
+#
+# 本模組不處理執行緒或事件迴圈：dashboard_api.py 以 threading.Condition、
+# dashboard_asgi.py 以 asyncio.Condition 等待版本改變。
+# =============================================================================
+
+from collections import deque
+from .responses import round_average
+from .serialization import dumps
+from .spatial import StationIndex
+
+# 建議瀏覽器斷線後的重連間隔 (毫秒) 與閒置連線的心跳訊息
+RETRY_MILLISECONDS = 3000
+RETRY_LINE = f"retry: {RETRY_MILLISECONDS}\n\n".encode('utf-8')
+KEEPALIVE_LINE = b": keepalive\n\n"
+
+
+def county_summary(stations):
+    """由測站列計算各縣市平均 AQI，結果與 queries.COUNTY_SUMMARY 相同"""
+    totals = {}
+    for row in stations:
+        if row['AQI'] is None:
+            continue
+        total, count = totals.get(row['County'], (0, 0))
+        totals[row['County']] = (total + row['AQI'], count + 1)
+    return [
+        {'County': county, 'average_aqi': round_average(total, count)}
+        for county, (total, count) in totals.items()
+    ]
+
+def format_event(event, event_id, payload):
+    """組成一則 SSE 訊息 (JSON 不含換行，只需一行 data:)"""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event.encode('utf-8'), dumps(payload))
+
+
+class RealtimeFeed:
+    """最新的測站快照與最近 history 則更新事件"""
+
+    def __init__(self, history=64):
+        self.version = None
+        self.summary = []
+        self.stations = {}
+        self.index = StationIndex([])
+        # (前一個版本, 版本, 已編碼的事件)；依版本遞增排列
+        self.events = deque(maxlen=history)
+        self._snapshot = None
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def apply(self, version, station_rows):
+        """以一次查詢的結果更新快照，回傳新的 update 事件；第一次讀取只建立快照，回傳 None"""
+        stations = {row['SiteId']: row for row in station_rows}
+        changed = [row for site_id, row in stations.items() if self.stations.get(site_id) != row]
+        removed = [site_id for site_id in self.stations if site_id not in stations]
+        previous_version = self.version
+
+        self.stations = stations
+        self.index = StationIndex(stations.values())
+        self.summary = county_summary(station_rows)
+        self.version = version
+        self._snapshot = None
+        if previous_version is None:
+            return None
+
+        event = format_event('update', version, {
+            'version': version, 'summary': self.summary, 'stations': changed, 'removed': removed,
+        })
+        self.events.append((previous_version, version, event))
+        return event
+
+    def snapshot(self):
+        """完整快照事件 (所有測站)，同一個版本只編碼一次"""
+        if self._snapshot is None:
+            self._snapshot = format_event('snapshot', self.version, {
+                'version': self.version, 'summary': self.summary, 'stations': list(self.stations.values()),
+            })
+        return self._snapshot
+
+    def events_since(self, last_event_id):
+        """回傳 last_event_id 之後要補送的事件
+
+        last_event_id 無效、已超出緩衝區或不屬於目前的版本序列 (例如資料庫重建) 時，改送完整快照。
+        """
+        try:
+            last_version = int(last_event_id)
+        except (TypeError, ValueError):
+            return [self.snapshot()]
+        if last_version == self.version:
+            return []
+        for index, (previous_version, _, _) in enumerate(self.events):
+            if previous_version == last_version:
+                return [event for _, _, event in list(self.events)[index:]]
+        return [self.snapshot()]
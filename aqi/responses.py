@@ -0,0 +1,119 @@
+# =============================================================================
+# API 回應內容的組裝 (與網頁框架無關)
+#
+# dashboard_api.py (Flask) 與 dashboard_asgi.py (ASGI) 共用，確保兩種服務模式
+# 回傳完全相同的 JSON 結構。
+#
+# 測站列表 (/api/county-data、/api/stations) 另提供 ?format=columnar：
+#   {"columns": [...], "dictionaries": {"County": [...], "Status": [...]}, "values": [[第 1 欄], [第 2 欄], ...]}
+# 欄位名稱只出現一次，每欄一個陣列；County / Status 的值為 dictionaries 中的索引 (null 維持 null)。
+# 只輸出網頁實際使用的欄位 (STATION_COLUMNS)，資料表新增的欄位不會因此出現在回應中。
+# =============================================================================
+
+from decimal import Decimal, ROUND_HALF_UP
+
+FORMATS = ('json', 'columnar')
+FORMAT_ERROR = "format must be json or columnar"
+
+# 地圖標記與測站表格使用的欄位 (templates/index.html)；Rolling 為巢狀物件 (aqi/rolling.py)，原樣輸出
+STATION_COLUMNS = ('SiteId', 'SiteName', 'County', 'AQI', 'Status', 'DataCreationDate', 'Latitude', 'Longitude',
+                   'Rolling')
+DICTIONARY_COLUMNS = ('County', 'Status')
+
+
+def round_average(total, count):
+    """total / count 四捨五入至整數，與 MySQL 對精確數值的 ROUND() 相同 (0.5 進位，而非銀行家捨入)"""
+    return float((Decimal(int(total)) / Decimal(int(count))).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def fill_months(rows, defaults):
+    """補齊 1~12 月，查無資料的月份以 defaults 填入"""
+    rows_by_month = {row['month']: row for row in rows}
+    return [rows_by_month.get(month, {'month': month, **defaults}) for month in range(1, 13)]
+
+def seasonal_trend(rows):
+    return fill_months(rows, {'average_aqi': 0})
+
+def monthly_distribution(rows):
+    return fill_months(rows, {'good_days': 0, 'moderate_days': 0, 'unhealthy_days': 0})
+
+def unhealthy_days_summary(rows, year):
+    """由 UNHEALTHY_DAYS_COUNT 的查詢結果組出當年與前一年的不健康日比較"""
+    previous_year = year - 1
+    counts_by_year = {row['year']: row['unhealthy_days_count'] for row in rows}
+    current_year_count = counts_by_year.get(year, 0)
+    previous_year_count = counts_by_year.get(previous_year, 0)
+
+    change_percentage = None
+    if previous_year_count > 0:
+        change_percentage = round(((current_year_count - previous_year_count) / previous_year_count) * 100, 2)
+
+    return {
+        "current_year": year,
+        "unhealthy_days": int(current_year_count),
+        "previous_year": previous_year,
+        "previous_unhealthy_days": int(previous_year_count),
+        "change_percentage": change_percentage
+    }
+
+def monthly_totals(rows):
+    """將月彙總列 (year, month, aqi_sum, aqi_count, unhealthy_days...) 分別依年份與月份加總"""
+    yearly, monthly = {}, {}
+    for row in rows:
+        for bucket, key in ((yearly, row['year']), (monthly, row['month'])):
+            total = bucket.setdefault(key, {'aqi_sum': 0, 'aqi_count': 0, 'unhealthy_days': 0})
+            total['aqi_sum'] += row['aqi_sum']
+            total['aqi_count'] += row['aqi_count']
+            total['unhealthy_days'] += row['unhealthy_days']
+    return yearly, monthly
+
+def average_rows(key, totals):
+    """{鍵: 加總} -> [{key: 鍵, 'average_aqi': 平均}]，依鍵排序並略過沒有讀數的項目"""
+    return [
+        {key: k, 'average_aqi': round_average(t['aqi_sum'], t['aqi_count'])}
+        for k, t in sorted(totals.items()) if t['aqi_count']
+    ]
+
+def county_report(rows, year):
+    """由 COUNTY_REPORT 的月彙總列，一次組出歷史分析頁面的四種結果"""
+    yearly, monthly = monthly_totals(rows)
+    annual_trend = average_rows('year', yearly)
+    seasonal_rows = average_rows('month', monthly)
+    distribution_rows = [
+        {'month': row['month'], 'good_days': row['good_days'],
+         'moderate_days': row['moderate_days'], 'unhealthy_days': row['unhealthy_days']}
+        for row in rows if row['year'] == year
+    ]
+    unhealthy_rows = [
+        {'year': y, 'unhealthy_days_count': yearly[y]['unhealthy_days']}
+        for y in (year, year - 1) if y in yearly
+    ]
+
+    return {
+        "year": year,
+        "annual_trend": annual_trend,
+        "seasonal_trend": seasonal_trend(seasonal_rows),
+        "monthly_distribution": monthly_distribution(distribution_rows),
+        "unhealthy_days": unhealthy_days_summary(unhealthy_rows, year),
+    }
+
+def parse_format(args):
+    """?format= 參數；未指定時為 json，其他值拋出 ValueError"""
+    value = (args.get('format') or 'json').strip().lower()
+    if value not in FORMATS:
+        raise ValueError(value)
+    return value
+
+def columnar(rows, columns=STATION_COLUMNS, dictionary_columns=DICTIONARY_COLUMNS):
+    """list[dict] -> 欄式格式：只輸出 columns，dictionary_columns 以字典索引編碼"""
+    dictionaries, values = {}, []
+    for name in columns:
+        column = [row.get(name) for row in rows]
+        if name in dictionary_columns:
+            codes = {}
+            column = [None if value is None else codes.setdefault(value, len(codes)) for value in column]
+            dictionaries[name] = list(codes)
+        values.append(column)
+    return {'columns': list(columns), 'dictionaries': dictionaries, 'values': values}
+
+def station_rows(rows, response_format):
+    return columnar(rows) if response_format == 'columnar' else rows
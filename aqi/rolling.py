@@ -0,0 +1,228 @@
+# =============================================================================
+# 測站滾動視窗 (8 / 24 小時平均與最大值) 的增量計算
+#
+# 每個測站、每個指標 (METRICS) 保留最近 CAPACITY 小時的逐時環形緩衝區，並為每個視窗 (WINDOWS)
+# 維護總和、有效筆數與最大值：
+#   1. 新的一小時：只移出離開各視窗的一個值、放入新值，每筆讀數 O(1)，不需重新掃描視窗
+#   2. 修正值 (爬蟲重抓的重疊時段)：以差值更新總和；被取代或移出的值剛好是最大值時，
+#      才在讀取時重新掃描該視窗 (最多 CAPACITY 格)
+# 有效筆數未達視窗的 MIN_COVERAGE (75%，8 小時需 6 筆、24 小時需 18 筆) 時，平均與最大值為 null。
+#
+# 1. StationWindows：單一測站的緩衝區與視窗統計
+# 2. RollingAggregator：寫入端 (crawler.py)，狀態存於 station_rolling_windows (見 migrations/0008)，
+#    與讀數在同一個交易中寫入，常駐模式跨次執行沿用記憶體中的狀態，重新啟動時由資料表載入。
+#    以 DB-API cursor 與 %s 參數操作 (與 aqi/dimensions.py 相同)。
+# 3. parse_summary：讀取端 (dashboard_api.py、dashboard_asgi.py) 將 Summary 欄位解碼為 Rolling 欄位
+# =============================================================================
+
+import json
+import math
+from datetime import datetime, timedelta
+
+# API 欄位 (aqi/serialization.py 的 COLUMN_MAPPING 標準化後的名稱)
+METRICS = ('AQI', 'PM2_5', 'PM10', 'O3', 'CO')
+WINDOWS = (8, 24)
+CAPACITY = max(WINDOWS)
+MIN_COVERAGE = 0.75
+
+# 小時序號的起點；只用來計算相對位置
+EPOCH = datetime(2000, 1, 1)
+
+LOAD_SQL = "SELECT SiteId, LatestHour, Buffers FROM station_rolling_windows"
+UPSERT_SQL = """
+    INSERT INTO station_rolling_windows (SiteId, LatestHour, Buffers, Summary)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE LatestHour = VALUES(LatestHour), Buffers = VALUES(Buffers), Summary = VALUES(Summary)
+"""
+# 尚無狀態的測站由即時資料表取得各指標 (污染物欄位見 migrations/0009)
+SEED_SQL = f"""
+    SELECT SiteId, DataCreationDate, {', '.join(METRICS)} FROM air_quality_records
+    WHERE SiteId IN ({{placeholders}}) AND DataCreationDate > %s
+    ORDER BY DataCreationDate
+"""
+
+
+def hour_index(moment):
+    return int((moment - EPOCH).total_seconds() // 3600)
+
+def hour_start(index):
+    return EPOCH + timedelta(hours=index)
+
+def number(value):
+    """None / NaN / 無法轉換的值為 None；整數值轉為 int，讓 JSON 與比較結果穩定"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value):
+        return None
+    return int(value) if value.is_integer() else value
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(',', ':'))
+
+def parse_summary(text):
+    return json.loads(text) if text else None
+
+
+class StationWindows:
+    """單一測站各指標最近 CAPACITY 小時的環形緩衝區 (索引 = 小時序號 % CAPACITY)"""
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self._reset()
+
+    def _reset(self):
+        self.latest = None      # 緩衝區中最新的小時序號
+        self.slots = {metric: [None] * CAPACITY for metric in self.metrics}
+        self.sums = {metric: [0.0] * len(WINDOWS) for metric in self.metrics}
+        self.counts = {metric: [0] * len(WINDOWS) for metric in self.metrics}
+        self.maxima = {metric: [None] * len(WINDOWS) for metric in self.metrics}
+        self.stale = set()      # 最大值被移出、需重新掃描的 (指標, 視窗)
+
+    @classmethod
+    def from_state(cls, latest_hour, buffers, metrics=METRICS):
+        """由 state() 的內容重建 (每個指標 CAPACITY 個值，由舊到新，最後一個為 latest_hour)"""
+        windows = cls(metrics)
+        windows.latest = hour_index(latest_hour)
+        for metric, values in buffers.items():
+            if metric not in windows.slots:
+                continue
+            for offset, value in enumerate(values[-CAPACITY:]):
+                hour = windows.latest - len(values[-CAPACITY:]) + 1 + offset
+                windows._set(metric, hour, number(value))
+        return windows
+
+    def _remove(self, metric, i, value):
+        if value is None:
+            return
+        self.sums[metric][i] -= value
+        self.counts[metric][i] -= 1
+        if value == self.maxima[metric][i]:
+            self.stale.add((metric, i))
+
+    def _insert(self, metric, i, value):
+        if value is None:
+            return
+        self.sums[metric][i] += value
+        self.counts[metric][i] += 1
+        if self.maxima[metric][i] is None or value > self.maxima[metric][i]:
+            self.maxima[metric][i] = value
+
+    def _set(self, metric, hour, value):
+        """取代 hour 的值並更新包含該小時的視窗；回傳是否改變"""
+        slots = self.slots[metric]
+        old = slots[hour % CAPACITY]
+        if old == value:
+            return False
+        slots[hour % CAPACITY] = value
+        for i, size in enumerate(WINDOWS):
+            if hour > self.latest - size:
+                self._remove(metric, i, old)
+                self._insert(metric, i, value)
+        return True
+
+    def _advance(self, hour):
+        """將視窗結尾移到 hour：逐小時移出離開各視窗的值並清空新的一格"""
+        if self.latest is None or hour - self.latest >= CAPACITY:
+            self._reset()
+            self.latest = hour
+            return
+        while self.latest < hour:
+            self.latest += 1
+            for metric in self.metrics:
+                slots = self.slots[metric]
+                for i, size in enumerate(WINDOWS):
+                    self._remove(metric, i, slots[(self.latest - size) % CAPACITY])
+                slots[self.latest % CAPACITY] = None
+
+    def add(self, moment, values):
+        """寫入一筆逐時讀數 (values: {指標: 數值或 None})；早於緩衝區的讀數忽略。回傳統計是否改變"""
+        hour = hour_index(moment)
+        if self.latest is not None and hour <= self.latest - CAPACITY:
+            return False
+        changed = self.latest is None or hour > self.latest
+        if changed:
+            self._advance(hour)
+        for metric in self.metrics:
+            changed = self._set(metric, hour, number(values.get(metric))) or changed
+        return changed
+
+    def _maximum(self, metric, i):
+        if (metric, i) in self.stale:
+            values = [self.slots[metric][(self.latest - k) % CAPACITY] for k in range(WINDOWS[i])]
+            self.maxima[metric][i] = max((value for value in values if value is not None), default=None)
+            self.stale.discard((metric, i))
+        return self.maxima[metric][i]
+
+    def summary(self):
+        """{指標: {'avg_8h', 'max_8h', 'avg_24h', 'max_24h'}}；略過整個緩衝區都沒有值的指標"""
+        result = {}
+        for metric in self.metrics:
+            stats = {}
+            for i, size in enumerate(WINDOWS):
+                count = self.counts[metric][i]
+                enough = count >= math.ceil(size * MIN_COVERAGE)
+                stats[f'avg_{size}h'] = round(self.sums[metric][i] / count, 2) if enough else None
+                stats[f'max_{size}h'] = self._maximum(metric, i) if enough else None
+            if any(value is not None for value in self.slots[metric]):
+                result[metric] = stats
+        return result
+
+    def state(self):
+        """(最新的整點, {指標: 由舊到新的 CAPACITY 個值})；只保存有值的指標"""
+        buffers = {}
+        for metric in self.metrics:
+            values = [self.slots[metric][(self.latest - CAPACITY + 1 + k) % CAPACITY] for k in range(CAPACITY)]
+            if any(value is not None for value in values):
+                buffers[metric] = values
+        return hour_start(self.latest), buffers
+
+
+class RollingAggregator:
+    """寫入端的滾動視窗狀態；寫入 station_rolling_windows 的交易回滾時需呼叫 invalidate()"""
+
+    def __init__(self):
+        self.stations = None    # SiteId -> StationWindows；None 代表尚未載入
+
+    def invalidate(self):
+        self.stations = None
+
+    def _ensure_loaded(self, cursor):
+        if self.stations is not None:
+            return
+        cursor.execute(LOAD_SQL)
+        self.stations = {int(site_id): StationWindows.from_state(latest_hour, json.loads(buffers))
+                         for site_id, latest_hour, buffers in cursor.fetchall()}
+
+    def _seed(self, cursor, site_ids, since):
+        """尚無狀態的測站 (新測站或剛啟用本功能)：以即時資料表中 since 之後的讀數建立緩衝區"""
+        cursor.execute(SEED_SQL.format(placeholders=', '.join(['%s'] * len(site_ids))), (*site_ids, since))
+        for site_id in site_ids:
+            self.stations[site_id] = StationWindows()
+        for site_id, moment, *values in cursor.fetchall():
+            self.stations[int(site_id)].add(moment, dict(zip(METRICS, values)))
+
+    def update(self, cursor, readings):
+        """readings 為 (SiteId, DataCreationDate, {指標: 數值})；寫入統計有變更的測站並回傳其 SiteId 清單
+
+        只執行寫入，由呼叫端提交交易。
+        """
+        self._ensure_loaded(cursor)
+        readings = sorted(((int(site_id), moment, values) for site_id, moment, values in readings),
+                          key=lambda reading: reading[1])
+        if not readings:
+            return []
+        missing = sorted({site_id for site_id, _, _ in readings if site_id not in self.stations})
+        if missing:
+            self._seed(cursor, missing, readings[-1][1] - timedelta(hours=CAPACITY))
+        changed = set(missing)
+        changed.update(site_id for site_id, moment, values in readings if self.stations[site_id].add(moment, values))
+        rows = []
+        for site_id in sorted(changed):
+            windows = self.stations[site_id]
+            latest_hour, buffers = windows.state()
+            rows.append((site_id, latest_hour, _dumps(buffers), _dumps(windows.summary())))
+        if rows:
+            cursor.executemany(UPSERT_SQL, rows)
+        return sorted(changed)
@@ -0,0 +1,97 @@
+# =============================================================================
+# 查詢結果 -> JSON 的輕量序列化
+#
+# API 回傳的結果集都很小 (幾十列以內)，建立 DataFrame 的成本遠高於查詢本身，
+# 因此直接逐列讀取 cursor：
+#   1. 欄位名稱對應 (COLUMN_MAPPING) 依「查詢形狀」(欄位名稱組合) 只計算一次
+#   2. datetime 在讀取每一列時即格式化為 ISO 8601 (YYYY-MM-DDTHH:MM:SS)
+#   3. Decimal / NumPy 純量轉為原生 int、float，NaN 轉為 null
+#   4. 有安裝 orjson 時使用 orjson 編碼，否則使用標準 json 的精簡輸出
+# 本模組不匯入 pandas 與 numpy。
+# =============================================================================
+
+import json
+import math
+import threading
+from datetime import datetime, date
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# --- 欄位標準化對應表 (所有 API 回傳的欄位名稱統一為 PascalCase) ---
+COLUMN_MAPPING = {
+    'sitename': 'SiteName', 'county': 'County', 'aqi': 'AQI', 'pollutant': 'Pollutant',
+    'status': 'Status', 'so2': 'SO2', 'co': 'CO', 'o3': 'O3', 'o3_8hr': 'O3_8hr',
+    'pm10': 'PM10', 'pm2.5': 'PM2_5', 'pm2_5': 'PM2_5', 'no2': 'NO2', 'nox': 'NOx',
+    'no': 'NO', 'windspeed': 'WindSpeed', 'winddirec': 'WindDirec',
+    'datacreationdate': 'DataCreationDate', 'unit': 'Unit', 'co_8hr': 'CO_8hr',
+    'pm2.5_avg': 'PM2_5_AVG', 'pm10_avg': 'PM10_AVG', 'so2_avg': 'SO2_AVG',
+    'longitude': 'Longitude', 'latitude': 'Latitude', 'siteid': 'SiteId'
+}
+
+
+def _convert_float(value):
+    return None if math.isnan(value) else value
+
+def _convert_decimal(value):
+    return _convert_float(float(value))
+
+# 依值的型別直接查表轉換；不在表中的型別 (int, str, None...) 原樣輸出
+_CONVERTERS = {
+    datetime: lambda v: v.strftime(DATETIME_FORMAT),
+    date: lambda v: v.isoformat(),
+    Decimal: _convert_decimal,
+    float: _convert_float,
+}
+
+def _convert_numpy(value):
+    """NumPy 純量 (np.int64、np.float64 等) 以 .item() 轉為原生型別，不需匯入 numpy"""
+    value = value.item()
+    converter = _CONVERTERS.get(type(value))
+    return converter(value) if converter else value
+
+def convert_value(value):
+    converter = _CONVERTERS.get(type(value))
+    if converter is not None:
+        return converter(value)
+    if type(value).__module__ == 'numpy':
+        return _convert_numpy(value)
+    return value
+
+
+class RowSerializer:
+    """將 SQLAlchemy 查詢結果轉為 list[dict]，欄位名稱依 column_mapping 標準化"""
+
+    def __init__(self, column_mapping=None):
+        self.column_mapping = column_mapping or {}
+        self._shapes = {}
+        self._lock = threading.Lock()
+
+    def output_names(self, keys):
+        """同一組欄位名稱只計算一次對應結果"""
+        keys = tuple(keys)
+        names = self._shapes.get(keys)
+        if names is None:
+            names = tuple(self.column_mapping.get(k.lower(), k) for k in keys)
+            with self._lock:
+                self._shapes[keys] = names
+        return names
+
+    def records(self, result):
+        names = self.output_names(result.keys())
+        return [
+            {name: convert_value(value) for name, value in zip(names, row)}
+            for row in result
+        ]
+
+
+def dumps(payload):
+    """將已轉換為原生型別的資料編碼為 UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,132 @@
+# =============================================================================
+# 單一測站的逐時 AQI 序列 (/api/stations/<site_id>/series)
+#
+# queries.STATION_SERIES 以主鍵 (SiteId, DataCreationDate) 依時間範圍讀取
+# air_quality_records 與 historical_aqi_analysis，同一小時兩張表都有資料時以爬蟲資料為準。
+#
+# 兩種模式：
+#   1. 指定 points：讀出整段範圍後在伺服器端降採樣，只回傳約 points 個點
+#        lttb   ：Largest-Triangle-Three-Buckets，保留走勢形狀 (預設)
+#        minmax ：每個區間保留最小值與最大值，確保尖峰不會被平均掉
+#   2. 未指定 points：原始逐時資料分頁匯出 (keyset 分頁)，每頁最多 limit 列，
+#      回應中的 next_after 帶回 after 參數即可取得下一頁；沒有下一頁時為 null
+# =============================================================================
+
+from datetime import datetime, timedelta
+from .serialization import DATETIME_FORMAT
+
+DEFAULT_RANGE_DAYS = 30
+MAX_POINTS = 5000
+DEFAULT_PAGE_ROWS = 1000
+MAX_PAGE_ROWS = 10000
+# 降採樣模式單次最多讀取的列數 (約 30 年的逐時資料)
+MAX_SERIES_ROWS = 24 * 366 * 30
+METHODS = ('lttb', 'minmax')
+
+QUERY_ERROR = (f"from/to/after must be ISO dates (from < to); points must be 3-{MAX_POINTS}, "
+               f"method lttb or minmax, limit 1-{MAX_PAGE_ROWS}")
+
+
+def _parse_time(value, end_of_day=False):
+    """ISO 日期或日期時間 (台灣當地時間，不接受時區)；只有日期且 end_of_day 時代表「含當天」，回傳隔天 00:00"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        raise ValueError(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def parse_series_query(args, today=None):
+    """解析 from、to、points、method、limit、after 查詢參數，格式錯誤時拋出 ValueError"""
+    today = today or datetime.now().date()
+    if args.get('to'):
+        end = _parse_time(args['to'], end_of_day=True)
+    else:
+        end = datetime.combine(today, datetime.min.time()) + timedelta(days=1)
+    start = _parse_time(args['from']) if args.get('from') else end - timedelta(days=DEFAULT_RANGE_DAYS)
+    points = int(args['points']) if args.get('points') else None
+    method = args.get('method', 'lttb')
+    limit = int(args.get('limit', DEFAULT_PAGE_ROWS))
+    after = _parse_time(args['after']) if args.get('after') else None
+    if not (start < end and method in METHODS and 1 <= limit <= MAX_PAGE_ROWS
+            and (points is None or 3 <= points <= MAX_POINTS)):
+        raise ValueError(args)
+    return {'start': start, 'end': end, 'points': points, 'method': method, 'limit': limit, 'after': after}
+
+def query_params(site_id, query):
+    """STATION_SERIES 的查詢參數"""
+    start = query['start']
+    if query['points'] is None and query['after'] is not None:
+        # DATETIME 精確到秒，從游標的下一秒開始即為「大於 after」
+        start = max(start, query['after'] + timedelta(seconds=1))
+    return {
+        'site_id': site_id, 'start': start, 'end': query['end'],
+        'limit': MAX_SERIES_ROWS if query['points'] else query['limit'],
+    }
+
+
+# --- 降採樣 (輸入依時間排序、AQI 不為空) ---
+def _hours(row):
+    """時間軸座標 (小時)；比 timedelta 運算快數倍，長序列的降採樣主要耗時在此"""
+    moment = datetime.fromisoformat(row['DataCreationDate'])
+    return moment.toordinal() * 24 + moment.hour + moment.minute / 60
+
+def lttb(rows, threshold):
+    """Largest-Triangle-Three-Buckets：保留首尾，其餘每個區間選出與前後點圍成最大三角形的點"""
+    count = len(rows)
+    if threshold >= count:
+        return rows
+    xs = [_hours(row) for row in rows]
+    ys = [row['AQI'] for row in rows]
+    every = (count - 2) / (threshold - 2)
+    selected = [rows[0]]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        next_start, next_end = end, min(int((bucket + 2) * every) + 1, count)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        ax, ay = xs[previous], ys[previous]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(rows[best])
+        previous = best
+    selected.append(rows[-1])
+    return selected
+
+def min_max(rows, threshold):
+    """分成 threshold // 2 個等列數區間，每個區間依時間順序保留最小值與最大值"""
+    count = len(rows)
+    if threshold >= count:
+        return rows
+    buckets = threshold // 2
+    selected = []
+    for bucket in range(buckets):
+        start, end = bucket * count // buckets, (bucket + 1) * count // buckets
+        low = min(range(start, end), key=lambda i: rows[i]['AQI'])
+        high = max(range(start, end), key=lambda i: rows[i]['AQI'])
+        selected.extend(rows[i] for i in sorted({low, high}))
+    return selected
+
+
+def series_response(site_id, query, rows):
+    """組成回應：points 模式回傳降採樣結果，否則回傳一頁原始資料與下一頁的游標"""
+    response = {
+        'SiteId': site_id,
+        'from': query['start'].strftime(DATETIME_FORMAT),
+        'to': query['end'].strftime(DATETIME_FORMAT),
+    }
+    if query['points'] is None:
+        full_page = len(rows) == query['limit']
+        return {**response, 'method': 'raw', 'series': rows,
+                'next_after': rows[-1]['DataCreationDate'] if full_page else None}
+
+    readings = [row for row in rows if row['AQI'] is not None]
+    downsample = lttb if query['method'] == 'lttb' else min_max
+    return {**response, 'method': query['method'], 'source_points': len(readings),
+            'series': downsample(readings, query['points'])}
@@ -0,0 +1,257 @@
+# =============================================================================
+# 歷史分析 API 的預先產生靜態快照
+#
+# 歷史資料只在匯入、重建彙總表或冷熱分層後改變，鍵空間也很小 (約 22 縣市 x 10 年)，
+# 因此 scripts/export_snapshots.py 將每個 (端點, 縣市, 年份) 的回應預先寫成 JSON 檔，
+# 並以最高等級預先壓縮為 gzip 與 brotli (有安裝 brotli 套件時，見 aqi/compression.py)，歷史分析請求不需查詢 MySQL。
+#
+# 目錄結構 (SNAPSHOT_DIR，預設為專案根目錄的 snapshots/)：
+#   current.json                              目前上線的版本 {"version", "generated_at", "entries"}
+#   current -> <version>                      同上，供靜態檔案伺服器使用的符號連結 (無法建立時略過)
+#   <version>/manifest.json                   請求鍵 -> 檔案、SHA-256、各編碼大小與輸入雜湊
+#   <version>/api/historical/<端點>/<縣市>[/<年份>].json[.gz|.br]
+# 檔名中的參數值以 URL 編碼 (與瀏覽器送出的查詢字串相同)，nginx 可直接以 $arg_county 對應檔案。
+# version 由所有檔案的內容雜湊計算，內容不變時不會產生新目錄；新目錄寫完後才以 os.replace
+# 原子地更新 current.json，上一版保留到下一次匯出，讀取中的請求不會讀到半成品。
+#
+# 1. SnapshotWriter：匯出端，輸入雜湊未變的項目直接沿用上一版的檔案 (硬連結)，不重新查詢與壓縮
+# 2. SnapshotStore：讀取端 (dashboard_api.py、dashboard_asgi.py)，current.json 改變時重新載入
+# =============================================================================
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import quote
+from aqi.compression import available_encodings, choose_encoding, compress
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POINTER_FILE = 'current.json'
+LINK_NAME = 'current'
+MANIFEST_FILE = 'manifest.json'
+STAGING_PREFIX = '.staging-'
+MIME_TYPE = 'application/json'
+
+# 編碼名稱 -> 副檔名
+EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+# 匯出時不在意壓縮耗時，使用最高等級
+LEVELS = {'gzip': 9, 'br': 11}
+
+
+def default_snapshot_dir():
+    return os.getenv('SNAPSHOT_DIR', os.path.join(PROJECT_ROOT, 'snapshots'))
+
+def snapshot_key(path, params):
+    """請求路徑 + 依名稱排序的查詢參數，例如 /api/historical/annual-trend?county=臺北市"""
+    return f"{path}?{'&'.join(f'{name}={value}' for name, value in sorted(params.items()))}"
+
+def request_params(items):
+    """(名稱, 值) -> 正規化的查詢參數 (去除空白，忽略空值)，與 aqi/cache.py 的快取鍵相同"""
+    return {name: value.strip() for name, value in items if value.strip()}
+
+def relative_file(path, params):
+    """請求 -> 快照目錄中的相對路徑 (未壓縮版本)；參數值依名稱排序作為目錄層級"""
+    parts = [quote(str(params[name]), safe='') for name in sorted(params)]
+    return '/'.join([path.strip('/')] + parts) + '.json'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 標頭是否包含 etag (忽略 W/ 前綴)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/').strip('"') == etag for tag in tags)
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def read_pointer(root):
+    """讀取 current.json；尚未匯出時回傳 None"""
+    try:
+        with open(os.path.join(root, POINTER_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def read_manifest(root, version):
+    with open(os.path.join(root, version, MANIFEST_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# --- 匯出端 ---
+class SnapshotWriter:
+    """在暫存目錄中組出新版本的快照，commit() 後才上線"""
+
+    def __init__(self, root=None):
+        self.root = root or default_snapshot_dir()
+        os.makedirs(self.root, exist_ok=True)
+        pointer = read_pointer(self.root)
+        self.previous_version = pointer['version'] if pointer else None
+        try:
+            self.previous = read_manifest(self.root, self.previous_version)['entries'] if pointer else {}
+        except FileNotFoundError:
+            self.previous = {}
+        self.staging = os.path.join(self.root, f"{STAGING_PREFIX}{os.getpid()}")
+        shutil.rmtree(self.staging, ignore_errors=True)
+        os.makedirs(self.staging)
+        self.encodings = available_encodings()
+        self.entries = {}
+        self.stats = {'reused': 0, 'rendered': 0, 'unchanged': 0}
+
+    def _previous_files(self, entry):
+        """上一版的檔案與目前需要的編碼都存在時，回傳 (編碼, 來源路徑) 清單"""
+        if entry is None or any(encoding not in entry['encodings'] for encoding in self.encodings):
+            return None
+        base = os.path.join(self.root, self.previous_version, entry['file'])
+        files = [(None, base)] + [(encoding, base + EXTENSIONS[encoding]) for encoding in self.encodings]
+        return files if all(os.path.exists(source) for _, source in files) else None
+
+    def _link(self, files, relative):
+        target = os.path.join(self.staging, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        for encoding, source in files:
+            destination = target + (EXTENSIONS[encoding] if encoding else '')
+            try:
+                os.link(source, destination)
+            except OSError:
+                shutil.copy2(source, destination)
+
+    def reuse(self, key, inputs):
+        """輸入雜湊與上一版相同時沿用上一版的檔案，回傳是否成功"""
+        entry = self.previous.get(key)
+        if entry is None or entry['inputs'] != inputs:
+            return False
+        files = self._previous_files(entry)
+        if files is None:
+            return False
+        self._link(files, entry['file'])
+        self.entries[key] = {**entry, 'encodings': {e: entry['encodings'][e] for e in self.encodings}}
+        self.stats['reused'] += 1
+        return True
+
+    def add(self, path, params, inputs, body):
+        """寫入一個重新產生的回應；內容與上一版相同時仍沿用上一版的壓縮檔"""
+        key = snapshot_key(path, params)
+        relative = relative_file(path, params)
+        digest = hashlib.sha256(body).hexdigest()
+        entry = self.previous.get(key)
+        files = self._previous_files(entry) if entry is not None and entry['sha256'] == digest else None
+        if files is not None:
+            self._link(files, relative)
+            encodings = {e: entry['encodings'][e] for e in self.encodings}
+            self.stats['unchanged'] += 1
+        else:
+            target = os.path.join(self.staging, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(body)
+            encodings = {}
+            for encoding in self.encodings:
+                data = compress(body, encoding, LEVELS[encoding])
+                with open(target + EXTENSIONS[encoding], 'wb') as f:
+                    f.write(data)
+                encodings[encoding] = len(data)
+            self.stats['rendered'] += 1
+        self.entries[key] = {'file': relative, 'sha256': digest, 'bytes': len(body),
+                             'encodings': encodings, 'inputs': inputs}
+
+    def version(self):
+        digest = hashlib.sha256()
+        for key in sorted(self.entries):
+            digest.update(f"{key}\t{self.entries[key]['sha256']}\t{','.join(self.entries[key]['encodings'])}\n".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def commit(self, keep=2):
+        """換上新版本並回傳版本號；內容與目前版本相同時不做任何變更"""
+        version = self.version()
+        if version == self.previous_version:
+            self.discard()
+            return version
+        manifest = {'version': version, 'generated_at': datetime.now().isoformat(timespec='seconds'),
+                    'encodings': self.encodings, 'entries': self.entries}
+        _write_atomic(os.path.join(self.staging, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=1))
+        target = os.path.join(self.root, version)
+        if os.path.exists(target):
+            # 退回曾經匯出過的內容：沿用既有目錄
+            self.discard()
+        else:
+            os.rename(self.staging, target)
+        _write_atomic(os.path.join(self.root, POINTER_FILE), json.dumps(
+            {'version': version, 'generated_at': manifest['generated_at'], 'entries': len(self.entries)}))
+        self._update_link(version)
+        self._prune(keep, version)
+        return version
+
+    def discard(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def _update_link(self, version):
+        link = os.path.join(self.root, LINK_NAME)
+        tmp_link = f"{link}.tmp"
+        try:
+            if os.path.lexists(tmp_link):
+                os.remove(tmp_link)
+            os.symlink(version, tmp_link, target_is_directory=True)
+            os.replace(tmp_link, link)
+        except OSError as e:
+            # Windows 未開啟開發人員模式時無法建立符號連結；API 只讀取 current.json，不受影響
+            logging.info(f"無法更新 {link} 符號連結: {e}")
+
+    def _prune(self, keep, version):
+        """只保留最新的 keep 個版本 (含目前版本)"""
+        versions = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name == version or name.startswith(STAGING_PREFIX) or not os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+                continue
+            versions.append((os.path.getmtime(os.path.join(path, MANIFEST_FILE)), path))
+        for _, path in sorted(versions, reverse=True)[max(0, keep - 1):]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# --- 讀取端 ---
+class SnapshotStore:
+    """唯讀存取目前上線的快照；current.json 改變時重新載入 manifest"""
+
+    def __init__(self, root=None):
+        self.root = root or default_snapshot_dir()
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._version = None
+        self._entries = {}
+
+    def _load(self):
+        try:
+            stat = os.stat(os.path.join(self.root, POINTER_FILE))
+        except FileNotFoundError:
+            return None, {}
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    pointer = read_pointer(self.root)
+                    self._version = pointer['version']
+                    self._entries = read_manifest(self.root, self._version)['entries']
+                    self._stamp = stamp
+        return self._version, self._entries
+
+    def find(self, path, params, accept_encoding):
+        """回傳 (檔案內容 bytes, 編碼或 None, ETag)；快照中沒有此請求時回傳 None"""
+        version, entries = self._load()
+        entry = entries.get(snapshot_key(path, params))
+        if entry is None:
+            return None
+        encoding = choose_encoding(accept_encoding, entry['encodings'])
+        file_path = os.path.join(self.root, version, entry['file']) + (EXTENSIONS[encoding] if encoding else '')
+        try:
+            with open(file_path, 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            # 剛好被下一次匯出清除的舊版本：改由資料庫查詢
+            return None
+        return body, encoding, f"{entry['sha256'][:16]}-{encoding or 'identity'}"
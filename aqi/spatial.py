@@ -0,0 +1,179 @@
+# =============================================================================
+# 測站空間索引 (地圖視窗、最近測站與任意座標的 AQI 估計)
+#
+# 以固定大小的經緯度網格 (CELL_DEGREES) 將測站分桶，全部放在記憶體中：
+#   1. within()   ：只檢查與查詢範圍重疊的格子
+#   2. nearest()  ：由查詢點所在的格子向外一圈一圈搜尋，已找到的第 k 近距離
+#                   小於尚未搜尋區域的最短可能距離時即停止
+#   3. estimate() ：以最近 k 個有 AQI 的測站做反距離加權 (IDW) 內插
+# 距離以 Haversine 公式計算 (公里)。
+#
+# 索引建立後不再修改；RealtimeFeed 每次讀到新的測站資料時會重新建立一份並整份替換，
+# 讀取端不需加鎖。本模組不匯入 numpy。
+# =============================================================================
+
+import math
+import heapq
+import itertools
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 0.2
+# 與測站距離小於此值 (公里) 時直接使用該測站的 AQI
+SAME_POINT_KM = 0.01
+
+DEFAULT_NEIGHBOURS = 5
+MAX_NEIGHBOURS = 50
+DEFAULT_POWER = 2.0
+MAX_POWER = 10.0
+
+BBOX_ERROR = "bbox must be minLon,minLat,maxLon,maxLat"
+POINT_QUERY_ERROR = f"lat and lon are required; k must be 1-{MAX_NEIGHBOURS}, power 0-{MAX_POWER:g}"
+
+
+def parse_bbox(value):
+    """解析 Leaflet toBBoxString() 格式的 minLon,minLat,maxLon,maxLat，格式錯誤時拋出 ValueError"""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError(value)
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError(value)
+    return min_lon, min_lat, max_lon, max_lat
+
+def parse_point_query(args):
+    """由查詢參數 lat、lon、k、power 解析出 (lat, lon, k, power)，缺少或超出範圍時拋出 ValueError"""
+    if args.get('lat') is None or args.get('lon') is None:
+        raise ValueError('lat and lon are required')
+    lat, lon = float(args.get('lat')), float(args.get('lon'))
+    k = int(args.get('k', DEFAULT_NEIGHBOURS))
+    power = float(args.get('power', DEFAULT_POWER))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 1 <= k <= MAX_NEIGHBOURS and 0 < power <= MAX_POWER):
+        raise ValueError((lat, lon, k, power))
+    return lat, lon, k, power
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class StationIndex:
+    """以經緯度網格分桶的測站列 (latest_station_readings 的查詢結果)，沒有座標的測站不列入"""
+
+    def __init__(self, stations, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        self.size = 0
+        max_abs_lat = 0.0
+        for row in stations:
+            lat, lon = row.get('Latitude'), row.get('Longitude')
+            if lat is None or lon is None:
+                continue
+            lat, lon = float(lat), float(lon)
+            self.cells.setdefault(self._cell(lat, lon), []).append((lat, lon, row))
+            max_abs_lat = max(max_abs_lat, abs(lat))
+            self.size += 1
+        if self.cells:
+            rows, columns = zip(*self.cells)
+            self.extent = (min(rows), min(columns), max(rows), max(columns))
+        else:
+            self.extent = None
+        self._max_abs_lat = max_abs_lat
+
+    def __len__(self):
+        return self.size
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def within(self, min_lon, min_lat, max_lon, max_lat):
+        """回傳座標落在範圍內 (含邊界) 的測站列"""
+        if self.extent is None:
+            return []
+        low_row, low_col = self._cell(min_lat, min_lon)
+        high_row, high_col = self._cell(max_lat, max_lon)
+        low_row, low_col = max(low_row, self.extent[0]), max(low_col, self.extent[1])
+        high_row, high_col = min(high_row, self.extent[2]), min(high_col, self.extent[3])
+        found = []
+        for i in range(low_row, high_row + 1):
+            for j in range(low_col, high_col + 1):
+                for lat, lon, row in self.cells.get((i, j), ()):
+                    if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                        found.append(row)
+        return found
+
+    def _ring(self, center_row, center_col, radius):
+        """與中心格子切比雪夫距離恰為 radius、且位於測站分佈範圍內的格子"""
+        low_row, low_col, high_row, high_col = self.extent
+        for i in range(max(center_row - radius, low_row), min(center_row + radius, high_row) + 1):
+            if abs(i - center_row) == radius:
+                columns = range(max(center_col - radius, low_col), min(center_col + radius, high_col) + 1)
+            else:
+                columns = [j for j in (center_col - radius, center_col + radius) if low_col <= j <= high_col]
+            for j in columns:
+                yield i, j
+
+    def _unsearched_bound_km(self, lat, radius):
+        """搜尋完第 radius 圈後，其餘測站與查詢點的最短可能距離 (公里)"""
+        gap = math.radians(radius * self.cell_degrees)
+        # 緯度差 gap 至少相距 R * gap；經度差 gap 時 hav(d) >= cos(phi1) cos(phi2) hav(gap)
+        min_cos = math.cos(math.radians(max(abs(lat), self._max_abs_lat)))
+        return EARTH_RADIUS_KM * min(gap, 2 * math.asin(min(1.0, min_cos * math.sin(gap / 2))))
+
+    def nearest(self, lat, lon, k=DEFAULT_NEIGHBOURS, with_aqi=False):
+        """回傳最近的 k 個測站 [(距離公里, 測站列)]，由近到遠；with_aqi 時略過 AQI 為空的測站"""
+        if self.extent is None or k <= 0:
+            return []
+        center_row, center_col = self._cell(lat, lon)
+        low_row, low_col, high_row, high_col = self.extent
+        first = max(0, low_row - center_row, center_row - high_row, low_col - center_col, center_col - high_col)
+        last = max(abs(center_row - low_row), abs(center_row - high_row),
+                   abs(center_col - low_col), abs(center_col - high_col))
+
+        # 以負距離維持大小為 k 的最大堆積；序號避免距離相同時比較 dict
+        best, order = [], itertools.count()
+        for radius in range(first, last + 1):
+            for cell in self._ring(center_row, center_col, radius):
+                for station_lat, station_lon, row in self.cells.get(cell, ()):
+                    if with_aqi and row.get('AQI') is None:
+                        continue
+                    entry = (-haversine_km(lat, lon, station_lat, station_lon), next(order), row)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry[0] > best[0][0]:
+                        heapq.heapreplace(best, entry)
+            if len(best) == k and -best[0][0] <= self._unsearched_bound_km(lat, radius):
+                break
+        return [(-distance, row) for distance, _, row in sorted(best, reverse=True)]
+
+    def estimate(self, lat, lon, k=DEFAULT_NEIGHBOURS, power=DEFAULT_POWER):
+        """以最近 k 個有 AQI 的測站做反距離加權，回傳 (估計值, [(距離公里, 權重, 測站列)])；沒有可用測站時估計值為 None"""
+        neighbours = self.nearest(lat, lon, k, with_aqi=True)
+        if not neighbours:
+            return None, []
+        if neighbours[0][0] < SAME_POINT_KM:
+            distance, row = neighbours[0]
+            return float(row['AQI']), [(distance, 1.0, row)]
+        weights = [distance ** -power for distance, _ in neighbours]
+        total = sum(weights)
+        value = sum(weight * float(row['AQI']) for weight, (_, row) in zip(weights, neighbours)) / total
+        return value, [(distance, weight / total, row) for weight, (distance, row) in zip(weights, neighbours)]
+
+
+# --- API 回應 (dashboard_api.py 與 dashboard_asgi.py 共用) ---
+def nearest_response(index, lat, lon, k):
+    return [{**row, 'distance_km': round(distance, 2)} for distance, row in index.nearest(lat, lon, k)]
+
+def estimate_response(index, lat, lon, k, power):
+    value, neighbours = index.estimate(lat, lon, k, power)
+    return {
+        'latitude': lat,
+        'longitude': lon,
+        'estimated_aqi': None if value is None else math.floor(value + 0.5),
+        'stations': [
+            {'SiteId': row['SiteId'], 'SiteName': row['SiteName'], 'County': row['County'], 'AQI': row['AQI'],
+             'distance_km': round(distance, 2), 'weight': round(weight, 4)}
+            for distance, weight, row in neighbours
+        ],
+    }
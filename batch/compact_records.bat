@@ -0,0 +1,41 @@
+@ECHO OFF
+TITLE AQI Real-time Data Compaction
+
+:: 將當前視窗的編碼模式切換為 UTF-8
+chcp 65001
+CLS
+
+:: 自動切換到專案根目錄
+cd /d "%~dp0..\"
+
+ECHO ===================================================
+ECHO  AQI 即時資料冷熱分層 (搬移過期資料到歷史資料表)
+ECHO ===================================================
+ECHO.
+
+:: 檢查 venv 是否存在
+IF NOT EXIST ".\venv\Scripts\activate.bat" (
+    ECHO [錯誤] 找不到虛擬環境！此視窗將於 5 秒後關閉。
+    TIMEOUT /T 5 /NOBREAK
+    EXIT /B
+)
+
+ECHO [*] 正在啟動虛擬環境...
+CALL .\venv\Scripts\activate
+
+ECHO [*] 虛擬環境已啟動！
+ECHO.
+ECHO [*] 正在執行冷熱分層 (compact_records.py)...
+ECHO.
+
+:: 保留期限與批次大小可於 .env 設定 (COMPACTION_RETENTION_HOURS / COMPACTION_BATCH_HOURS)
+python scripts/compact_records.py
+
+ECHO.
+ECHO [*] 執行完畢，此視窗將於 5 秒後自動關閉...
+
+:: 等待 5 秒
+TIMEOUT /T 5 /NOBREAK
+
+:: 自動退出
+EXIT
\ No newline at end of file
@@ -0,0 +1,37 @@
+@ECHO OFF
+TITLE AQI Real-time Data Crawler (Daemon)
+
+:: 將當前視窗的編碼模式切換為 UTF-8
+chcp 65001
+CLS
+
+:: 自動切換到專案根目錄
+cd /d "%~dp0..\"
+
+ECHO ===================================================
+ECHO  AQI 即時資料爬蟲 - 常駐模式
+ECHO ===================================================
+ECHO.
+
+:: 檢查 venv 是否存在
+IF NOT EXIST ".\venv\Scripts\activate.bat" (
+    ECHO [錯誤] 找不到虛擬環境！此視窗將於 5 秒後關閉。
+    TIMEOUT /T 5 /NOBREAK
+    EXIT /B
+)
+
+ECHO [*] 正在啟動虛擬環境...
+CALL .\venv\Scripts\activate
+
+ECHO [*] 虛擬環境已啟動！
+ECHO.
+ECHO [*] 爬蟲將每小時自動執行，按下 Ctrl+C 即可停止。**請勿關閉此視窗**
+ECHO.
+
+:: 常駐執行 Python 爬蟲腳本
+python scripts/crawler.py --daemon
+
+ECHO.
+ECHO [*] 爬蟲已停止，此視窗將於 5 秒後自動關閉...
+TIMEOUT /T 5 /NOBREAK
+EXIT
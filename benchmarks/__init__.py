@@ -0,0 +1 @@
+"""可重現的效能測試：合成資料產生器、API / 匯入 / 爬蟲測量與結果比較 (python -m benchmarks --help)。"""
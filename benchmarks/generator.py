@@ -0,0 +1,178 @@
+# =============================================================================
+# 合成 AQI 資料產生器 (可重現)
+#
+# 依 (測站數, 年數, 結束年份, 亂數種子) 產生逐時 AQI，相同參數必定得到相同內容：
+#   1. history_records/history_<年>.json ：與 import_lean_data.py 讀取的歷史檔案格式相同
+#                                           ({"records": [...]}，欄位小寫、數值為字串)
+#   2. api_feed.csv                      ：環境部 aqx_p_488 的 CSV 格式，供 standin.FakeAqiApi 模擬即時 API；
+#                                           以產生當下為終點，harness 執行時會以執行當下重新產生
+#   3. dataset.json                      ：產生參數與測站清單，harness 依此組出查詢參數
+#
+# 每個測站的讀數 = 縣市基準值 + 季節變化 (冬季較高) + 日夜變化 + 平滑雜訊，約 1% 的小時缺值。
+# PM2.5 由 AQI 換算 (pm25_for)，其餘污染物留空，與部分測站未提供該項目的情況相同。
+# 每個測站使用獨立的亂數種子 (seed + SiteId)，與產生順序無關。
+# =============================================================================
+
+import os
+import csv
+import json
+import math
+import random
+from datetime import datetime, timedelta
+import numpy as np
+
+# 與 templates/index.html 的縣市中心點相同
+COUNTY_CENTERS = {
+    "基隆市": (25.1276, 121.7419), "臺北市": (25.033, 121.5654), "新北市": (25.0169, 121.4626),
+    "桃園市": (24.9936, 121.3), "新竹市": (24.8039, 120.9687), "新竹縣": (24.8423, 121.0116),
+    "苗栗縣": (24.5602, 120.8214), "臺中市": (24.1477, 120.6736), "彰化縣": (24.0531, 120.5151),
+    "南投縣": (23.9169, 120.982), "雲林縣": (23.7091, 120.4319), "嘉義市": (23.4801, 120.4464),
+    "嘉義縣": (23.45, 120.4), "臺南市": (22.9997, 120.2133), "高雄市": (22.6273, 120.3014),
+    "屏東縣": (22.6715, 120.487), "宜蘭縣": (24.7458, 121.7523), "花蓮縣": (23.9871, 121.6016),
+    "臺東縣": (22.7566, 121.1511), "澎湖縣": (23.57, 119.57), "金門縣": (24.4382, 118.3242),
+    "連江縣": (26.1492, 119.9542),
+}
+
+# (AQI 上限, 狀態)，與環境部的分級相同
+STATUS_LEVELS = [(50, '良好'), (100, '普通'), (150, '對敏感族群不健康'), (200, '對所有族群不健康'),
+                 (300, '非常不健康'), (math.inf, '危害')]
+
+HISTORY_DIR_NAME = 'history_records'
+API_FEED_FILE = 'api_feed.csv'
+DATASET_FILE = 'dataset.json'
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+API_COLUMNS = ['sitename', 'county', 'aqi', 'pollutant', 'status', 'pm2.5', 'datacreationdate',
+               'longitude', 'latitude', 'siteid']
+MISSING_RATE = 0.01
+# 即時 API 替身的資料使用另一組種子，與歷史資料不重疊
+API_SEED_OFFSET = 1_000_003
+
+
+def pm25_for(aqi):
+    return None if aqi is None else round(aqi * 0.35, 1)
+
+def status_for(aqi):
+    if aqi is None:
+        return ''
+    return next(status for limit, status in STATUS_LEVELS if aqi <= limit)
+
+def make_stations(count, seed):
+    """依序將測站分配到各縣市，座標在縣市中心點附近隨機散佈"""
+    rng = random.Random(seed)
+    counties = list(COUNTY_CENTERS)
+    stations = []
+    for site_id in range(1, count + 1):
+        county = counties[(site_id - 1) % len(counties)]
+        lat, lon = COUNTY_CENTERS[county]
+        stations.append({
+            'SiteId': site_id, 'SiteName': f'測站{site_id:03d}', 'County': county,
+            'Latitude': round(lat + rng.uniform(-0.08, 0.08), 6),
+            'Longitude': round(lon + rng.uniform(-0.08, 0.08), 6),
+        })
+    return stations
+
+def simulate_aqi(station, start, hours, seed):
+    """回傳 start 起連續 hours 小時的 AQI (list，缺值為 None)"""
+    rng = np.random.default_rng(seed + station['SiteId'])
+    # 以起點到 2000-01-01 的小時數為相位，不同起點產生的序列在季節與日夜上一致
+    offset = (start - datetime(2000, 1, 1)) // timedelta(hours=1)
+    t = np.arange(offset, offset + hours, dtype=np.float64)
+    base = 35 + 4 * (station['SiteId'] % 11)
+    seasonal = 22 * np.cos(2 * np.pi * (t / 24 - 15) / 365.25)
+    diurnal = 8 * np.sin(2 * np.pi * ((t % 24) - 9) / 24)
+    noise = np.convolve(rng.normal(0, 18, hours + 11), np.ones(12) / np.sqrt(12), mode='valid')
+    aqi = np.clip(np.rint(base + seasonal + diurnal + noise), 0, 500).astype(int)
+    missing = rng.random(hours) < MISSING_RATE
+    return [None if gone else value for value, gone in zip(aqi.tolist(), missing.tolist())]
+
+def _hour_strings(start, hours):
+    return [(start + timedelta(hours=h)).strftime(DATETIME_FORMAT) for h in range(hours)]
+
+def years_of(dataset):
+    return list(range(dataset['end_year'] - dataset['years'] + 1, dataset['end_year'] + 1))
+
+
+# --- 歷史檔案 ---
+def _history_record(station, timestamp, aqi):
+    return json.dumps({
+        'siteid': str(station['SiteId']), 'sitename': station['SiteName'], 'county': station['County'],
+        'aqi': '' if aqi is None else str(aqi), 'status': status_for(aqi), 'datacreationdate': timestamp,
+        'pm2.5': '' if aqi is None else str(pm25_for(aqi)),
+    }, ensure_ascii=False)
+
+def write_history_files(dataset, folder):
+    """每年一個 JSON 檔，回傳總筆數"""
+    os.makedirs(folder, exist_ok=True)
+    total = 0
+    for year in years_of(dataset):
+        start = datetime(year, 1, 1)
+        hours = (datetime(year + 1, 1, 1) - start) // timedelta(hours=1)
+        timestamps = _hour_strings(start, hours)
+        with open(os.path.join(folder, f'history_{year}.json'), 'w', encoding='utf-8') as f:
+            f.write('{"records": [\n')
+            first = True
+            for station in dataset['stations']:
+                for timestamp, aqi in zip(timestamps, simulate_aqi(station, start, hours, dataset['seed'])):
+                    f.write(('' if first else ',\n') + _history_record(station, timestamp, aqi))
+                    first = False
+                total += hours
+            f.write('\n]}\n')
+    return total
+
+def iter_history_rows(dataset):
+    """與歷史檔案內容相同的 (SiteId, SiteName, County, AQI, Status, DataCreationDate)，供 SQLite 替身直接載入"""
+    for year in years_of(dataset):
+        start = datetime(year, 1, 1)
+        hours = (datetime(year + 1, 1, 1) - start) // timedelta(hours=1)
+        timestamps = _hour_strings(start, hours)
+        for station in dataset['stations']:
+            values = simulate_aqi(station, start, hours, dataset['seed'])
+            yield [(station['SiteId'], station['SiteName'], station['County'], aqi, status_for(aqi) or None, timestamp)
+                   for timestamp, aqi in zip(timestamps, values)]
+
+
+# --- 即時 API 替身的 CSV ---
+def api_feed_rows(dataset, anchor, hours):
+    """anchor (含) 之前 hours 小時、每站每小時一列，依時間排序 (與 API 的 sort=datacreationdate asc 相同)"""
+    start = anchor.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    timestamps = _hour_strings(start, hours)
+    series = {station['SiteId']: simulate_aqi(station, start, hours, dataset['seed'] + API_SEED_OFFSET)
+              for station in dataset['stations']}
+    rows = []
+    for h, timestamp in enumerate(timestamps):
+        for station in dataset['stations']:
+            aqi = series[station['SiteId']][h]
+            rows.append({
+                'sitename': station['SiteName'], 'county': station['County'], 'aqi': '' if aqi is None else aqi,
+                'pollutant': '' if aqi is None or aqi <= 50 else '細懸浮微粒', 'status': status_for(aqi),
+                'pm2.5': '' if aqi is None else pm25_for(aqi), 'datacreationdate': timestamp,
+                'longitude': station['Longitude'], 'latitude': station['Latitude'], 'siteid': station['SiteId'],
+            })
+    return rows
+
+def write_api_feed(rows, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=API_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+# --- 資料集 ---
+def load_dataset(data_dir):
+    with open(os.path.join(data_dir, DATASET_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+def generate(data_dir, stations, years, end_year, seed, api_hours=48):
+    """產生歷史檔案、即時 API CSV 與 dataset.json，回傳 dataset"""
+    os.makedirs(data_dir, exist_ok=True)
+    dataset = {
+        'stations_count': stations, 'years': years, 'end_year': end_year, 'seed': seed,
+        'api_hours': api_hours, 'stations': make_stations(stations, seed),
+    }
+    dataset['history_records'] = write_history_files(dataset, os.path.join(data_dir, HISTORY_DIR_NAME))
+    feed_rows = api_feed_rows(dataset, datetime.now(), api_hours)
+    dataset['api_rows'] = write_api_feed(feed_rows, os.path.join(data_dir, API_FEED_FILE))
+    with open(os.path.join(data_dir, DATASET_FILE), 'w', encoding='utf-8') as f:
+        json.dump(dataset, f, ensure_ascii=False, indent=2)
+    return dataset
@@ -0,0 +1,321 @@
+# =============================================================================
+# benchmark 執行流程
+#
+#   1. 準備資料庫：
+#        sqlite (預設)：建立 SQLite 替身，直接載入合成資料並重建 rollup_* 彙總表
+#        mysql        ：以 import_lean_data.run_import 匯入合成的歷史檔案 (即「匯入」項目的測量)
+#   2. 匯入：mysql 測量完整匯入 (載入 + 切換 + 彙總表) 的 records/sec；
+#            sqlite 只測量解析與清洗 (import_lean_data.run_check)，不含寫入
+#   3. 爬蟲：以 FakeAqiApi 提供即時資料，測量 crawler.run_crawl 第一次 (全部新增)
+#            與第二次 (資料皆未變更) 的端到端時間；需要 MySQL
+#   4. API：逐一對每個 /api/* 路由以固定並行數持續送出請求，記錄 p50/p95/p99 與 req/s
+#   5. 回應大小：每個路由未壓縮 / gzip / brotli 實際傳輸的位元組數 (與並行測量無關，不受機器快慢影響)
+#
+# 腳本會讀取環境變數 (HISTORY_RECORDS_DIR、AQI_API_URL 等)，因此 import_lean_data、
+# crawler、dashboard_api 都在 configure_environment() 之後才匯入。
+# =============================================================================
+
+import os
+import sys
+import time
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import quote
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from . import generator
+from .standin import PROJECT_ROOT, create_standin_engine, FakeAqiApi
+
+SCRIPTS_DIR = os.path.join(PROJECT_ROOT, 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# 不測量的路由與原因 (Flask 規則字串)
+EXCLUDED_ROUTES = {
+    '/api/realtime/stream': 'SSE 長連線，無單次延遲可言',
+    '/api/crawler-status': '只讀取狀態檔，與資料庫無關',
+}
+
+HISTORY_INSERT_SQL = text("""
+    INSERT INTO historical_aqi_analysis (SiteId, DataCreationDate, AQI, StatusId, PM2_5)
+    VALUES (:SiteId, :DataCreationDate, :AQI, :StatusId, :PM2_5)
+""")
+RECORD_INSERT_SQL = text("""
+    INSERT INTO air_quality_records (SiteId, DataCreationDate, AQI, StatusId, PM2_5)
+    VALUES (:SiteId, :DataCreationDate, :AQI, :StatusId, :PM2_5)
+""")
+# latest_station_readings 沒有污染物欄位 (見 migrations/0009)
+LATEST_INSERT_SQL = text("""
+    INSERT INTO latest_station_readings (SiteId, DataCreationDate, AQI, StatusId)
+    VALUES (:SiteId, :DataCreationDate, :AQI, :StatusId)
+""")
+ROLLING_INSERT_SQL = text("""
+    INSERT INTO station_rolling_windows (SiteId, LatestHour, Buffers, Summary)
+    VALUES (:SiteId, :LatestHour, :Buffers, :Summary)
+""")
+STATION_INSERT_SQL = text("""
+    INSERT INTO stations (SiteId, SiteName, CountyId, Latitude, Longitude)
+    VALUES (:SiteId, :SiteName, :CountyId, :Latitude, :Longitude)
+""")
+
+
+def configure_environment(data_dir, mysql_url=None, historical_backend='mysql', cache=False, api_url=''):
+    """在匯入專案腳本之前設定環境變數 (load_dotenv 不會覆寫已存在的變數)"""
+    os.environ['HISTORY_RECORDS_DIR'] = os.path.join(data_dir, generator.HISTORY_DIR_NAME)
+    os.environ['COLUMNAR_STORE_DIR'] = os.path.join(data_dir, 'columnar_store')
+    os.environ['HISTORICAL_BACKEND'] = historical_backend
+    os.environ['AQI_API_URL'] = api_url
+    os.environ['DASHBOARD_NOTIFY_URL'] = ''
+    if not cache:
+        # 測量每次都查詢資料庫的延遲；--cache 時改為測量回應快取
+        os.environ['CACHE_MAX_ENTRIES'] = '0'
+        os.environ['CACHE_SHARED_BACKEND'] = ''
+    if mysql_url:
+        url = make_url(mysql_url)
+        os.environ.update(DB_USER=url.username or '', DB_PASSWORD=url.password or '', DB_HOST=url.host or '127.0.0.1',
+                          DB_PORT=str(url.port or 3306), DB_NAME=url.database or '')
+    else:
+        # dashboard_api / import_lean_data 匯入時會檢查連線設定；替身模式不會用到這些值
+        for name, value in dict(DB_USER='standin', DB_PASSWORD='standin', DB_HOST='127.0.0.1',
+                                DB_PORT='3306', DB_NAME='standin').items():
+            os.environ.setdefault(name, value)
+
+
+# --- 1. 資料庫 ---
+def load_standin(engine, dataset, feed_rows):
+    """將合成資料直接寫入 SQLite 替身：測站維度表、歷史資料、爬蟲資料表、最新讀數快照與滾動視窗"""
+    total = 0
+    with engine.begin() as conn:
+        status_ids = load_dimensions(conn, dataset)
+        for rows in generator.iter_history_rows(dataset):
+            conn.execute(HISTORY_INSERT_SQL, [
+                {'SiteId': site_id, 'DataCreationDate': created, 'AQI': aqi, 'StatusId': status_ids.get(status),
+                 'PM2_5': generator.pm25_for(aqi)}
+                for site_id, _, _, aqi, status, created in rows])
+            total += len(rows)
+
+    records = [{
+        'SiteId': int(row['siteid']), 'AQI': None if row['aqi'] == '' else int(row['aqi']),
+        'StatusId': status_ids.get(row['status']), 'DataCreationDate': row['datacreationdate'],
+        'PM2_5': None if row.get('pm2.5', '') == '' else float(row['pm2.5']),
+    } for row in feed_rows]
+    latest = {record['SiteId']: record for record in records}
+    with engine.begin() as conn:
+        conn.execute(RECORD_INSERT_SQL, records)
+        conn.execute(LATEST_INSERT_SQL, list(latest.values()))
+        conn.execute(ROLLING_INSERT_SQL, rolling_rows(feed_rows))
+        conn.execute(text("UPDATE data_versions SET version = version + 1 WHERE name = 'realtime'"))
+    return total
+
+def rolling_rows(feed_rows):
+    """以爬蟲相同的方式 (aqi/rolling.py) 由即時 API 資料計算各測站的滾動視窗"""
+    from aqi.rolling import StationWindows, _dumps
+
+    stations = {}
+    for row in feed_rows:
+        moment = datetime.strptime(row['datacreationdate'], generator.DATETIME_FORMAT)
+        stations.setdefault(int(row['siteid']), StationWindows()).add(
+            moment, {'AQI': row['aqi'], 'PM2_5': row.get('pm2.5')})
+    rows = []
+    for site_id, windows in stations.items():
+        latest_hour, buffers = windows.state()
+        rows.append({'SiteId': site_id, 'LatestHour': latest_hour,
+                     'Buffers': _dumps(buffers), 'Summary': _dumps(windows.summary())})
+    return rows
+
+def load_dimensions(conn, dataset):
+    """寫入 counties 與 stations (aqi_statuses 已由替身建立)，回傳狀態名稱 -> StatusId"""
+    counties = sorted({station['County'] for station in dataset['stations']})
+    conn.execute(text("INSERT INTO counties (Name) VALUES (:Name)"), [{'Name': county} for county in counties])
+    county_ids = dict(conn.execute(text("SELECT Name, CountyId FROM counties")).all())
+    conn.execute(STATION_INSERT_SQL, [{**station, 'CountyId': county_ids[station['County']]}
+                                      for station in dataset['stations']])
+    return dict(conn.execute(text("SELECT Name, StatusId FROM aqi_statuses")).all())
+
+def prepare_standin(data_dir, dataset, feed_rows, historical_backend):
+    from rollups import rebuild_rollups
+    from columnar_store import build_columnar_store
+
+    engine = create_standin_engine(os.path.join(data_dir, 'standin.sqlite'))
+    started = time.perf_counter()
+    total = load_standin(engine, dataset, feed_rows)
+    logging.info(f"SQLite 替身已載入 {total} 筆歷史資料 ({time.perf_counter() - started:.1f} 秒)。")
+    if historical_backend == 'columnar':
+        build_columnar_store(engine)
+    rebuild_rollups(engine)
+    return engine
+
+
+# --- 2. 匯入 ---
+def history_files():
+    folder = os.environ['HISTORY_RECORDS_DIR']
+    return sorted(f for f in os.listdir(folder) if f.endswith('.json'))
+
+def bench_import(engine, dataset, workers, load):
+    """load 為 True 時執行完整匯入 (MySQL)，否則只解析與清洗"""
+    import import_lean_data
+
+    files = history_files()
+    started = time.perf_counter()
+    if load:
+        import_lean_data.run_import(engine, files, workers=workers)
+    else:
+        import_lean_data.run_check(files, workers=workers)
+    seconds = time.perf_counter() - started
+    records = dataset['history_records']
+    return {'mode': 'load' if load else 'parse', 'records': records, 'workers': workers,
+            'seconds': round(seconds, 3), 'records_per_sec': round(records / seconds if seconds else 0.0)}
+
+
+# --- 3. 爬蟲 ---
+def bench_crawler(engine):
+    """清空即時資料表後執行兩次 run_crawl：第一次全部新增，第二次資料皆未變更"""
+    import crawler
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM air_quality_records"))
+        conn.execute(text("DELETE FROM latest_station_readings"))
+    session = crawler.create_http_session()
+
+    def timed_crawl():
+        started = time.perf_counter()
+        result = crawler.run_crawl(session=session)
+        if result is None:
+            raise RuntimeError('crawler.run_crawl 執行失敗')
+        return result, time.perf_counter() - started
+
+    first, seconds = timed_crawl()
+    _, noop_seconds = timed_crawl()
+    return {'rows': first['new'], 'seconds': round(seconds, 3), 'noop_seconds': round(noop_seconds, 3)}
+
+
+# --- 4. API ---
+def api_routes(dataset):
+    """(名稱, Flask 規則, 請求路徑)；參數取自合成資料集，保證查得到資料"""
+    station = dataset['stations'][0]
+    county, year, site_id = quote(station['County']), dataset['end_year'], station['SiteId']
+    lat, lon = station['Latitude'], station['Longitude']
+    first_year = dataset['end_year'] - dataset['years'] + 1
+    return [
+        ('county-summary', '/api/county-summary', '/api/county-summary'),
+        ('county-data', '/api/county-data/<string:county_name>', f'/api/county-data/{county}'),
+        ('county-data (columnar)', '/api/county-data/<string:county_name>', f'/api/county-data/{county}?format=columnar'),
+        ('historical/annual-trend', '/api/historical/annual-trend', f'/api/historical/annual-trend?county={county}'),
+        ('historical/annual-map', '/api/historical/annual-map', f'/api/historical/annual-map?year={year}'),
+        ('historical/seasonal-trend', '/api/historical/seasonal-trend', f'/api/historical/seasonal-trend?county={county}'),
+        ('historical/monthly-distribution', '/api/historical/monthly-distribution',
+         f'/api/historical/monthly-distribution?county={county}&year={year}'),
+        ('historical/unhealthy-days-count', '/api/historical/unhealthy-days-count',
+         f'/api/historical/unhealthy-days-count?county={county}&year={year}'),
+        ('historical/county-report', '/api/historical/county-report',
+         f'/api/historical/county-report?county={county}&year={year}'),
+        ('stations (bbox)', '/api/stations', '/api/stations?bbox=120.9,24.6,121.9,25.3'),
+        ('stations (bbox, columnar)', '/api/stations', '/api/stations?bbox=120.9,24.6,121.9,25.3&format=columnar'),
+        ('stations/nearest', '/api/stations/nearest', f'/api/stations/nearest?lat={lat}&lon={lon}&k=5'),
+        ('aqi-estimate', '/api/aqi-estimate', f'/api/aqi-estimate?lat={lat + 0.05}&lon={lon + 0.05}'),
+        ('stations/series (points=500)', '/api/stations/<int:site_id>/series',
+         f'/api/stations/{site_id}/series?from={first_year}-01-01&to={year}-12-31&points=500'),
+        ('stations/series (raw page)', '/api/stations/<int:site_id>/series',
+         f'/api/stations/{site_id}/series?from={year}-01-01&limit=1000'),
+        ('historical/aggregate (aqi+pm2_5)', '/api/historical/aggregate',
+         f'/api/historical/aggregate?metric=aqi,pm2_5&county={county}&group=month&stat=mean,p95,exceedance_days&year={year}'),
+    ]
+
+def uncovered_routes(app, routes):
+    """Flask app 中沒有列入測量、也不在排除清單內的 GET /api/* 路由"""
+    covered = {rule for _, rule, _ in routes} | set(EXCLUDED_ROUTES)
+    return sorted(rule.rule for rule in app.url_map.iter_rules()
+                  if rule.rule.startswith('/api/') and 'GET' in rule.methods and rule.rule not in covered)
+
+def start_flask_server(engine):
+    """在背景執行緒啟動 dashboard_api (多執行緒開發伺服器)，回傳 (基底網址, app)"""
+    from werkzeug.serving import make_server
+    import dashboard_api
+
+    dashboard_api.engine = engine
+    # 每個請求一行的存取紀錄會拖慢伺服器並淹沒測量結果
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, dashboard_api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='benchmark-api', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", dashboard_api.app
+
+def bench_api(base_url, routes, concurrency, duration, warmup, route_filter=None):
+    from load_test import run_target
+
+    metrics = {}
+    for name, _, path in routes:
+        if route_filter and not any(part in name for part in route_filter):
+            continue
+        if warmup > 0:
+            run_target(base_url, [path], concurrency, warmup)
+        result = run_target(base_url, [path], concurrency, duration)
+        metrics[f'api {name}'] = {
+            'requests': result['requests'], 'errors': result['errors'], 'rps': round(result['rps'], 1),
+            'p50_ms': round(result['p50_ms'], 2), 'p95_ms': round(result['p95_ms'], 2), 'p99_ms': round(result['p99_ms'], 2),
+        }
+        logging.info(f"{name:<34} {result['rps']:>8.1f} req/s  p50 {result['p50_ms']:.1f} ms  "
+                     f"p95 {result['p95_ms']:.1f} ms  p99 {result['p99_ms']:.1f} ms  錯誤 {result['errors']}")
+    return metrics
+
+def bench_payloads(base_url, routes, route_filter=None):
+    """以不同的 Accept-Encoding 各請求一次，記錄實際傳輸的位元組數；伺服器未以該編碼回應時不記錄"""
+    import requests
+
+    metrics = {}
+    for name, _, path in routes:
+        if route_filter and not any(part in name for part in route_filter):
+            continue
+        sizes = {}
+        for encoding in ('identity', 'gzip', 'br'):
+            # stream=True 並讀取 raw：取得壓縮後的內容，不讓 requests 自動解壓縮
+            response = requests.get(base_url + path, headers={'Accept-Encoding': encoding}, stream=True, timeout=30)
+            body = response.raw.read()
+            if response.status_code == 200 and response.headers.get('Content-Encoding', 'identity') == encoding:
+                sizes[f'{encoding}_bytes'] = len(body)
+        metrics[f'payload {name}'] = sizes
+        logging.info(f"{name:<34} " + '  '.join(f"{field[:-6]} {size:>8,} B" for field, size in sizes.items()))
+    return metrics
+
+
+def run(args, results):
+    """依 args 執行各項測量，結果寫入 results['metrics']"""
+    dataset = generator.load_dataset(args.data)
+    feed_path = os.path.join(args.data, generator.API_FEED_FILE)
+    # 爬蟲以「現在」往前推算抓取起點，即時資料需以執行當下為終點重新產生
+    feed_rows = generator.api_feed_rows(dataset, datetime.now(), dataset['api_hours'])
+    generator.write_api_feed(feed_rows, feed_path)
+    api = FakeAqiApi(feed_path).start()
+    configure_environment(args.data, args.mysql_url, args.historical_backend, args.cache, api.url)
+    skip = set(args.skip or [])
+
+    if args.mysql_url:
+        engine = create_engine(args.mysql_url)
+        if 'import' not in skip:
+            results['metrics']['import'] = bench_import(engine, dataset, args.workers, load=True)
+        if 'crawler' not in skip:
+            results['metrics']['crawler'] = bench_crawler(engine)
+    else:
+        engine = prepare_standin(args.data, dataset, feed_rows, args.historical_backend)
+        if 'import' not in skip:
+            results['metrics']['import'] = bench_import(engine, dataset, args.workers, load=False)
+        if 'crawler' not in skip:
+            logging.warning("crawler.py 以 MySQLdb 寫入 MySQL，SQLite 替身模式不測量爬蟲 (請改用 --mysql-url)。")
+    api.shutdown()
+
+    if not {'api', 'payload'} <= skip:
+        routes = api_routes(dataset)
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            base_url, app = start_flask_server(engine)
+            for rule in uncovered_routes(app, routes):
+                logging.warning(f"路由 {rule} 尚未列入 benchmark (請更新 benchmarks/harness.py 的 api_routes)。")
+        if 'api' not in skip:
+            results['metrics'].update(bench_api(base_url, routes, args.concurrency, args.duration, args.warmup, args.routes))
+        if 'payload' not in skip:
+            results['metrics'].update(bench_payloads(base_url, routes, args.routes))
+    return results
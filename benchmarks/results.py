@@ -0,0 +1,118 @@
+# =============================================================================
+# benchmark 結果檔 (JSON) 與兩次結果的比較
+#
+# 結果檔格式 (format = 1)：
+#   {
+#     "format": 1,
+#     "created_at": "2025-01-01T12:00:00",
+#     "git_commit": "abc1234",               # 無法取得時為 null
+#     "environment": {"python": ..., "platform": ..., "cpu_count": ...},
+#     "config": {"backend": "sqlite", "stations": 80, "years": 10, "seed": 42, "concurrency": 8, ...},
+#     "metrics": {
+#       "api /api/county-summary": {"requests": 812, "errors": 0, "rps": 162.3,
+#                                   "p50_ms": 4.1, "p95_ms": 9.8, "p99_ms": 14.0},
+#       "payload county-data (columnar)": {"identity_bytes": 1890, "gzip_bytes": 512, "br_bytes": 431},
+#       "import": {"records": 7012800, "seconds": 85.2, "records_per_sec": 82310},
+#       "crawler": {"rows": 3840, "seconds": 2.1, "noop_seconds": 0.4}
+#     }
+#   }
+#
+# 比較規則：名稱以 _ms / seconds / _bytes 結尾的指標越小越好，rps / records_per_sec 越大越好，
+# 變差超過門檻 (預設 10%) 即列為退步；errors 由 0 變為非 0 也列為退步。
+# config 不同 (資料量、並行數、後端) 的兩次結果不具可比性，比較時會先提出警告。
+# =============================================================================
+
+import os
+import sys
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+RESULTS_FORMAT = 1
+HIGHER_IS_BETTER = ('rps', 'records_per_sec')
+LOWER_IS_BETTER_SUFFIXES = ('_ms', 'seconds', '_bytes')
+DEFAULT_THRESHOLD = 0.10
+
+
+def git_commit(project_root):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def new_results(project_root, config):
+    return {
+        'format': RESULTS_FORMAT,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(project_root),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': config,
+        'metrics': {},
+    }
+
+def save_results(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        results = json.load(f)
+    if results.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path}: 不支援的結果檔格式 {results.get('format')}")
+    return results
+
+def _direction(field):
+    """1 代表越大越好，-1 代表越小越好，0 代表不比較"""
+    if field in HIGHER_IS_BETTER:
+        return 1
+    if field.endswith(LOWER_IS_BETTER_SUFFIXES):
+        return -1
+    return 0
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """回傳 [(指標, 欄位, 基準值, 本次值, 變化比例, 是否退步)]，只比較兩份結果都有的指標"""
+    rows = []
+    for metric, values in current['metrics'].items():
+        base_values = baseline['metrics'].get(metric)
+        if not base_values:
+            continue
+        for field, value in values.items():
+            base = base_values.get(field)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)):
+                continue
+            if field == 'errors':
+                rows.append((metric, field, base, value, None, base == 0 and value > 0))
+                continue
+            direction = _direction(field)
+            if direction == 0 or base == 0:
+                continue
+            change = (value - base) / base
+            rows.append((metric, field, base, value, change, -direction * change > threshold))
+    return rows
+
+def config_differences(baseline, current):
+    keys = sorted(set(baseline['config']) | set(current['config']))
+    return [(key, baseline['config'].get(key), current['config'].get(key))
+            for key in keys if baseline['config'].get(key) != current['config'].get(key)]
+
+def print_comparison(baseline, current, threshold=DEFAULT_THRESHOLD, out=sys.stdout):
+    """印出比較表，回傳退步的項目數"""
+    for key, old, new in config_differences(baseline, current):
+        print(f"[!] 設定不同，結果可能無法直接比較：{key} = {old} -> {new}", file=out)
+    print(f"基準: {baseline.get('git_commit')} ({baseline['created_at']})  "
+          f"本次: {current.get('git_commit')} ({current['created_at']})  門檻: {threshold:.0%}", file=out)
+    print(f"\n{'指標':<44}{'欄位':<18}{'基準':>12}{'本次':>12}{'變化':>9}", file=out)
+    regressions = 0
+    for metric, field, base, value, change, regressed in compare(baseline, current, threshold):
+        regressions += regressed
+        change_text = '' if change is None else f"{change:+.1%}"
+        print(f"{metric:<44}{field:<18}{base:>12.6g}{value:>12.6g}{change_text:>9}{'  <-- 退步' if regressed else ''}",
+              file=out)
+    print(f"\n共 {regressions} 項退步。" if regressions else "\n沒有超過門檻的退步。", file=out)
+    return regressions
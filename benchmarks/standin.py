@@ -0,0 +1,144 @@
+# =============================================================================
+# 本機替身：SQLite 資料庫與即時 AQI API
+#
+# 沒有 MySQL 時，benchmark 以 SQLite 檔案代替：
+#   - 由 database/initialize_database.sql 轉出資料表 (去掉索引、分區與 MySQL 專屬語法)
+#     與 aqi_statuses 的初始資料
+#   - 以 SQLite 自訂函式補上 YEAR / MONTH / GREATEST / UNIX_TIMESTAMP 與 GET_LOCK / RELEASE_LOCK
+#     (單一行程，一律取得成功)，
+#     並改寫 INSERT IGNORE 與 data_versions 的 ON DUPLICATE KEY UPDATE，
+#     rollups.py 與 API 查詢即可照常執行
+# SQLite 的整數除法、查詢最佳化與 MySQL 不同，數字只能與同樣使用替身的結果比較。
+#
+# FakeAqiApi 以 api_feed.csv 模擬環境部 API 的 offset / limit / filters 分頁，
+# 供 crawler.py (AQI_API_URL) 的端到端測試使用；failures 可讓接下來的請求回應錯誤狀態碼 (測試重試)。
+# =============================================================================
+
+import os
+import re
+import csv
+import io
+import threading
+from collections import deque
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from sqlalchemy import create_engine, event, text
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(PROJECT_ROOT, 'database', 'initialize_database.sql')
+
+_MYSQL_REWRITES = [
+    ('ON DUPLICATE KEY UPDATE version = version + 1', 'ON CONFLICT(name) DO UPDATE SET version = version + 1'),
+    ('INSERT IGNORE INTO', 'INSERT OR IGNORE INTO'),
+]
+
+
+def _unix_timestamp(value):
+    if value is None:
+        return None
+    return datetime.fromisoformat(str(value)).timestamp()
+
+def create_standin_engine(path):
+    """建立 SQLite 替身的引擎 (每次建立全新的資料庫檔案)"""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False})
+
+    @event.listens_for(engine, 'connect')
+    def register_functions(dbapi_connection, _):
+        dbapi_connection.create_function('YEAR', 1, lambda s: None if s is None else int(str(s)[:4]))
+        dbapi_connection.create_function('MONTH', 1, lambda s: None if s is None else int(str(s)[5:7]))
+        dbapi_connection.create_function('GREATEST', 2, max)
+        dbapi_connection.create_function('UNIX_TIMESTAMP', 1, _unix_timestamp)
+        dbapi_connection.create_function('GET_LOCK', 2, lambda name, wait: 1)
+        dbapi_connection.create_function('RELEASE_LOCK', 1, lambda name: 1)
+
+    @event.listens_for(engine, 'before_cursor_execute', retval=True)
+    def rewrite_mysql(conn, cursor, statement, parameters, context, executemany):
+        for mysql, sqlite in _MYSQL_REWRITES:
+            statement = statement.replace(mysql, sqlite)
+        return statement, parameters
+
+    create_schema(engine)
+    return engine
+
+def create_schema(engine):
+    ddl = open(SCHEMA_FILE, encoding='utf-8').read()
+    with engine.begin() as conn:
+        for statement in re.findall(r"CREATE TABLE `[^;]+;", ddl):
+            statement = re.sub(r",\s*(UNIQUE )?KEY `[^`]+` \([^)]*\)", "", statement)
+            statement = re.sub(r"\)\s*ENGINE=InnoDB.*", ")", statement, flags=re.S)
+            statement = statement.replace("ON UPDATE CURRENT_TIMESTAMP", "").replace("COLLATE utf8mb4_bin", "")
+            # 單一 INTEGER 欄位的主鍵即 SQLite 的 rowid，插入時自動配發
+            statement = re.sub(r"\w+ UNSIGNED NOT NULL AUTO_INCREMENT", "INTEGER NOT NULL", statement)
+            conn.execute(text(statement))
+        for statement in re.findall(r"INSERT INTO `aqi_statuses`[^;]+;", ddl):
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO data_versions (name, version) VALUES ('realtime', 0), ('historical', 0)"))
+
+
+# --- 即時 API 替身 ---
+class FakeAqiApi(ThreadingHTTPServer):
+    """回應 crawler.fetch_page 使用的參數：limit、offset、filters=datacreationdate,GR,<時間>"""
+
+    daemon_threads = True
+
+    def __init__(self, csv_path, port=0):
+        with open(csv_path, encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            self.header = next(reader)
+            self.rows = list(reader)
+        self.date_column = self.header.index('datacreationdate')
+        self.requests_served = 0
+        self.failures = deque()     # 依序以這些狀態碼回應接下來的請求 (不回傳資料)；None 代表該次正常回應
+        self.offsets = []           # 成功回應的 offset，依請求順序
+        super().__init__(('127.0.0.1', port), _FakeAqiHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/v2/aqx_p_488"
+
+    def page(self, since, offset, limit):
+        rows = [row for row in self.rows if since is None or row[self.date_column] > since]
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(self.header)
+        writer.writerows(rows[offset:offset + limit])
+        return out.getvalue()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-aqi-api', daemon=True).start()
+        return self
+
+
+class _FakeAqiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        try:
+            status = self.server.failures.popleft()
+        except IndexError:
+            status = None
+        if status is not None:
+            self.server.requests_served += 1
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        since = None
+        if params.get('filters'):
+            column, operator, value = params['filters'].split(',', 2)
+            if column == 'datacreationdate' and operator == 'GR':
+                since = value
+        offset = int(params.get('offset', 0))
+        body = self.server.page(since, offset, int(params.get('limit', 1000))).encode('utf-8')
+        self.server.requests_served += 1
+        self.server.offsets.append(offset)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -1,11 +1,26 @@
 import os
+import json
+import hmac
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, jsonify, request, render_template, g
 from flask_cors import CORS
-from sqlalchemy import create_engine, text
-import pandas as pd
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 import logging
 import sys
+import threading
+from datetime import datetime, timezone
+from aqi import queries, responses
+from aqi.cache import ResponseCache, create_shared_backend
+from aqi.realtime_feed import RealtimeFeed, RETRY_LINE, KEEPALIVE_LINE
+from aqi import spatial, series, aggregate
+from aqi.dimensions import Dimensions
+from aqi.snapshots import SnapshotStore, request_params, MIME_TYPE
+from aqi.compression import ResponseCompressor, compressible
+from aqi.serialization import RowSerializer, COLUMN_MAPPING, dumps
+from aqi.metrics import MetricsRegistry, SlowQueryLog, ROW_BUCKETS, BYTE_BUCKETS, CONTENT_TYPE
 
 # --- 1. 設定與環境變數載入 ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -37,195 +52,550 @@ except Exception as e:
     logging.error(f"資料庫引擎建立失敗: {e}")
     engine = None
 
-# --- 欄位標準化對應表 (維持不變) ---
-COLUMN_MAPPING = {
-    'sitename': 'SiteName', 'county': 'County', 'aqi': 'AQI', 'pollutant': 'Pollutant',
-    'status': 'Status', 'so2': 'SO2', 'co': 'CO', 'o3': 'O3', 'o3_8hr': 'O3_8hr',
-    'pm10': 'PM10', 'pm2.5': 'PM2_5', 'pm2_5': 'PM2_5', 'no2': 'NO2', 'nox': 'NOx',
-    'no': 'NO', 'windspeed': 'WindSpeed', 'winddirec': 'WindDirec',
-    'datacreationdate': 'DataCreationDate', 'unit': 'Unit', 'co_8hr': 'CO_8hr',
-    'pm2.5_avg': 'PM2_5_AVG', 'pm10_avg': 'PM10_AVG', 'so2_avg': 'SO2_AVG',
-    'longitude': 'Longitude', 'latitude': 'Latitude', 'siteid': 'SiteId'
-}
+# --- 效能指標 (/metrics，Prometheus 文字格式，詳見 aqi/metrics.py) ---
+# 一個請求的耗時可拆為：等待連線池 -> execute -> fetch (逐列轉換) -> JSON 序列化
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram('aqi_http_request_duration_seconds', '路由處理時間 (含快取命中與 304)',
+                                    ['route', 'method', 'status'])
+serialize_seconds = metrics.histogram('aqi_serialize_duration_seconds', '回應 JSON 序列化時間', ['route'])
+pool_wait_seconds = metrics.histogram('aqi_db_pool_wait_seconds', '從連線池取得連線的等待時間')
+pool_timeouts = metrics.counter('aqi_db_pool_timeouts_total', '等待連線池逾時 (pool_timeout) 的次數')
+pool_overflow_checkouts = metrics.counter('aqi_db_pool_overflow_checkouts_total', '連線池已滿、借用溢出連線的次數')
+query_seconds = metrics.histogram('aqi_db_query_duration_seconds', '查詢各階段耗時 (execute / fetch)', ['query', 'stage'])
+query_rows = metrics.histogram('aqi_db_query_rows', '查詢回傳列數', ['query'], buckets=ROW_BUCKETS)
+columnar_seconds = metrics.histogram('aqi_columnar_query_duration_seconds', '欄式儲存查詢耗時', ['query'])
+slow_query_count = metrics.counter('aqi_db_slow_queries_total', '超過 SLOW_QUERY_MS 的查詢次數', ['query'])
+response_bytes = metrics.histogram('aqi_http_response_bytes', '回應內容大小 (stage: uncompressed 壓縮前 / sent 實際送出)',
+                                   ['route', 'format', 'stage'], buckets=BYTE_BUCKETS)
+
+def _pool_stat(read):
+    return read(engine.pool) if engine is not None and hasattr(engine.pool, 'checkedout') else None
+
+metrics.gauge('aqi_db_pool_size', '連線池大小 (pool_size)', lambda: _pool_stat(lambda pool: pool.size()))
+metrics.gauge('aqi_db_pool_checked_out', '目前借出的連線數', lambda: _pool_stat(lambda pool: pool.checkedout()))
+metrics.gauge('aqi_db_pool_overflow', '目前使用中的溢出連線數 (max_overflow 上限)',
+              lambda: _pool_stat(lambda pool: max(0, pool.overflow())))
+
+# 查詢名稱 (指標標籤與慢查詢紀錄)；與 scripts/explain_queries.py 使用相同的名稱
+QUERY_NAMES = {id(sql): name for name, sql in queries.ENDPOINT_QUERIES.items()}
+QUERY_NAMES[id(queries.LATEST_STATIONS)] = 'realtime/latest-stations'
+QUERY_NAMES.update({id(sql): f'dimensions/{name}' for name, sql in
+                    zip(('stations', 'counties', 'statuses'), queries.DIMENSION_QUERIES)})
+
+def explain_query(sql, params):
+    with db_connection() as conn:
+        result = conn.execute(text(f"EXPLAIN {sql.strip().rstrip(';')}"), params)
+        return [dict(row._mapping) for row in result]
+
+slow_queries = SlowQueryLog(
+    threshold=float(os.getenv('SLOW_QUERY_MS', 500)) / 1000,
+    explain=explain_query if os.getenv('SLOW_QUERY_EXPLAIN', '1') == '1' else None,
+    log_file=os.getenv('SLOW_QUERY_LOG_FILE') or None,
+    explain_interval=float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', 300)),
+)
+
+if engine is not None:
+    @event.listens_for(engine, 'checkout')
+    def count_overflow_checkout(dbapi_connection, connection_record, connection_proxy):
+        if hasattr(engine.pool, 'overflow') and engine.pool.overflow() > 0:
+            pool_overflow_checkouts.inc()
+
+@contextmanager
+def db_connection():
+    """engine.connect()，並記錄等待連線池的時間"""
+    started = time.perf_counter()
+    try:
+        conn = engine.connect()
+    except PoolTimeoutError:
+        pool_timeouts.inc()
+        raise
+    finally:
+        pool_wait_seconds.observe(time.perf_counter() - started)
+    with conn:
+        yield conn
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    # SSE 等串流回應在此時才剛開始傳送，不列入延遲統計
+    if started is not None and not response.is_streamed:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(time.perf_counter() - started, route, request.method, str(response.status_code))
+    return response
+
+# --- 回應壓縮 (aqi/compression.py)：COMPRESSION_MIN_BYTES 以上的回應依 Accept-Encoding 以 brotli / gzip 壓縮 ---
+# 在回應快取之後執行，快取中保存的是未壓縮的內容
+response_compressor = ResponseCompressor.from_env()
+
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or not compressible(response.mimetype)):
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    response_format = 'columnar' if request.args.get('format') == 'columnar' else 'json'
+    body = response.get_data()
+    response_bytes.observe(len(body), route, response_format, 'uncompressed')
+    response.vary.add('Accept-Encoding')
+    if response_compressor is not None:
+        body, encoding = response_compressor.encode(body, request.headers.get('Accept-Encoding'))
+        if encoding:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+            etag, weak = response.get_etag()
+            if etag and not weak:
+                response.set_etag(etag, weak=True)
+    response_bytes.observe(len(body), route, response_format, 'sent')
+    return response
+
+# --- 回應快取 (以 data_versions 版本水位失效，詳見 aqi/cache.py) ---
+def load_data_versions():
+    """讀取各資料集的版本號與更新時間 (UTC)"""
+    with db_connection() as conn:
+        rows = conn.execute(queries.DATA_VERSIONS).all()
+    return {
+        name: (version, datetime.fromtimestamp(float(updated_ts), tz=timezone.utc) if updated_ts else None)
+        for name, version, updated_ts in rows
+    }
+
+response_cache = ResponseCache(
+    load_data_versions,
+    max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 512)),
+    version_ttl=float(os.getenv('CACHE_VERSION_TTL', 5)),
+    shared_backend=create_shared_backend(),
+)
 
 # --- 網站首頁路由 (維持不變) ---
 @app.route('/')
 def index():
     return render_template('index.html')
 
-# --- Helper Function (維持不變) ---
+# --- Helper Function ---
+# 查詢結果直接逐列轉為 list[dict] (不經過 pandas)，欄位名稱依 COLUMN_MAPPING 標準化
+row_serializer = RowSerializer(COLUMN_MAPPING)
+
+def run_query(conn, sql, params):
+    """執行查詢並逐列轉為 list[dict]；記錄 execute / fetch 耗時與列數，超過 SLOW_QUERY_MS 時寫入慢查詢紀錄"""
+    name = QUERY_NAMES.get(id(sql), 'other')
+    started = time.perf_counter()
+    result = conn.execute(sql, params)
+    executed = time.perf_counter()
+    rows = row_serializer.records(result)
+    fetched = time.perf_counter()
+    query_seconds.observe(executed - started, name, 'execute')
+    query_seconds.observe(fetched - executed, name, 'fetch')
+    query_rows.observe(len(rows), name)
+    if slow_queries.record(name, sql, params, fetched - started, len(rows)):
+        slow_query_count.inc(name)
+    return rows
+
 def execute_query(sql, params):
-    with engine.connect() as conn:
-        df = pd.read_sql(sql, conn, params=params)
-        return df
+    with db_connection() as conn:
+        return run_query(conn, sql, params)
+
+# --- 維度快照 (aqi/dimensions.py)：即時資料查詢只取出代碼，回傳前解碼為測站名稱、縣市與狀態 ---
+dimensions = Dimensions()
+
+def load_dimensions(conn, version):
+    global dimensions
+    dimensions = Dimensions(version, *(run_query(conn, sql, {}) for sql in queries.DIMENSION_QUERIES))
+    return dimensions
+
+def current_dimensions(conn, county=None, version=None):
+    """realtime 版本改變 (爬蟲新增或更新測站時必定遞增) 或查詢的縣市不在快照中時重新載入"""
+    if version is None:
+        version = conn.execute(queries.REALTIME_VERSION).scalar() or 0
+    return load_dimensions(conn, version) if dimensions.stale(version, county) else dimensions
+
+def json_response(payload):
+    started = time.perf_counter()
+    body = dumps(payload)
+    serialize_seconds.observe(time.perf_counter() - started, request.url_rule.rule if request.url_rule else 'unmatched')
+    return app.response_class(body, mimetype='application/json')
+
+# --- 歷史分析資料來源：mysql (rollup_* 彙總表，預設) 或 columnar (aqi/columnar.py 欄式儲存) ---
+if os.getenv('HISTORICAL_BACKEND', 'mysql') == 'columnar':
+    from aqi.columnar import ColumnarStore
+    columnar_store = ColumnarStore()
+else:
+    columnar_store = None
 
-# --- API 路由 (所有路由邏輯維持不變) ---
+def historical_query(name, sql, params):
+    """欄式儲存已建立時以向量化運算取得與 SQL 相同的列，否則查詢彙總表"""
+    if columnar_store is not None and columnar_store.available():
+        with columnar_seconds.time(name):
+            return columnar_store.query(name, params)
+    return execute_query(sql, params)
+
+# --- 歷史分析靜態快照 (aqi/snapshots.py，由 scripts/export_snapshots.py 匯出) ---
+# HISTORICAL_SNAPSHOTS=1 時，快照中有的請求直接回傳預先壓縮的檔案，不查詢資料庫也不經過回應快取；
+# 快照中沒有的請求 (例如尚無資料的年份) 照常查詢
+snapshot_store = SnapshotStore() if os.getenv('HISTORICAL_SNAPSHOTS') == '1' else None
+snapshot_responses = metrics.counter('aqi_snapshot_responses_total', '由靜態快照回應的歷史分析請求', ['encoding'])
+
+@app.before_request
+def serve_historical_snapshot():
+    if snapshot_store is None or not request.path.startswith('/api/historical/'):
+        return None
+    try:
+        found = snapshot_store.find(request.path, request_params(request.args.items(multi=True)),
+                                    request.headers.get('Accept-Encoding'))
+    except (OSError, ValueError) as e:
+        logging.error(f"讀取靜態快照失敗，改為查詢資料庫: {e}")
+        return None
+    if found is None:
+        return None
+    body, encoding, etag = found
+    snapshot_responses.inc(encoding or 'identity')
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype=MIME_TYPE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response
+
+# --- API 路由 ---
+# SQL 定義集中於 aqi/queries.py：即時資料讀取 latest_station_readings，歷史分析讀取 rollup_* 彙總表
 @app.route('/api/county-summary')
+@response_cache.cached('realtime')
 def get_county_summary():
     if not engine: return jsonify({"error": "資料庫未連接"}), 500
-    query_sql = text("""
-        WITH RankedRecords AS (
-            SELECT *, ROW_NUMBER() OVER(PARTITION BY SiteName ORDER BY DataCreationDate DESC) as rn
-            FROM air_quality_records
-        )
-        SELECT County, ROUND(AVG(AQI)) as average_aqi
-        FROM RankedRecords WHERE rn = 1 AND AQI IS NOT NULL GROUP BY County;
-    """)
-    try:
-        df = execute_query(query_sql, {})
-        return jsonify(df.to_dict(orient='records'))
+    try:
+        with db_connection() as conn:
+            rows = run_query(conn, queries.COUNTY_SUMMARY, {})
+            return json_response(current_dimensions(conn).decode_counties(rows))
     except Exception as e:
         logging.error(f"查詢 county-summary 時發生錯誤: {e}")
         return jsonify({"error": "無法查詢資料庫"}), 500
 
 @app.route('/api/county-data/<string:county_name>')
+@response_cache.cached('realtime')
 def get_county_data(county_name):
     if not engine: return jsonify({"error": "資料庫未連接"}), 500
-    query_sql = text("""
-        WITH RankedRecords AS (
-            SELECT *, ROW_NUMBER() OVER(PARTITION BY SiteName ORDER BY DataCreationDate DESC) as rn
-            FROM air_quality_records WHERE County = :county_param
-        )
-        SELECT * FROM RankedRecords WHERE rn = 1;
-    """)
-    try:
-        df = execute_query(query_sql, {"county_param": county_name})
-        rename_map = {col: COLUMN_MAPPING.get(col.lower(), col) for col in df.columns}
-        df.rename(columns=rename_map, inplace=True)
-        if 'DataCreationDate' in df.columns:
-            df['DataCreationDate'] = pd.to_datetime(df['DataCreationDate']).dt.strftime('%Y-%m-%dT%H:%M:%S')
-        return jsonify(df.to_dict(orient='records'))
+    try:
+        response_format = responses.parse_format(request.args)
+    except ValueError:
+        return jsonify({"error": responses.FORMAT_ERROR}), 400
+    try:
+        with db_connection() as conn:
+            dims = current_dimensions(conn, county_name)
+            county_id = dims.county_id(county_name)
+            rows = run_query(conn, queries.COUNTY_DATA, {"county_id": county_id}) if county_id is not None else []
+            return json_response(responses.station_rows(dims.decode_readings(rows), response_format))
     except Exception as e:
         logging.error(f"查詢時發生錯誤: {e}")
         return jsonify({"error": "無法查詢資料庫", "details": str(e)}), 500
         
 @app.route('/api/historical/annual-trend')
+@response_cache.cached('historical')
 def get_annual_trend():
     county = request.args.get('county')
     if not county: return jsonify({"error": "County parameter is required"}), 400
     if not engine: return jsonify({"error": "資料庫未連接"}), 500
-    query_sql = text("""
-        SELECT YEAR(DataCreationDate) as year, ROUND(AVG(AQI)) as average_aqi
-        FROM historical_aqi_analysis
-        WHERE County = :county_param AND AQI IS NOT NULL
-        GROUP BY YEAR(DataCreationDate) ORDER BY year;
-    """)
-    try:
-        df = execute_query(query_sql, {"county_param": county})
-        return jsonify(df.to_dict(orient='records'))
+    try:
+        return json_response(historical_query('annual-trend', queries.ANNUAL_TREND, {"county_param": county}))
     except Exception as e:
         logging.error(f"查詢 annual-trend 時發生錯誤: {e}")
         return jsonify({"error": "無法查詢資料庫"}), 500
 
 @app.route('/api/historical/annual-map')
+@response_cache.cached('historical')
 def get_annual_map_data():
     year = request.args.get('year')
     if not year: return jsonify({"error": "Year parameter is required"}), 400
     if not engine: return jsonify({"error": "資料庫未連接"}), 500
-    query_sql = text("""
-        SELECT County, ROUND(AVG(AQI)) as average_aqi
-        FROM historical_aqi_analysis
-        WHERE YEAR(DataCreationDate) = :year_param AND AQI IS NOT NULL GROUP BY County;
-    """)
-    try:
-        df = execute_query(query_sql, {"year_param": year})
-        return jsonify(df.to_dict(orient='records'))
+    try:
+        return json_response(historical_query('annual-map', queries.ANNUAL_MAP, {"year_param": year}))
     except Exception as e:
         logging.error(f"查詢 annual-map 時發生錯誤: {e}")
         return jsonify({"error": "無法查詢資料庫"}), 500
 
 @app.route('/api/historical/seasonal-trend')
+@response_cache.cached('historical')
 def get_seasonal_trend():
     county = request.args.get('county')
     if not county: return jsonify({"error": "County parameter is required"}), 400
     if not engine: return jsonify({"error": "資料庫未連接"}), 500
-    query_sql = text("""
-        SELECT MONTH(DataCreationDate) as month, ROUND(AVG(AQI)) as average_aqi
-        FROM historical_aqi_analysis
-        WHERE County = :county_param AND AQI IS NOT NULL
-        GROUP BY MONTH(DataCreationDate) ORDER BY month;
-    """)
-    try:
-        df = execute_query(query_sql, {"county_param": county})
-        df_full_month = pd.DataFrame({'month': range(1, 13)})
-        df = pd.merge(df_full_month, df, on='month', how='left').fillna(0)
-        return jsonify(df.to_dict(orient='records'))
+    try:
+        rows = historical_query('seasonal-trend', queries.SEASONAL_TREND, {"county_param": county})
+        return json_response(responses.seasonal_trend(rows))
     except Exception as e:
         logging.error(f"查詢 seasonal-trend 時發生錯誤: {e}")
         return jsonify({"error": "無法查詢資料庫"}), 500
 
 @app.route('/api/historical/monthly-distribution')
+@response_cache.cached('historical')
 def get_monthly_distribution():
     county = request.args.get('county'); year = request.args.get('year')
     if not county or not year: return jsonify({"error": "County and Year parameters are required"}), 400
     if not engine: return jsonify({"error": "資料庫未連接"}), 500
-    query_sql = text("""
-        SELECT month,
-            SUM(CASE WHEN daily_avg_aqi <= 50 THEN 1 ELSE 0 END) as good_days,
-            SUM(CASE WHEN daily_avg_aqi > 50 AND daily_avg_aqi <= 100 THEN 1 ELSE 0 END) as moderate_days,
-            SUM(CASE WHEN daily_avg_aqi > 100 THEN 1 ELSE 0 END) as unhealthy_days
-        FROM (
-            SELECT MONTH(DataCreationDate) as month, DATE(DataCreationDate) as day, AVG(AQI) as daily_avg_aqi
-            FROM historical_aqi_analysis
-            WHERE County = :county_param AND YEAR(DataCreationDate) = :year_param AND AQI IS NOT NULL
-            GROUP BY month, day
-        ) as daily_data GROUP BY month ORDER BY month;
-    """)
-    try:
-        df = execute_query(query_sql, {"county_param": county, "year_param": year})
-        df_full_month = pd.DataFrame({'month': range(1, 13)})
-        df = pd.merge(df_full_month, df, on='month', how='left').fillna(0)
-        for col in ['good_days', 'moderate_days', 'unhealthy_days']:
-            df[col] = df[col].astype(int)
-        return jsonify(df.to_dict(orient='records'))
+    try:
+        rows = historical_query('monthly-distribution', queries.MONTHLY_DISTRIBUTION, {"county_param": county, "year_param": year})
+        return json_response(responses.monthly_distribution(rows))
     except Exception as e:
         logging.error(f"查詢 monthly-distribution 時發生錯誤: {e}")
         return jsonify({"error": "無法查詢資料庫"}), 500
 
 @app.route('/api/historical/unhealthy-days-count')
+@response_cache.cached('historical')
 def get_unhealthy_days_count():
     county = request.args.get('county'); year_str = request.args.get('year')
     if not county or not year_str: return jsonify({"error": "County and Year parameters are required"}), 400
+    if not year_str.lstrip('-').isdigit(): return jsonify({"error": "Year parameter must be an integer"}), 400
     if not engine: return jsonify({"error": "資料庫未連接"}), 500
 
     try:
         year = int(year_str)
         previous_year = year - 1
 
-        query_sql = text("""
-            SELECT COUNT(*) as unhealthy_days_count
-            FROM (
-                SELECT DATE(DataCreationDate) as day, AVG(AQI) as daily_avg_aqi
-                FROM historical_aqi_analysis
-                WHERE County = :county_param AND YEAR(DataCreationDate) = :year_param AND AQI IS NOT NULL
-                GROUP BY day
-            ) as daily_data
-            WHERE daily_avg_aqi > 100;
-        """)
-        
-        current_year_df = execute_query(query_sql, {"county_param": county, "year_param": year})
-        current_year_count = current_year_df.iloc[0]['unhealthy_days_count'] if not current_year_df.empty else 0
-
-        previous_year_df = execute_query(query_sql, {"county_param": county, "year_param": previous_year})
-        previous_year_count = previous_year_df.iloc[0]['unhealthy_days_count'] if not previous_year_df.empty else 0
-        
-        change_percentage = None
-        if previous_year_count > 0:
-            change_percentage = round(((current_year_count - previous_year_count) / previous_year_count) * 100, 2)
-
-        result = {
-            "current_year": year,
-            "unhealthy_days": int(current_year_count),
-            "previous_year": previous_year,
-            "previous_unhealthy_days": int(previous_year_count),
-            "change_percentage": change_percentage
-        }
-        return jsonify(result)
+        rows = historical_query('unhealthy-days-count', queries.UNHEALTHY_DAYS_COUNT, {"county_param": county, "year_param": year, "previous_year_param": previous_year})
+        return json_response(responses.unhealthy_days_summary(rows, year))
 
     except Exception as e:
         logging.error(f"查詢 unhealthy-days-count 時發生錯誤: {e}")
         return jsonify({"error": "無法查詢資料庫"}), 500
 
+@app.route('/api/historical/county-report')
+@response_cache.cached('historical')
+def get_county_report():
+    """單一請求取得縣市的年度趨勢、季節趨勢、月分佈與不健康日 (含前一年比較)，只讀取一次月彙總表"""
+    county = request.args.get('county'); year_str = request.args.get('year')
+    if not county or not year_str: return jsonify({"error": "County and Year parameters are required"}), 400
+    if not year_str.lstrip('-').isdigit(): return jsonify({"error": "Year parameter must be an integer"}), 400
+    if not engine: return jsonify({"error": "資料庫未連接"}), 500
+    try:
+        year = int(year_str)
+        rows = historical_query('county-report', queries.COUNTY_REPORT, {"county_param": county})
+        return json_response(responses.county_report(rows, year))
+    except Exception as e:
+        logging.error(f"查詢 county-report 時發生錯誤: {e}")
+        return jsonify({"error": "無法查詢資料庫"}), 500
+
+def run_aggregation(query):
+    """以伺服器端游標逐批 (aggregate.BATCH_ROWS 列) 讀取讀數並交由 NumPy 歸約，不一次載入整個範圍"""
+    # NumPy 只在第一次請求時載入，其餘路由啟動時不需要
+    from aqi.aggregation import Aggregation, from_columnar
+    name = 'historical/aggregate'
+    if columnar_store is not None and aggregate.columnar_supported(query) and columnar_store.available():
+        with columnar_seconds.time(name):
+            return from_columnar(columnar_store.snapshot(), query)
+    sql, params = aggregate.readings_sql(query), aggregate.query_params(query)
+    aggregation = Aggregation(query)
+    with db_connection() as conn:
+        started = time.perf_counter()
+        result = conn.execution_options(stream_results=True).execute(sql, params)
+        executed = time.perf_counter()
+        for rows in result.partitions(aggregate.BATCH_ROWS):
+            aggregation.add_rows(rows)
+        fetched = time.perf_counter()
+    query_seconds.observe(executed - started, name, 'execute')
+    query_seconds.observe(fetched - executed, name, 'fetch')
+    query_rows.observe(aggregation.rows, name)
+    if slow_queries.record(name, sql, params, fetched - started, aggregation.rows):
+        slow_query_count.inc(name)
+    return aggregation.result()
+
+# 任意指標 x 縣市的年 / 月 / 日統計 (aqi/aggregate.py)：同時讀取爬蟲與歷史資料表，任一資料集更新即失效
+@app.route('/api/historical/aggregate')
+@response_cache.cached('realtime', 'historical')
+def get_historical_aggregate():
+    """metric=aqi,pm2_5&county=臺北市&group=year|month|day&stat=mean,max,p95,exceedance_days&year=2024"""
+    if not engine: return jsonify({"error": "資料庫未連接"}), 500
+    try:
+        query = aggregate.parse_aggregate_query(request.args)
+    except ValueError:
+        return jsonify({"error": aggregate.QUERY_ERROR}), 400
+    try:
+        return json_response(run_aggregation(query))
+    except Exception as e:
+        logging.error(f"查詢 historical/aggregate 時發生錯誤: {e}")
+        return jsonify({"error": "無法查詢資料庫"}), 500
+
+# 單一測站逐時序列：同時讀取爬蟲與歷史資料表，任一資料集更新即失效
+@app.route('/api/stations/<int:site_id>/series')
+@response_cache.cached('realtime', 'historical')
+def get_station_series(site_id):
+    """指定 points 時降採樣 (method=lttb|minmax)，否則以 after / limit 分頁回傳原始逐時資料"""
+    if not engine: return jsonify({"error": "資料庫未連接"}), 500
+    try:
+        query = series.parse_series_query(request.args)
+    except ValueError:
+        return jsonify({"error": series.QUERY_ERROR}), 400
+    try:
+        rows = execute_query(queries.STATION_SERIES, series.query_params(site_id, query))
+        return json_response(series.series_response(site_id, query, rows))
+    except Exception as e:
+        logging.error(f"查詢 stations/series 時發生錯誤: {e}")
+        return jsonify({"error": "無法查詢資料庫"}), 500
+
+# --- 即時資料推播 (Server-Sent Events，詳見 aqi/realtime_feed.py) ---
+# 開發伺服器與同步 worker 每個連線佔用一條執行緒；大量閒置連線請改用 dashboard_asgi.py
+STREAM_POLL_SECONDS = float(os.getenv('STREAM_POLL_SECONDS', 2))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+realtime_feed = RealtimeFeed(history=int(os.getenv('STREAM_HISTORY', 64)))
+feed_changed = threading.Condition()
+poll_wakeup = threading.Event()
+_poller_lock = threading.Lock()
+_poller_thread = None
+
+def refresh_realtime_feed():
+    """讀取 realtime 版本號，改變時才讀取所有測站並通知等待中的連線"""
+    with db_connection() as conn:
+        version = conn.execute(queries.REALTIME_VERSION).scalar() or 0
+        if version == realtime_feed.version:
+            return
+        rows = current_dimensions(conn, version=version).decode_readings(run_query(conn, queries.LATEST_STATIONS, {}))
+    with feed_changed:
+        if version != realtime_feed.version:
+            realtime_feed.apply(version, rows)
+            feed_changed.notify_all()
+
+def poll_realtime_feed():
+    while True:
+        try:
+            refresh_realtime_feed()
+        except Exception as e:
+            logging.error(f"更新即時推播資料時發生錯誤: {e}")
+        poll_wakeup.wait(STREAM_POLL_SECONDS)
+        poll_wakeup.clear()
+
+def start_realtime_poller():
+    """每個行程只啟動一個輪詢執行緒 (第一個訂閱者連線時)"""
+    global _poller_thread
+    with _poller_lock:
+        if _poller_thread is None:
+            _poller_thread = threading.Thread(target=poll_realtime_feed, name='realtime-feed', daemon=True)
+            _poller_thread.start()
+
+@app.route('/api/realtime/stream')
+def realtime_stream():
+    """SSE：推送縣市摘要與有變更的測站；重新連線時依 Last-Event-ID 補送錯過的事件"""
+    if not engine: return jsonify({"error": "資料庫未連接"}), 500
+    start_realtime_poller()
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    def events():
+        seen = last_event_id
+        yield RETRY_LINE
+        while True:
+            with feed_changed:
+                changed = feed_changed.wait_for(
+                    lambda: realtime_feed.ready and str(realtime_feed.version) != seen,
+                    timeout=STREAM_HEARTBEAT_SECONDS)
+                if changed:
+                    pending = realtime_feed.events_since(seen)
+                    seen = str(realtime_feed.version)
+                else:
+                    pending = [KEEPALIVE_LINE]
+            yield from pending
+
+    return app.response_class(events(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# --- 測站空間查詢 (地圖視窗、最近測站、任意座標的 AQI 估計，詳見 aqi/spatial.py) ---
+# 與即時推播共用同一份記憶體中的測站快照，查詢本身不存取資料庫
+def current_station_index():
+    """回傳最新的測站空間索引；輪詢執行緒尚未讀到資料時先同步讀取一次"""
+    start_realtime_poller()
+    if not realtime_feed.ready:
+        refresh_realtime_feed()
+    return realtime_feed.index
+
+@app.route('/api/stations')
+def get_stations():
+    """bbox=minLon,minLat,maxLon,maxLat (Leaflet map.getBounds().toBBoxString())；未指定時回傳所有測站；format=columnar 見 aqi/responses.py"""
+    if not engine: return jsonify({"error": "資料庫未連接"}), 500
+    bbox = request.args.get('bbox')
+    try:
+        bounds = spatial.parse_bbox(bbox) if bbox else None
+    except ValueError:
+        return jsonify({"error": spatial.BBOX_ERROR}), 400
+    try:
+        response_format = responses.parse_format(request.args)
+    except ValueError:
+        return jsonify({"error": responses.FORMAT_ERROR}), 400
+    try:
+        index = current_station_index()
+    except Exception as e:
+        logging.error(f"查詢 stations 時發生錯誤: {e}")
+        return jsonify({"error": "無法查詢資料庫"}), 500
+    rows = index.within(*bounds) if bounds else list(realtime_feed.stations.values())
+    return json_response(responses.station_rows(rows, response_format))
+
+@app.route('/api/stations/nearest')
+def get_nearest_stations():
+    if not engine: return jsonify({"error": "資料庫未連接"}), 500
+    try:
+        lat, lon, k, _ = spatial.parse_point_query(request.args)
+    except ValueError:
+        return jsonify({"error": spatial.POINT_QUERY_ERROR}), 400
+    try:
+        index = current_station_index()
+    except Exception as e:
+        logging.error(f"查詢 stations/nearest 時發生錯誤: {e}")
+        return jsonify({"error": "無法查詢資料庫"}), 500
+    return json_response(spatial.nearest_response(index, lat, lon, k))
+
+@app.route('/api/aqi-estimate')
+def get_aqi_estimate():
+    """以最近 k 個測站的反距離加權 (power 次方) 估計任意座標的 AQI"""
+    if not engine: return jsonify({"error": "資料庫未連接"}), 500
+    try:
+        lat, lon, k, power = spatial.parse_point_query(request.args)
+    except ValueError:
+        return jsonify({"error": spatial.POINT_QUERY_ERROR}), 400
+    try:
+        index = current_station_index()
+    except Exception as e:
+        logging.error(f"查詢 aqi-estimate 時發生錯誤: {e}")
+        return jsonify({"error": "無法查詢資料庫"}), 500
+    return json_response(spatial.estimate_response(index, lat, lon, k, power))
+
+# --- 爬蟲通知與狀態 ---
+# crawler.py --daemon 寫入新資料後會 POST 到此端點 (DASHBOARD_NOTIFY_URL)，並將執行狀態寫入 crawler_status.json
+# 未設定 DASHBOARD_NOTIFY_TOKEN 時拒絕所有通知，避免任何人都能清除版本快取並強迫重新查詢資料庫
+NOTIFY_TOKEN = os.getenv('DASHBOARD_NOTIFY_TOKEN', '')
+CRAWLER_STATUS_FILE = os.getenv('CRAWLER_STATUS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crawler_status.json'))
+
+@app.route('/api/internal/data-updated', methods=['POST'])
+def notify_data_updated():
+    """立即重新讀取資料版本，不必等待 CACHE_VERSION_TTL (多個 worker 時只有收到請求的 worker 立即生效)"""
+    if not NOTIFY_TOKEN or not hmac.compare_digest(request.headers.get('X-Notify-Token', ''), NOTIFY_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+    response_cache.invalidate_versions()
+    poll_wakeup.set()
+    return '', 204
+
+@app.route('/api/crawler-status')
+def get_crawler_status():
+    """回傳爬蟲常駐模式最近一次執行的時間、耗時與筆數"""
+    try:
+        with open(CRAWLER_STATUS_FILE, encoding='utf-8') as f:
+            return json_response(json.load(f))
+    except FileNotFoundError:
+        return jsonify({"error": "尚無爬蟲執行狀態"}), 404
+    except (OSError, ValueError) as e:
+        logging.error(f"讀取爬蟲狀態檔時發生錯誤: {e}")
+        return jsonify({"error": "無法讀取爬蟲狀態"}), 500
+
+# --- 效能指標 ---
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus 抓取端點；設定 METRICS_TOKEN 時需帶 Authorization: Bearer <token>"""
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return jsonify({"error": "Forbidden"}), 403
+    return app.response_class(metrics.render(), content_type=CONTENT_TYPE)
+
 if __name__ == '__main__':
     # 從環境變數讀取 HOST 和 PORT，提供預設值
     host = os.getenv('FLASK_RUN_HOST', '127.0.0.1')
@@ -0,0 +1,466 @@
+# =============================================================================
+# AQI 儀表板 - 非同步 (ASGI) 服務模式
+#
+# 與 dashboard_api.py 提供相同的路由與 JSON 結構，但以 Starlette + Uvicorn 執行，
+# 並透過 aiomysql 非同步驅動存取 MySQL，等待資料庫時不會佔住執行緒。
+#
+# 即時 (realtime) 與歷史 (historical) 兩組路由各自有獨立的並行上限與查詢逾時，
+# 即使歷史查詢變慢，也只會排隊消耗自己的額度，不會拖垮即時資料的回應。
+#
+# 啟動方式:
+#    uvicorn dashboard_asgi:app --host 127.0.0.1 --port 8000 --workers 2
+# 或直接執行:
+#    python dashboard_asgi.py
+# =============================================================================
+
+import os
+import sys
+import json
+import hmac
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response, FileResponse, StreamingResponse
+from starlette.routing import Route
+from aqi import queries, responses
+from aqi.realtime_feed import RealtimeFeed, RETRY_LINE, KEEPALIVE_LINE
+from aqi import spatial, series, aggregate
+from aqi.dimensions import Dimensions
+from aqi.snapshots import SnapshotStore, request_params, etag_matches, MIME_TYPE
+from aqi.compression import ResponseCompressor, compressible
+from aqi.serialization import RowSerializer, COLUMN_MAPPING, dumps
+
+# --- 1. 設定與環境變數載入 ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+load_dotenv()
+
+required_vars = ['DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_NAME', 'DB_PORT']
+missing_vars = [var for var in required_vars if not os.getenv(var)]
+if missing_vars:
+    logging.error(f"[*] 致命錯誤：.env 檔案中缺少必要的資料庫變數：{', '.join(missing_vars)}")
+    sys.exit(1)
+
+ASYNC_DB_CONNECTION_STR = (
+    f"mysql+aiomysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+    f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}?charset=utf8mb4"
+)
+
+# --- 2. 連線池與流量控制設定 ---
+POOL_SIZE = int(os.getenv('ASGI_POOL_SIZE', 10))
+POOL_MAX_OVERFLOW = int(os.getenv('ASGI_POOL_MAX_OVERFLOW', 5))
+POOL_RECYCLE_SECONDS = int(os.getenv('ASGI_POOL_RECYCLE', 1800))
+
+# 每組路由：(同時執行的查詢上限, 單次請求的逾時秒數，含排隊等待)
+ROUTE_GROUP_LIMITS = {
+    'realtime': (int(os.getenv('ASGI_REALTIME_CONCURRENCY', 8)), float(os.getenv('ASGI_REALTIME_TIMEOUT', 3))),
+    'historical': (int(os.getenv('ASGI_HISTORICAL_CONCURRENCY', 4)), float(os.getenv('ASGI_HISTORICAL_TIMEOUT', 15))),
+}
+
+engine = create_async_engine(
+    ASYNC_DB_CONNECTION_STR,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=POOL_RECYCLE_SECONDS,
+)
+row_serializer = RowSerializer(COLUMN_MAPPING)
+
+# 歷史分析資料來源：mysql (rollup_* 彙總表，預設) 或 columnar (aqi/columnar.py 欄式儲存)
+if os.getenv('HISTORICAL_BACKEND', 'mysql') == 'columnar':
+    from aqi.columnar import ColumnarStore
+    columnar_store = ColumnarStore()
+else:
+    columnar_store = None
+# 歷史分析靜態快照 (aqi/snapshots.py)：HISTORICAL_SNAPSHOTS=1 時優先回傳預先壓縮的檔案
+snapshot_store = SnapshotStore() if os.getenv('HISTORICAL_SNAPSHOTS') == '1' else None
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+# 未設定時拒絕所有 /api/internal/data-updated 通知 (與 dashboard_api.py 相同)
+NOTIFY_TOKEN = os.getenv('DASHBOARD_NOTIFY_TOKEN', '')
+CRAWLER_STATUS_FILE = os.getenv('CRAWLER_STATUS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crawler_status.json'))
+
+# Semaphore 需在事件迴圈啟動後建立，因此延後到第一次使用時
+_semaphores = {}
+
+def _semaphore(group):
+    if group not in _semaphores:
+        _semaphores[group] = asyncio.Semaphore(ROUTE_GROUP_LIMITS[group][0])
+    return _semaphores[group]
+
+# 即時推播 (aqi/realtime_feed.py)：每個 worker 一個輪詢工作，所有 SSE 連線共用其結果；
+# 每個連線只是一個等待中的協程，不佔用執行緒
+STREAM_POLL_SECONDS = float(os.getenv('STREAM_POLL_SECONDS', 2))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+realtime_feed = RealtimeFeed(history=int(os.getenv('STREAM_HISTORY', 64)))
+_feed_changed = None
+_poll_wakeup = None
+
+
+# --- 3. Helper Function ---
+def json_response(payload, status_code=200):
+    return Response(dumps(payload), status_code=status_code, media_type='application/json')
+
+def error_response(message, status_code):
+    return json_response({"error": message}, status_code)
+
+async def fetch_records(conn, sql, params):
+    return row_serializer.records(await conn.execute(sql, params))
+
+async def run_in_group(group, work):
+    """在該路由組的並行額度內執行 work(conn)；排隊加上查詢超過逾時即拋出 asyncio.TimeoutError"""
+    async def run():
+        async with _semaphore(group):
+            async with engine.connect() as conn:
+                return await work(conn)
+    return await asyncio.wait_for(run(), timeout=ROUTE_GROUP_LIMITS[group][1])
+
+async def execute_query(group, sql, params):
+    return await run_in_group(group, lambda conn: fetch_records(conn, sql, params))
+
+# --- 維度快照 (aqi/dimensions.py)：即時資料查詢只取出代碼，回傳前解碼為測站名稱、縣市與狀態 ---
+dimensions = Dimensions()
+
+async def current_dimensions(conn, county=None, version=None):
+    """realtime 版本改變或查詢的縣市不在快照中時重新載入 (與 dashboard_api.py 相同)"""
+    global dimensions
+    if version is None:
+        version = (await conn.execute(queries.REALTIME_VERSION)).scalar() or 0
+    if dimensions.stale(version, county):
+        dimensions = Dimensions(version, *[await fetch_records(conn, sql, {}) for sql in queries.DIMENSION_QUERIES])
+    return dimensions
+
+async def guarded_response(name, produce):
+    """等待 produce (回傳 JSON 內容的 awaitable) 並組成回應，統一處理逾時與資料庫錯誤"""
+    try:
+        return json_response(await produce)
+    except asyncio.TimeoutError:
+        logging.error(f"查詢 {name} 逾時")
+        return error_response("查詢逾時，請稍後再試", 504)
+    except Exception as e:
+        logging.error(f"查詢 {name} 時發生錯誤: {e}")
+        return error_response("無法查詢資料庫", 500)
+
+async def query_response(name, group, sql, params, build=None):
+    """執行查詢並組成回應，統一處理逾時與資料庫錯誤"""
+    async def produce():
+        if (group == 'historical' and columnar_store is not None
+                and columnar_store.supports(name) and columnar_store.available()):
+            # 向量化運算只需數毫秒，但仍移出事件迴圈，避免阻塞其他連線
+            rows = await asyncio.to_thread(columnar_store.query, name, params)
+        else:
+            rows = await execute_query(group, sql, params)
+        return build(rows) if build else rows
+    return await guarded_response(name, produce())
+
+
+def snapshot_first(handler):
+    """快照中有此請求時直接回傳檔案 (與 dashboard_api.py 相同)，否則交給 handler 查詢；檔案很小，直接同步讀取"""
+    if snapshot_store is None:
+        return handler
+
+    async def serve(request):
+        try:
+            found = snapshot_store.find(request.url.path, request_params(request.query_params.multi_items()),
+                                        request.headers.get('accept-encoding'))
+        except (OSError, ValueError) as e:
+            logging.error(f"讀取靜態快照失敗，改為查詢資料庫: {e}")
+            found = None
+        if found is None:
+            return await handler(request)
+        body, encoding, etag = found
+        headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, media_type=MIME_TYPE, headers=headers)
+    return serve
+
+
+class CompressionMiddleware:
+    """非串流回應依 Accept-Encoding 壓縮 (與 dashboard_api.py 的 compress_response 相同)；SSE 與檔案等分段送出的回應原樣轉送"""
+
+    def __init__(self, app, compressor=None):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or self.compressor is None:
+            return await self.app(scope, receive, send)
+        accept_encoding = Headers(scope=scope).get('accept-encoding')
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                # 等到第一段內容才能判斷是否為單次送出的回應
+                start = message
+                return
+            if start is None:
+                return await send(message)
+            pending, start = start, None
+            headers = MutableHeaders(scope=pending)
+            if (not message.get('more_body') and pending['status'] == 200 and 'content-encoding' not in headers
+                    and compressible(headers.get('content-type'))):
+                headers.add_vary_header('Accept-Encoding')
+                body, encoding = self.compressor.encode(message.get('body', b''), accept_encoding)
+                if encoding:
+                    headers['Content-Encoding'] = encoding
+                    headers['Content-Length'] = str(len(body))
+                    if 'etag' in headers:
+                        headers['ETag'] = self.compressor.weak_etag(headers['etag'])
+                    message = {**message, 'body': body}
+            await send(pending)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+# --- 4. 路由 (與 dashboard_api.py 相同) ---
+async def index(request):
+    return FileResponse(TEMPLATE_PATH, media_type='text/html')
+
+async def get_county_summary(request):
+    async def work(conn):
+        rows = await fetch_records(conn, queries.COUNTY_SUMMARY, {})
+        return (await current_dimensions(conn)).decode_counties(rows)
+    return await guarded_response('county-summary', run_in_group('realtime', work))
+
+async def get_county_data(request):
+    county_name = request.path_params['county_name']
+    try:
+        response_format = responses.parse_format(request.query_params)
+    except ValueError:
+        return error_response(responses.FORMAT_ERROR, 400)
+    async def work(conn):
+        dims = await current_dimensions(conn, county_name)
+        county_id = dims.county_id(county_name)
+        rows = await fetch_records(conn, queries.COUNTY_DATA, {"county_id": county_id}) if county_id is not None else []
+        return responses.station_rows(dims.decode_readings(rows), response_format)
+    return await guarded_response('county-data', run_in_group('realtime', work))
+
+async def get_annual_trend(request):
+    county = request.query_params.get('county')
+    if not county: return error_response("County parameter is required", 400)
+    return await query_response('annual-trend', 'historical', queries.ANNUAL_TREND, {"county_param": county})
+
+async def get_annual_map_data(request):
+    year = request.query_params.get('year')
+    if not year: return error_response("Year parameter is required", 400)
+    return await query_response('annual-map', 'historical', queries.ANNUAL_MAP, {"year_param": year})
+
+async def get_seasonal_trend(request):
+    county = request.query_params.get('county')
+    if not county: return error_response("County parameter is required", 400)
+    return await query_response('seasonal-trend', 'historical', queries.SEASONAL_TREND,
+                                {"county_param": county}, responses.seasonal_trend)
+
+async def get_monthly_distribution(request):
+    county = request.query_params.get('county'); year = request.query_params.get('year')
+    if not county or not year: return error_response("County and Year parameters are required", 400)
+    return await query_response('monthly-distribution', 'historical', queries.MONTHLY_DISTRIBUTION,
+                                {"county_param": county, "year_param": year}, responses.monthly_distribution)
+
+async def get_unhealthy_days_count(request):
+    county = request.query_params.get('county'); year_str = request.query_params.get('year')
+    if not county or not year_str: return error_response("County and Year parameters are required", 400)
+    try:
+        year = int(year_str)
+    except ValueError:
+        return error_response("Year parameter must be an integer", 400)
+    return await query_response('unhealthy-days-count', 'historical', queries.UNHEALTHY_DAYS_COUNT,
+                                {"county_param": county, "year_param": year, "previous_year_param": year - 1},
+                                lambda rows: responses.unhealthy_days_summary(rows, year))
+
+async def get_county_report(request):
+    county = request.query_params.get('county'); year_str = request.query_params.get('year')
+    if not county or not year_str: return error_response("County and Year parameters are required", 400)
+    try:
+        year = int(year_str)
+    except ValueError:
+        return error_response("Year parameter must be an integer", 400)
+    return await query_response('county-report', 'historical', queries.COUNTY_REPORT,
+                                {"county_param": county}, lambda rows: responses.county_report(rows, year))
+
+async def get_station_series(request):
+    site_id = request.path_params['site_id']
+    try:
+        query = series.parse_series_query(request.query_params)
+    except ValueError:
+        return error_response(series.QUERY_ERROR, 400)
+    return await query_response('stations/series', 'historical', queries.STATION_SERIES,
+                                series.query_params(site_id, query),
+                                lambda rows: series.series_response(site_id, query, rows))
+
+async def get_historical_aggregate(request):
+    """任意指標的年 / 月 / 日統計 (aqi/aggregate.py)；以伺服器端游標逐批讀取，每批的 NumPy 歸約只需數毫秒"""
+    try:
+        query = aggregate.parse_aggregate_query(request.query_params)
+    except ValueError:
+        return error_response(aggregate.QUERY_ERROR, 400)
+    # NumPy 只在第一次請求時載入 (與 dashboard_api.py 相同)
+    from aqi.aggregation import Aggregation, from_columnar
+
+    async def scan(conn):
+        aggregation = Aggregation(query)
+        result = await conn.stream(aggregate.readings_sql(query), aggregate.query_params(query))
+        async for rows in result.partitions(aggregate.BATCH_ROWS):
+            aggregation.add_rows(rows)
+        return aggregation.result()
+
+    async def produce():
+        if columnar_store is not None and aggregate.columnar_supported(query) and columnar_store.available():
+            return await asyncio.to_thread(from_columnar, columnar_store.snapshot(), query)
+        return await run_in_group('historical', scan)
+    return await guarded_response('historical/aggregate', produce())
+
+async def realtime_stream(request):
+    """SSE：推送縣市摘要與有變更的測站；重新連線時依 Last-Event-ID 補送錯過的事件"""
+    last_event_id = request.headers.get('last-event-id')
+
+    async def events():
+        seen = last_event_id
+        yield RETRY_LINE
+        while True:
+            async with _feed_changed:
+                try:
+                    await asyncio.wait_for(_feed_changed.wait_for(
+                        lambda: realtime_feed.ready and str(realtime_feed.version) != seen),
+                        timeout=STREAM_HEARTBEAT_SECONDS)
+                    pending = realtime_feed.events_since(seen)
+                    seen = str(realtime_feed.version)
+                except asyncio.TimeoutError:
+                    pending = [KEEPALIVE_LINE]
+            for event in pending:
+                yield event
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+async def spatial_response(name, build):
+    """測站空間查詢只讀取記憶體中的快照；輪詢工作尚未讀到資料時先讀取一次"""
+    try:
+        if not realtime_feed.ready:
+            await asyncio.wait_for(refresh_realtime_feed(), timeout=ROUTE_GROUP_LIMITS['realtime'][1])
+        return json_response(build(realtime_feed.index))
+    except asyncio.TimeoutError:
+        logging.error(f"查詢 {name} 逾時")
+        return error_response("查詢逾時，請稍後再試", 504)
+    except Exception as e:
+        logging.error(f"查詢 {name} 時發生錯誤: {e}")
+        return error_response("無法查詢資料庫", 500)
+
+async def get_stations(request):
+    bbox = request.query_params.get('bbox')
+    try:
+        bounds = spatial.parse_bbox(bbox) if bbox else None
+    except ValueError:
+        return error_response(spatial.BBOX_ERROR, 400)
+    try:
+        response_format = responses.parse_format(request.query_params)
+    except ValueError:
+        return error_response(responses.FORMAT_ERROR, 400)
+    return await spatial_response('stations', lambda index: responses.station_rows(
+        index.within(*bounds) if bounds else list(realtime_feed.stations.values()), response_format))
+
+async def get_nearest_stations(request):
+    try:
+        lat, lon, k, _ = spatial.parse_point_query(request.query_params)
+    except ValueError:
+        return error_response(spatial.POINT_QUERY_ERROR, 400)
+    return await spatial_response('stations/nearest', lambda index: spatial.nearest_response(index, lat, lon, k))
+
+async def get_aqi_estimate(request):
+    try:
+        lat, lon, k, power = spatial.parse_point_query(request.query_params)
+    except ValueError:
+        return error_response(spatial.POINT_QUERY_ERROR, 400)
+    return await spatial_response('aqi-estimate', lambda index: spatial.estimate_response(index, lat, lon, k, power))
+
+async def notify_data_updated(request):
+    # ASGI 模式沒有回應快取，驗證權杖後只需喚醒即時推播的輪詢工作
+    if not NOTIFY_TOKEN or not hmac.compare_digest(request.headers.get('X-Notify-Token', ''), NOTIFY_TOKEN):
+        return error_response("Forbidden", 403)
+    _poll_wakeup.set()
+    return Response(status_code=204)
+
+async def get_crawler_status(request):
+    try:
+        with open(CRAWLER_STATUS_FILE, encoding='utf-8') as f:
+            return json_response(json.load(f))
+    except FileNotFoundError:
+        return error_response("尚無爬蟲執行狀態", 404)
+    except (OSError, ValueError) as e:
+        logging.error(f"讀取爬蟲狀態檔時發生錯誤: {e}")
+        return error_response("無法讀取爬蟲狀態", 500)
+
+
+async def refresh_realtime_feed():
+    """讀取 realtime 版本號，改變時才讀取所有測站並通知等待中的連線"""
+    async with engine.connect() as conn:
+        version = (await conn.execute(queries.REALTIME_VERSION)).scalar() or 0
+        if version == realtime_feed.version:
+            return
+        dims = await current_dimensions(conn, version=version)
+        rows = dims.decode_readings(await fetch_records(conn, queries.LATEST_STATIONS, {}))
+    async with _feed_changed:
+        if version != realtime_feed.version:
+            realtime_feed.apply(version, rows)
+            _feed_changed.notify_all()
+
+async def poll_realtime_feed():
+    while True:
+        try:
+            await refresh_realtime_feed()
+        except Exception as e:
+            logging.error(f"更新即時推播資料時發生錯誤: {e}")
+        try:
+            await asyncio.wait_for(_poll_wakeup.wait(), timeout=STREAM_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _poll_wakeup.clear()
+
+@asynccontextmanager
+async def lifespan(app):
+    global _feed_changed, _poll_wakeup
+    _feed_changed, _poll_wakeup = asyncio.Condition(), asyncio.Event()
+    poller = asyncio.create_task(poll_realtime_feed())
+    yield
+    poller.cancel()
+    await engine.dispose()
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/api/county-summary', get_county_summary),
+        Route('/api/county-data/{county_name}', get_county_data),
+        Route('/api/historical/annual-trend', snapshot_first(get_annual_trend)),
+        Route('/api/historical/annual-map', snapshot_first(get_annual_map_data)),
+        Route('/api/historical/seasonal-trend', snapshot_first(get_seasonal_trend)),
+        Route('/api/historical/monthly-distribution', snapshot_first(get_monthly_distribution)),
+        Route('/api/historical/unhealthy-days-count', snapshot_first(get_unhealthy_days_count)),
+        Route('/api/historical/county-report', snapshot_first(get_county_report)),
+        Route('/api/stations/{site_id:int}/series', get_station_series),
+        Route('/api/historical/aggregate', get_historical_aggregate),
+        Route('/api/realtime/stream', realtime_stream),
+        Route('/api/stations', get_stations),
+        Route('/api/stations/nearest', get_nearest_stations),
+        Route('/api/aqi-estimate', get_aqi_estimate),
+        Route('/api/internal/data-updated', notify_data_updated, methods=['POST']),
+        Route('/api/crawler-status', get_crawler_status),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*']),
+                Middleware(CompressionMiddleware, compressor=ResponseCompressor.from_env())],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    host = os.getenv('FLASK_RUN_HOST', '127.0.0.1')
+    port = int(os.getenv('ASGI_RUN_PORT', 8000))
+    uvicorn.run('dashboard_asgi:app', host=host, port=port, workers=int(os.getenv('ASGI_WORKERS', 1)))
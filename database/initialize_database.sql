@@ -8,30 +8,264 @@ CREATE USER IF NOT EXISTS 'aqi_user'@'localhost'
 GRANT ALL PRIVILEGES ON `aqi_db`.* TO 'aqi_user'@'localhost';
 FLUSH PRIVILEGES;
 
+-- 結構版本紀錄：scripts/migrate.py 依此判斷尚未套用的 database/migrations/*.sql
+DROP TABLE IF EXISTS `schema_migrations`;
+
+CREATE TABLE `schema_migrations` (
+  `version`           VARCHAR(255) NOT NULL,
+  `applied_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 本檔案已包含以下版本的完整結構，全新安裝時直接標記為已套用
+INSERT INTO `schema_migrations` (`version`) VALUES
+  ('0001_latest_station_readings'),
+  ('0002_historical_rollups'),
+  ('0003_historical_partitions_and_indexes'),
+  ('0004_data_versions'),
+  ('0005_import_manifest'),
+  ('0006_records_retention'),
+  ('0007_station_dimensions'),
+  ('0008_station_rolling_windows'),
+  ('0009_pollutant_columns');
+
+-- 資料版本水位：crawler.py (realtime) 與 rollups.py (historical) 寫入時遞增，供 API 回應快取判斷是否過期
+DROP TABLE IF EXISTS `data_versions`;
+
+CREATE TABLE `data_versions` (
+  `name`              VARCHAR(64) NOT NULL,
+  `version`           BIGINT NOT NULL DEFAULT 0,
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO `data_versions` (`name`, `version`) VALUES ('realtime', 0), ('historical', 0);
+
+-- =====================================================================
+-- 維度表 (詳見 migrations/0007 與 aqi/dimensions.py)
+-- 讀數資料表只存 SiteId / StatusId 代碼，測站名稱、縣市與座標集中存放於此；
+-- 名稱欄位使用 utf8mb4_bin，與程式中的字典比對方式 (逐字元相同) 一致
+-- =====================================================================
+DROP TABLE IF EXISTS `counties`;
+
+CREATE TABLE `counties` (
+  `CountyId`          TINYINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  `Name`              VARCHAR(32) COLLATE utf8mb4_bin NOT NULL,
+  PRIMARY KEY (`CountyId`),
+  UNIQUE KEY `uq_counties_name` (`Name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DROP TABLE IF EXISTS `aqi_statuses`;
+
+CREATE TABLE `aqi_statuses` (
+  `StatusId`          TINYINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  `Name`              VARCHAR(32) COLLATE utf8mb4_bin NOT NULL,
+  PRIMARY KEY (`StatusId`),
+  UNIQUE KEY `uq_aqi_statuses_name` (`Name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO `aqi_statuses` (`StatusId`, `Name`) VALUES
+  (1, '良好'), (2, '普通'), (3, '對敏感族群不健康'), (4, '對所有族群不健康'), (5, '非常不健康'), (6, '危害');
+
+-- 每個測站一列：crawler.py 以 API 的最新名稱 / 縣市 / 座標更新，import_lean_data.py 只新增未知的測站
+DROP TABLE IF EXISTS `stations`;
+
+CREATE TABLE `stations` (
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
+  `SiteName`          VARCHAR(64) NOT NULL,
+  `CountyId`          TINYINT UNSIGNED,
+  `Latitude`          DECIMAL(10,7),
+  `Longitude`         DECIMAL(11,7),
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`SiteId`),
+  KEY `idx_stations_county` (`CountyId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 DROP TABLE IF EXISTS `air_quality_records`;
 
+-- PM2_5 ~ CO：各污染物的逐時濃度，無數值時為 NULL (詳見 migrations/0009 與 aqi/pollutants.py)
 CREATE TABLE `air_quality_records` (
-  `SiteId`            INT NOT NULL,
-  `SiteName`          VARCHAR(255) NOT NULL,
-  `County`            VARCHAR(255),
-  `AQI`               INT,
-  `Status`            VARCHAR(255),
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
   `DataCreationDate`  DATETIME NOT NULL,
-  `Latitude`          DECIMAL(10,7),
-  `Longitude`         DECIMAL(11,7),
-  `created_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+  `AQI`               SMALLINT,
+  `StatusId`          TINYINT UNSIGNED,
+  `PM2_5`             DECIMAL(5,1),
+  `PM10`              DECIMAL(5,1),
+  `O3`                DECIMAL(5,1),
+  `NO2`               DECIMAL(5,1),
+  `SO2`               DECIMAL(5,1),
+  `CO`                DECIMAL(5,2),
+  PRIMARY KEY (`SiteId`, `DataCreationDate`),
+  KEY `idx_records_date` (`DataCreationDate`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 每個測站僅保留一筆「最新」讀數，由 crawler.py 每次同步時一併更新
+DROP TABLE IF EXISTS `latest_station_readings`;
+
+CREATE TABLE `latest_station_readings` (
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
+  `DataCreationDate`  DATETIME NOT NULL,
+  `AQI`               SMALLINT,
+  `StatusId`          TINYINT UNSIGNED,
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
                                        ON UPDATE CURRENT_TIMESTAMP,
-  PRIMARY KEY (`SiteId`, `DataCreationDate`)
+  PRIMARY KEY (`SiteId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 各測站最近 24 小時的環形緩衝區與 8 / 24 小時平均、最大值 (詳見 migrations/0008 與 aqi/rolling.py)
+DROP TABLE IF EXISTS `station_rolling_windows`;
+
+CREATE TABLE `station_rolling_windows` (
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
+  `LatestHour`        DATETIME NOT NULL,
+  `Buffers`           TEXT NOT NULL,
+  `Summary`           TEXT NOT NULL,
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`SiteId`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 DROP TABLE IF EXISTS `historical_aqi_analysis`;
 
+-- (DataCreationDate, AQI) 為覆蓋索引 (次要索引附帶主鍵 SiteId)；依年份 RANGE 分區，
+-- 以 DataCreationDate 半開區間查詢時可做分區裁剪 (詳見 migrations/0003、0007)；
+-- 分區清單與 migrations/0003 相同，全新安裝與升級後的資料表一致
 CREATE TABLE `historical_aqi_analysis` (
-  `SiteId`            INT NOT NULL,
-  `SiteName`          VARCHAR(255) NOT NULL,
-  `County`            VARCHAR(255),
-  `AQI`               INT,
-  `Status`            VARCHAR(255),
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
   `DataCreationDate`  DATETIME NOT NULL,
-  PRIMARY KEY (`SiteId`, `DataCreationDate`)
+  `AQI`               SMALLINT,
+  `StatusId`          TINYINT UNSIGNED,
+  `PM2_5`             DECIMAL(5,1),
+  `PM10`              DECIMAL(5,1),
+  `O3`                DECIMAL(5,1),
+  `NO2`               DECIMAL(5,1),
+  `SO2`               DECIMAL(5,1),
+  `CO`                DECIMAL(5,2),
+  PRIMARY KEY (`SiteId`, `DataCreationDate`),
+  KEY `idx_hist_date_aqi` (`DataCreationDate`, `AQI`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+  PARTITION BY RANGE COLUMNS(`DataCreationDate`) (
+  PARTITION p2015 VALUES LESS THAN ('2016-01-01'),
+  PARTITION p2016 VALUES LESS THAN ('2017-01-01'),
+  PARTITION p2017 VALUES LESS THAN ('2018-01-01'),
+  PARTITION p2018 VALUES LESS THAN ('2019-01-01'),
+  PARTITION p2019 VALUES LESS THAN ('2020-01-01'),
+  PARTITION p2020 VALUES LESS THAN ('2021-01-01'),
+  PARTITION p2021 VALUES LESS THAN ('2022-01-01'),
+  PARTITION p2022 VALUES LESS THAN ('2023-01-01'),
+  PARTITION p2023 VALUES LESS THAN ('2024-01-01'),
+  PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+  PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+  PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+  PARTITION p2027 VALUES LESS THAN ('2028-01-01'),
+  PARTITION p2028 VALUES LESS THAN ('2029-01-01'),
+  PARTITION p2029 VALUES LESS THAN ('2030-01-01'),
+  PARTITION p2030 VALUES LESS THAN ('2031-01-01'),
+  PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- =====================================================================
+-- 歷史資料彙總表 (由 scripts/rollups.py 維護，供 /api/historical/* 查詢)
+-- AqiSum / AqiCount 可重組出精確平均值；*Days 以「日平均 AQI」判定等級
+-- =====================================================================
+DROP TABLE IF EXISTS `rollup_site_daily`;
+
+CREATE TABLE `rollup_site_daily` (
+  `County`            VARCHAR(255) NOT NULL,
+  `SiteId`            INT NOT NULL,
+  `Day`               DATE NOT NULL,
+  `AqiSum`            INT NOT NULL,
+  `AqiCount`          SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `SiteId`, `Day`),
+  KEY `idx_site_daily_day` (`Day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DROP TABLE IF EXISTS `rollup_county_daily`;
+
+CREATE TABLE `rollup_county_daily` (
+  `County`            VARCHAR(255) NOT NULL,
+  `Day`               DATE NOT NULL,
+  `AqiSum`            INT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  PRIMARY KEY (`County`, `Day`),
+  KEY `idx_county_daily_day` (`Day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DROP TABLE IF EXISTS `rollup_site_monthly`;
+
+CREATE TABLE `rollup_site_monthly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `SiteId`            INT NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `Month`             TINYINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `SiteId`, `Year`, `Month`),
+  KEY `idx_site_monthly_year` (`Year`, `Month`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DROP TABLE IF EXISTS `rollup_county_monthly`;
+
+CREATE TABLE `rollup_county_monthly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `Month`             TINYINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `Year`, `Month`),
+  KEY `idx_county_monthly_year` (`Year`, `Month`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DROP TABLE IF EXISTS `rollup_site_yearly`;
+
+CREATE TABLE `rollup_site_yearly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `SiteId`            INT NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `SiteId`, `Year`),
+  KEY `idx_site_yearly_year` (`Year`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DROP TABLE IF EXISTS `rollup_county_yearly`;
+
+CREATE TABLE `rollup_county_yearly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `Year`),
+  KEY `idx_county_yearly_year` (`Year`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 歷史資料匯入清單：import_lean_data.py 記錄每個檔案的指紋與匯入進度，供 --incremental 增量 / 續傳匯入
+DROP TABLE IF EXISTS `import_manifest`;
+
+CREATE TABLE `import_manifest` (
+  `FileName`          VARCHAR(255) NOT NULL,
+  `FileSize`          BIGINT NOT NULL,
+  `FileMtime`         DOUBLE NOT NULL,
+  `ContentHash`       CHAR(64) NOT NULL,
+  `ChunkSize`         INT NOT NULL,
+  `ChunksDone`        INT NOT NULL DEFAULT 0,
+  `RecordCount`       INT NOT NULL DEFAULT 0,
+  `Status`            VARCHAR(16) NOT NULL,
+  `UpdatedAt`         TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`FileName`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,16 @@
+-- 每個測站僅保留一筆「最新」讀數，由 crawler.py 每次同步時一併更新
+-- 套用後請執行一次：python scripts/crawler.py --backfill-latest
+CREATE TABLE IF NOT EXISTS `latest_station_readings` (
+  `SiteId`            INT NOT NULL,
+  `SiteName`          VARCHAR(255) NOT NULL,
+  `County`            VARCHAR(255),
+  `AQI`               INT,
+  `Status`            VARCHAR(255),
+  `DataCreationDate`  DATETIME NOT NULL,
+  `Latitude`          DECIMAL(10,7),
+  `Longitude`         DECIMAL(11,7),
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`SiteId`),
+  KEY `idx_latest_county` (`County`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,72 @@
+-- 歷史資料彙總表 (由 scripts/rollups.py 維護，供 /api/historical/* 查詢)
+-- 套用後請執行一次：python scripts/rollups.py --rebuild
+CREATE TABLE IF NOT EXISTS `rollup_site_daily` (
+  `County`            VARCHAR(255) NOT NULL,
+  `SiteId`            INT NOT NULL,
+  `Day`               DATE NOT NULL,
+  `AqiSum`            INT NOT NULL,
+  `AqiCount`          SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `SiteId`, `Day`),
+  KEY `idx_site_daily_day` (`Day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `rollup_county_daily` (
+  `County`            VARCHAR(255) NOT NULL,
+  `Day`               DATE NOT NULL,
+  `AqiSum`            INT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  PRIMARY KEY (`County`, `Day`),
+  KEY `idx_county_daily_day` (`Day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `rollup_site_monthly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `SiteId`            INT NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `Month`             TINYINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `SiteId`, `Year`, `Month`),
+  KEY `idx_site_monthly_year` (`Year`, `Month`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `rollup_county_monthly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `Month`             TINYINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `Year`, `Month`),
+  KEY `idx_county_monthly_year` (`Year`, `Month`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `rollup_site_yearly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `SiteId`            INT NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `SiteId`, `Year`),
+  KEY `idx_site_yearly_year` (`Year`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `rollup_county_yearly` (
+  `County`            VARCHAR(255) NOT NULL,
+  `Year`              SMALLINT NOT NULL,
+  `AqiSum`            BIGINT NOT NULL,
+  `AqiCount`          INT NOT NULL,
+  `GoodDays`          SMALLINT NOT NULL,
+  `ModerateDays`      SMALLINT NOT NULL,
+  `UnhealthyDays`     SMALLINT NOT NULL,
+  PRIMARY KEY (`County`, `Year`),
+  KEY `idx_county_yearly_year` (`Year`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,31 @@
+-- historical_aqi_analysis：覆蓋索引 + 依年份 RANGE 分區
+--
+-- 1. (County, DataCreationDate, AQI) 覆蓋索引：縣市 + 日期區間查詢只需讀索引；
+--    InnoDB 次要索引會附帶主鍵 (SiteId, DataCreationDate)，rollups.py 的日彙總亦可完全由索引取得。
+-- 2. RANGE COLUMNS(DataCreationDate) 分區：查詢以半開區間
+--    DataCreationDate >= :start AND DataCreationDate < :end 過濾時，MySQL 只會掃描相關年份的分區。
+--    分區欄位必須包含於所有唯一鍵中，現有主鍵 (SiteId, DataCreationDate) 已符合。
+--    pmax 承接超出範圍的資料；新年度可用 ALTER TABLE ... REORGANIZE PARTITION pmax 切出新分區。
+ALTER TABLE `historical_aqi_analysis`
+  ADD INDEX `idx_hist_county_date_aqi` (`County`, `DataCreationDate`, `AQI`);
+
+ALTER TABLE `historical_aqi_analysis`
+  PARTITION BY RANGE COLUMNS(`DataCreationDate`) (
+  PARTITION p2015 VALUES LESS THAN ('2016-01-01'),
+  PARTITION p2016 VALUES LESS THAN ('2017-01-01'),
+  PARTITION p2017 VALUES LESS THAN ('2018-01-01'),
+  PARTITION p2018 VALUES LESS THAN ('2019-01-01'),
+  PARTITION p2019 VALUES LESS THAN ('2020-01-01'),
+  PARTITION p2020 VALUES LESS THAN ('2021-01-01'),
+  PARTITION p2021 VALUES LESS THAN ('2022-01-01'),
+  PARTITION p2022 VALUES LESS THAN ('2023-01-01'),
+  PARTITION p2023 VALUES LESS THAN ('2024-01-01'),
+  PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+  PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+  PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+  PARTITION p2027 VALUES LESS THAN ('2028-01-01'),
+  PARTITION p2028 VALUES LESS THAN ('2029-01-01'),
+  PARTITION p2029 VALUES LESS THAN ('2030-01-01'),
+  PARTITION p2030 VALUES LESS THAN ('2031-01-01'),
+  PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
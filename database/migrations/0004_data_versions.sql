@@ -0,0 +1,11 @@
+-- 資料版本水位：crawler.py (realtime) 與 rollups.py (historical) 在寫入的同一個交易中遞增版本號，
+-- dashboard_api.py 的回應快取以此判斷快取是否過期，並產生 ETag / Last-Modified
+CREATE TABLE IF NOT EXISTS `data_versions` (
+  `name`              VARCHAR(64) NOT NULL,
+  `version`           BIGINT NOT NULL DEFAULT 0,
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO `data_versions` (`name`, `version`) VALUES ('realtime', 0), ('historical', 0);
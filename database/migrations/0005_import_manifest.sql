@@ -0,0 +1,16 @@
+-- 歷史資料匯入清單：記錄 history_records/ 中每個檔案的大小、修改時間、內容雜湊、
+-- 匯入狀態與已提交的批次數。import_lean_data.py --incremental 依此只匯入新增或變更的檔案，
+-- 中斷後從最後一個已提交的批次繼續；批次寫入與進度更新在同一個交易中完成。
+CREATE TABLE IF NOT EXISTS `import_manifest` (
+  `FileName`          VARCHAR(255) NOT NULL,
+  `FileSize`          BIGINT NOT NULL,
+  `FileMtime`         DOUBLE NOT NULL,
+  `ContentHash`       CHAR(64) NOT NULL,
+  `ChunkSize`         INT NOT NULL,
+  `ChunksDone`        INT NOT NULL DEFAULT 0,
+  `RecordCount`       INT NOT NULL DEFAULT 0,
+  `Status`            VARCHAR(16) NOT NULL,
+  `UpdatedAt`         TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`FileName`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
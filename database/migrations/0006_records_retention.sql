@@ -0,0 +1,6 @@
+-- air_quality_records (即時資料熱表) 只保留最近幾天：scripts/compact_records.py 依時間分批
+-- 將超過保留期限的列搬移到 historical_aqi_analysis 並刪除。
+-- 依 DataCreationDate 的索引讓每一批只掃描該時間區間 (主鍵以 SiteId 開頭，無法依時間範圍掃描)，
+-- 搬移時的 SELECT ... FOR UPDATE 也只鎖定該區間，不會阻擋爬蟲寫入最新資料。
+ALTER TABLE `air_quality_records`
+  ADD INDEX `idx_records_date` (`DataCreationDate`);
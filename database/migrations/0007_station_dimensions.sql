@@ -0,0 +1,134 @@
+-- 測站維度表 + 字典編碼的讀數資料表
+--
+-- 原本 air_quality_records / historical_aqi_analysis / latest_station_readings 每一列都重複存放
+-- SiteName、County、Status (VARCHAR(255) utf8mb4) 與座標。改為：
+--   stations (SiteId, SiteName, CountyId, 座標)、counties、aqi_statuses 三張維度表
+--   讀數資料表只存 (SiteId SMALLINT, DataCreationDate, AQI SMALLINT, StatusId TINYINT)
+-- 每列約由上百位元組縮小為十餘位元組，主鍵與次要索引一併縮小，緩衝池可容納更多工作集。
+-- 歷史資料表的覆蓋索引改為 (DataCreationDate, AQI)：rollups.py 依日期區間讀取，縣市改由 stations 取得。
+--
+-- 三張讀數資料表皆先建立新結構的資料表、複製並編碼後以 RENAME TABLE 換上線，
+-- 歷史資料表以 CREATE TABLE ... LIKE 沿用既有的分區定義。資料量大時複製需要一段時間，
+-- 請在爬蟲與匯入工具停止時執行。套用後請執行一次：python scripts/rollups.py --rebuild
+CREATE TABLE IF NOT EXISTS `counties` (
+  `CountyId`          TINYINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  `Name`              VARCHAR(32) COLLATE utf8mb4_bin NOT NULL,
+  PRIMARY KEY (`CountyId`),
+  UNIQUE KEY `uq_counties_name` (`Name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `aqi_statuses` (
+  `StatusId`          TINYINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  `Name`              VARCHAR(32) COLLATE utf8mb4_bin NOT NULL,
+  PRIMARY KEY (`StatusId`),
+  UNIQUE KEY `uq_aqi_statuses_name` (`Name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO `aqi_statuses` (`StatusId`, `Name`) VALUES
+  (1, '良好'), (2, '普通'), (3, '對敏感族群不健康'), (4, '對所有族群不健康'), (5, '非常不健康'), (6, '危害');
+
+CREATE TABLE IF NOT EXISTS `stations` (
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
+  `SiteName`          VARCHAR(64) NOT NULL,
+  `CountyId`          TINYINT UNSIGNED,
+  `Latitude`          DECIMAL(10,7),
+  `Longitude`         DECIMAL(11,7),
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`SiteId`),
+  KEY `idx_stations_county` (`CountyId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 1. 由既有資料建立縣市與狀態字典 (歷史資料表的縣市可由舊的 (County, ...) 索引取得)
+INSERT IGNORE INTO `counties` (`Name`)
+  SELECT DISTINCT `County` FROM `latest_station_readings` WHERE `County` <> '';
+INSERT IGNORE INTO `counties` (`Name`)
+  SELECT DISTINCT `County` FROM `air_quality_records` WHERE `County` <> '';
+INSERT IGNORE INTO `counties` (`Name`)
+  SELECT DISTINCT `County` FROM `historical_aqi_analysis` WHERE `County` <> '';
+
+INSERT IGNORE INTO `aqi_statuses` (`Name`)
+  SELECT DISTINCT `Status` FROM `latest_station_readings` WHERE `Status` <> '';
+INSERT IGNORE INTO `aqi_statuses` (`Name`)
+  SELECT DISTINCT `Status` FROM `air_quality_records` WHERE `Status` <> '';
+INSERT IGNORE INTO `aqi_statuses` (`Name`)
+  SELECT DISTINCT `Status` FROM `historical_aqi_analysis` WHERE `Status` <> '';
+
+-- 2. 測站：最新讀數快照 (含座標) 優先，其餘測站取即時、歷史資料中的名稱與縣市
+INSERT IGNORE INTO `stations` (`SiteId`, `SiteName`, `CountyId`, `Latitude`, `Longitude`)
+  SELECT l.`SiteId`, l.`SiteName`, c.`CountyId`, l.`Latitude`, l.`Longitude`
+  FROM `latest_station_readings` l
+  LEFT JOIN `counties` c ON c.`Name` = l.`County` COLLATE utf8mb4_bin;
+INSERT IGNORE INTO `stations` (`SiteId`, `SiteName`, `CountyId`, `Latitude`, `Longitude`)
+  SELECT r.`SiteId`, MAX(r.`SiteName`), MAX(c.`CountyId`), MAX(r.`Latitude`), MAX(r.`Longitude`)
+  FROM `air_quality_records` r
+  LEFT JOIN `counties` c ON c.`Name` = r.`County` COLLATE utf8mb4_bin
+  GROUP BY r.`SiteId`;
+INSERT IGNORE INTO `stations` (`SiteId`, `SiteName`, `CountyId`)
+  SELECT h.`SiteId`, MAX(h.`SiteName`), MAX(c.`CountyId`)
+  FROM `historical_aqi_analysis` h
+  LEFT JOIN `counties` c ON c.`Name` = h.`County` COLLATE utf8mb4_bin
+  GROUP BY h.`SiteId`;
+
+-- 3. 即時資料表
+CREATE TABLE `air_quality_records_encoded` (
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
+  `DataCreationDate`  DATETIME NOT NULL,
+  `AQI`               SMALLINT,
+  `StatusId`          TINYINT UNSIGNED,
+  PRIMARY KEY (`SiteId`, `DataCreationDate`),
+  KEY `idx_records_date` (`DataCreationDate`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO `air_quality_records_encoded` (`SiteId`, `DataCreationDate`, `AQI`, `StatusId`)
+  SELECT r.`SiteId`, r.`DataCreationDate`, r.`AQI`, s.`StatusId`
+  FROM `air_quality_records` r
+  LEFT JOIN `aqi_statuses` s ON s.`Name` = r.`Status` COLLATE utf8mb4_bin;
+
+RENAME TABLE `air_quality_records` TO `air_quality_records_unencoded`,
+             `air_quality_records_encoded` TO `air_quality_records`;
+DROP TABLE `air_quality_records_unencoded`;
+
+-- 4. 最新讀數快照表
+CREATE TABLE `latest_station_readings_encoded` (
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
+  `DataCreationDate`  DATETIME NOT NULL,
+  `AQI`               SMALLINT,
+  `StatusId`          TINYINT UNSIGNED,
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`SiteId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO `latest_station_readings_encoded` (`SiteId`, `DataCreationDate`, `AQI`, `StatusId`)
+  SELECT l.`SiteId`, l.`DataCreationDate`, l.`AQI`, s.`StatusId`
+  FROM `latest_station_readings` l
+  LEFT JOIN `aqi_statuses` s ON s.`Name` = l.`Status` COLLATE utf8mb4_bin;
+
+RENAME TABLE `latest_station_readings` TO `latest_station_readings_unencoded`,
+             `latest_station_readings_encoded` TO `latest_station_readings`;
+DROP TABLE `latest_station_readings_unencoded`;
+
+-- 5. 歷史資料表：空表上調整欄位 (瞬間完成)，載入後才建立次要索引
+CREATE TABLE `historical_aqi_analysis_encoded` LIKE `historical_aqi_analysis`;
+
+ALTER TABLE `historical_aqi_analysis_encoded`
+  DROP INDEX `idx_hist_county_date_aqi`,
+  DROP COLUMN `SiteName`,
+  DROP COLUMN `County`,
+  DROP COLUMN `Status`,
+  MODIFY `SiteId` SMALLINT UNSIGNED NOT NULL,
+  MODIFY `AQI` SMALLINT AFTER `DataCreationDate`,
+  ADD COLUMN `StatusId` TINYINT UNSIGNED;
+
+INSERT INTO `historical_aqi_analysis_encoded` (`SiteId`, `DataCreationDate`, `AQI`, `StatusId`)
+  SELECT h.`SiteId`, h.`DataCreationDate`, h.`AQI`, s.`StatusId`
+  FROM `historical_aqi_analysis` h
+  LEFT JOIN `aqi_statuses` s ON s.`Name` = h.`Status` COLLATE utf8mb4_bin;
+
+ALTER TABLE `historical_aqi_analysis_encoded`
+  ADD INDEX `idx_hist_date_aqi` (`DataCreationDate`, `AQI`);
+
+RENAME TABLE `historical_aqi_analysis` TO `historical_aqi_analysis_unencoded`,
+             `historical_aqi_analysis_encoded` TO `historical_aqi_analysis`;
+DROP TABLE `historical_aqi_analysis_unencoded`;
@@ -0,0 +1,17 @@
+-- 測站滾動視窗 (8 / 24 小時平均與最大值，詳見 aqi/rolling.py)
+--
+-- crawler.py 寫入讀數時，在同一個交易中增量更新各測站最近 24 小時的逐時環形緩衝區，
+-- 並寫入計算好的統計 (Summary)；即時 API 直接讀取 Summary，不需以視窗函數重新計算。
+--   LatestHour：緩衝區最新的整點 (各測站最新讀數的時間)
+--   Buffers   ：{"AQI": [24 個逐時值，由舊到新], "PM2_5": [...], ...}，爬蟲重新啟動時由此還原狀態
+--   Summary   ：{"AQI": {"avg_8h": ..., "max_8h": ..., "avg_24h": ..., "max_24h": ...}, ...}
+-- 套用後不需回填：爬蟲第一次執行時會以 air_quality_records 最近 24 小時的 AQI 建立緩衝區。
+CREATE TABLE IF NOT EXISTS `station_rolling_windows` (
+  `SiteId`            SMALLINT UNSIGNED NOT NULL,
+  `LatestHour`        DATETIME NOT NULL,
+  `Buffers`           TEXT NOT NULL,
+  `Summary`           TEXT NOT NULL,
+  `updated_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                                       ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`SiteId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,24 @@
+-- 污染物濃度欄位 (詳見 aqi/pollutants.py)
+--
+-- 環境部 API 的 PM2.5、PM10、O3、NO2、SO2、CO 原本只用於計算滾動視窗，不寫入資料庫。
+-- 兩張逐時讀數資料表各新增六個可為 NULL 的 DECIMAL 欄位 (每欄 3 bytes)，
+-- 供 /api/historical/aggregate (aqi/aggregate.py) 依任意指標彙總；latest_station_readings 不需要這些欄位。
+-- 欄位附加在資料表最後：MySQL 8.0.29 以上以 INSTANT 演算法加入，不需重建資料表；
+-- 較舊的版本會重建資料表，歷史資料量大時請在爬蟲與匯入工具停止時執行。
+-- 既有的列為 NULL，不需回填；歷史檔案含污染物欄位時，重新執行 import_lean_data.py --import 即可補上。
+-- compact_records.py 搬移資料時一併複製這些欄位。
+ALTER TABLE `air_quality_records`
+  ADD COLUMN `PM2_5`  DECIMAL(5,1),
+  ADD COLUMN `PM10`   DECIMAL(5,1),
+  ADD COLUMN `O3`     DECIMAL(5,1),
+  ADD COLUMN `NO2`    DECIMAL(5,1),
+  ADD COLUMN `SO2`    DECIMAL(5,1),
+  ADD COLUMN `CO`     DECIMAL(5,2);
+
+ALTER TABLE `historical_aqi_analysis`
+  ADD COLUMN `PM2_5`  DECIMAL(5,1),
+  ADD COLUMN `PM10`   DECIMAL(5,1),
+  ADD COLUMN `O3`     DECIMAL(5,1),
+  ADD COLUMN `NO2`    DECIMAL(5,1),
+  ADD COLUMN `SO2`    DECIMAL(5,1),
+  ADD COLUMN `CO`     DECIMAL(5,2);
@@ -0,0 +1,97 @@
+# =============================================================================
+# 歷史分析：MySQL 彙總表 vs. 欄式儲存 效能比較
+#
+# 對每個歷史分析端點，分別以
+#   1. mysql    ：執行 aqi/queries.py 的 SQL (讀取 rollup_* 彙總表) 並轉為 list[dict]
+#   2. columnar ：以 aqi/columnar.py 對 memmap 矩陣做向量化運算
+# 各重複執行 --repeat 次，輸出中位數與 p95 延遲 (毫秒)、加速倍數，並比對兩者結果是否一致。
+# 另外列出 MySQL 資料表與欄式儲存檔案的大小。
+#
+# 使用說明 (需先執行 python columnar_store.py --build):
+#    python benchmark_columnar.py --county 臺北市 --year 2024 --repeat 50
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import date
+from sqlalchemy import text
+from import_lean_data import create_db_engine, PROJECT_ROOT
+
+sys.path.insert(0, PROJECT_ROOT)
+from aqi import queries
+from aqi.columnar import ColumnarStore, ENDPOINT_QUERIES
+from aqi.serialization import RowSerializer, COLUMN_MAPPING
+
+TABLE_SIZE_SQL = """
+    SELECT TABLE_NAME, DATA_LENGTH + INDEX_LENGTH FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND (TABLE_NAME = 'historical_aqi_analysis' OR TABLE_NAME LIKE 'rollup\\_%')
+"""
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def timed(func, repeat):
+    """執行 repeat 次 (另加一次暖身)，回傳 (最後一次的結果, 每次耗時毫秒)"""
+    result = func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, samples
+
+def normalized(rows):
+    """忽略列的順序 (例如 annual-map 的縣市順序) 後比較"""
+    return sorted(json.dumps(row, sort_keys=True, ensure_ascii=False) for row in rows)
+
+def print_sizes(engine, store):
+    with engine.connect() as conn:
+        for table, size in conn.execute(text(TABLE_SIZE_SQL)):
+            print(f"  MySQL {table:<28} {size / 1024 / 1024:10.1f} MB")
+    data_file = os.path.join(store.path, store.snapshot().meta['data_file'])
+    print(f"  欄式儲存 {os.path.basename(data_file):<25} {os.path.getsize(data_file) / 1024 / 1024:10.1f} MB")
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='比較歷史分析端點在 MySQL 彙總表與欄式儲存上的延遲')
+    parser.add_argument('--county', default='臺北市', help='查詢用的縣市 (預設: 臺北市)')
+    parser.add_argument('--year', type=int, default=date.today().year - 1, help='查詢用的年份 (預設: 去年)')
+    parser.add_argument('--repeat', type=int, default=30, help='每個端點重複執行的次數 (預設: 30)')
+    args = parser.parse_args()
+
+    engine = create_db_engine()
+    if not engine: return
+    store = ColumnarStore()
+    open_start = time.perf_counter()
+    if not store.available():
+        print("[!] 尚未建立欄式儲存，請先執行 'python columnar_store.py --build'。")
+        return
+    print(f"欄式儲存開啟 (memmap) 耗時 {(time.perf_counter() - open_start) * 1000:.2f} ms")
+
+    params = {"county_param": args.county, "year_param": args.year, "previous_year_param": args.year - 1}
+    serializer = RowSerializer(COLUMN_MAPPING)
+    print(f"\n{'端點':<24}{'mysql p50':>11}{'p95':>9}{'columnar p50':>14}{'p95':>9}{'加速':>8}  結果")
+    with engine.connect() as conn:
+        for name in ENDPOINT_QUERIES:
+            sql = queries.ENDPOINT_QUERIES[f'historical/{name}']
+            mysql_rows, mysql_ms = timed(lambda: serializer.records(conn.execute(sql, params)), args.repeat)
+            columnar_rows, columnar_ms = timed(lambda: store.query(name, params), args.repeat)
+            mysql_p50, columnar_p50 = statistics.median(mysql_ms), statistics.median(columnar_ms)
+            same = '一致' if normalized(mysql_rows) == normalized(columnar_rows) else '不一致'
+            print(f"{name:<24}{mysql_p50:>9.2f}ms{percentile(mysql_ms, 0.95):>7.2f}ms"
+                  f"{columnar_p50:>12.2f}ms{percentile(columnar_ms, 0.95):>7.2f}ms"
+                  f"{mysql_p50 / columnar_p50 if columnar_p50 else float('inf'):>7.1f}x  {same}")
+
+    print("\n儲存空間：")
+    print_sizes(engine, store)
+    print("\n註：欄式儲存包含爬蟲附加的近期資料、縣市取自測站目前的所屬縣市，與彙總表不一致時多半來自這兩點。")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+# =============================================================================
+# 歷史 AQI 欄式儲存 (aqi/columnar.py) 建立工具
+#
+# 從 historical_aqi_analysis 與爬蟲的 air_quality_records 讀出 (測站, 小時, AQI)，
+# 寫入 小時 × 測站 的 int16 矩陣，供 HISTORICAL_BACKEND=columnar 時的歷史分析 API 使用。
+# 同一小時兩張表都有資料時以 air_quality_records (較新的爬蟲資料) 為準。
+#
+# import_lean_data.py 匯入完成後、crawler.py 寫入後皆會自動更新既有的儲存，
+# 一般只需在第一次啟用時手動建立。
+#
+# 使用說明:
+# 1. 全部重建:
+#    python columnar_store.py --build
+#
+# 2. 只重算某段日期 (含頭尾兩天):
+#    python columnar_store.py --refresh --start 2024-01-01 --end 2024-01-31
+# =============================================================================
+
+import os
+import sys
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from aqi.columnar import StoreWriter, MISSING, default_store_dir
+
+# 依序寫入，後者覆蓋前者
+SOURCE_TABLES = ['historical_aqi_analysis', 'air_quality_records']
+
+STATIONS_SQL = """
+    SELECT s.SiteId, s.SiteName, c.Name AS County
+    FROM stations s LEFT JOIN counties c ON c.CountyId = s.CountyId
+"""
+DATE_BOUNDS_SQL = "SELECT MIN(DataCreationDate), MAX(DataCreationDate) FROM {table}"
+READINGS_SQL = """
+    SELECT SiteId, DataCreationDate, AQI FROM {table}
+    WHERE DataCreationDate >= :start AND DataCreationDate < :end
+"""
+
+
+def write_frame(writer, df):
+    """將含 SiteId / SiteName / County / DataCreationDate / AQI 欄位的 DataFrame 寫入儲存，回傳寫入筆數"""
+    if df.empty:
+        return 0
+    if 'County' in df.columns:
+        stations = df.drop_duplicates('SiteId', keep='last')
+        for site_id, site_name, county in stations[['SiteId', 'SiteName', 'County']].itertuples(index=False):
+            writer.add_station(site_id, site_name, county)
+    times = pd.to_datetime(df['DataCreationDate']).to_numpy(dtype='datetime64[h]')
+    values = pd.to_numeric(df['AQI'], errors='coerce').fillna(MISSING).to_numpy(dtype=np.int64)
+    return writer.write(df['SiteId'].to_numpy(dtype=np.int64), times, values)
+
+def _warn_unregistered(writer):
+    if writer.unregistered:
+        logging.warning(f"{writer.unregistered} 筆讀數的測站未在 stations 登記，未寫入欄式儲存。")
+
+def _month_ranges(start_day, end_day):
+    """將 [start_day, end_day] 切成逐月的半開區間，每次只讀一個月的資料"""
+    current = start_day
+    while current <= end_day:
+        next_month = date(current.year + (current.month == 12), current.month % 12 + 1, 1)
+        yield current, min(next_month, end_day + timedelta(days=1))
+        current = next_month
+
+def _load_readings(engine, writer, start_day, end_day):
+    total = 0
+    with engine.connect() as conn:
+        for table in SOURCE_TABLES:
+            for start, end in _month_ranges(start_day, end_day):
+                df = pd.read_sql(text(READINGS_SQL.format(table=table)), conn, params={"start": start, "end": end})
+                total += write_frame(writer, df)
+    return total
+
+def _register_stations(engine, writer):
+    with engine.connect() as conn:
+        for site_id, site_name, county in conn.execute(text(STATIONS_SQL)):
+            writer.add_station(site_id, site_name, county)
+
+def build_columnar_store(engine, path=None):
+    """由資料庫完整重建欄式儲存 (新代號的資料檔寫完後才切換，重建期間 API 照常讀取舊版)"""
+    path = path or default_store_dir()
+    logging.info(f"--- 正在建立欄式儲存: {path} ---")
+    bounds = []
+    with engine.connect() as conn:
+        for table in SOURCE_TABLES:
+            bounds.extend(b for b in conn.execute(text(DATE_BOUNDS_SQL.format(table=table))).one() if b is not None)
+    if not bounds:
+        logging.warning("資料庫中沒有任何讀數，略過建立欄式儲存。")
+        return
+
+    first_day, last_day = pd.Timestamp(min(bounds)).date(), pd.Timestamp(max(bounds)).date()
+    writer = StoreWriter.create(path, first_day)
+    try:
+        _register_stations(engine, writer)
+        writer.ensure_hours(((last_day - first_day).days + 1) * 24)
+        total = _load_readings(engine, writer, first_day, last_day)
+        _warn_unregistered(writer)
+        writer.commit()
+    finally:
+        writer.close()
+    logging.info(f"欄式儲存建立完成：{len(writer.meta['stations'])} 個測站、{writer.meta['hours'] // 24} 天、"
+                 f"{total} 筆讀數 ({first_day} ~ {last_day})。")
+
+def refresh_columnar_store(engine, start_day, end_day, path=None):
+    """重算既有儲存中 [start_day, end_day] 的讀數 (增量匯入後呼叫)；尚未建立儲存時不做任何事"""
+    writer = StoreWriter.open(path or default_store_dir())
+    if writer is None:
+        return
+    try:
+        if start_day < date.fromisoformat(writer.meta['origin']):
+            # 早於起始日的資料無法附加，改為完整重建
+            writer.close()
+            build_columnar_store(engine, path)
+            return
+        _register_stations(engine, writer)
+        writer.stage()     # 清除與重算寫入新代號的資料檔，完成前 API 仍讀取舊資料
+        writer.clear(np.datetime64(start_day), np.datetime64(end_day + timedelta(days=1)))
+        total = _load_readings(engine, writer, start_day, end_day)
+        _warn_unregistered(writer)
+        writer.commit()
+    finally:
+        writer.close()
+    logging.info(f"欄式儲存已更新：{start_day} ~ {end_day}，{total} 筆讀數。")
+
+def append_frame(df, path=None):
+    """將爬蟲剛寫入的讀數附加到既有儲存；尚未建立儲存時回傳 None，否則回傳寫入筆數"""
+    writer = StoreWriter.open(path or default_store_dir())
+    if writer is None:
+        return None
+    try:
+        written = write_frame(writer, df)
+        _warn_unregistered(writer)
+        writer.commit()
+        return written
+    finally:
+        writer.close()
+
+def store_enabled():
+    """HISTORICAL_BACKEND=columnar 或已建立過儲存時，匯入後需一併更新"""
+    return os.getenv('HISTORICAL_BACKEND') == 'columnar' or os.path.exists(os.path.join(default_store_dir(), 'meta.json'))
+
+
+def _parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='歷史 AQI 欄式儲存建立工具')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--build', action='store_true', help='由資料庫完整重建欄式儲存。')
+    group.add_argument('--refresh', action='store_true', help='僅重算 --start 與 --end 之間的日期。')
+    parser.add_argument('--start', type=_parse_day, help='起始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end', type=_parse_day, help='結束日期 (YYYY-MM-DD，含當天)')
+    args = parser.parse_args()
+
+    if args.refresh and (not args.start or not args.end):
+        parser.error('--refresh 需要同時指定 --start 與 --end')
+
+    # 沿用匯入工具的 .env 載入與連線設定
+    from import_lean_data import create_db_engine
+    engine = create_db_engine()
+    if not engine: return
+
+    if args.build:
+        build_columnar_store(engine)
+    else:
+        refresh_columnar_store(engine, args.start, args.end)
+
+if __name__ == '__main__':
+    main()
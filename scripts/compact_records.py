@@ -0,0 +1,194 @@
+# =============================================================================
+# AQI 即時資料表冷熱分層 (Compaction) 工具
+#
+# crawler.py 持續寫入 air_quality_records (熱資料)，本工具將超過保留期限的列
+# 搬移到 historical_aqi_analysis (冷資料) 並從熱表刪除，熱表固定只保留最近幾天。
+#
+# 依時間分批 (--batch-hours)，每一批在單一交易中：
+#   1. SELECT ... FOR UPDATE 鎖定該時間區間 (爬蟲此時修正同一區間的資料會等待本批完成)
+#   2. INSERT ... SELECT ... ON DUPLICATE KEY UPDATE 寫入歷史資料表 (同一小時以爬蟲資料為準，
+#      與 /api/stations/<id>/series 的合併規則相同)
+#   3. 從熱表刪除同一區間
+#   4. 重算受影響日期的 rollup_* 彙總表並遞增 historical 版本水位
+# 全部批次完成後，已啟用歷史分析靜態快照時重新匯出受影響的回應 (export_snapshots.py)。
+# 每一批都持有 HISTORY_LOCK_NAME 具名鎖：完整匯入 (import_lean_data.py) 將正式資料表的列複製到
+# 影子資料表並切換期間持有同一個鎖，搬移會暫停，不會有列在切換前後之間遺失。
+# 中斷後重新執行即可：已提交的批次不在熱表中，未提交的批次整批回復，重複執行結果相同。
+# 欄式儲存 (aqi/columnar.py) 已由爬蟲寫入同一批讀數，不需更新。
+#
+# 使用說明:
+# 1. 查看有多少列將被搬移 (不寫入):
+#    python compact_records.py --dry-run
+#
+# 2. 搬移超過 72 小時的資料 (可於工作排程器每日執行 batch/compact_records.bat):
+#    python compact_records.py --retention-hours 72
+#
+# 爬蟲常駐模式也可在行程內定期執行 (CRAWLER_COMPACT_INTERVAL_HOURS，見 crawler.py)。
+# =============================================================================
+
+import os
+import sys
+import logging
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from rollups import refresh_rollups_in_conn, BUMP_HISTORICAL_VERSION_SQL
+from export_snapshots import export_if_enabled
+from aqi.pollutants import COLUMNS as POLLUTANT_COLUMNS
+
+# 保留期限等設定在匯入時讀取，需先載入專案根目錄的 .env
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+HOT_TABLE = 'air_quality_records'
+COLD_TABLE = 'historical_aqi_analysis'
+
+RETENTION_HOURS = int(os.getenv('COMPACTION_RETENTION_HOURS', 72))
+BATCH_HOURS = int(os.getenv('COMPACTION_BATCH_HOURS', 24))
+# 爬蟲的抓取範圍可能早於保留期限 (停擺測站最多拉低水位 7 天)，已搬走的列由 crawler.py 的
+# classify_changes 與歷史資料表比對，不會被當成新資料重新寫入。下限是滾動視窗 (aqi/rolling.py)
+# 為新測站建立緩衝區時讀取的熱表範圍 (最近 24 小時)
+MIN_RETENTION_HOURS = 24
+
+# 與完整匯入的資料表切換互斥的 MySQL 具名鎖 (GET_LOCK)；每批最多等待 LOCK_WAIT_SECONDS
+HISTORY_LOCK_NAME = 'aqi_history_table'
+LOCK_WAIT_SECONDS = int(os.getenv('COMPACTION_LOCK_WAIT', 30))
+
+OLDEST_SQL = text(f"""
+    SELECT MIN(DataCreationDate) FROM {HOT_TABLE} WHERE DataCreationDate < :cutoff
+""")
+
+COUNT_SQL = text(f"""
+    SELECT COUNT(*) FROM {HOT_TABLE} WHERE DataCreationDate < :cutoff
+""")
+
+LOCK_BATCH_SQL = text(f"""
+    SELECT COUNT(*) FROM {HOT_TABLE}
+    WHERE DataCreationDate >= :start AND DataCreationDate < :end
+    FOR UPDATE
+""")
+
+# 兩張表的讀數欄位相同 (含污染物濃度，見 migrations/0009)
+MOVE_COLUMNS = ['SiteId', 'DataCreationDate', 'AQI', 'StatusId'] + POLLUTANT_COLUMNS
+
+MOVE_BATCH_SQL = text(f"""
+    INSERT INTO {COLD_TABLE} ({', '.join(MOVE_COLUMNS)})
+    SELECT {', '.join(MOVE_COLUMNS)} FROM {HOT_TABLE}
+    WHERE DataCreationDate >= :start AND DataCreationDate < :end
+    ON DUPLICATE KEY UPDATE {', '.join(f'{col} = VALUES({col})' for col in MOVE_COLUMNS[2:])}
+""")
+
+DELETE_BATCH_SQL = text(f"""
+    DELETE FROM {HOT_TABLE} WHERE DataCreationDate >= :start AND DataCreationDate < :end
+""")
+
+
+class HistoryTableBusy(Exception):
+    """等待逾時仍無法取得 HISTORY_LOCK_NAME (另一個行程正在搬移或切換歷史資料表)"""
+
+
+@contextmanager
+def history_table_lock(engine, wait_seconds):
+    """持有歷史資料表的具名鎖 (連線層級，與交易無關)；逾時拋出 HistoryTableBusy"""
+    params = {"name": HISTORY_LOCK_NAME, "wait": wait_seconds}
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT GET_LOCK(:name, :wait)"), params).scalar():
+            raise HistoryTableBusy(f"等待 {wait_seconds} 秒仍無法取得鎖 '{HISTORY_LOCK_NAME}'")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), params)
+
+def _hour_floor(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def retention_cutoff(retention_hours, now=None):
+    """早於此時間 (整點) 的列會被搬移"""
+    if retention_hours < MIN_RETENTION_HOURS:
+        raise ValueError(f"保留期限至少需 {MIN_RETENTION_HOURS} 小時")
+    return _hour_floor((now or datetime.now()) - timedelta(hours=retention_hours))
+
+def move_batch(conn, start, end):
+    """在呼叫端的交易中搬移 [start, end) 的列並更新彙總表，回傳搬移筆數"""
+    params = {"start": start, "end": end}
+    count = conn.execute(LOCK_BATCH_SQL, params).scalar()
+    if not count:
+        return 0
+    conn.execute(MOVE_BATCH_SQL, params)
+    conn.execute(DELETE_BATCH_SQL, params)
+    # 日彙總只重算本批涵蓋的日期；跨日的批次邊界會讓同一天重算兩次，結果相同
+    refresh_rollups_in_conn(conn, start.date(), (end - timedelta(seconds=1)).date())
+    conn.execute(text(BUMP_HISTORICAL_VERSION_SQL))
+    return count
+
+def compact(engine, retention_hours=RETENTION_HOURS, batch_hours=BATCH_HOURS, max_batches=None, now=None):
+    """將早於保留期限的列分批搬移到歷史資料表；回傳 {'cutoff', 'batches', 'moved', 'first', 'last'}"""
+    cutoff = retention_cutoff(retention_hours, now)
+    step = timedelta(hours=max(1, batch_hours))
+    stats = {'cutoff': cutoff, 'batches': 0, 'moved': 0, 'first': None, 'last': None}
+
+    while max_batches is None or stats['batches'] < max_batches:
+        with engine.connect() as conn:
+            oldest = conn.execute(OLDEST_SQL, {"cutoff": cutoff}).scalar()
+        if oldest is None:
+            break
+        start = _hour_floor(oldest)
+        end = min(start + step, cutoff)
+        try:
+            with history_table_lock(engine, LOCK_WAIT_SECONDS), engine.begin() as conn:
+                moved = move_batch(conn, start, end)
+        except HistoryTableBusy as e:
+            logging.warning(f"完整匯入正在切換歷史資料表，本次搬移提前結束 (下次執行會接續): {e}")
+            break
+        stats['batches'] += 1
+        stats['moved'] += moved
+        stats['first'] = stats['first'] or start
+        stats['last'] = end
+        logging.info(f"已搬移 {start:%Y-%m-%d %H:%M} ~ {end:%Y-%m-%d %H:%M}：{moved} 筆")
+
+    if stats['moved']:
+        logging.info(f"冷熱分層完成：共 {stats['batches']} 批、{stats['moved']} 筆 "
+                     f"({stats['first']:%Y-%m-%d %H:%M} ~ {stats['last']:%Y-%m-%d %H:%M})，熱表保留 {cutoff:%Y-%m-%d %H:%M} 之後的資料。")
+        export_if_enabled(engine)
+    else:
+        logging.info(f"沒有早於 {cutoff:%Y-%m-%d %H:%M} 的即時資料需要搬移。")
+    return stats
+
+def count_pending(engine, retention_hours=RETENTION_HOURS, now=None):
+    """回傳 (保留期限, 待搬移筆數)"""
+    cutoff = retention_cutoff(retention_hours, now)
+    with engine.connect() as conn:
+        return cutoff, conn.execute(COUNT_SQL, {"cutoff": cutoff}).scalar()
+
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='AQI 即時資料表冷熱分層工具')
+    parser.add_argument('--retention-hours', type=int, default=RETENTION_HOURS,
+                        help=f'熱表保留的小時數，至少 {MIN_RETENTION_HOURS} (預設: {RETENTION_HOURS})')
+    parser.add_argument('--batch-hours', type=int, default=BATCH_HOURS,
+                        help=f'每批 (單一交易) 搬移的小時數 (預設: {BATCH_HOURS})')
+    parser.add_argument('--max-batches', type=int, help='最多執行的批數 (預設: 直到搬移完畢)')
+    parser.add_argument('--dry-run', action='store_true', help='只顯示待搬移的筆數，不寫入資料庫。')
+    args = parser.parse_args()
+
+    if args.retention_hours < MIN_RETENTION_HOURS:
+        parser.error(f'--retention-hours 至少需 {MIN_RETENTION_HOURS}')
+
+    # 沿用匯入工具的 .env 載入與連線設定
+    from import_lean_data import create_db_engine
+    engine = create_db_engine()
+    if not engine: return
+
+    if args.dry_run:
+        cutoff, pending = count_pending(engine, args.retention_hours)
+        logging.info(f"'{HOT_TABLE}' 中早於 {cutoff:%Y-%m-%d %H:%M} 的資料共 {pending} 筆。")
+        return
+    compact(engine, args.retention_hours, args.batch_hours, args.max_batches)
+
+if __name__ == '__main__':
+    main()
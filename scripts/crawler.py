@@ -4,9 +4,29 @@ import io
 import MySQLdb
 import sys
 import os
+import time
+import json
+import random
+import signal
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 import certifi # <-- 1. 匯入 certifi 套件
+from sqlalchemy import create_engine
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from rollups import BUMP_HISTORICAL_VERSION_SQL
+from columnar_store import append_frame
+from compact_records import compact
+from aqi.columnar import StoreConflict
+from aqi.dimensions import DimensionEncoder
+from aqi.rolling import RollingAggregator, METRICS as ROLLING_METRICS
+from aqi import pollutants
+from aqi.metrics import StageTimer
 
 # =====================================================================
 # 1. 組態設定 (Configuration)
@@ -28,56 +48,181 @@ DB_CONFIG = {
 }
 
 # --- 從環境變數讀取 API 設定 ---
-API_URL = "https://data.moenv.gov.tw/api/v2/aqx_p_488"
+# AQI_API_URL 可指向本機的替身服務，用來測試分頁與重試邏輯
+API_URL = os.getenv('AQI_API_URL', "https://data.moenv.gov.tw/api/v2/aqx_p_488")
 API_KEY = os.getenv('API_KEY')
 
+# --- 增量抓取設定 ---
+PAGE_SIZE = int(os.getenv('CRAWLER_PAGE_SIZE', 1000))              # 每頁筆數 (limit)
+PAGE_CONCURRENCY = int(os.getenv('CRAWLER_PAGE_CONCURRENCY', 4))   # 同時請求的頁數
+MAX_RETRIES = int(os.getenv('CRAWLER_MAX_RETRIES', 3))             # 每頁失敗後的重試次數
+RETRY_BACKOFF_SECONDS = float(os.getenv('CRAWLER_RETRY_BACKOFF', 2))
+# 從水位往前多抓幾小時，以接收 API 對近期資料的修正值 (未變更的列不會寫入)
+OVERLAP_HOURS = int(os.getenv('CRAWLER_OVERLAP_HOURS', 2))
+DEFAULT_LOOKBACK_HOURS = 25    # 資料庫尚無資料時，抓取過去 25 小時
+MAX_LOOKBACK_HOURS = 24 * 7    # 超過 7 天沒有新資料的測站視為停用，不再拉低水位
+
+# --- 常駐模式 (--daemon) 設定 ---
+# 環境部每小時整點後陸續發布資料，排程對齊每小時的第 SCHEDULE_MINUTE 分鐘，再加上隨機延遲
+SCHEDULE_MINUTE = int(os.getenv('CRAWLER_SCHEDULE_MINUTE', 20))
+SCHEDULE_JITTER_SECONDS = int(os.getenv('CRAWLER_SCHEDULE_JITTER', 120))
+RUN_RETRY_BASE_SECONDS = float(os.getenv('CRAWLER_RUN_RETRY_BASE', 60))    # 整次執行失敗後的重試間隔 (指數退避)
+RUN_RETRY_MAX_SECONDS = float(os.getenv('CRAWLER_RUN_RETRY_MAX', 900))
+# 寫入成功後通知儀表板 API 立即重新讀取資料版本，例如 http://127.0.0.1:5000/api/internal/data-updated
+NOTIFY_URL = os.getenv('DASHBOARD_NOTIFY_URL')
+NOTIFY_TOKEN = os.getenv('DASHBOARD_NOTIFY_TOKEN', '')
+# 常駐模式中每隔幾小時搬移一次超過保留期限的即時資料 (compact_records.py)；0 代表停用 (改由排程執行)
+COMPACT_INTERVAL_HOURS = float(os.getenv('CRAWLER_COMPACT_INTERVAL_HOURS', 0))
+STATUS_FILE = os.getenv('CRAWLER_STATUS_FILE', os.path.join(PROJECT_ROOT, 'crawler_status.json'))
+
+# --- 各階段耗時 (每次執行結束時印出；--summary-json 時寫出整個行程的累計) ---
+stage_timer = StageTimer('crawler')
+
+# --- 寫入資料庫的欄位順序 ---
+# 測站名稱、縣市與座標寫入 stations 維度表，讀數資料表只存代碼 (見 aqi/dimensions.py)
+RECORD_COLUMNS = ['SiteId', 'DataCreationDate', 'AQI', 'StatusId']
+# air_quality_records 另存各污染物濃度 (aqi/pollutants.py)；latest_station_readings 只存 RECORD_COLUMNS
+READING_COLUMNS = RECORD_COLUMNS + pollutants.COLUMNS
+# 主鍵以外、用來判斷資料是否變更的欄位
+VALUE_COLUMNS = ['AQI', 'StatusId'] + pollutants.COLUMNS
+STATION_COLUMNS = ['SiteId', 'SiteName', 'County', 'Latitude', 'Longitude']
+# API 污染物欄位 -> 資料表欄位；API 未提供的欄位寫入 NULL
+POLLUTANT_COLUMNS = pollutants.API_COLUMNS
+
+# 名稱 -> 代碼與測站屬性的快取；常駐模式跨次執行沿用
+dimensions = DimensionEncoder()
+# 各測站 8 / 24 小時滾動視窗的環形緩衝區；常駐模式跨次執行沿用，啟動時由 station_rolling_windows 載入
+rolling = RollingAggregator()
+
+# --- 遞增即時資料的版本水位，讓 API 回應快取失效 (須與資料寫入在同一個交易中) ---
+BUMP_REALTIME_VERSION_SQL = """
+    INSERT INTO data_versions (name, version) VALUES ('realtime', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
 
 # =====================================================================
 # 2. 核心功能函式
 # =====================================================================
 
-# (get_db_connection 函式維持不變)
-def get_db_connection():
-    """建立並回傳資料庫連線"""
+def get_db_connection(exit_on_error=True):
+    """建立並回傳資料庫連線；常駐模式傳入 exit_on_error=False，連線失敗時拋出例外交由排程重試"""
     try:
         conn = MySQLdb.connect(**DB_CONFIG)
         return conn
     except MySQLdb.Error as e:
         print(f"資料庫連線錯誤: {e}")
+        if not exit_on_error:
+            raise
         sys.exit(1)
 
+def ensure_db_connection(conn):
+    """常駐模式下重複使用同一條連線；連線已中斷時重新建立"""
+    if conn is not None:
+        try:
+            conn.ping()
+            # 結束上一次執行可能殘留的讀取交易，讓這次讀到的水位是最新的快照
+            conn.rollback()
+            return conn
+        except MySQLdb.Error as e:
+            print(f"[!] 資料庫連線已中斷 ({e})，重新連線...")
+            close_quietly(conn)
+    return get_db_connection(exit_on_error=False)
 
-def fetch_recent_data_from_api():
-    """從 API 獲取過去 24 小時的數據"""
-    print("[*] 正在從 API 獲取過去 24 小時的數據...")
-    
-    start_time = (datetime.now() - timedelta(hours=25)).strftime("%Y-%m-%d %H:%M:%S")
-    
-    PARAMS = {
+def close_quietly(conn):
+    try:
+        conn.close()
+    except MySQLdb.Error:
+        pass
+
+def create_http_session():
+    """建立可重複使用的 HTTP session：連線池大小與並行頁數相同，跨次執行沿用已建立的 TLS 連線"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PAGE_CONCURRENCY)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_fetch_start(conn):
+    """以資料庫中各測站的最新資料時間 (水位) 決定本次抓取的起點
+
+    取仍在運作的測站中最舊的水位，再往前 OVERLAP_HOURS 小時；資料庫尚無資料時抓取過去 25 小時。
+    """
+    now = datetime.now()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT MIN(DataCreationDate) FROM latest_station_readings WHERE DataCreationDate >= %s",
+            (now - timedelta(hours=MAX_LOOKBACK_HOURS),)
+        )
+        watermark = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if watermark is None:
+        return now - timedelta(hours=DEFAULT_LOOKBACK_HOURS)
+    return watermark - timedelta(hours=OVERLAP_HOURS)
+
+def fetch_page(session, start_time, offset, limit=PAGE_SIZE, api_url=API_URL):
+    """抓取單一頁 (offset / limit)；連線錯誤、逾時、429 與 5xx 會以指數退避重試"""
+    params = {
         "api_key": API_KEY,
-        "limit": "5000",
-        "sort": "datacreationdate desc",
+        "limit": str(limit),
+        "offset": str(offset),
+        # 由舊到新排序：抓取期間新增的資料只會出現在最後幾頁，不會讓前面的分頁位移
+        "sort": "datacreationdate asc",
         "format": "csv",
-        "filters": f"datacreationdate,GR,{start_time}"
+        "filters": f"datacreationdate,GR,{start_time.strftime('%Y-%m-%d %H:%M:%S')}"
     }
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = session.get(api_url, params=params, timeout=90, verify=False)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+            response.raise_for_status()
+            if not response.text.strip():
+                return pd.DataFrame()
+            return pd.read_csv(io.StringIO(response.text))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+            status = e.response.status_code if e.response is not None else None
+            retryable = status is None or status == 429 or status >= 500
+            if not retryable or attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_BACKOFF_SECONDS * (2 ** attempt)
+            print(f"[!] 第 {offset // limit + 1} 頁請求失敗 ({e})，{delay:g} 秒後重試...")
+            time.sleep(delay)
+
+def fetch_data_since(start_time, session=None, api_url=API_URL, page_size=PAGE_SIZE, concurrency=PAGE_CONCURRENCY):
+    """抓取 start_time 之後的所有資料：先抓第一頁，若已滿則每次同時請求 concurrency 頁，直到出現不滿的一頁
 
+    任一頁在重試後仍失敗即放棄本次抓取 (回傳 None)，避免寫入有缺口的資料後水位越過缺口。
+    """
+    print(f"[*] 正在從 API 獲取 {start_time.strftime('%Y-%m-%d %H:%M:%S')} 之後的數據...")
+    session = session or requests.Session()
     try:
-        # v-- 2. 在 requests.get 中新增 verify=False 參數 --v
-        response = requests.get(API_URL, params=PARAMS, timeout=90, verify=False)
-        response.raise_for_status()
-        if not response.text:
-            print("[!] API 回傳內容為空。")
-            return None
-        
-        csv_data = io.StringIO(response.text)
-        df = pd.read_csv(csv_data)
-        print(f"[+] 成功獲取 {len(df)} 筆原始記錄。")
-        return df
+        pages = [fetch_page(session, start_time, 0, page_size, api_url)]
+        if len(pages[0]) >= page_size:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                next_offset = page_size
+                while True:
+                    offsets = [next_offset + i * page_size for i in range(concurrency)]
+                    batch = list(pool.map(lambda offset: fetch_page(session, start_time, offset, page_size, api_url), offsets))
+                    pages.extend(batch)
+                    if any(len(page) < page_size for page in batch):
+                        break
+                    next_offset = offsets[-1] + page_size
     except requests.exceptions.RequestException as e:
         print(f"API 請求失敗: {e}")
         return None
 
-# (clean_and_prepare_data 和 upsert_data_to_db 函式維持不變)
+    pages = [page for page in pages if not page.empty]
+    if not pages:
+        print("[!] API 沒有回傳新的數據。")
+        return pd.DataFrame()
+    df = pd.concat(pages, ignore_index=True)
+    print(f"[+] 成功獲取 {len(df)} 筆原始記錄 (共 {len(pages)} 頁)。")
+    return df
+
 def clean_and_prepare_data(df):
     """清理 DataFrame 並將欄位名稱標準化為我們統一的 PascalCase 格式"""
     print("[*] 正在清理、轉換並標準化數據...")
@@ -89,58 +234,447 @@ def clean_and_prepare_data(df):
     for raw_col in column_rename_map.keys():
         if raw_col not in df.columns:
             print(f"[!] 警告：API 回傳資料中缺少欄位 '{raw_col}'，將會被忽略。")
-    df.rename(columns=column_rename_map, inplace=True)
-    required_cols = list(column_rename_map.values())
+    df.rename(columns={**column_rename_map, **POLLUTANT_COLUMNS}, inplace=True)
+    required_cols = list(column_rename_map.values()) + list(POLLUTANT_COLUMNS.values())
     existing_required_cols = [col for col in required_cols if col in df.columns]
     df = df[existing_required_cols].copy()
     if 'DataCreationDate' in df.columns:
         df['DataCreationDate'] = pd.to_datetime(df['DataCreationDate'], errors='coerce')
-    numeric_cols = ['AQI', 'Latitude', 'Longitude', 'SiteId']
+    numeric_cols = ['AQI', 'Latitude', 'Longitude', 'SiteId'] + list(POLLUTANT_COLUMNS.values())
     for col in numeric_cols:
         if col in df.columns:
             df[col] = df[col].replace('nan', None)
             df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in POLLUTANT_COLUMNS.values():
+        if col not in df.columns:
+            df[col] = None
+            continue
+        # 超出 DECIMAL 欄位範圍或為負值的讀數視為異常值；範圍以四捨五入後的值判斷 (9999.96 會進位為 10000.0)
+        rounded = df[col].round(pollutants.decimals(col))
+        valid = (df[col] >= 0) & (rounded < pollutants.upper_bound(col))
+        df[col] = rounded.where(valid)
     df.dropna(subset=['SiteId', 'DataCreationDate'], inplace=True)
-    df = df.where(pd.notnull(df), None)
+    # 分頁期間資料可能位移而重複出現，同一個 (SiteId, DataCreationDate) 只保留最後一筆
+    df.drop_duplicates(subset=['SiteId', 'DataCreationDate'], keep='last', inplace=True)
+    # 轉為 object 欄位才能以 None 取代 NaN (數值欄位的 where 會保留 NaN)，寫入資料庫時即為 NULL
+    df = df.astype(object).where(pd.notnull(df), None)
     print(f"[+] 清理後剩餘 {len(df)} 筆有效記錄。")
     return df
 
-def upsert_data_to_db(df, conn):
-    """使用 REPLACE INTO 將標準化後的數據更新或插入到資料庫"""
+def _row_key(site_id, data_creation_date):
+    if isinstance(data_creation_date, pd.Timestamp):
+        data_creation_date = data_creation_date.to_pydatetime()
+    return int(site_id), data_creation_date
+
+def _row_values(values):
+    """將可比較欄位正規化，避免 Decimal / float / int 的型別差異被誤判為變更"""
+    aqi, status_id, *concentrations = values
+    return (None if aqi is None else int(aqi), None if status_id is None else int(status_id),
+            *(pollutants.normalize(column, value) for column, value in zip(pollutants.COLUMNS, concentrations)))
+
+def _text(value):
+    """NaN 與空字串視為 None"""
+    return value if isinstance(value, str) and value else None
+
+def encode_dimensions(df, conn, cursor):
+    """更新 stations 維度表並在 df 加上 StatusId 欄位；維度資料在獨立的交易中先行提交，回傳寫入的測站數
+
+    測站屬性以本批次中各測站最新的一筆為準。
+    """
+    try:
+        latest_df = df.sort_values('DataCreationDate').groupby('SiteId', sort=False).tail(1)
+        stations = [(site_id, _text(site_name), _text(county), latitude, longitude)
+                    for site_id, site_name, county, latitude, longitude in latest_df[STATION_COLUMNS].itertuples(index=False)]
+        written = dimensions.register_stations(cursor, stations)
+        status_ids = dimensions.status_codes(cursor, [_text(status) for status in df['Status']])
+        # object 欄位保留 None (數值欄位會轉成 NaN)
+        df['StatusId'] = pd.Series(status_ids, index=df.index, dtype=object)
+        conn.commit()
+        return written
+    except MySQLdb.Error:
+        dimensions.invalidate()
+        raise
+
+def update_rolling_windows(df, cursor):
+    """將本批次的每一筆讀數 (含未變更的列) 放入滾動視窗，並在呼叫端的交易中寫入統計有變更的測站；回傳其 SiteId 清單"""
+    metrics = [metric for metric in ROLLING_METRICS if metric in df.columns]
+    readings = [(*_row_key(site_id, moment), dict(zip(metrics, values)))
+                for site_id, moment, *values in df[['SiteId', 'DataCreationDate'] + metrics].itertuples(index=False)]
+    return rolling.update(cursor, readings)
+
+def _existing_rows(cursor, table, site_ids, start, end=None):
+    """table 中這些測站 [start, end] 的讀數：{(SiteId, DataCreationDate): 正規化後的值}"""
+    # SiteId IN (...) + 時間範圍可走主鍵 (SiteId, DataCreationDate) 的範圍掃描
+    sql = (f"SELECT SiteId, DataCreationDate, {', '.join(VALUE_COLUMNS)} FROM {table} "
+           f"WHERE SiteId IN ({', '.join(['%s'] * len(site_ids))}) AND DataCreationDate >= %s")
+    params = (*site_ids, start)
+    if end is not None:
+        sql += " AND DataCreationDate <= %s"
+        params += (end,)
+    cursor.execute(sql, params)
+    return {_row_key(row[0], row[1]): _row_values(row[2:]) for row in cursor.fetchall()}
+
+def classify_changes(df, cursor):
+    """與資料庫中相同 (SiteId, DataCreationDate) 的資料比對，回傳 (需寫入的 DataFrame, 新增數, 變更數, 未變更數)
+
+    水位被停擺的測站拉低時 (最多 MAX_LOOKBACK_HOURS)，抓取範圍會早於 compact_records.py 的保留期限，
+    這段讀數已搬到 historical_aqi_analysis：熱表中找不到的列再與歷史資料表比對，
+    內容相同的列不會被當成新資料重新寫入熱表。
+    """
+    site_ids = sorted({int(site_id) for site_id in df['SiteId']})
+    existing = _existing_rows(cursor, 'air_quality_records', site_ids, df['DataCreationDate'].min().to_pydatetime())
+    keys = [_row_key(site_id, moment) for site_id, moment in zip(df['SiteId'], df['DataCreationDate'])]
+    missing = [key for key in keys if key not in existing]
+    if missing:
+        # 一般情況只有最新一兩個小時不在熱表中，歷史資料表的範圍掃描通常沒有結果
+        compacted = _existing_rows(cursor, 'historical_aqi_analysis', sorted({site_id for site_id, _ in missing}),
+                                   min(moment for _, moment in missing), max(moment for _, moment in missing))
+        existing = {**compacted, **existing}
+
+    is_new, is_changed = [], []
+    for row in df[['SiteId', 'DataCreationDate'] + VALUE_COLUMNS].itertuples(index=False):
+        current = existing.get(_row_key(row[0], row[1]))
+        is_new.append(current is None)
+        is_changed.append(current is not None and current != _row_values(row[2:]))
+
+    is_new = pd.Series(is_new, index=df.index)
+    is_changed = pd.Series(is_changed, index=df.index)
+    new_count, changed_count = int(is_new.sum()), int(is_changed.sum())
+    return df[is_new | is_changed], new_count, changed_count, len(df) - new_count - changed_count
+
+def upsert_data_to_db(df, conn, timer=None):
+    """只將新增或內容有變更的列寫入資料庫 (INSERT ... ON DUPLICATE KEY UPDATE)，並同步更新最新讀數快照表
+
+    回傳 {'new', 'changed', 'skipped'} 筆數；寫入失敗時回傳 None。timer 記錄 dimensions / classify / rolling / write / columnar 階段的耗時。
+    """
+    timer = timer or StageTimer('upsert')
+    cursor = conn.cursor()
+    sql = f"""
+        INSERT INTO air_quality_records ({', '.join(READING_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(READING_COLUMNS))})
+        ON DUPLICATE KEY UPDATE {', '.join(f'{col} = VALUES({col})' for col in VALUE_COLUMNS)}
+    """
+    try:
+        df = df.copy()
+        with timer.stage('dimensions') as stage:
+            stations_written = encode_dimensions(df, conn, cursor)
+            stage.count = stations_written
+        with timer.stage('classify') as stage:
+            changes_df, new_count, changed_count, skipped_count = classify_changes(df, cursor)
+            stage.count = len(df)
+        with timer.stage('rolling') as stage:
+            rolling_sites = update_rolling_windows(df, cursor)
+            stage.count = len(rolling_sites)
+        counts = {'new': new_count, 'changed': changed_count, 'skipped': skipped_count}
+        if changes_df.empty:
+            if stations_written or rolling_sites:
+                # 只有測站屬性或滾動視窗變更：仍需遞增版本水位，API 才會重新載入
+                cursor.execute(BUMP_REALTIME_VERSION_SQL)
+                conn.commit()
+                print(f"[+] 讀數皆未變更 (略過 {skipped_count} 筆)，已更新 {stations_written} 個測站的屬性、"
+                      f"{len(rolling_sites)} 個測站的滾動視窗。")
+                return counts
+            # 沒有任何變更時不遞增版本水位，API 快取與瀏覽器的 ETag 都維持有效
+            conn.rollback()
+            print(f"[+] 資料皆未變更：新增 0、變更 0、略過 {skipped_count} 筆。")
+            return counts
+
+        with timer.stage('write') as stage:
+            cursor.executemany(sql, [tuple(x) for x in changes_df[READING_COLUMNS].to_numpy()])
+            upsert_latest_readings(changes_df, cursor)
+            cursor.execute(BUMP_REALTIME_VERSION_SQL)
+            conn.commit()
+            stage.count = len(changes_df)
+        print(f"[+] 成功！新增 {new_count}、變更 {changed_count}、未變更略過 {skipped_count} 筆"
+              f"{f'，更新 {stations_written} 個測站' if stations_written else ''}，"
+              f"滾動視窗更新 {len(rolling_sites)} 個測站。")
+        with timer.stage('columnar'):
+            update_columnar_store(changes_df, conn, cursor)
+        return counts
+    except MySQLdb.Error as e:
+        print(f"資料庫寫入錯誤: {e}")
+        conn.rollback()
+        # 記憶體中的緩衝區已包含未提交的讀數，下次執行時由資料表重新載入
+        rolling.invalidate()
+        return None
+    finally:
+        cursor.close()
+
+def update_columnar_store(df, conn, cursor):
+    """已建立歷史欄式儲存 (aqi/columnar.py) 時附加本次寫入的讀數，並遞增歷史資料版本讓 API 快取失效"""
+    try:
+        written = append_frame(df)
+    except (OSError, StoreConflict) as e:
+        print(f"[!] 更新欄式儲存失敗，可執行 'python scripts/columnar_store.py --build' 重建: {e}")
+        return
+    if written is None:
+        return
+    try:
+        cursor.execute(BUMP_HISTORICAL_VERSION_SQL)
+        conn.commit()
+    except MySQLdb.Error as e:
+        # 即時資料已提交，版本水位未遞增只會讓歷史分析的快取延後更新
+        print(f"[!] 遞增歷史資料版本失敗: {e}")
+        conn.rollback()
+    print(f"[+] 欄式儲存已附加 {written} 筆讀數。")
+
+def upsert_latest_readings(df, cursor):
+    """將本批次中每個測站最新的一筆讀數寫入 latest_station_readings (每站僅一列)"""
+    latest_df = df.sort_values('DataCreationDate').groupby('SiteId', sort=False).tail(1)
+    # ON DUPLICATE KEY UPDATE 由左至右賦值，DataCreationDate 必須放在最後，
+    # 前面的欄位才能以「舊的」時間判斷這筆資料是否真的比較新。
+    sql = """
+        INSERT INTO latest_station_readings (SiteId, DataCreationDate, AQI, StatusId)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            AQI      = IF(VALUES(DataCreationDate) >= DataCreationDate, VALUES(AQI), AQI),
+            StatusId = IF(VALUES(DataCreationDate) >= DataCreationDate, VALUES(StatusId), StatusId),
+            DataCreationDate = GREATEST(VALUES(DataCreationDate), DataCreationDate)
+    """
+    cursor.executemany(sql, [tuple(x) for x in latest_df[RECORD_COLUMNS].to_numpy()])
+    print(f"[+] 最新讀數快照表已更新 {len(latest_df)} 個測站。")
+
+def backfill_latest_readings(conn):
+    """一次性作業：從 air_quality_records 既有資料重建 latest_station_readings"""
+    print("[*] 正在從 air_quality_records 回填最新讀數快照表...")
     cursor = conn.cursor()
     sql = """
-        REPLACE INTO air_quality_records 
-        (SiteId, SiteName, County, AQI, Status, DataCreationDate, Latitude, Longitude) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        REPLACE INTO latest_station_readings (SiteId, DataCreationDate, AQI, StatusId)
+        SELECT SiteId, DataCreationDate, AQI, StatusId
+        FROM (
+            SELECT *, ROW_NUMBER() OVER(PARTITION BY SiteId ORDER BY DataCreationDate DESC) as rn
+            FROM air_quality_records
+        ) AS ranked
+        WHERE rn = 1
     """
-    records_to_insert = [tuple(x) for x in df[['SiteId', 'SiteName', 'County', 'AQI', 'Status', 'DataCreationDate', 'Latitude', 'Longitude']].to_numpy()]
     try:
-        cursor.executemany(sql, records_to_insert)
+        cursor.execute(sql)
+        cursor.execute(BUMP_REALTIME_VERSION_SQL)
         conn.commit()
-        print(f"[+] 成功！共 {cursor.rowcount} 筆記錄已同步至資料庫。")
+        cursor.execute("SELECT COUNT(*) FROM latest_station_readings")
+        print(f"[+] 回填完成！快照表目前共有 {cursor.fetchone()[0]} 個測站。")
     except MySQLdb.Error as e:
-        print(f"資料庫寫入錯誤: {e}")
+        print(f"回填快照表失敗: {e}")
         conn.rollback()
     finally:
         cursor.close()
 
 
 # =====================================================================
-# 3. 主程式執行區 (維持不變)
+# 3. 主程式執行區
 # =====================================================================
-if __name__ == "__main__":
+def run_crawl(session=None, conn=None, timer=None):
+    """執行一次完整的 ETL：讀取水位、抓取、清理、寫入
+
+    可傳入既有的 HTTP session 與資料庫連線重複使用；回傳 {'fetched', 'new', 'changed', 'skipped'}，失敗時回傳 None。
+    各階段耗時記錄於 timer (未傳入時建立新的)，並累計到 stage_timer。
+    """
     print(f"\n===== 開始執行 ETL 爬蟲 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) =====")
-    
-    raw_df = fetch_recent_data_from_api()
-    
-    if raw_df is not None and not raw_df.empty:
-        cleaned_df = clean_and_prepare_data(raw_df)
-        
-        if cleaned_df is not None and not cleaned_df.empty:
+
+    timer = timer or StageTimer('crawl')
+    own_conn = conn is None
+    db_conn = get_db_connection() if own_conn else conn
+    result = None
+    try:
+        with timer.stage('watermark'):
+            start_time = get_fetch_start(db_conn)
+        with timer.stage('fetch') as stage:
+            raw_df = fetch_data_since(start_time, session=session)
+            stage.count = len(raw_df) if raw_df is not None else 0
+
+        if raw_df is not None:
+            result = {'fetched': len(raw_df), 'new': 0, 'changed': 0, 'skipped': 0}
+            with timer.stage('clean') as stage:
+                cleaned_df = clean_and_prepare_data(raw_df) if not raw_df.empty else raw_df
+                stage.count = len(cleaned_df)
+            if not cleaned_df.empty:
+                counts = upsert_data_to_db(cleaned_df, db_conn, timer)
+                result = {**result, **counts} if counts is not None else None
+            if result is not None:
+                print(f"[*] 本次統計：抓取 {result['fetched']}、新增 {result['new']}、"
+                      f"變更 {result['changed']}、略過 {result['skipped']} 筆。")
+    finally:
+        if own_conn:
+            db_conn.close()
+            print("[*] 資料庫連線已關閉。")
+        stage_timer.merge(timer)
+        print(f"[*] 各階段耗時：{timer.describe()}")
+
+    print(f"===== ETL 爬蟲執行完畢 =====\n")
+    return result
+
+# --- 常駐模式 (--daemon) ---
+def next_scheduled_run(now):
+    """下一個排程時間：下一個整點的第 SCHEDULE_MINUTE 分鐘 (若本小時尚未到達則為本小時) 加上隨機延遲"""
+    slot = now.replace(minute=SCHEDULE_MINUTE, second=0, microsecond=0)
+    if slot <= now:
+        slot += timedelta(hours=1)
+    return slot + timedelta(seconds=random.uniform(0, SCHEDULE_JITTER_SECONDS))
+
+def retry_delay(failures):
+    """連續失敗 failures 次後的等待秒數 (指數退避，上限 RUN_RETRY_MAX_SECONDS)"""
+    return min(RUN_RETRY_BASE_SECONDS * (2 ** (failures - 1)), RUN_RETRY_MAX_SECONDS)
+
+def notify_dashboard(session):
+    """通知儀表板 API 即時資料已更新，讓回應快取立即重新讀取版本水位 (失敗不影響爬蟲)"""
+    if not NOTIFY_URL:
+        return
+    if not NOTIFY_TOKEN:
+        print("[!] 已設定 DASHBOARD_NOTIFY_URL 但未設定 DASHBOARD_NOTIFY_TOKEN，API 會拒絕通知，略過。")
+        return
+    try:
+        response = session.post(NOTIFY_URL, headers={'X-Notify-Token': NOTIFY_TOKEN}, timeout=5)
+        response.raise_for_status()
+        print("[+] 已通知儀表板 API 更新快取。")
+    except requests.exceptions.RequestException as e:
+        print(f"[!] 通知儀表板 API 失敗: {e}")
+
+def create_compaction_engine():
+    """冷熱分層使用 SQLAlchemy (與 rollups.py 共用 SQL)，以爬蟲相同的 MySQLdb 連線設定建立"""
+    return create_engine('mysql+mysqldb://', creator=lambda: MySQLdb.connect(**DB_CONFIG), pool_pre_ping=True)
+
+def run_compaction(engine):
+    """搬移超過保留期限的即時資料到歷史資料表；回傳 {'finished', 'moved'}，失敗時回傳 None (下次排程重試)"""
+    try:
+        with stage_timer.stage('compaction') as stage:
+            stats = compact(engine)
+            stage.count = stats['moved']
+    except Exception as e:
+        print(f"[!] 冷熱分層失敗，將於下次執行時重試: {e}")
+        return None
+    print(f"[+] 冷熱分層：已將 {stats['moved']} 筆早於 {_timestamp(stats['cutoff'])} 的即時資料搬移到歷史資料表。")
+    return {'finished': _timestamp(datetime.now()), 'moved': stats['moved']}
+
+def write_status(status, path=STATUS_FILE):
+    """將執行狀態寫入 JSON 檔 (先寫暫存檔再取代，讀取端不會讀到寫一半的內容)"""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[!] 無法寫入狀態檔 {path}: {e}")
+
+def _timestamp(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+def run_daemon():
+    """常駐執行：沿用同一個 HTTP session 與資料庫連線，依排程重複執行 run_crawl，直到收到 Ctrl+C / SIGTERM
+
+    啟動時立即執行一次；之後對齊每小時的發布時間。整次執行失敗時以指數退避重試，
+    但不會晚於下一個排程時間。設定 CRAWLER_COMPACT_INTERVAL_HOURS 時，成功執行後每隔該時數
+    在同一行程內搬移超過保留期限的即時資料 (compact_records.py)。
+    """
+    stop_event = threading.Event()
+    def request_stop(signum, frame):
+        print("\n[*] 收到停止訊號，將在目前的執行結束後離開...")
+        stop_event.set()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    session = create_http_session()
+    conn = None
+    failures = 0
+    compaction_engine = create_compaction_engine() if COMPACT_INTERVAL_HOURS > 0 else None
+    next_compaction = datetime.now()
+    status = {
+        'pid': os.getpid(), 'started_at': _timestamp(datetime.now()), 'state': 'starting',
+        'last_run_started': None, 'last_run_finished': None, 'last_duration_seconds': None,
+        'last_result': None, 'last_error': None, 'last_counts': None, 'last_success': None,
+        'consecutive_failures': 0, 'next_run': None, 'last_stages': None, 'last_compaction': None,
+    }
+    next_run = datetime.now()
+    print(f"[*] 爬蟲常駐模式啟動：每小時第 {SCHEDULE_MINUTE} 分鐘執行 (隨機延遲 0~{SCHEDULE_JITTER_SECONDS} 秒)，"
+          f"狀態檔 {STATUS_FILE}")
+
+    try:
+        while not stop_event.is_set():
+            status.update(state='retrying' if failures else 'waiting', next_run=_timestamp(next_run))
+            write_status(status)
+            if stop_event.wait(max(0.0, (next_run - datetime.now()).total_seconds())):
+                break
+
+            started = datetime.now()
+            status.update(state='running', last_run_started=_timestamp(started))
+            write_status(status)
+            start_time = time.perf_counter()
+            result, error = None, None
+            run_timer = StageTimer('crawl')
+            try:
+                conn = ensure_db_connection(conn)
+                result = run_crawl(session=session, conn=conn, timer=run_timer)
+                if result is None:
+                    error = 'API 請求或資料庫寫入失敗'
+            except MySQLdb.Error as e:
+                error = f"資料庫錯誤: {e}"
+                print(f"[!] {error}")
+                if conn is not None:
+                    close_quietly(conn)
+                conn = None
+            except Exception as e:
+                # 常駐模式不因單次執行的非預期錯誤而結束，交由下一次排程重試
+                error = f"未預期的錯誤: {e}"
+                print(f"[!] {error}")
+
+            status.update(
+                last_run_finished=_timestamp(datetime.now()),
+                last_duration_seconds=round(time.perf_counter() - start_time, 2),
+                last_result='success' if result is not None else 'failed',
+                last_error=error,
+                last_stages=run_timer.summary()['stages'],
+            )
+            if result is not None:
+                failures = 0
+                status.update(last_counts=result, last_success=status['last_run_finished'], consecutive_failures=0)
+                if result['new'] or result['changed']:
+                    notify_dashboard(session)
+                if compaction_engine is not None and datetime.now() >= next_compaction:
+                    compaction = run_compaction(compaction_engine)
+                    if compaction is not None:
+                        status['last_compaction'] = compaction
+                        next_compaction = datetime.now() + timedelta(hours=COMPACT_INTERVAL_HOURS)
+                        if compaction['moved']:
+                            notify_dashboard(session)
+                next_run = next_scheduled_run(datetime.now())
+            else:
+                failures += 1
+                status['consecutive_failures'] = failures
+                now = datetime.now()
+                next_run = min(now + timedelta(seconds=retry_delay(failures)), next_scheduled_run(now))
+                print(f"[!] 第 {failures} 次連續失敗，{_timestamp(next_run)} 重試。")
+    finally:
+        if conn is not None:
+            close_quietly(conn)
+        if compaction_engine is not None:
+            compaction_engine.dispose()
+        session.close()
+        status.update(state='stopped', next_run=None)
+        write_status(status)
+        print("[*] 爬蟲常駐模式已停止。")
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='AQI 即時資料爬蟲')
+    parser.add_argument('--backfill-latest', action='store_true',
+                        help='一次性作業：以 air_quality_records 既有資料回填 latest_station_readings。')
+    parser.add_argument('--daemon', action='store_true',
+                        help='常駐執行：沿用 HTTP session 與資料庫連線，每小時對齊資料發布時間自動抓取。')
+    parser.add_argument('--summary-json',
+                        help='結束時將各階段 (watermark / fetch / clean / dimensions / classify / rolling / write / columnar) 的累計筆數與秒數寫入此 JSON 檔。')
+    args = parser.parse_args()
+
+    try:
+        if args.daemon:
+            run_daemon()
+        elif args.backfill_latest:
             db_conn = get_db_connection()
-            if db_conn:
-                upsert_data_to_db(cleaned_df, db_conn)
-                db_conn.close()
-                print("[*] 資料庫連線已關閉。")
-    
-    print(f"===== ETL 爬蟲執行完畢 =====\n")
\ No newline at end of file
+            backfill_latest_readings(db_conn)
+            db_conn.close()
+        else:
+            run_crawl()
+    finally:
+        if args.summary_json:
+            stage_timer.write_summary(args.summary_json, mode='daemon' if args.daemon else 'once')
+
+if __name__ == "__main__":
+    main()
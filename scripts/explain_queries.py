@@ -0,0 +1,70 @@
+# =============================================================================
+# AQI API 查詢執行計畫檢查工具
+#
+# 對 aqi/queries.py 中每個 API 查詢，以及 rollups.py 讀取原始逐時資料的查詢
+# 執行 EXPLAIN，確認是否使用索引 (key)、掃描了哪些分區 (partitions) 與預估列數 (rows)。
+#
+# 使用說明:
+#    python explain_queries.py --county 臺北市 --year 2024 --site-id 12
+# =============================================================================
+
+import sys
+import argparse
+from datetime import date
+from sqlalchemy import text
+from import_lean_data import create_db_engine, PROJECT_ROOT
+from rollups import SITE_DAILY_SQL
+
+sys.path.insert(0, PROJECT_ROOT)
+from aqi import queries
+
+# 只顯示判斷是否全表掃描所需的欄位 (MySQL 與 MariaDB 的 EXPLAIN 欄位略有差異)
+EXPLAIN_COLUMNS = ['table', 'partitions', 'type', 'possible_keys', 'key', 'rows', 'Extra']
+
+
+def explain(conn, name, sql, params):
+    """執行 EXPLAIN 並以表格形式印出結果；type 為 ALL 代表全表掃描"""
+    result = conn.execute(text(f"EXPLAIN {sql}"), params)
+    columns = [c for c in EXPLAIN_COLUMNS if c in result.keys()]
+    rows = [dict(zip(result.keys(), row)) for row in result]
+    print(f"\n=== {name} ===")
+    print(" | ".join(columns))
+    for row in rows:
+        print(" | ".join(str(row.get(c)) for c in columns))
+        if row.get('type') == 'ALL':
+            print(f"    [!] 警告：{row.get('table')} 為全表掃描")
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='印出每個 API 查詢的 EXPLAIN 執行計畫')
+    parser.add_argument('--county', default='臺北市', help='查詢用的縣市 (預設: 臺北市)')
+    parser.add_argument('--year', type=int, default=date.today().year - 1, help='查詢用的年份 (預設: 去年)')
+    parser.add_argument('--site-id', type=int, default=1, help='測站序列查詢用的 SiteId (預設: 1)')
+    args = parser.parse_args()
+
+    engine = create_db_engine()
+    if not engine: return
+
+    start, end = queries.year_range(args.year)
+    with engine.connect() as conn:
+        # 即時資料查詢以 CountyId 篩選 (見 aqi/dimensions.py)
+        county_id = conn.execute(text("SELECT CountyId FROM counties WHERE Name = :name"), {"name": args.county}).scalar()
+    params = {
+        "county_param": args.county,
+        "county": args.county,
+        "county_id": county_id,
+        "year_param": args.year,
+        "previous_year_param": args.year - 1,
+        "start": start,
+        "end": end,
+        "site_id": args.site_id,
+        "limit": 1000,
+    }
+    with engine.connect() as conn:
+        for name, query in queries.ENDPOINT_QUERIES.items():
+            explain(conn, name, query.text.strip().rstrip(';'), params)
+        # 重算彙總表時對原始資料表的查詢，應只掃描單一年份分區
+        explain(conn, 'rollups/site-daily (historical_aqi_analysis)', SITE_DAILY_SQL.strip(), params)
+
+if __name__ == '__main__':
+    main()
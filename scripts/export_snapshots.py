@@ -0,0 +1,143 @@
+# =============================================================================
+# 歷史分析 API 靜態快照匯出工具 (aqi/snapshots.py)
+#
+# 對每個縣市 / 年份預先產生歷史分析 API 的回應 (JSON + gzip + brotli)，
+# dashboard_api.py / dashboard_asgi.py 於 HISTORICAL_SNAPSHOTS=1 時直接回傳這些檔案，
+# 也可部署在 nginx 等靜態檔案伺服器之後 (見 README)，歷史分析流量完全不需查詢 MySQL。
+#
+# 每個回應的「輸入」為它讀取的 rollup_county_monthly / rollup_county_yearly 列 (依縣市、年份分組)
+# 的雜湊；輸入未變的回應直接沿用上一版的檔案，不重新查詢也不重新壓縮。
+# 已匯出過快照 (或 HISTORICAL_SNAPSHOTS=1) 時，import_lean_data.py、rollups.py 與
+# compact_records.py 更新彙總表後會自動重新匯出。
+#
+# 使用說明:
+# 1. 匯出 (只重新產生輸入有變更的回應):
+#    python export_snapshots.py
+#
+# 2. 全部重新產生:
+#    python export_snapshots.py --force
+# =============================================================================
+
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+from collections import defaultdict
+from sqlalchemy import text
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from aqi import queries, responses
+from aqi.serialization import RowSerializer, COLUMN_MAPPING, dumps
+from aqi.snapshots import SnapshotWriter, default_snapshot_dir, read_pointer, snapshot_key, available_encodings
+
+# 回應格式改變時遞增，讓所有快照重新產生
+RENDER_VERSION = 1
+KEEP_VERSIONS = int(os.getenv('SNAPSHOT_KEEP_VERSIONS', 2))
+
+# 每個縣市、年份的彙總列；歷史分析 API 只讀取這兩張表
+INPUT_SQL = {
+    'monthly': "SELECT County, Year, Month, AqiSum, AqiCount, GoodDays, ModerateDays, UnhealthyDays "
+               "FROM rollup_county_monthly ORDER BY County, Year, Month",
+    'yearly': "SELECT County, Year, AqiSum, AqiCount, GoodDays, ModerateDays, UnhealthyDays "
+              "FROM rollup_county_yearly ORDER BY County, Year",
+}
+
+row_serializer = RowSerializer(COLUMN_MAPPING)
+
+
+def snapshots_enabled():
+    """HISTORICAL_SNAPSHOTS=1 或已匯出過快照時，彙總表更新後需一併重新匯出"""
+    return os.getenv('HISTORICAL_SNAPSHOTS') == '1' or read_pointer(default_snapshot_dir()) is not None
+
+def load_input_cells(conn):
+    """回傳 ({(縣市, 年份): 雜湊}, 縣市清單, 年份清單)"""
+    cells = defaultdict(hashlib.sha256)
+    for table, sql in INPUT_SQL.items():
+        for row in conn.execute(text(sql)):
+            cells[(row[0], int(row[1]))].update(repr((table,) + tuple(str(value) for value in row[2:])).encode('utf-8'))
+    hashes = {cell: digest.hexdigest() for cell, digest in cells.items()}
+    return hashes, sorted({county for county, _ in hashes}), sorted({year for _, year in hashes})
+
+def iter_requests(counties, years):
+    """(端點, 請求參數, 查詢, 查詢參數, 組裝回應, 讀取的 (縣市, 年份) 條件) ；與 dashboard_api.py 的路由一致"""
+    for county in counties:
+        by_county = lambda cell, county=county: cell[0] == county
+        yield ('annual-trend', {'county': county}, queries.ANNUAL_TREND, {"county_param": county}, None, by_county)
+        yield ('seasonal-trend', {'county': county}, queries.SEASONAL_TREND, {"county_param": county},
+               responses.seasonal_trend, by_county)
+        for year in years:
+            params = {'county': county, 'year': str(year)}
+            yield ('monthly-distribution', params, queries.MONTHLY_DISTRIBUTION,
+                   {"county_param": county, "year_param": str(year)}, responses.monthly_distribution,
+                   lambda cell, county=county, year=year: cell == (county, year))
+            yield ('unhealthy-days-count', params, queries.UNHEALTHY_DAYS_COUNT,
+                   {"county_param": county, "year_param": year, "previous_year_param": year - 1},
+                   lambda rows, year=year: responses.unhealthy_days_summary(rows, year),
+                   lambda cell, county=county, year=year: cell[0] == county and cell[1] in (year, year - 1))
+            yield ('county-report', params, queries.COUNTY_REPORT, {"county_param": county},
+                   lambda rows, year=year: responses.county_report(rows, year), by_county)
+    for year in years:
+        yield ('annual-map', {'year': str(year)}, queries.ANNUAL_MAP, {"year_param": str(year)}, None,
+               lambda cell, year=year: cell[1] == year)
+
+def input_hash(name, cells, matches):
+    digest = hashlib.sha256(f"{RENDER_VERSION}:{name}:{','.join(available_encodings())}".encode('utf-8'))
+    for cell in sorted(cell for cell in cells if matches(cell)):
+        digest.update(f"{cell}={cells[cell]}".encode('utf-8'))
+    return digest.hexdigest()
+
+def export_snapshots(engine, path=None, force=False):
+    """匯出所有歷史分析回應並換上新版本；回傳 {'version', 'entries', 'reused', 'rendered', 'unchanged'}"""
+    started = time.perf_counter()
+    writer = SnapshotWriter(path)
+    if force:
+        writer.previous = {}
+    try:
+        with engine.connect() as conn:
+            cells, counties, years = load_input_cells(conn)
+            for name, params, sql, sql_params, build, matches in iter_requests(counties, years):
+                request_path = f"/api/historical/{name}"
+                inputs = input_hash(name, cells, matches)
+                if writer.reuse(snapshot_key(request_path, params), inputs):
+                    continue
+                rows = row_serializer.records(conn.execute(sql, sql_params))
+                writer.add(request_path, params, inputs, dumps(build(rows) if build else rows))
+        version = writer.commit(KEEP_VERSIONS)
+    except Exception:
+        writer.discard()
+        raise
+    stats = {'version': version, 'entries': len(writer.entries), **writer.stats}
+    logging.info(f"靜態快照 {version}：{stats['entries']} 個回應 (重新產生 {stats['rendered']}、"
+                 f"內容未變 {stats['unchanged']}、沿用 {stats['reused']})，"
+                 f"{len(counties)} 個縣市 x {len(years)} 年，耗時 {time.perf_counter() - started:.1f} 秒。")
+    return stats
+
+def export_if_enabled(engine):
+    """彙總表更新後呼叫；未啟用快照時不做任何事，失敗時只記錄錯誤"""
+    if not snapshots_enabled():
+        return None
+    try:
+        return export_snapshots(engine)
+    except Exception as e:
+        logging.error(f"匯出靜態快照失敗，請稍後執行 'python export_snapshots.py': {e}")
+        return None
+
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='歷史分析 API 靜態快照匯出工具')
+    parser.add_argument('--force', action='store_true', help='忽略上一版，全部重新查詢與壓縮。')
+    parser.add_argument('--output', help=f'快照目錄 (預設: SNAPSHOT_DIR 或 {default_snapshot_dir()})')
+    args = parser.parse_args()
+
+    # 沿用匯入工具的 .env 載入與連線設定
+    from import_lean_data import create_db_engine
+    engine = create_db_engine()
+    if not engine: return
+    export_snapshots(engine, args.output, args.force)
+
+if __name__ == '__main__':
+    main()
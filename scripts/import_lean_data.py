@@ -7,19 +7,67 @@
 # 1. 第一階段 (資料檢查):
 #    python import_lean_data.py --check
 #
-# 2. 第二階段 (資料匯入):
+# 2. 第二階段 (資料匯入，完成後會自動重建 rollup_* 彙總表並重寫匯入清單):
 #    python import_lean_data.py --import
+#
+#    預設先載入影子資料表 (historical_aqi_analysis_shadow)，載入完成後才建立次要索引，
+#    再以 RENAME TABLE 一次性換上線；匯入期間儀表板仍讀取舊資料。正式資料表中匯入檔案沒有的列
+#    (compact_records.py 搬入的爬蟲資料) 在切換前複製過去，期間暫停冷熱分層。載入方式 (--method):
+#      values   : 多列 VALUES 的 INSERT，每個語句依位元組數分批 (預設)
+#      infile   : 先寫入暫存 TSV 檔再以 LOAD DATA LOCAL INFILE 載入
+#                 (MySQL 伺服器需開啟 local_infile)
+#      in-place : 舊的作法，直接清空正式資料表後逐批 INSERT，可用來比較吞吐量
+#
+# 3. 增量匯入 (只處理新增或內容變更的檔案，中斷後重新執行即從上次進度繼續):
+#    python import_lean_data.py --incremental
+#    依 import_manifest 資料表比對每個檔案的大小 / 修改時間 / 內容雜湊 (見 import_manifest.py)；
+#    每一批紀錄以 INSERT ... ON DUPLICATE KEY UPDATE 逐列取代相同 (SiteId, DataCreationDate) 的舊資料
+#    (與檔案內的排列順序、檔案之間的時間重疊無關)，並只重算受影響日期的彙總表。
+#    從檔案中移除的紀錄不會被刪除，需要完全同步時請改用 --import。
+#
+# 處理流程 (記憶體用量與單一檔案大小無關):
+#   行程池 (--workers) 各自逐筆串流解析 JSON 檔案，每 --chunk-size 筆以 pandas
+#   向量化清洗後放入有界佇列 (--queue-size)；主行程從佇列取出並寫入資料庫。
+#   寫入端較慢時佇列會塞滿，解析端隨之暫停，同時在記憶體中的紀錄最多約為
+#   (workers + queue-size) x chunk-size 筆。結束時輸出各階段的 records/sec。
+#   寫入前主行程將測站與狀態名稱編碼為代碼 (aqi/dimensions.py)：檔案中出現的新測站寫入 stations，
+#   既有測站的名稱與縣市不會被舊檔案覆寫；歷史資料表每列只存 (SiteId, DataCreationDate, AQI, StatusId)
+#   與各污染物濃度 (檔案中有 pm2.5、pm10、o3、no2、so2、co 欄位時，見 aqi/pollutants.py，否則為 NULL)。
+#   加上 --summary-json <路徑> 時另外寫出各階段 (parse / clean / write / index / swap /
+#   columnar / rollups / snapshots) 筆數與秒數的 JSON 摘要，供排程或監控系統讀取。
 # =============================================================================
 
 import os
 import json
+import queue
+import time
 import logging
-import decimal
 import argparse
 import sys
+import tempfile
+import multiprocessing
+from collections import defaultdict
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import numpy as np
+import pandas as pd
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
+# 專案根目錄 (aqi_dashboard)，加入 sys.path 以匯入 aqi 套件
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from rollups import rebuild_rollups, refresh_rollups
+from columnar_store import build_columnar_store, refresh_columnar_store, store_enabled
+from export_snapshots import export_if_enabled
+from compact_records import history_table_lock
+from import_manifest import (plan_incremental, record_chunk_progress, finish_file, rewrite_manifest,
+                             file_fingerprint, file_sha256)
+from aqi.metrics import StageTimer
+from aqi.dimensions import DimensionEncoder
+from aqi import pollutants
+
 # --- 全域設定 ---
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
@@ -41,31 +89,45 @@ DB_CONNECTION_STR = (
 )
 
 # --- 3. 使用更穩健的方式定義路徑 ---
-# 專案根目錄 (aqi_dashboard)
-PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-JSON_FOLDER_PATH = os.path.join(PROJECT_ROOT, 'history_records')
+# HISTORY_RECORDS_DIR 可改讀其他資料夾 (例如 benchmarks 產生的合成資料)
+JSON_FOLDER_PATH = os.getenv('HISTORY_RECORDS_DIR', os.path.join(PROJECT_ROOT, 'history_records'))
 TARGET_TABLE = 'historical_aqi_analysis'
 
-# --- 核心功能函式 (此區塊完全不變) ---
+# --- 4. 串流處理參數 ---
+CHUNK_SIZE = 5000              # 每批清洗 / 寫入的紀錄筆數
+READ_BLOCK_SIZE = 1 << 20      # 每次從檔案讀入的字元數
+DEFAULT_WORKERS = os.cpu_count() or 1
+BULK_BATCH_BYTES = 4 * 1024 * 1024      # 多列 VALUES 單一語句的大小上限 (需小於 max_allowed_packet)
+INFILE_MAX_BYTES = 256 * 1024 * 1024    # LOAD DATA 暫存檔累積到此大小即載入一次
 
-def to_numeric(value):
-    """將值穩健地轉換為整數，處理 'nan' 等情況"""
-    if value is None or isinstance(value, int):
-        return value
-    if isinstance(value, str):
-        if value.strip() == '':
-            return None
-        if value.lower() == 'nan':
-            return None
-    try:
-        return int(float(value))
-    except (ValueError, TypeError):
-        return None
+# 整次執行各階段的累計耗時 (--summary-json)
+stage_timer = StageTimer('import')
+
+SHADOW_TABLE = f'{TARGET_TABLE}_shadow'
+RETIRED_TABLE = f'{TARGET_TABLE}_old'
+# 複製已搬移的即時資料到切換完成前暫停 compact_records.py；等待進行中的一批搬移最多此秒數
+SWAP_LOCK_WAIT_SECONDS = 600
 
-def create_db_engine():
+LEAN_COLUMNS = ['SiteId', 'SiteName', 'County', 'AQI', 'Status', 'DataCreationDate'] + pollutants.COLUMNS
+# 寫入歷史資料表的欄位 (名稱編碼後)
+FACT_COLUMNS = ['SiteId', 'DataCreationDate', 'AQI', 'StatusId'] + pollutants.COLUMNS
+RAW_COLUMNS = ['siteid', 'sitename', 'county', 'aqi', 'status', 'datacreationdate'] + list(pollutants.API_COLUMNS)
+
+INSERT_STMT = text(
+    f"INSERT IGNORE INTO {TARGET_TABLE} "
+    f"({', '.join(FACT_COLUMNS)}) "
+    f"VALUES ({', '.join(f':{c}' for c in FACT_COLUMNS)})"
+)
+
+# 名稱 -> 代碼的快取，只在主行程 (寫入端) 使用
+dimensions = DimensionEncoder()
+
+# --- 核心功能函式 ---
+
+def create_db_engine(connect_args=None):
     """建立資料庫引擎"""
     try:
-        engine = create_engine(DB_CONNECTION_STR)
+        engine = create_engine(DB_CONNECTION_STR, connect_args=connect_args or {})
         with engine.connect():
             logging.info("資料庫連接成功！")
         return engine
@@ -73,119 +135,458 @@ def create_db_engine():
         logging.error(f"資料庫連接失敗: {e}")
         return None
 
-def read_and_clean_file_lean(file_path):
-    """讀取並清洗單一 JSON 檔案，只提取核心欄位"""
+class _JsonStream:
+    """以固定大小的區塊讀取 JSON 文字，逐一解析其中的值，不需一次載入整個檔案"""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f, block_size=READ_BLOCK_SIZE):
+        self.f = f
+        self.block_size = block_size
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self):
+        block = self.f.read(self.block_size)
+        if not block:
+            return False
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """跳過空白，回傳下一個字元 (檔案結尾回傳空字串)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON 格式錯誤：預期 '{char}'，實際為 {self.buf[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def value(self):
+        """解析下一個完整的 JSON 值；緩衝區內容不足時再讀入下一個區塊"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # 值剛好結束在緩衝區尾端時，數字可能被區塊邊界截斷，補讀後重新解析
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+def _iter_array(stream):
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() != ',':
+            stream.expect(']')
+            return
+        stream.expect(',')
+
+def iter_json_records(file_path):
+    """逐筆產生檔案中的紀錄；支援頂層陣列或 {"records": [...]} 兩種格式"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        first = stream.peek()
+        if first == '[':
+            yield from _iter_array(stream)
+        elif first == '{':
+            stream.expect('{')
+            if stream.peek() == '}':
+                return
+            while True:
+                key = stream.value()
+                stream.expect(':')
+                if key == 'records' and stream.peek() == '[':
+                    yield from _iter_array(stream)
+                    return
+                stream.value()  # 其他欄位 (如 fields) 直接略過
+                if stream.peek() != ',':
+                    stream.expect('}')
+                    return
+                stream.expect(',')
+
+def _to_int_column(series):
+    """向量化版的數值轉換：無法解析、'nan'、空字串與無限大皆視為 None，小數無條件捨去"""
+    numeric = pd.to_numeric(series, errors='coerce')
+    valid = np.isfinite(numeric)
+    return np.trunc(numeric.where(valid)).astype('Int64').astype(object).where(valid, None)
+
+def _to_decimal_column(series, column):
+    """污染物濃度：依欄位的小數位數四捨五入；無法解析、'nan'、負值與超出 DECIMAL 範圍的值皆視為 None"""
+    numeric = pd.to_numeric(series, errors='coerce')
+    # 範圍以四捨五入後的值判斷，寫入的值才不會進位到欄位上限 (9999.96 -> 10000.0)
+    rounded = numeric.round(pollutants.decimals(column))
+    valid = np.isfinite(numeric) & (numeric >= 0) & (rounded < pollutants.upper_bound(column))
+    return rounded.where(valid).astype(object).where(valid, None)
+
+def _to_datetime_column(series):
+    """DataCreationDate 轉為 datetime：先以推斷的單一格式向量化解析，格式不同的值 (例如 '2024/1/5 10:00')
+    再逐一解析；無法解析的值為 None"""
+    parsed = pd.to_datetime(series, errors='coerce')
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry], errors='coerce', format='mixed')
+    return pd.Series(parsed.dt.to_pydatetime(), index=series.index, dtype=object).where(parsed.notna(), None)
+
+def clean_chunk(raw_records):
+    """以向量化方式清洗一批原始紀錄，只提取核心欄位，回傳 (有效紀錄 list[dict], 無效筆數)"""
+    df = pd.DataFrame([r for r in raw_records if isinstance(r, dict)], columns=RAW_COLUMNS, dtype=object)
+
+    site_id = _to_int_column(df['siteid'])
+    created = _to_datetime_column(df['datacreationdate'])
+    # 核心驗證：必須有 SiteId 與可解析的 DataCreationDate
+    valid = site_id.notna() & created.notna()
+
+    # Status 可能是 'nan' 字串，一併清為 None
+    status = df['status']
+    status = status.where(status.notna() & (status.astype(str).str.lower() != 'nan'), None)
+
+    cleaned = pd.DataFrame({
+        'SiteId': site_id,
+        'SiteName': df['sitename'].where(df['sitename'].notna(), None),
+        'County': df['county'].where(df['county'].notna(), None),
+        'AQI': _to_int_column(df['aqi']),
+        'Status': status,
+        'DataCreationDate': created,
+        **{column: _to_decimal_column(df[api_column], column) for api_column, column in pollutants.API_COLUMNS.items()},
+    })[valid]
+
+    columns = [cleaned[c].tolist() for c in LEAN_COLUMNS]
+    records = [dict(zip(LEAN_COLUMNS, row)) for row in zip(*columns)]
+    return records, len(raw_records) - len(records)
+
+def iter_raw_chunks(file_path, chunk_size):
+    """將串流解析的紀錄每 chunk_size 筆分為一批，並附上解析該批所花的秒數"""
+    records = iter_json_records(file_path)
+    while True:
+        started = time.perf_counter()
+        chunk = list(islice(records, chunk_size))
+        elapsed = time.perf_counter() - started
+        if not chunk:
+            return
+        yield chunk, elapsed
+
+def encode_chunk(conn, records):
+    """以獨立交易將一批紀錄中的新測站與狀態名稱寫入維度表，回傳只含 FACT_COLUMNS 的紀錄"""
+    stations = {}
+    for record in records:
+        stations.setdefault(record['SiteId'], (record['SiteId'], record['SiteName'], record['County'], None, None))
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        logging.error(f"讀取檔案 {os.path.basename(file_path)} 失敗: {e}")
-        return [], 0
-
-    records_data = data.get('records', data) if isinstance(data, dict) else data
-    if not isinstance(records_data, list):
-        return [], 0
-
-    valid_records = []
-    invalid_count = 0
-    for record in records_data:
-        cleaned_record = {
-            'SiteId': to_numeric(record.get('siteid')),
-            'SiteName': record.get('sitename'),
-            'County': record.get('county'),
-            'AQI': to_numeric(record.get('aqi')),
-            'Status': record.get('status'),
-            'DataCreationDate': record.get('datacreationdate')
-        }
-        
-        # 核心驗證
-        if cleaned_record.get('SiteId') is not None and cleaned_record.get('DataCreationDate'):
-            # 再次清洗 Status, 避免 'nan' 字串
-            if isinstance(cleaned_record['Status'], str) and cleaned_record['Status'].lower() == 'nan':
-                cleaned_record['Status'] = None
-            valid_records.append(cleaned_record)
-        else:
-            invalid_count += 1
-            
-    return valid_records, invalid_count
+        with conn.begin():
+            cursor = conn.connection.cursor()
+            try:
+                dimensions.register_stations(cursor, stations.values(), update=False)
+                status_ids = dimensions.status_codes(cursor, [record['Status'] for record in records])
+            finally:
+                cursor.close()
+    except Exception:
+        dimensions.invalidate()
+        raise
+    return [{'SiteId': record['SiteId'], 'DataCreationDate': record['DataCreationDate'],
+             'AQI': record['AQI'], 'StatusId': status_id, **{c: record[c] for c in pollutants.COLUMNS}}
+            for record, status_id in zip(records, status_ids)]
 
-def insert_records_to_db(engine, records_to_insert, file_name):
-    """將紀錄列表分批匯入資料庫"""
-    if not records_to_insert:
-        return 0
-    
-    CHUNK_SIZE = 5000 
-    total_inserted_for_file = 0
-    
+def encoded(conn, handle_chunk):
+    """包裝 run_pipeline 的 handle_chunk：先編碼再寫入"""
+    return lambda file_name, records, chunk_index: handle_chunk(file_name, encode_chunk(conn, records), chunk_index)
+
+def insert_chunk(conn, records, file_name):
+    """以單一交易寫入一批紀錄，失敗時回滾該批並回傳 0"""
     try:
-        with engine.connect() as conn:
-            for i in range(0, len(records_to_insert), CHUNK_SIZE):
-                chunk = records_to_insert[i:i + CHUNK_SIZE]
-                with conn.begin() as transaction:
-                    try:
-                        stmt = text(
-                            f"INSERT IGNORE INTO {TARGET_TABLE} "
-                            "(SiteId, SiteName, County, AQI, Status, DataCreationDate) "
-                            "VALUES (:SiteId, :SiteName, :County, :AQI, :Status, :DataCreationDate)"
-                        )
-                        conn.execute(stmt, chunk)
-                        total_inserted_for_file += len(chunk)
-                    except Exception as e:
-                        logging.error(f"檔案 {file_name} 的批次 {i//CHUNK_SIZE + 1} 匯入失敗: {e}")
-                        transaction.rollback()
-                        
-            return total_inserted_for_file
+        with conn.begin():
+            conn.execute(INSERT_STMT, records)
+        return len(records)
+    except Exception as e:
+        logging.error(f"檔案 {file_name} 的一個批次 ({len(records)} 筆) 匯入失敗: {e}")
+        return 0
+
+# --- 批次載入與影子資料表 ---
+
+def _estimate_row_bytes(record):
+    # 以 UTF-8 最壞情況 (每字 3 bytes) 估計，寧可高估也不要超過 max_allowed_packet
+    return sum(3 * len(str(value)) + 4 for value in record.values())
+
+def _byte_sized_batches(records, batch_bytes):
+    batch, size = [], 0
+    for record in records:
+        row_bytes = _estimate_row_bytes(record)
+        if batch and size + row_bytes > batch_bytes:
+            yield batch
+            batch, size = [], 0
+        batch.append(record)
+        size += row_bytes
+    if batch:
+        yield batch
+
+def execute_bulk_values(conn, table, records, batch_bytes=BULK_BATCH_BYTES, replace=False):
+    """在目前的交易中以多列 VALUES 的 INSERT 寫入紀錄，依估計位元組數切分為數個語句
+
+    replace=True 時以 ON DUPLICATE KEY UPDATE 覆寫相同主鍵的舊資料，否則略過 (INSERT IGNORE)。
+    """
+    if replace:
+        prefix = f"INSERT INTO {table} ({', '.join(FACT_COLUMNS)}) VALUES "
+        suffix = " ON DUPLICATE KEY UPDATE " + ', '.join(f'{c} = VALUES({c})' for c in FACT_COLUMNS[2:])
+    else:
+        prefix, suffix = f"INSERT IGNORE INTO {table} ({', '.join(FACT_COLUMNS)}) VALUES ", ''
+    row_placeholder = '(' + ', '.join(['%s'] * len(FACT_COLUMNS)) + ')'
+    for batch in _byte_sized_batches(records, batch_bytes - len(prefix) - len(suffix)):
+        params = tuple(row[c] for row in batch for c in FACT_COLUMNS)
+        conn.exec_driver_sql(prefix + ', '.join([row_placeholder] * len(batch)) + suffix, params)
 
+def bulk_insert_values(conn, table, records, file_name, batch_bytes=BULK_BATCH_BYTES):
+    """以多列 VALUES 的 INSERT 寫入一批紀錄，整批為單一交易"""
+    try:
+        with conn.begin():
+            execute_bulk_values(conn, table, records, batch_bytes)
+        return len(records)
     except Exception as e:
-        logging.error(f"匯入檔案 {file_name} 時發生無法預期的錯誤: {e}")
+        logging.error(f"檔案 {file_name} 的一個批次 ({len(records)} 筆) 匯入失敗: {e}")
         return 0
 
-# --- 兩階段執行函式 (此區塊完全不變) ---
+def _tsv_field(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+class InfileLoader:
+    """將紀錄寫入暫存 TSV 檔，累積到 max_bytes 後以 LOAD DATA LOCAL INFILE 一次載入"""
+
+    def __init__(self, conn, table, max_bytes=INFILE_MAX_BYTES):
+        self.conn = conn
+        self.table = table
+        self.max_bytes = max_bytes
+        self.spool = None
+        self.loaded = 0
+
+    def add(self, records):
+        if self.spool is None:
+            self.spool = tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', suffix='.tsv', delete=False)
+        self.spool.writelines('\t'.join(_tsv_field(r[c]) for c in FACT_COLUMNS) + '\n' for r in records)
+        if self.spool.tell() >= self.max_bytes:
+            self.flush()
+        return len(records)
+
+    def flush(self):
+        """載入目前的暫存檔；載入失敗時直接拋出例外，由呼叫端中止匯入"""
+        if self.spool is None:
+            return
+        path = self.spool.name
+        self.spool.close()
+        self.spool = None
+        try:
+            with self.conn.begin():
+                result = self.conn.exec_driver_sql(
+                    f"LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}' IGNORE INTO TABLE {self.table} "
+                    "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                    f"({', '.join(FACT_COLUMNS)})"
+                )
+                self.loaded += result.rowcount
+        finally:
+            os.remove(path)
+
+def get_secondary_indexes(conn, table):
+    """讀取資料表的非唯一次要索引 {索引名稱: [欄位定義...]}；主鍵與 UNIQUE 索引不列入"""
+    indexes = {}
+    rows = conn.exec_driver_sql(f"SHOW INDEX FROM {table}").mappings().all()
+    for row in sorted(rows, key=lambda r: (r['Key_name'], r['Seq_in_index'])):
+        if row['Key_name'] == 'PRIMARY' or not row['Non_unique']:
+            continue
+        column = f"`{row['Column_name']}`" + (f"({row['Sub_part']})" if row['Sub_part'] else '')
+        indexes.setdefault(row['Key_name'], []).append(column)
+    return indexes
+
+def prepare_shadow_table(engine):
+    """以正式資料表的結構 (含分區) 建立空的影子資料表，並先移除次要索引以加快載入；回傳移除的索引"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+        conn.exec_driver_sql(f"CREATE TABLE {SHADOW_TABLE} LIKE {TARGET_TABLE}")
+        indexes = get_secondary_indexes(conn, SHADOW_TABLE)
+        if indexes:
+            conn.exec_driver_sql(f"ALTER TABLE {SHADOW_TABLE} " + ", ".join(f"DROP INDEX `{name}`" for name in indexes))
+    return indexes
+
+def carry_over_compacted_rows(engine):
+    """將正式資料表中匯入檔案沒有的 (SiteId, DataCreationDate) 複製到影子資料表，回傳筆數
+
+    這些列是 compact_records.py 自即時資料表搬入的爬蟲資料，已不在 air_quality_records 中，
+    不複製的話切換資料表後就會遺失；不限時間範圍 (匯入檔案可能有缺漏的小時)。
+    主鍵相同的列以匯入檔案為準 (INSERT IGNORE)。呼叫端需持有 history_table_lock，
+    直到切換完成前都不會再有新的列搬入正式資料表。
+    """
+    columns = ', '.join(FACT_COLUMNS)
+    with engine.begin() as conn:
+        result = conn.execute(text(f"INSERT IGNORE INTO {SHADOW_TABLE} ({columns}) "
+                                   f"SELECT {columns} FROM {TARGET_TABLE}"))
+        return result.rowcount
+
+def build_shadow_indexes(engine, indexes):
+    """載入完成後一次建立所有次要索引 (排序後建立，比逐筆維護快得多)"""
+    if not indexes:
+        return
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"ALTER TABLE {SHADOW_TABLE} " + ", ".join(
+            f"ADD INDEX `{name}` ({', '.join(columns)})" for name, columns in indexes.items()))
+
+def swap_shadow_table(engine):
+    """以單一 RENAME TABLE 敘述同時換上影子資料表，查詢不會看到空表或半成品"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {RETIRED_TABLE}")
+        conn.exec_driver_sql(f"RENAME TABLE {TARGET_TABLE} TO {RETIRED_TABLE}, {SHADOW_TABLE} TO {TARGET_TABLE}")
+        conn.exec_driver_sql(f"DROP TABLE {RETIRED_TABLE}")
+
+# --- 多行程管線 ---
+
+# 行程池中每個 worker 共用的有界佇列 (由 initializer 設定)
+_chunk_queue = None
+
+def _init_worker(chunk_queue):
+    global _chunk_queue
+    _chunk_queue = chunk_queue
 
-def run_check(json_files):
+def parse_file_worker(file_name, chunk_size, skip_chunks=0):
+    """行程池工作：逐批解析並清洗單一檔案，清洗後的紀錄連同批次序號放入有界佇列交給寫入端
+
+    前 skip_chunks 批 (續傳時已提交的批次) 只解析不清洗也不送出。結束時附上檔案的指紋與雜湊。
+    """
+    file_path = os.path.join(JSON_FOLDER_PATH, file_name)
+    stats = {'parsed': 0, 'cleaned': 0, 'valid': 0, 'invalid': 0, 'chunks': 0,
+             'parse_seconds': 0.0, 'clean_seconds': 0.0, 'error': None,
+             'size': 0, 'mtime': 0.0, 'content_hash': ''}
+    try:
+        stats['size'], stats['mtime'] = file_fingerprint(file_path)
+        for chunk_index, (raw_chunk, parse_seconds) in enumerate(iter_raw_chunks(file_path, chunk_size)):
+            stats['chunks'] = chunk_index + 1
+            stats['parse_seconds'] += parse_seconds
+            stats['parsed'] += len(raw_chunk)
+            if chunk_index < skip_chunks:
+                continue
+            started = time.perf_counter()
+            records, invalid_count = clean_chunk(raw_chunk)
+            stats['clean_seconds'] += time.perf_counter() - started
+            stats['cleaned'] += len(raw_chunk)
+            stats['valid'] += len(records)
+            stats['invalid'] += invalid_count
+            if records:
+                # 佇列已滿時在此等待，避免解析速度超過寫入速度而堆積在記憶體中
+                _chunk_queue.put(('chunk', file_name, chunk_index, records))
+    except Exception as e:
+        stats['error'] = str(e)
+    try:
+        stats['content_hash'] = file_sha256(file_path)
+    except OSError as e:
+        stats['error'] = stats['error'] or str(e)
+    _chunk_queue.put(('done', file_name, stats['chunks'], stats))
+
+def run_pipeline(json_files, handle_chunk, workers, chunk_size, queue_size, skip_chunks=None):
+    """以行程池平行解析所有檔案，主行程依序呼叫 handle_chunk(file_name, records, chunk_index) 寫入每一批
+
+    每處理完一個檔案即產生 (檔名, 統計)；handle_chunk 為 None 時只解析與清洗 (檢查模式)。
+    handle_chunk 拋出例外時停止派送新檔案，待執行中的 worker 結束後再將例外拋給呼叫端。
+    """
+    written = defaultdict(int)
+    stages = StageTimer('pipeline')
+    for stage in ('parse', 'clean') if handle_chunk is None else ('parse', 'clean', 'write'):
+        stages.add(stage, 0.0, calls=0)
+    chunk_queue = multiprocessing.Queue(maxsize=queue_size)
+    failure = None
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(chunk_queue,)) as pool:
+        futures = {
+            pool.submit(parse_file_worker, file_name, chunk_size, (skip_chunks or {}).get(file_name, 0)): file_name
+            for file_name in json_files
+        }
+        pending = set(json_files)
+        while pending:
+            try:
+                kind, file_name, chunk_index, payload = chunk_queue.get(timeout=1)
+            except queue.Empty:
+                # worker 行程異常結束 (例如被系統終止) 時不會送出 'done'，需主動檢查
+                for future in futures:
+                    if future.done() and not future.cancelled() and future.exception():
+                        raise future.exception()
+                continue
+
+            if kind == 'chunk':
+                # 寫入已失敗時仍需持續取出佇列內容，執行中的 worker 才不會卡在已滿的佇列上
+                if handle_chunk is None or failure is not None:
+                    continue
+                write_started = time.perf_counter()
+                try:
+                    written[file_name] += handle_chunk(file_name, payload, chunk_index)
+                except Exception as e:
+                    failure = e
+                    for future, name in futures.items():
+                        if future.cancel():
+                            pending.discard(name)
+                    continue
+                stages.add('write', time.perf_counter() - write_started, len(payload))
+                continue
+
+            pending.discard(file_name)
+            payload['written'] = written.pop(file_name, 0)
+            stages.add('parse', payload['parse_seconds'], payload['parsed'])
+            stages.add('clean', payload['clean_seconds'], payload['cleaned'])
+            if payload['error']:
+                logging.error(f"讀取檔案 {file_name} 失敗 (已處理前 {payload['parsed']} 筆): {payload['error']}")
+            if failure is None:
+                yield file_name, payload
+
+    if failure is not None:
+        raise failure
+    log_stage_rates(stages, time.perf_counter() - started, workers)
+    stage_timer.merge(stages)
+
+def log_stage_rates(stages, elapsed, workers):
+    """輸出各階段的處理速度；解析與清洗的秒數為所有 worker 的累計時間"""
+    logging.info("-" * 50)
+    logging.info(f"{'階段':<8}{'筆數':>12}{'累計秒數':>12}{'records/sec':>14}")
+    for stage, totals in stages.stages.items():
+        count, seconds = totals['count'], totals['seconds']
+        rate = count / seconds if seconds else 0.0
+        logging.info(f"{stage:<8}{count:>12}{seconds:>12.2f}{rate:>14.0f}")
+    total = stages.stages['parse']['count']
+    logging.info(f"整體 (wall clock, {workers} 個 worker): {total} 筆 / {elapsed:.2f} 秒 = "
+                 f"{total / elapsed if elapsed else 0.0:.0f} records/sec")
+    logging.info("-" * 50)
+
+# --- 兩階段執行函式 ---
+
+def run_check(json_files, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, queue_size=None):
     """執行第一階段：資料檢查"""
     logging.info("--- 模式: 資料檢查 (精簡模式) ---")
     total_valid = 0
     total_invalid = 0
-    for file_name in json_files:
-        file_path = os.path.join(JSON_FOLDER_PATH, file_name)
-        valid_records, invalid_count = read_and_clean_file_lean(file_path)
-        logging.info(f"檔案 {file_name}: 找到 {len(valid_records)} 筆有效紀錄，{invalid_count} 筆無效紀錄。")
-        total_valid += len(valid_records)
-        total_invalid += invalid_count
-    
-    logging.info("="*50 + f"\n所有檔案檢查完畢！\n總計找到 {total_valid} 筆『有效』紀錄。\n總計找到 {total_invalid} 筆『無效』紀錄。\n" + "="*50)
+    for file_name, stats in run_pipeline(json_files, None, workers, chunk_size, queue_size or workers * 2):
+        logging.info(f"檔案 {file_name}: 找到 {stats['valid']} 筆有效紀錄，{stats['invalid']} 筆無效紀錄。")
+        total_valid += stats['valid']
+        total_invalid += stats['invalid']
 
-def run_import(engine, json_files):
-    """執行第二階段：資料匯入"""
-    logging.info("--- 模式: 資料匯入 (精簡模式) ---")
-    
-    try:
-        with engine.connect() as conn:
-            with conn.begin() as transaction:
-                logging.info(f"正在清空資料表 '{TARGET_TABLE}'...")
-                conn.execute(text(f"DELETE FROM {TARGET_TABLE}"))
-        logging.info("資料表已清空。")
-    except Exception as e:
-        logging.error(f"清空資料表失敗: {e}")
-        return
+    logging.info("="*50 + f"\n所有檔案檢查完畢！\n總計找到 {total_valid} 筆『有效』紀錄。\n總計找到 {total_invalid} 筆『無效』紀錄。\n" + "="*50)
 
-    total_inserted = 0
-    for file_name in json_files:
-        file_path = os.path.join(JSON_FOLDER_PATH, file_name)
-        valid_records, _ = read_and_clean_file_lean(file_path)
-        inserted_count = insert_records_to_db(engine, valid_records, file_name)
-        logging.info(f"檔案 {file_name}: 腳本嘗試匯入 {inserted_count} / {len(valid_records)} 筆紀錄。")
-        total_inserted += inserted_count
-        
-    # --- 最終驗證 ---
+def verify_row_count(engine, table, total_inserted):
+    """比對腳本記錄的匯入筆數與資料表中的實際筆數"""
     logging.info("="*50)
     logging.info(f"腳本記錄的總匯入筆數為: {total_inserted}")
     try:
         with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {TARGET_TABLE}"))
+            result = conn.execute(text(f"SELECT COUNT(*) FROM {table}"))
             final_count = result.scalar_one()
-            logging.info(f"資料庫回報: '{TARGET_TABLE}' 中目前共有 {final_count} 筆紀錄。")
+            logging.info(f"資料庫回報: '{table}' 中目前共有 {final_count} 筆紀錄。")
             if final_count == total_inserted:
                 logging.info(">>> 驗證成功！腳本紀錄與資料庫紀錄一致。")
             else:
@@ -194,15 +595,271 @@ def run_import(engine, json_files):
         logging.error(f"最終驗證失敗: {e}")
     logging.info("="*50)
 
-# --- 主程式執行區 (此區塊完全不變) ---
+def import_in_place(engine, json_files, workers, chunk_size, queue_size):
+    """舊的匯入方式：清空正式資料表後逐批 INSERT (匯入期間歷史資料為空)；成功時回傳每個檔案的統計"""
+    try:
+        with engine.connect() as conn:
+            with conn.begin() as transaction:
+                logging.info(f"正在清空資料表 '{TARGET_TABLE}'...")
+                conn.execute(text(f"DELETE FROM {TARGET_TABLE}"))
+        logging.info("資料表已清空。")
+    except Exception as e:
+        logging.error(f"清空資料表失敗: {e}")
+        return None
+
+    started = time.perf_counter()
+    total_inserted = 0
+    file_stats = {}
+    # 寫入端在整個匯入期間共用同一條連線
+    with engine.connect() as conn:
+        handle_chunk = encoded(conn, lambda file_name, records, chunk_index: insert_chunk(conn, records, file_name))
+        for file_name, stats in run_pipeline(json_files, handle_chunk, workers, chunk_size, queue_size):
+            logging.info(f"檔案 {file_name}: 腳本嘗試匯入 {stats['written']} / {stats['valid']} 筆紀錄。")
+            total_inserted += stats['written']
+            file_stats[file_name] = stats
+    elapsed = time.perf_counter() - started
+
+    verify_row_count(engine, TARGET_TABLE, total_inserted)
+    logging.info(f"就地匯入完成：{total_inserted} 筆，耗時 {elapsed:.1f} 秒 "
+                 f"({total_inserted / elapsed if elapsed else 0.0:.0f} records/sec)")
+    return file_stats
+
+def import_via_shadow_table(engine, json_files, workers, chunk_size, queue_size, method):
+    """載入影子資料表 -> 建立次要索引 -> RENAME TABLE 換上線；任何步驟失敗時正式資料表維持不變
+
+    成功時回傳每個檔案的統計，失敗時回傳 None。
+    """
+    try:
+        indexes = prepare_shadow_table(engine)
+    except Exception as e:
+        logging.error(f"建立影子資料表失敗: {e}")
+        return None
+    logging.info(f"已建立影子資料表 '{SHADOW_TABLE}'，載入完成前暫不建立的索引: {', '.join(indexes) or '無'}")
+
+    started = time.perf_counter()
+    total_inserted = 0
+    total_valid = 0
+    file_stats = {}
+    with engine.connect() as conn:
+        if method == 'infile':
+            loader = InfileLoader(conn, SHADOW_TABLE)
+            handle_chunk = lambda file_name, records, chunk_index: loader.add(records)
+        else:
+            handle_chunk = lambda file_name, records, chunk_index: bulk_insert_values(conn, SHADOW_TABLE, records, file_name)
+        handle_chunk = encoded(conn, handle_chunk)
+        try:
+            for file_name, stats in run_pipeline(json_files, handle_chunk, workers, chunk_size, queue_size):
+                logging.info(f"檔案 {file_name}: 腳本嘗試匯入 {stats['written']} / {stats['valid']} 筆紀錄。")
+                total_inserted += stats['written']
+                total_valid += stats['valid']
+                file_stats[file_name] = stats
+            if method == 'infile':
+                loader.flush()
+        except Exception as e:
+            logging.error(f"載入影子資料表失敗，正式資料表維持不變: {e}")
+            return None
+    load_seconds = time.perf_counter() - started
+
+    if total_inserted < total_valid:
+        logging.error(f"有 {total_valid - total_inserted} 筆紀錄寫入失敗，正式資料表維持不變；"
+                      f"影子資料表 '{SHADOW_TABLE}' 保留供檢查。")
+        return None
+
+    # 從複製已搬移的資料到切換完成都持有鎖：期間 compact_records.py 不會再搬入新的列
+    try:
+        with history_table_lock(engine, SWAP_LOCK_WAIT_SECONDS):
+            try:
+                carried = carry_over_compacted_rows(engine)
+            except Exception as e:
+                logging.error(f"保留已搬移的即時資料失敗，正式資料表維持不變: {e}")
+                return None
+            if carried:
+                logging.info(f"已保留 {carried} 筆匯入檔案沒有的歷史資料 (由即時資料表搬入)。")
+                total_inserted += carried
+
+            try:
+                with stage_timer.stage('index'):
+                    index_started = time.perf_counter()
+                    build_shadow_indexes(engine, indexes)
+                    index_seconds = time.perf_counter() - index_started
+                verify_row_count(engine, SHADOW_TABLE, total_inserted)
+                with stage_timer.stage('swap'):
+                    swap_started = time.perf_counter()
+                    swap_shadow_table(engine)
+                    swap_seconds = time.perf_counter() - swap_started
+            except Exception as e:
+                logging.error(f"建立索引或切換資料表失敗，正式資料表維持不變: {e}")
+                return None
+    except Exception as e:
+        logging.error(f"無法暫停冷熱分層 (compact_records.py)，正式資料表維持不變；"
+                      f"影子資料表 '{SHADOW_TABLE}' 保留供檢查: {e}")
+        return None
+
+    logging.info(f"影子資料表匯入完成 ({method})：{total_inserted} 筆，載入 {load_seconds:.1f} 秒 "
+                 f"({total_inserted / load_seconds if load_seconds else 0.0:.0f} records/sec)，"
+                 f"建立索引 {index_seconds:.1f} 秒，切換 {swap_seconds:.2f} 秒")
+    return file_stats
+
+def run_import(engine, json_files, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, queue_size=None, method='values'):
+    """執行第二階段：資料匯入"""
+    logging.info(f"--- 模式: 資料匯入 (精簡模式，載入方式: {method}) ---")
+    queue_size = queue_size or workers * 2
+
+    if method == 'in-place':
+        file_stats = import_in_place(engine, json_files, workers, chunk_size, queue_size)
+    else:
+        file_stats = import_via_shadow_table(engine, json_files, workers, chunk_size, queue_size, method)
+    if file_stats is None:
+        return
+
+    # --- 重寫匯入清單，之後的 --incremental 只處理新的變更 ---
+    try:
+        rewrite_manifest(engine, file_stats, chunk_size)
+    except Exception as e:
+        logging.error(f"更新匯入清單失敗，下次 --incremental 將重新比對所有檔案: {e}")
+
+    # --- 重建欄式儲存 (HISTORICAL_BACKEND=columnar 時歷史分析 API 改讀此儲存) ---
+    # 須在彙總表之前完成：重建彙總表最後遞增的版本水位會讓兩種來源的 API 快取一併失效
+    if store_enabled():
+        try:
+            with stage_timer.stage('columnar'):
+                build_columnar_store(engine)
+        except Exception as e:
+            logging.error(f"建立欄式儲存失敗，請稍後執行 'python columnar_store.py --build': {e}")
+
+    # --- 重建歷史彙總表 (API 的歷史分析查詢皆讀取彙總表) ---
+    try:
+        with stage_timer.stage('rollups'):
+            rebuild_rollups(engine)
+    except Exception as e:
+        logging.error(f"重建彙總表失敗，請稍後執行 'python rollups.py --rebuild': {e}")
+        return
+
+    # --- 重新匯出歷史分析 API 的靜態快照 (aqi/snapshots.py) ---
+    with stage_timer.stage('snapshots'):
+        export_if_enabled(engine)
+
+def replace_chunk(conn, records, file_name, chunk_index):
+    """以單一交易逐列取代一批紀錄 (相同主鍵以檔案內容為準)，並在同一交易中記錄該檔案的匯入進度
+
+    只覆寫本批出現的 (SiteId, DataCreationDate)：檔案未依時間排序或檔案之間時間重疊時，
+    不會刪除前一批或其他檔案剛寫入的列。
+    """
+    with conn.begin():
+        execute_bulk_values(conn, TARGET_TABLE, records, replace=True)
+        record_chunk_progress(conn, file_name, chunk_index, len(records))
+    return len(records)
+
+def day_ranges(days):
+    """將日期集合合併為連續的 [start_day, end_day] 區間 (依日期排序)"""
+    ranges = []
+    for day in sorted(days):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(day_range) for day_range in ranges]
+
+def run_incremental(engine, json_files, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, queue_size=None):
+    """增量匯入：只處理新增、內容變更或上次中斷的檔案，完成後只重算受影響日期的彙總表"""
+    logging.info("--- 模式: 增量匯入 (精簡模式) ---")
+    try:
+        to_import = plan_incremental(engine, JSON_FOLDER_PATH, json_files, chunk_size)
+    except Exception as e:
+        logging.error(f"讀取匯入清單失敗 (請先執行 'python migrate.py'): {e}")
+        return
+    if not to_import:
+        logging.info("沒有需要匯入的檔案。")
+        return
+
+    # 本次寫入涵蓋的日期：只重算這些日期，相隔很遠的檔案不會讓中間所有日期一併重算
+    affected_days = set()
+    total_inserted = 0
+    with engine.connect() as conn:
+        def handle_chunk(file_name, records, chunk_index):
+            written = replace_chunk(conn, encode_chunk(conn, records), file_name, chunk_index)
+            # clean_chunk 已轉為 datetime
+            affected_days.update(record['DataCreationDate'].date() for record in records)
+            return written
+
+        try:
+            for file_name, stats in run_pipeline(list(to_import), handle_chunk, workers, chunk_size,
+                                                 queue_size or workers * 2, skip_chunks=to_import):
+                finish_file(engine, file_name, stats)
+                resumed = f" (自第 {to_import[file_name] + 1} 批續傳)" if to_import[file_name] else ''
+                logging.info(f"檔案 {file_name}: 本次匯入 {stats['written']} / {stats['valid']} 筆紀錄{resumed}。")
+                total_inserted += stats['written']
+        except Exception as e:
+            logging.error(f"增量匯入中斷，已提交的批次皆已記錄於匯入清單，重新執行即可續傳: {e}")
+
+    logging.info(f"增量匯入共寫入 {total_inserted} 筆紀錄。")
+    # 即使中途中斷，已提交的批次仍需反映到彙總表
+    if not affected_days:
+        return
+    ranges = day_ranges(affected_days)
+    logging.info(f"受影響的日期：{len(affected_days)} 天，{len(ranges)} 個連續區間。")
+    if store_enabled():
+        for start_day, end_day in ranges:
+            try:
+                with stage_timer.stage('columnar'):
+                    refresh_columnar_store(engine, start_day, end_day)
+            except Exception as e:
+                logging.error(f"更新欄式儲存失敗，請執行 'python columnar_store.py --refresh "
+                              f"--start {start_day.isoformat()} --end {end_day.isoformat()}': {e}")
+    rollups_failed = False
+    for start_day, end_day in ranges:
+        try:
+            with stage_timer.stage('rollups'):
+                refresh_rollups(engine, start_day, end_day)
+        except Exception as e:
+            logging.error(f"更新彙總表失敗，請執行 'python rollups.py --refresh "
+                          f"--start {start_day.isoformat()} --end {end_day.isoformat()}': {e}")
+            rollups_failed = True
+    if rollups_failed:
+        return
+    with stage_timer.stage('snapshots'):
+        export_if_enabled(engine)
+
+# --- 主程式執行區 ---
+def run_mode(args, json_files, pipeline_args):
+    """依命令列參數執行檢查、增量匯入或完整匯入"""
+    if args.check:
+        run_check(json_files, **pipeline_args)
+    elif args.incremental:
+        engine = create_db_engine()
+        if not engine: return
+        run_incremental(engine, json_files, **pipeline_args)
+    elif args.run_import:
+        if args.method == 'in-place':
+            warning = f"警告：即將清空資料表 '{TARGET_TABLE}' 並重新匯入所有資料！"
+        else:
+            warning = f"警告：即將重新匯入所有資料，完成後將取代資料表 '{TARGET_TABLE}' 的全部內容！"
+        user_input = input(f"{warning}\n確定要繼續嗎？ (請輸入 yes 確認): ")
+        if user_input.lower() != 'yes':
+            logging.info("操作已取消。")
+            return
+
+        # LOAD DATA LOCAL INFILE 需要用戶端明確允許
+        engine = create_db_engine({'allow_local_infile': True} if args.method == 'infile' else None)
+        if not engine: return
+        run_import(engine, json_files, method=args.method, **pipeline_args)
+
 def main():
     """主執行函式，處理命令列參數"""
     parser = argparse.ArgumentParser(description='AQI 精簡歷史資料匯入工具 (兩階段模式)')
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('--check', action='store_true', help='第一階段：僅檢查與驗證資料，不寫入資料庫。')
     group.add_argument('--import', dest='run_import', action='store_true', help='第二階段：將資料實際匯入資料庫。')
-    
+    group.add_argument('--incremental', action='store_true', help='增量匯入：只處理新增、變更或上次中斷的檔案。')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'解析檔案的行程數 (預設: {DEFAULT_WORKERS})')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'每批清洗與寫入的筆數 (預設: {CHUNK_SIZE})')
+    parser.add_argument('--queue-size', type=int, help='解析端與寫入端之間最多暫存的批數 (預設: workers x 2)')
+    parser.add_argument('--method', choices=['values', 'infile', 'in-place'], default='values',
+                        help='匯入方式：values / infile 先載入影子資料表再切換上線 (預設: values)；in-place 直接清空正式資料表後寫入')
+    parser.add_argument('--summary-json', help='結束時將各階段的筆數與秒數寫入此 JSON 檔')
+
     args = parser.parse_args()
+    pipeline_args = dict(workers=max(1, args.workers), chunk_size=max(1, args.chunk_size), queue_size=args.queue_size)
 
     if not os.path.isdir(JSON_FOLDER_PATH):
         logging.error(f"找不到指定的資料夾: '{JSON_FOLDER_PATH}'")
@@ -212,18 +869,13 @@ def main():
     if not json_files:
         logging.warning(f"在 '{JSON_FOLDER_PATH}' 資料夾中找不到任何 .json 檔案。")
         return
-    
-    if args.check:
-        run_check(json_files)
-    elif args.run_import:
-        user_input = input(f"警告：即將清空資料表 '{TARGET_TABLE}' 並重新匯入所有資料！\n確定要繼續嗎？ (請輸入 yes 確認): ")
-        if user_input.lower() != 'yes':
-            logging.info("操作已取消。")
-            return
-            
-        engine = create_db_engine()
-        if not engine: return
-        run_import(engine, json_files)
+
+    mode = 'check' if args.check else 'incremental' if args.incremental else f'import ({args.method})'
+    try:
+        run_mode(args, json_files, pipeline_args)
+    finally:
+        if args.summary_json:
+            stage_timer.write_summary(args.summary_json, mode=mode, files=len(json_files), workers=pipeline_args['workers'])
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
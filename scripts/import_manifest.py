@@ -0,0 +1,136 @@
+# =============================================================================
+# 歷史資料匯入清單 (import_manifest)
+#
+# 記錄 history_records/ 中每個檔案的大小、修改時間、內容雜湊 (SHA-256)、
+# 有效紀錄數與匯入狀態，供 import_lean_data.py --incremental 判斷哪些檔案需要匯入：
+#   1. 大小與修改時間皆未變             -> 略過 (不需讀取檔案)
+#   2. 大小或修改時間改變但雜湊相同     -> 僅更新清單中的指紋
+#   3. 上次匯入中斷 (importing / failed) 且內容未變 -> 從已提交的批次之後繼續
+#   4. 其餘 (新檔案或內容已變更)        -> 從頭匯入
+#
+# 每個批次的寫入與 ChunksDone 的更新在同一個交易中提交，因此清單中的進度
+# 永遠與資料表內容一致。
+# =============================================================================
+
+import os
+import hashlib
+import logging
+from sqlalchemy import text
+
+MANIFEST_TABLE = 'import_manifest'
+
+STATUS_IMPORTING = 'importing'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 整列寫入 (新檔案、變更的檔案、全量匯入完成後)
+UPSERT_FILE_SQL = f"""
+    REPLACE INTO {MANIFEST_TABLE}
+    (FileName, FileSize, FileMtime, ContentHash, ChunkSize, ChunksDone, RecordCount, Status)
+    VALUES (:FileName, :FileSize, :FileMtime, :ContentHash, :ChunkSize, :ChunksDone, :RecordCount, :Status)
+"""
+
+# 與批次資料在同一個交易中執行
+CHUNK_PROGRESS_SQL = f"""
+    UPDATE {MANIFEST_TABLE}
+    SET ChunksDone = :ChunksDone, RecordCount = RecordCount + :RecordCount
+    WHERE FileName = :FileName
+"""
+
+FINISH_FILE_SQL = f"""
+    UPDATE {MANIFEST_TABLE}
+    SET FileSize = :FileSize, FileMtime = :FileMtime, ContentHash = :ContentHash,
+        ChunksDone = :ChunksDone, Status = :Status
+    WHERE FileName = :FileName
+"""
+
+TOUCH_FILE_SQL = f"""
+    UPDATE {MANIFEST_TABLE} SET FileSize = :FileSize, FileMtime = :FileMtime WHERE FileName = :FileName
+"""
+
+
+def file_fingerprint(file_path):
+    """回傳 (檔案大小, 修改時間)，用來快速判斷檔案是否可能變更"""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime
+
+def file_sha256(file_path, block_size=1 << 20):
+    """以固定大小區塊計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(conn):
+    """讀取整份清單 {檔名: 欄位 dict}"""
+    rows = conn.execute(text(f"SELECT * FROM {MANIFEST_TABLE}")).mappings().all()
+    return {row['FileName']: dict(row) for row in rows}
+
+def plan_incremental(engine, folder, json_files, chunk_size):
+    """比對清單與目前的檔案，回傳需要匯入的 {檔名: 略過的批次數}
+
+    新檔案與內容已變更的檔案會先在清單中登記為 importing (ChunksDone = 0)。
+    """
+    to_import = {}
+    counts = {'unchanged': 0, 'new': 0, 'changed': 0, 'resumed': 0}
+    with engine.begin() as conn:
+        manifest = load_manifest(conn)
+        for file_name in sorted(json_files):
+            file_path = os.path.join(folder, file_name)
+            size, mtime = file_fingerprint(file_path)
+            entry = manifest.get(file_name)
+            fingerprint = {"FileName": file_name, "FileSize": size, "FileMtime": mtime}
+
+            if entry and entry['Status'] == STATUS_DONE and (entry['FileSize'], entry['FileMtime']) == (size, mtime):
+                counts['unchanged'] += 1
+                continue
+
+            content_hash = file_sha256(file_path)
+            if entry and entry['ContentHash'] == content_hash:
+                if entry['Status'] == STATUS_DONE:
+                    conn.execute(text(TOUCH_FILE_SQL), fingerprint)
+                    counts['unchanged'] += 1
+                    continue
+                # 批次邊界需與上次相同，續傳才有意義；批次大小不同時從頭匯入
+                if entry['ChunkSize'] == chunk_size:
+                    to_import[file_name] = entry['ChunksDone']
+                    counts['resumed'] += 1
+                    continue
+
+            counts['changed' if entry else 'new'] += 1
+            to_import[file_name] = 0
+            conn.execute(text(UPSERT_FILE_SQL), {
+                **fingerprint, "ContentHash": content_hash, "ChunkSize": chunk_size,
+                "ChunksDone": 0, "RecordCount": 0, "Status": STATUS_IMPORTING,
+            })
+
+    logging.info(f"匯入清單比對結果：未變更 {counts['unchanged']}、新增 {counts['new']}、"
+                 f"已變更 {counts['changed']}、續傳 {counts['resumed']} 個檔案。")
+    return to_import
+
+def record_chunk_progress(conn, file_name, chunk_index, record_count):
+    """在寫入批次的同一個交易中記錄進度 (chunk_index 從 0 起算)"""
+    conn.execute(text(CHUNK_PROGRESS_SQL), {
+        "FileName": file_name, "ChunksDone": chunk_index + 1, "RecordCount": record_count,
+    })
+
+def finish_file(engine, file_name, stats):
+    """檔案處理結束：以 worker 實際讀到的指紋更新清單，讀取錯誤時標記為 failed 以便下次重試"""
+    with engine.begin() as conn:
+        conn.execute(text(FINISH_FILE_SQL), {
+            "FileName": file_name, "FileSize": stats['size'], "FileMtime": stats['mtime'],
+            "ContentHash": stats['content_hash'], "ChunksDone": stats['chunks'],
+            "Status": STATUS_FAILED if stats['error'] else STATUS_DONE,
+        })
+
+def rewrite_manifest(engine, file_stats, chunk_size):
+    """全量匯入完成後重寫整份清單，之後的 --incremental 只需處理新的變更"""
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {MANIFEST_TABLE}"))
+        for file_name, stats in file_stats.items():
+            conn.execute(text(UPSERT_FILE_SQL), {
+                "FileName": file_name, "FileSize": stats['size'], "FileMtime": stats['mtime'],
+                "ContentHash": stats['content_hash'], "ChunkSize": chunk_size, "ChunksDone": stats['chunks'],
+                "RecordCount": stats['valid'], "Status": STATUS_FAILED if stats['error'] else STATUS_DONE,
+            })
@@ -0,0 +1,128 @@
+# =============================================================================
+# AQI API 壓力測試工具 (比較 Flask 與 ASGI 兩種服務模式)
+#
+# 對一個或多個已啟動的服務，以相同的請求組合與並行數持續送出請求，
+# 統計吞吐量 (req/s)、延遲百分位數與錯誤數。兩種模式應連到同一個資料庫
+# (本機 MySQL，或僅供測試用的資料庫) 才有比較意義。
+#
+# Flask 模式內建回應快取；若要比較「每次都查詢資料庫」的吞吐量，
+# 請以 CACHE_MAX_ENTRIES=0 啟動 dashboard_api.py。
+#
+# 使用說明:
+# 1. 分別啟動兩種服務:
+#    python dashboard_api.py          (預設 http://127.0.0.1:5000)
+#    python dashboard_asgi.py         (預設 http://127.0.0.1:8000)
+#
+# 2. 執行測試:
+#    python load_test.py --target flask=http://127.0.0.1:5000 --target asgi=http://127.0.0.1:8000 \
+#        --concurrency 50 --duration 30
+# =============================================================================
+
+import time
+import random
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import requests
+
+COUNTIES = ["臺北市", "新北市", "桃園市", "臺中市", "臺南市", "高雄市", "彰化縣", "屏東縣"]
+
+
+def build_request_mix(year):
+    """模擬儀表板的實際使用：即時端點佔多數，歷史分析端點佔少數"""
+    paths = ['/api/county-summary'] * 4
+    for county in COUNTIES:
+        c = quote(county)
+        paths += [
+            f'/api/county-data/{c}',
+            f'/api/historical/annual-trend?county={c}',
+            f'/api/historical/seasonal-trend?county={c}',
+            f'/api/historical/monthly-distribution?county={c}&year={year}',
+            f'/api/historical/unhealthy-days-count?county={c}&year={year}',
+            f'/api/historical/county-report?county={c}&year={year}',
+        ]
+    paths.append(f'/api/historical/annual-map?year={year}')
+    return paths
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_target(base_url, paths, concurrency, duration):
+    """在 duration 秒內以 concurrency 個執行緒持續送出請求，回傳統計結果"""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        nonlocal errors
+        rng = random.Random(seed)
+        session = requests.Session()
+        local_latencies, local_errors = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(base_url + rng.choice(paths), timeout=30)
+                if response.status_code != 200:
+                    local_errors += 1
+            except requests.exceptions.RequestException:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+def parse_target(value):
+    name, sep, url = value.partition('=')
+    if not sep or not url:
+        raise argparse.ArgumentTypeError("格式應為 名稱=網址，例如 flask=http://127.0.0.1:5000")
+    return name, url.rstrip('/')
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='AQI API 壓力測試 (比較不同服務模式的吞吐量)')
+    parser.add_argument('--target', type=parse_target, action='append', required=True,
+                        help='受測服務，格式為 名稱=網址，可重複指定')
+    parser.add_argument('--concurrency', type=int, default=20, help='同時連線數 (預設: 20)')
+    parser.add_argument('--duration', type=float, default=20, help='每個服務的測試秒數 (預設: 20)')
+    parser.add_argument('--warmup', type=float, default=3, help='正式測試前的暖機秒數 (預設: 3)')
+    parser.add_argument('--year', type=int, default=time.localtime().tm_year - 1, help='歷史查詢使用的年份')
+    args = parser.parse_args()
+
+    paths = build_request_mix(args.year)
+    results = {}
+    for name, url in args.target:
+        print(f"[*] 正在測試 {name} ({url})：並行 {args.concurrency}，{args.duration:g} 秒...")
+        if args.warmup > 0:
+            run_target(url, paths, args.concurrency, args.warmup)
+        results[name] = run_target(url, paths, args.concurrency, args.duration)
+
+    print("\n" + "=" * 78)
+    print(f"{'服務':<10}{'請求數':>10}{'錯誤':>8}{'req/s':>10}{'平均 ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}{r['mean_ms']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    print("=" * 78)
+
+if __name__ == '__main__':
+    main()
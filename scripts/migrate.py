@@ -0,0 +1,101 @@
+# =============================================================================
+# AQI 資料庫結構遷移工具
+#
+# 依檔名順序套用 database/migrations/ 下尚未執行過的 .sql 檔案，
+# 已套用的版本記錄於 schema_migrations 資料表 (版本號 = 檔名去掉 .sql)。
+#
+# 使用說明:
+# 1. 查看各版本的套用狀態:
+#    python migrate.py --status
+#
+# 2. 套用所有尚未執行的遷移:
+#    python migrate.py
+# =============================================================================
+
+import os
+import logging
+import argparse
+from sqlalchemy import text
+from import_lean_data import create_db_engine, PROJECT_ROOT
+
+MIGRATIONS_PATH = os.path.join(PROJECT_ROOT, 'database', 'migrations')
+
+CREATE_VERSION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS `schema_migrations` (
+      `version`           VARCHAR(255) NOT NULL,
+      `applied_at`        TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      PRIMARY KEY (`version`)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def list_migrations():
+    """回傳 (版本號, 檔案路徑) 列表，依檔名排序"""
+    files = sorted(f for f in os.listdir(MIGRATIONS_PATH) if f.endswith('.sql'))
+    return [(f[:-len('.sql')], os.path.join(MIGRATIONS_PATH, f)) for f in files]
+
+def split_statements(sql_script):
+    """去除 -- 註解後，以行尾分號切分為單一 SQL 語句"""
+    lines = [line for line in sql_script.splitlines() if not line.strip().startswith('--')]
+    statements, current = [], []
+    for line in lines:
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            statements.append('\n'.join(current).strip().rstrip(';'))
+            current = []
+    if ''.join(current).strip():
+        statements.append('\n'.join(current).strip())
+    return statements
+
+def get_applied_versions(engine):
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_VERSION_TABLE_SQL))
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def run_status(engine):
+    applied = get_applied_versions(engine)
+    for version, _ in list_migrations():
+        logging.info(f"[{'x' if version in applied else ' '}] {version}")
+
+def run_migrations(engine):
+    """依序套用尚未執行的遷移；任一語句失敗即停止，後續版本不會執行"""
+    applied = get_applied_versions(engine)
+    pending = [(v, p) for v, p in list_migrations() if v not in applied]
+    if not pending:
+        logging.info("資料庫結構已是最新版本。")
+        return True
+
+    for version, path in pending:
+        logging.info(f"--- 正在套用 {version} ---")
+        with open(path, 'r', encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        try:
+            # MySQL 的 DDL 會隱含提交，因此每個版本只能逐句執行，失敗時需人工檢查；
+            # 以 exec_driver_sql 原樣送出，避免 SQL 內的 ':' 被當成綁定參數
+            with engine.connect() as conn:
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+                conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+                conn.commit()
+        except Exception as e:
+            logging.error(f"套用 {version} 失敗，已停止後續遷移: {e}")
+            return False
+        logging.info(f"{version} 套用完成。")
+    return True
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='AQI 資料庫結構遷移工具')
+    parser.add_argument('--status', action='store_true', help='僅列出各遷移版本的套用狀態。')
+    args = parser.parse_args()
+
+    engine = create_db_engine()
+    if not engine: return
+
+    if args.status:
+        run_status(engine)
+    else:
+        run_migrations(engine)
+
+if __name__ == '__main__':
+    main()
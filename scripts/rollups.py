@@ -0,0 +1,214 @@
+# =============================================================================
+# AQI 歷史資料彙總表 (Rollup) 維護工具
+#
+# 將 historical_aqi_analysis 的逐時資料預先彙總為「日 / 月 / 年」三層、
+# 「測站 / 縣市」兩種維度的彙總表，歷史分析 API 只需讀取彙總表即可回應。
+#
+# 每層彙總皆保存 AQI 總和 (AqiSum) 與筆數 (AqiCount)，平均值以 SUM/COUNT 重組，
+# 與直接對原始資料做 AVG(AQI) 的結果完全一致；月、年兩層另外保存以「日平均 AQI」
+# 判定的良好 (<= 50) / 普通 (51-100) / 不健康 (> 100) 天數。
+# 原始資料只存 SiteId，測站所屬縣市取自 stations / counties 維度表 (見 aqi/dimensions.py)。
+#
+# 使用說明:
+# 1. 全部重建 (import_lean_data.py --import 完成後會自動執行):
+#    python rollups.py --rebuild
+#
+# 2. 只重算某段日期 (含頭尾兩天，會自動擴展至整月 / 整年):
+#    python rollups.py --refresh --start 2024-01-01 --end 2024-01-31
+# =============================================================================
+
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+
+SOURCE_TABLE = 'historical_aqi_analysis'
+
+# --- AQI 等級門檻 (與前端圖表的分級一致) ---
+GOOD_MAX_AQI = 50
+MODERATE_MAX_AQI = 100
+
+# 遞增歷史資料的版本水位，讓 API 回應快取失效 (見 aqi/cache.py)
+BUMP_HISTORICAL_VERSION_SQL = """
+    INSERT INTO data_versions (name, version) VALUES ('historical', 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+ROLLUP_TABLES = [
+    'rollup_site_daily', 'rollup_county_daily',
+    'rollup_site_monthly', 'rollup_county_monthly',
+    'rollup_site_yearly', 'rollup_county_yearly',
+]
+
+# --- 日彙總：測站層直接由原始資料計算，縣市層再由測站層合併 ---
+SITE_DAILY_SQL = f"""
+    INSERT INTO rollup_site_daily (County, SiteId, Day, AqiSum, AqiCount)
+    SELECT c.Name, h.SiteId, DATE(h.DataCreationDate), SUM(h.AQI), COUNT(h.AQI)
+    FROM {SOURCE_TABLE} h
+    JOIN stations s ON s.SiteId = h.SiteId
+    JOIN counties c ON c.CountyId = s.CountyId
+    WHERE h.DataCreationDate >= :start AND h.DataCreationDate < :end
+      AND h.AQI IS NOT NULL
+    GROUP BY c.Name, h.SiteId, DATE(h.DataCreationDate)
+"""
+
+COUNTY_DAILY_SQL = """
+    INSERT INTO rollup_county_daily (County, Day, AqiSum, AqiCount)
+    SELECT County, Day, SUM(AqiSum), SUM(AqiCount)
+    FROM rollup_site_daily
+    WHERE Day >= :start AND Day < :end
+    GROUP BY County, Day
+"""
+
+# 日平均 <= 50 等價於 AqiSum <= 50 * AqiCount，以整數比較避免除法的捨入誤差
+_DAY_LEVEL_COLUMNS = f"""
+    SUM(AqiSum <= {GOOD_MAX_AQI} * AqiCount),
+    SUM(AqiSum > {GOOD_MAX_AQI} * AqiCount AND AqiSum <= {MODERATE_MAX_AQI} * AqiCount),
+    SUM(AqiSum > {MODERATE_MAX_AQI} * AqiCount)
+"""
+
+SITE_MONTHLY_SQL = f"""
+    INSERT INTO rollup_site_monthly
+    (County, SiteId, Year, Month, AqiSum, AqiCount, GoodDays, ModerateDays, UnhealthyDays)
+    SELECT County, SiteId, YEAR(Day), MONTH(Day), SUM(AqiSum), SUM(AqiCount), {_DAY_LEVEL_COLUMNS}
+    FROM rollup_site_daily
+    WHERE Day >= :start AND Day < :end
+    GROUP BY County, SiteId, YEAR(Day), MONTH(Day)
+"""
+
+COUNTY_MONTHLY_SQL = f"""
+    INSERT INTO rollup_county_monthly
+    (County, Year, Month, AqiSum, AqiCount, GoodDays, ModerateDays, UnhealthyDays)
+    SELECT County, YEAR(Day), MONTH(Day), SUM(AqiSum), SUM(AqiCount), {_DAY_LEVEL_COLUMNS}
+    FROM rollup_county_daily
+    WHERE Day >= :start AND Day < :end
+    GROUP BY County, YEAR(Day), MONTH(Day)
+"""
+
+SITE_YEARLY_SQL = """
+    INSERT INTO rollup_site_yearly
+    (County, SiteId, Year, AqiSum, AqiCount, GoodDays, ModerateDays, UnhealthyDays)
+    SELECT County, SiteId, Year, SUM(AqiSum), SUM(AqiCount),
+           SUM(GoodDays), SUM(ModerateDays), SUM(UnhealthyDays)
+    FROM rollup_site_monthly
+    WHERE Year >= :start_year AND Year < :end_year
+    GROUP BY County, SiteId, Year
+"""
+
+COUNTY_YEARLY_SQL = """
+    INSERT INTO rollup_county_yearly
+    (County, Year, AqiSum, AqiCount, GoodDays, ModerateDays, UnhealthyDays)
+    SELECT County, Year, SUM(AqiSum), SUM(AqiCount),
+           SUM(GoodDays), SUM(ModerateDays), SUM(UnhealthyDays)
+    FROM rollup_county_monthly
+    WHERE Year >= :start_year AND Year < :end_year
+    GROUP BY County, Year
+"""
+
+
+def _month_floor(day):
+    return day.replace(day=1)
+
+def _next_month(day):
+    return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+
+def refresh_rollups_in_conn(conn, start_day, end_day):
+    """在既有交易中重算 [start_day, end_day] 涵蓋的所有彙總列 (月、年層會擴展至完整月份 / 年份)"""
+    # 日層只重算受影響的日期；月、年層必須重算整月 / 整年，才能包含範圍外的其他天
+    day_range = {"start": start_day, "end": end_day + timedelta(days=1)}
+    month_range = {"start": _month_floor(start_day), "end": _next_month(end_day)}
+    year_keys = {"start_year": start_day.year, "end_year": end_day.year + 1}
+
+    conn.execute(text("DELETE FROM rollup_site_daily WHERE Day >= :start AND Day < :end"), day_range)
+    conn.execute(text(SITE_DAILY_SQL), day_range)
+    conn.execute(text("DELETE FROM rollup_county_daily WHERE Day >= :start AND Day < :end"), day_range)
+    conn.execute(text(COUNTY_DAILY_SQL), day_range)
+
+    month_keys = "(Year * 100 + Month) >= :start_key AND (Year * 100 + Month) < :end_key"
+    month_key_params = {
+        "start_key": month_range["start"].year * 100 + month_range["start"].month,
+        "end_key": month_range["end"].year * 100 + month_range["end"].month,
+    }
+    for table, insert_sql in (('rollup_site_monthly', SITE_MONTHLY_SQL), ('rollup_county_monthly', COUNTY_MONTHLY_SQL)):
+        conn.execute(text(f"DELETE FROM {table} WHERE {month_keys}"), month_key_params)
+        conn.execute(text(insert_sql), month_range)
+
+    for table, insert_sql in (('rollup_site_yearly', SITE_YEARLY_SQL), ('rollup_county_yearly', COUNTY_YEARLY_SQL)):
+        conn.execute(text(f"DELETE FROM {table} WHERE Year >= :start_year AND Year < :end_year"), year_keys)
+        conn.execute(text(insert_sql), year_keys)
+
+def refresh_rollups(engine, start_day, end_day):
+    """以單一交易重算指定日期範圍的彙總表，供增量匯入後呼叫"""
+    with engine.begin() as conn:
+        refresh_rollups_in_conn(conn, start_day, end_day)
+        conn.execute(text(BUMP_HISTORICAL_VERSION_SQL))
+    logging.info(f"彙總表已更新：{start_day} ~ {end_day}")
+
+def rebuild_rollups(engine):
+    """依原始資料的年份逐年重建所有彙總表，並刪除範圍外的舊彙總列
+
+    不先清空彙總表：每一年在自己的交易中以新結果取代舊結果，重建期間 API 仍可讀到完整資料。
+    """
+    logging.info("--- 正在重建歷史彙總表 ---")
+    with engine.connect() as conn:
+        first_year, last_year = conn.execute(
+            text(f"SELECT YEAR(MIN(DataCreationDate)), YEAR(MAX(DataCreationDate)) FROM {SOURCE_TABLE}")).one()
+
+    if first_year is None:
+        with engine.begin() as conn:
+            for table in ROLLUP_TABLES:
+                conn.execute(text(f"DELETE FROM {table}"))
+            conn.execute(text(BUMP_HISTORICAL_VERSION_SQL))
+        logging.warning(f"'{SOURCE_TABLE}' 中沒有資料，彙總表已清空。")
+        return
+
+    # 逐年分批，避免單一交易過大
+    for year in range(first_year, last_year + 1):
+        with engine.begin() as conn:
+            refresh_rollups_in_conn(conn, date(year, 1, 1), date(year, 12, 31))
+        logging.info(f"{year} 年彙總完成。")
+
+    with engine.begin() as conn:
+        day_bounds = {"start": date(first_year, 1, 1), "end": date(last_year + 1, 1, 1)}
+        year_bounds = {"first_year": first_year, "last_year": last_year}
+        for table in ROLLUP_TABLES:
+            if table.endswith('_daily'):
+                conn.execute(text(f"DELETE FROM {table} WHERE Day < :start OR Day >= :end"), day_bounds)
+            else:
+                conn.execute(text(f"DELETE FROM {table} WHERE Year < :first_year OR Year > :last_year"), year_bounds)
+        conn.execute(text(BUMP_HISTORICAL_VERSION_SQL))
+    logging.info("彙總表重建完成！")
+
+
+def _parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main():
+    """主執行函式，處理命令列參數"""
+    parser = argparse.ArgumentParser(description='AQI 歷史資料彙總表維護工具')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--rebuild', action='store_true', help='清空並重建所有彙總表。')
+    group.add_argument('--refresh', action='store_true', help='僅重算 --start 與 --end 之間的日期。')
+    parser.add_argument('--start', type=_parse_day, help='起始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end', type=_parse_day, help='結束日期 (YYYY-MM-DD，含當天)')
+    args = parser.parse_args()
+
+    if args.refresh and (not args.start or not args.end):
+        parser.error('--refresh 需要同時指定 --start 與 --end')
+
+    # 沿用匯入工具的 .env 載入與連線設定
+    from import_lean_data import create_db_engine
+    engine = create_db_engine()
+    if not engine: return
+
+    if args.rebuild:
+        rebuild_rollups(engine)
+    else:
+        refresh_rollups(engine, args.start, args.end)
+
+    # 已啟用歷史分析靜態快照時一併重新匯出 (只重新產生受影響的回應)
+    from export_snapshots import export_if_enabled
+    export_if_enabled(engine)
+
+if __name__ == '__main__':
+    main()
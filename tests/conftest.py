@@ -0,0 +1,46 @@
+# =============================================================================
+# 測試共用設定 (在專案根目錄執行：python -m pytest)
+#
+# 不需要 MySQL：API 測試以 benchmarks/ 產生的合成資料載入 SQLite 替身 (benchmarks/standin.py)。
+# dashboard_api、crawler 在匯入時讀取環境變數，需先經 harness.configure_environment() 設定後才匯入。
+# =============================================================================
+
+import os
+import sys
+from datetime import datetime
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import generator, harness    # harness 會將 scripts/ 加入 sys.path
+
+STATIONS = 6
+END_YEAR = 2024
+API_HOURS = 30
+
+
+@pytest.fixture(scope='session')
+def data_dir(tmp_path_factory):
+    data_dir = str(tmp_path_factory.mktemp('benchmark_data'))
+    generator.generate(data_dir, STATIONS, 1, END_YEAR, seed=7, api_hours=API_HOURS)
+    harness.configure_environment(data_dir)
+    return data_dir
+
+@pytest.fixture(scope='session')
+def dataset(data_dir):
+    return generator.load_dataset(data_dir)
+
+@pytest.fixture(scope='session')
+def standin(data_dir, dataset):
+    """已載入合成資料 (含 rollup_* 彙總表) 的 SQLite 替身引擎"""
+    feed_rows = generator.api_feed_rows(dataset, datetime.now(), dataset['api_hours'])
+    return harness.prepare_standin(data_dir, dataset, feed_rows, 'mysql')
+
+@pytest.fixture(scope='session')
+def api_app(standin):
+    import dashboard_api
+
+    dashboard_api.engine = standin
+    return dashboard_api.app
@@ -0,0 +1,106 @@
+# aqi/aggregation.py：分批歸約的結果與逐筆計算相同，與批次的切法無關；API 的結果與 rollup_* 一致
+
+import random
+from urllib.parse import quote
+import numpy as np
+import pytest
+from aqi.aggregate import parse_aggregate_query, EXCEEDANCE
+from aqi.aggregation import Aggregation
+
+YEAR = 2024
+
+
+def readings(seed, count=5000):
+    """(時間 datetime64[h], {欄位: float 陣列})；約兩成缺值"""
+    rng = np.random.default_rng(seed)
+    hours = np.datetime64(f'{YEAR}-01-01T00', 'h') + rng.integers(0, 24 * 366, count)
+    values = {}
+    for column, high in (('AQI', 200), ('O3', 180)):
+        column_values = rng.integers(0, high, count).astype(np.float64)
+        column_values[rng.random(count) < 0.2] = np.nan
+        values[column] = column_values
+    return hours, values
+
+def brute_force(query, hours, values):
+    """以 Python 逐筆分組：期間 -> 欄位 -> 統計"""
+    unit = {'year': 'Y', 'month': 'M', 'day': 'D'}[query['group']]
+    periods = {}
+    for i, hour in enumerate(hours):
+        period = str(hour.astype(f'datetime64[{unit}]'))
+        day = str(hour.astype('datetime64[D]'))
+        for column, column_values in values.items():
+            if not np.isnan(column_values[i]):
+                periods.setdefault(period, {}).setdefault(column, {}).setdefault(day, []).append(column_values[i])
+    expected = {}
+    for period, columns in periods.items():
+        for column, days in columns.items():
+            every = [value for day_values in days.values() for value in day_values]
+            limit, basis = EXCEEDANCE[column]
+            daily = [np.mean(v) if basis == 'mean' else max(v) for v in days.values()]
+            expected[(period, column)] = {
+                'mean': round(float(np.mean(every)), 2),
+                'max': max(every),
+                'p95': round(float(np.percentile(every, 95)), 2),
+                'exceedance_days': sum(1 for value in daily if value > limit),
+            }
+    return expected
+
+def aggregate(query, hours, values, batches):
+    aggregation = Aggregation(query)
+    bounds = sorted(random.Random(batches).sample(range(1, len(hours)), batches - 1)) if batches > 1 else []
+    for start, end in zip([0] + bounds, bounds + [len(hours)]):
+        aggregation.add(hours[start:end], {column: column_values[start:end] for column, column_values in values.items()})
+    return aggregation.result()
+
+
+@pytest.mark.parametrize('group', ['year', 'month', 'day'])
+@pytest.mark.parametrize('batches', [1, 7, 40])
+def test_aggregation_matches_brute_force(group, batches):
+    query = parse_aggregate_query({'metric': 'aqi,o3', 'county': '臺北市', 'group': group, 'year': str(YEAR),
+                                   'stat': 'mean,max,p95,exceedance_days'})
+    hours, values = readings(seed=batches)
+    result = aggregate(query, hours, values, batches)
+    expected = brute_force(query, hours, values)
+
+    assert result['periods'] == sorted({period for period, _ in expected})
+    for name, column in (('aqi', 'AQI'), ('o3', 'O3')):
+        metric = result['metrics'][name]
+        assert metric['limit'] == EXCEEDANCE[column][0]
+        for i, period in enumerate(result['periods']):
+            stats = expected.get((period, column))
+            for stat in query['stats']:
+                if stats is None:
+                    assert metric[stat][i] is None
+                else:
+                    assert metric[stat][i] == pytest.approx(stats[stat], abs=0.01), (name, period, stat)
+
+def test_empty_aggregation_lists_requested_stats():
+    query = parse_aggregate_query({'metric': 'aqi', 'county': '臺北市', 'stat': 'mean,p95'})
+    result = Aggregation(query).result()
+    assert result['periods'] == []
+    assert result['metrics']['aqi']['mean'] == [] and result['metrics']['aqi']['p95'] == []
+
+def test_add_rows_accepts_sql_rows():
+    query = parse_aggregate_query({'metric': 'aqi,o3', 'county': '臺北市', 'group': 'day', 'year': str(YEAR),
+                                   'stat': 'mean,max'})
+    aggregation = Aggregation(query)
+    aggregation.add_rows([(f'{YEAR}-05-01 01:00:00', 40, None), (f'{YEAR}-05-01 02:00:00', 60, 130),
+                          (f'{YEAR}-05-02 00:00:00', None, 20)])
+    result = aggregation.result()
+    assert result['periods'] == [f'{YEAR}-05-01', f'{YEAR}-05-02']
+    assert result['metrics']['aqi'] == {'unit': None, 'limit': 100, 'mean': [50, None], 'max': [60, None]}
+    assert result['metrics']['o3']['max'] == [130, 20]
+
+
+def test_aggregate_matches_rollups(api_app, dataset):
+    # 通用彙總直接讀取讀數，結果需與 rollup_* 彙總表的年平均、不健康日數相同
+    client = api_app.test_client()
+    county, year = quote(dataset['stations'][0]['County']), dataset['end_year']
+    aggregate = client.get(f'/api/historical/aggregate?metric=aqi&county={county}&group=year&year={year}'
+                           f'&stat=mean,exceedance_days').get_json()
+    # county-report 在 Python 中計算平均 (annual-trend 的 SQL 除法在 SQLite 替身為整數除法)
+    report = client.get(f'/api/historical/county-report?county={county}&year={year}').get_json()
+    trend = {row['year']: row['average_aqi'] for row in report['annual_trend']}
+    assert aggregate['periods'] == [str(year)]
+    assert round(aggregate['metrics']['aqi']['mean'][0]) == trend[year]     # 年度趨勢四捨五入至整數
+    assert aggregate['metrics']['aqi']['exceedance_days'] == [report['unhealthy_days']['unhealthy_days']]
@@ -0,0 +1,46 @@
+# dashboard_api.py：以 SQLite 替身執行所有 /api/* 路由 (路由與參數與 benchmark 相同，見 benchmarks/harness.py)
+
+import pytest
+from benchmarks import harness
+
+
+@pytest.fixture(scope='module')
+def client(api_app):
+    return api_app.test_client()
+
+
+def test_every_api_route_is_covered(api_app, dataset):
+    assert harness.uncovered_routes(api_app, harness.api_routes(dataset)) == []
+
+def test_api_routes_return_data(client, dataset):
+    for name, _, path in harness.api_routes(dataset):
+        response = client.get(path)
+        assert response.status_code == 200, (name, response.get_data(as_text=True))
+        assert response.get_json(), name
+
+def test_county_summary_matches_latest_readings(client, dataset):
+    summary = {row['County']: row['average_aqi'] for row in client.get('/api/county-summary').get_json()}
+    assert set(summary) <= {station['County'] for station in dataset['stations']}
+    stations = client.get('/api/stations').get_json()
+    assert {row['SiteId'] for row in stations} == {station['SiteId'] for station in dataset['stations']}
+
+def test_nearest_stations_are_sorted(client, dataset):
+    station = dataset['stations'][0]
+    rows = client.get(f"/api/stations/nearest?lat={station['Latitude']}&lon={station['Longitude']}&k=3").get_json()
+    assert len(rows) == 3 and rows[0]['SiteId'] == station['SiteId']
+    assert [row['distance_km'] for row in rows] == sorted(row['distance_km'] for row in rows)
+
+@pytest.mark.parametrize('path', [
+    '/api/historical/aggregate?metric=nope&county=x',
+    '/api/historical/aggregate?metric=aqi',
+    '/api/stations?bbox=1,2,3',
+    '/api/stations/nearest?lat=abc&lon=121',
+    '/api/aqi-estimate?lat=25',
+    '/api/stations/1/series?points=2',
+    '/api/county-data/x?format=xml',
+    '/api/historical/unhealthy-days-count?county=x&year=abc',
+    '/api/historical/county-report?county=x&year=2024a',
+])
+def test_invalid_parameters_are_rejected(client, path):
+    response = client.get(path)
+    assert response.status_code == 400 and 'error' in response.get_json()
@@ -0,0 +1,133 @@
+# scripts/crawler.py fetch_data_since：以 FakeAqiApi (benchmarks/standin.py) 驗證分頁、分頁位移與重試
+
+import os
+from datetime import datetime
+import pytest
+from benchmarks import generator
+from benchmarks.standin import FakeAqiApi
+
+pytest.importorskip('MySQLdb')     # crawler.py 匯入時需要 mysqlclient
+
+PAGE_SIZE = 7
+
+
+@pytest.fixture(scope='module')
+def crawler(data_dir):
+    import crawler
+
+    return crawler
+
+@pytest.fixture(scope='module')
+def feed(data_dir, dataset):
+    path = os.path.join(data_dir, 'crawler_feed.csv')
+    rows = generator.api_feed_rows(dataset, datetime(2025, 6, 1, 12), 10)
+    generator.write_api_feed(rows, path)
+    return path, rows
+
+@pytest.fixture
+def sleeps(crawler, monkeypatch):
+    """記錄退避的秒數而不實際等待"""
+    delays = []
+    monkeypatch.setattr(crawler.time, 'sleep', delays.append)
+    return delays
+
+def keys(df):
+    return [(int(site_id), str(created)) for site_id, created in zip(df['siteid'], df['datacreationdate'])]
+
+def feed_keys(rows):
+    return [(row['siteid'], row['datacreationdate']) for row in rows]
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_fetches_every_page(crawler, feed, sleeps, concurrency):
+    api = FakeAqiApi(feed[0]).start()
+    try:
+        df = crawler.fetch_data_since(datetime(2025, 1, 1), api_url=api.url, page_size=PAGE_SIZE, concurrency=concurrency)
+    finally:
+        api.shutdown()
+    rows = feed[1]
+    assert keys(df) == feed_keys(rows)
+    # 每頁的 offset 依序遞增 PAGE_SIZE，直到出現不滿的一頁 (並行時最後一批可能多請求幾頁空白頁)
+    pages = -(-len(rows) // PAGE_SIZE)
+    assert sorted(api.offsets)[:pages] == [page * PAGE_SIZE for page in range(pages)]
+    assert len(api.offsets) < pages + concurrency
+    assert sleeps == []
+
+def test_filters_rows_after_start_time(crawler, feed, sleeps):
+    api = FakeAqiApi(feed[0]).start()
+    since = feed[1][len(feed[1]) // 2]['datacreationdate']
+    try:
+        df = crawler.fetch_data_since(datetime.fromisoformat(since), api_url=api.url, page_size=PAGE_SIZE)
+    finally:
+        api.shutdown()
+    assert keys(df) == [key for key in feed_keys(feed[1]) if key[1] > since]
+
+
+class ShiftingApi(FakeAqiApi):
+    """第一頁回應之後，API 在最前面多出一列 (例如補上較早的資料)，之後每一頁都往後位移一列"""
+
+    def page(self, since, offset, limit):
+        body = super().page(since, offset, limit)
+        if offset == 0 and not getattr(self, 'shifted', False):
+            self.shifted = True
+            late = list(self.rows[0])
+            late[self.header.index('siteid')] = '999'
+            self.rows.insert(0, late)
+        return body
+
+
+def test_rows_shifting_between_pages_are_deduplicated(crawler, feed, sleeps):
+    api = ShiftingApi(feed[0]).start()
+    try:
+        df = crawler.fetch_data_since(datetime(2025, 1, 1), api_url=api.url, page_size=PAGE_SIZE, concurrency=1)
+    finally:
+        api.shutdown()
+    expected = feed_keys(feed[1])
+    fetched = keys(df)
+    # 每一頁的第一列都是前一頁最後一列的重複，但沒有任何一列遺漏
+    assert len(fetched) > len(expected) and set(fetched) == set(expected)
+    cleaned = crawler.clean_and_prepare_data(df.copy())
+    assert len(cleaned) == len(expected)
+    assert {(row.SiteId, row.DataCreationDate.strftime(generator.DATETIME_FORMAT))
+            for row in cleaned.itertuples()} == set(expected)
+
+
+def test_retries_429_and_5xx_with_backoff(crawler, feed, sleeps):
+    api = FakeAqiApi(feed[0]).start()
+    api.failures.extend([429, 503, 500])
+    try:
+        df = crawler.fetch_data_since(datetime(2025, 1, 1), api_url=api.url, page_size=PAGE_SIZE, concurrency=1)
+    finally:
+        api.shutdown()
+    assert keys(df) == feed_keys(feed[1])
+    base = crawler.RETRY_BACKOFF_SECONDS
+    assert sleeps == [base, base * 2, base * 4]
+
+def test_gives_up_after_max_retries(crawler, feed, sleeps):
+    api = FakeAqiApi(feed[0]).start()
+    api.failures.extend([502] * (crawler.MAX_RETRIES + 1))
+    try:
+        assert crawler.fetch_data_since(datetime(2025, 1, 1), api_url=api.url, page_size=PAGE_SIZE) is None
+    finally:
+        api.shutdown()
+    assert len(sleeps) == crawler.MAX_RETRIES
+    assert api.offsets == []
+
+def test_failed_later_page_discards_the_whole_fetch(crawler, feed, sleeps):
+    api = FakeAqiApi(feed[0]).start()
+    # 第一頁成功後，第二頁在所有重試都失敗：不回傳有缺口的資料
+    api.failures.extend([None] + [503] * (crawler.MAX_RETRIES + 1))
+    try:
+        assert crawler.fetch_data_since(datetime(2025, 1, 1), api_url=api.url, page_size=PAGE_SIZE, concurrency=1) is None
+    finally:
+        api.shutdown()
+    assert api.offsets[0] == 0
+
+def test_client_errors_are_not_retried(crawler, feed, sleeps):
+    api = FakeAqiApi(feed[0]).start()
+    api.failures.append(404)
+    try:
+        assert crawler.fetch_data_since(datetime(2025, 1, 1), api_url=api.url, page_size=PAGE_SIZE) is None
+    finally:
+        api.shutdown()
+    assert sleeps == [] and api.requests_served == 1
@@ -0,0 +1,46 @@
+# scripts/import_lean_data.py run_incremental：只重算實際寫入的日期 (合併為連續區間)
+
+from datetime import date, datetime
+import pytest
+
+
+@pytest.fixture(scope='module')
+def importer(data_dir):
+    import import_lean_data
+
+    return import_lean_data
+
+
+def test_day_ranges_merges_consecutive_days(importer):
+    days = {date(2024, 1, 3), date(2024, 1, 1), date(2024, 1, 2), date(2024, 3, 1), date(2021, 12, 31), date(2022, 1, 1)}
+    assert importer.day_ranges(days) == [
+        (date(2021, 12, 31), date(2022, 1, 1)), (date(2024, 1, 1), date(2024, 1, 3)), (date(2024, 3, 1), date(2024, 3, 1)),
+    ]
+    assert importer.day_ranges(set()) == []
+
+def test_files_years_apart_refresh_only_their_days(importer, standin, monkeypatch):
+    chunks = {
+        '2019.json': [[datetime(2019, 5, 1, 3), datetime(2019, 5, 2, 23)], [datetime(2019, 5, 3, 0)]],
+        '2024.json': [[datetime(2024, 7, 9, 0)]],
+    }
+
+    def run_pipeline(json_files, handle_chunk, *args, **kwargs):
+        for file_name in json_files:
+            for chunk_index, moments in enumerate(chunks[file_name]):
+                handle_chunk(file_name, [{'DataCreationDate': moment} for moment in moments], chunk_index)
+            yield file_name, {'written': 1, 'valid': 1}
+
+    calls = []
+    monkeypatch.setattr(importer, 'plan_incremental', lambda *args: {file_name: 0 for file_name in chunks})
+    monkeypatch.setattr(importer, 'run_pipeline', run_pipeline)
+    monkeypatch.setattr(importer, 'encode_chunk', lambda conn, records: records)
+    monkeypatch.setattr(importer, 'replace_chunk', lambda conn, records, *args: len(records))
+    monkeypatch.setattr(importer, 'finish_file', lambda *args: None)
+    monkeypatch.setattr(importer, 'store_enabled', lambda: True)
+    monkeypatch.setattr(importer, 'refresh_columnar_store', lambda engine, start, end: calls.append(('columnar', start, end)))
+    monkeypatch.setattr(importer, 'refresh_rollups', lambda engine, start, end: calls.append(('rollups', start, end)))
+    monkeypatch.setattr(importer, 'export_if_enabled', lambda engine: calls.append(('snapshots',)))
+
+    importer.run_incremental(standin, list(chunks))
+    ranges = [(date(2019, 5, 1), date(2019, 5, 3)), (date(2024, 7, 9), date(2024, 7, 9))]
+    assert calls == ([('columnar', *r) for r in ranges] + [('rollups', *r) for r in ranges] + [('snapshots',)])
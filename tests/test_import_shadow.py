@@ -0,0 +1,50 @@
+# scripts/import_lean_data.py 影子資料表切換：正式資料表中匯入檔案沒有的列不會遺失
+
+from datetime import datetime
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def importer(data_dir):
+    import import_lean_data
+
+    return import_lean_data
+
+@pytest.fixture
+def shadow(importer, standin):
+    """與正式資料表結構相同的空白影子資料表 (SQLite 沒有 CREATE TABLE ... LIKE)"""
+    with standin.begin() as conn:
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"),
+                           {"name": importer.TARGET_TABLE}).scalar()
+        conn.execute(text(f"DROP TABLE IF EXISTS {importer.SHADOW_TABLE}"))
+        conn.execute(text(ddl.replace(importer.TARGET_TABLE, importer.SHADOW_TABLE, 1)))
+    yield importer.SHADOW_TABLE
+    with standin.begin() as conn:
+        conn.execute(text(f"DROP TABLE {importer.SHADOW_TABLE}"))
+
+
+def test_carry_over_copies_every_missing_row(importer, standin, shadow, dataset):
+    year = dataset['end_year']
+    imported = {"start": datetime(year, 6, 1), "end": datetime(year, 7, 1)}
+    with standin.begin() as conn:
+        # 匯入檔案只有六月 (且 AQI 與正式資料表不同)；其他月份包含比匯入檔案更早、更晚的列
+        conn.execute(text(f"""
+            INSERT INTO {shadow} (SiteId, DataCreationDate, AQI, StatusId)
+            SELECT SiteId, DataCreationDate, AQI + 1, StatusId FROM {importer.TARGET_TABLE}
+            WHERE DataCreationDate >= :start AND DataCreationDate < :end AND AQI IS NOT NULL
+        """), imported)
+        target_rows = conn.execute(text(f"SELECT COUNT(*) FROM {importer.TARGET_TABLE}")).scalar()
+        imported_rows = conn.execute(text(f"SELECT COUNT(*) FROM {shadow}")).scalar()
+
+    carried = importer.carry_over_compacted_rows(standin)
+    with standin.connect() as conn:
+        assert carried == target_rows - imported_rows
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {shadow}")).scalar() == target_rows
+        # 主鍵相同的列以匯入檔案為準
+        differing = conn.execute(text(f"""
+            SELECT COUNT(*) FROM {shadow} s JOIN {importer.TARGET_TABLE} t
+              ON t.SiteId = s.SiteId AND t.DataCreationDate = s.DataCreationDate
+            WHERE s.AQI = t.AQI + 1
+        """)).scalar()
+        assert differing == imported_rows
@@ -0,0 +1,36 @@
+# 污染物濃度的範圍檢查以四捨五入後的值為準：進位後達到 DECIMAL 上限的讀數存為 NULL
+
+import pandas as pd
+import pytest
+
+RAW = ['9999.94', '9999.96', '-0.04', '0.04', 'ND', '']
+PM25 = [9999.9, None, None, 0.0, None, None]
+CO = ['999.994', '999.996', '12.346']
+CO_EXPECTED = [999.99, None, 12.35]
+
+
+@pytest.fixture(scope='module')
+def importer(data_dir):
+    import import_lean_data
+
+    return import_lean_data
+
+def values(series):
+    return [None if value is None else float(value) for value in series]
+
+
+def test_import_checks_bounds_after_rounding(importer):
+    assert values(importer._to_decimal_column(pd.Series(RAW), 'PM2_5')) == PM25
+    assert values(importer._to_decimal_column(pd.Series(CO), 'CO')) == CO_EXPECTED
+
+def test_crawler_checks_bounds_after_rounding(data_dir):
+    pytest.importorskip('MySQLdb')     # crawler.py 匯入時需要 mysqlclient
+    import crawler
+
+    df = pd.DataFrame({
+        'siteid': range(1, len(RAW) + 1), 'datacreationdate': ['2025-06-01 12:00'] * len(RAW),
+        'pm2.5': RAW, 'co': CO + CO,
+    })
+    cleaned = crawler.clean_and_prepare_data(df)
+    assert values(cleaned['PM2_5']) == PM25
+    assert values(cleaned['CO']) == CO_EXPECTED + CO_EXPECTED
@@ -0,0 +1,55 @@
+# aqi/realtime_feed.py：重新連線時依 Last-Event-ID 補送事件或改送完整快照
+
+import json
+import pytest
+from aqi.realtime_feed import RealtimeFeed
+
+HISTORY = 4
+
+
+def parse(event):
+    """SSE 訊息 -> (event, id, payload)"""
+    fields = dict(line.split(': ', 1) for line in event.decode('utf-8').strip().split('\n'))
+    return fields['event'], int(fields['id']), json.loads(fields['data'])
+
+def stations(version):
+    """每個版本只有測站 version % 5 的 AQI 提高 (前一版本提高的測站回到 50)"""
+    return [{'SiteId': site_id, 'County': '臺北市' if site_id < 3 else '新北市',
+             'AQI': 50 + (version if site_id == version % 5 else 0)} for site_id in range(5)]
+
+@pytest.fixture
+def feed():
+    feed = RealtimeFeed(history=HISTORY)
+    assert feed.apply(10, stations(10)) is None    # 第一次讀取只建立快照
+    for version in range(11, 20):
+        feed.apply(version, stations(version))
+    return feed
+
+
+def test_current_version_needs_nothing(feed):
+    assert feed.events_since('19') == []
+
+@pytest.mark.parametrize('last_event_id', ['18', '16'])
+def test_buffered_events_are_replayed_in_order(feed, last_event_id):
+    events = [parse(event) for event in feed.events_since(last_event_id)]
+    assert [event_id for _, event_id, _ in events] == list(range(int(last_event_id) + 1, 20))
+    for kind, event_id, payload in events:
+        assert kind == 'update' and payload['version'] == event_id
+        assert {row['SiteId'] for row in payload['stations']} == {(event_id - 1) % 5, event_id % 5}
+
+@pytest.mark.parametrize('last_event_id', [None, '', 'abc', '12', '14', '100', '-1'])
+def test_missing_or_unknown_id_gets_snapshot(feed, last_event_id):
+    # 12、14 已超出緩衝區 (只保留最近 HISTORY 則)；100、-1 不屬於目前的版本序列
+    (event,) = feed.events_since(last_event_id)
+    kind, event_id, payload = parse(event)
+    assert (kind, event_id) == ('snapshot', 19)
+    assert payload['stations'] == stations(19)
+    assert event is feed.snapshot()     # 同一版本的快照只編碼一次
+
+def test_update_lists_removed_stations_and_summary(feed):
+    event = feed.apply(20, stations(20)[:4])
+    _, _, payload = parse(event)
+    assert payload['removed'] == [4]
+    assert [row['SiteId'] for row in payload['stations']] == [0]     # 測站 4 (版本 19) 已移除
+    assert {row['County'] for row in payload['summary']} == {'臺北市', '新北市'}
+    assert len(feed.index) == 0     # 測試資料沒有座標，不列入空間索引
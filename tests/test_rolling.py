@@ -0,0 +1,123 @@
+# aqi/rolling.py：增量維護的滾動視窗與逐小時重新掃描的結果必須相同
+
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from aqi.rolling import StationWindows, RollingAggregator, WINDOWS, CAPACITY, MIN_COVERAGE, LOAD_SQL, number
+
+START = datetime(2024, 3, 1)
+
+
+class BruteForce:
+    """每小時只保留最後寫入的值，讀取時重新掃描整個視窗"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.values = {}
+        self.latest = None
+
+    def add(self, hour, values):
+        if self.latest is not None and hour <= self.latest - CAPACITY:
+            return
+        self.latest = hour if self.latest is None else max(self.latest, hour)
+        for metric in self.metrics:
+            self.values[(metric, hour)] = number(values.get(metric))
+
+    def summary(self):
+        result = {}
+        for metric in self.metrics:
+            stats = {}
+            for size in WINDOWS:
+                window = [self.values.get((metric, h)) for h in range(self.latest - size + 1, self.latest + 1)]
+                window = [value for value in window if value is not None]
+                enough = len(window) >= math.ceil(size * MIN_COVERAGE)
+                stats[f'avg_{size}h'] = round(sum(window) / len(window), 2) if enough else None
+                stats[f'max_{size}h'] = max(window) if enough else None
+            buffered = [self.values.get((metric, h)) for h in range(self.latest - CAPACITY + 1, self.latest + 1)]
+            if any(value is not None for value in buffered):
+                result[metric] = stats
+        return result
+
+
+def random_readings(rng, count):
+    """大致逐時前進，夾雜缺值、重抓的修正值、跳過數小時與超過緩衝區的空窗"""
+    hour = 0
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.15:
+            offset = hour - rng.randrange(0, CAPACITY + 6)     # 修正較早的小時 (可能早於緩衝區)
+        elif roll < 0.18:
+            hour += rng.randrange(CAPACITY, CAPACITY * 2)       # 測站停機超過緩衝區
+            offset = hour
+        else:
+            hour += rng.choice((1, 1, 1, 2, 3))
+            offset = hour
+        # PM2_5 以 0.5 為單位，浮點數總和沒有捨入誤差
+        values = {'AQI': None if rng.random() < 0.2 else rng.randrange(0, 300),
+                  'PM2_5': None if rng.random() < 0.3 else rng.randrange(0, 200) / 2}
+        yield offset, values
+
+
+def test_station_windows_match_brute_force():
+    rng = random.Random(11)
+    metrics = ('AQI', 'PM2_5')
+    windows, expected = StationWindows(metrics), BruteForce(metrics)
+    for hour, values in random_readings(rng, 3000):
+        windows.add(START + timedelta(hours=hour), values)
+        expected.add(hour, values)
+        assert windows.summary() == expected.summary()
+
+def test_station_windows_state_round_trip():
+    rng = random.Random(5)
+    windows = StationWindows()
+    for hour, values in random_readings(rng, 200):
+        windows.add(START + timedelta(hours=hour), values)
+    restored = StationWindows.from_state(*windows.state())
+    assert restored.summary() == windows.summary()
+    assert restored.state() == windows.state()
+
+
+class FakeCursor:
+    """station_rolling_windows 的記憶體替身 (即時資料表為空，新測站不會有種子讀數)"""
+
+    def __init__(self):
+        self.table = {}
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        if sql == LOAD_SQL:
+            self.rows = [(site_id, latest_hour, buffers) for site_id, (latest_hour, buffers, _) in self.table.items()]
+        else:
+            self.rows = []
+
+    def fetchall(self):
+        return self.rows
+
+    def executemany(self, sql, rows):
+        for site_id, latest_hour, buffers, summary in rows:
+            self.table[site_id] = (latest_hour, buffers, summary)
+
+
+def test_rolling_aggregator_matches_brute_force_across_restarts():
+    rng = random.Random(3)
+    metrics = ('AQI', 'PM2_5')
+    cursor = FakeCursor()
+    aggregator = RollingAggregator()
+    expected = {site_id: BruteForce(metrics) for site_id in (1, 2, 3)}
+    streams = {site_id: list(random_readings(rng, 300)) for site_id in expected}
+
+    for batch in range(0, 300, 25):
+        readings = []
+        for site_id, stream in streams.items():
+            for hour, values in stream[batch:batch + 25]:
+                readings.append((site_id, START + timedelta(hours=hour), values))
+        # 同一批內依時間排序後寫入 (與 update() 相同)，以比對同樣的順序
+        for site_id, moment, values in sorted(readings, key=lambda reading: reading[1]):
+            expected[site_id].add(int((moment - START).total_seconds() // 3600), values)
+        changed = aggregator.update(cursor, readings)
+        assert set(changed) <= set(expected)
+        for site_id, brute in expected.items():
+            assert json.loads(cursor.table[site_id][2]) == brute.summary()
+        if batch % 100 == 0:
+            aggregator = RollingAggregator()    # 模擬重新啟動：由資料表載入狀態
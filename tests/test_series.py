@@ -0,0 +1,65 @@
+# aqi/series.py：降採樣結果與教科書版本的 LTTB、逐區間的最小 / 最大值相同
+
+import math
+import random
+from datetime import datetime, timedelta
+import pytest
+from aqi.series import lttb, min_max
+
+
+def hourly_rows(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows, hour, value = [], 0, 50
+    for _ in range(count):
+        hour += rng.choice((1, 1, 1, 2, 5))     # 夾雜缺漏的小時
+        value = max(0, value + rng.randrange(-15, 16))
+        rows.append({'DataCreationDate': (start + timedelta(hours=hour)).strftime('%Y-%m-%d %H:%M:%S'), 'AQI': value})
+    return rows
+
+def reference_lttb(points, threshold):
+    """Steinarsson (2013) 的 LTTB；points 為 (x, y)，回傳選出的索引"""
+    n = len(points)
+    every = (n - 2) / (threshold - 2)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        avg_start, avg_end = math.floor((i + 1) * every) + 1, min(math.floor((i + 2) * every) + 1, n)
+        avg_x = sum(x for x, _ in points[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y for _, y in points[avg_start:avg_end]) / (avg_end - avg_start)
+        ax, ay = points[a]
+        best, best_area = None, -1
+        for j in range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay)) * 0.5
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    return selected + [n - 1]
+
+
+@pytest.mark.parametrize('count, threshold', [(1000, 100), (5000, 3), (777, 500), (50, 49)])
+def test_lttb_matches_reference(count, threshold):
+    rows = hourly_rows(count, seed=count)
+    points = [(datetime.fromisoformat(row['DataCreationDate']).timestamp() / 3600, row['AQI']) for row in rows]
+    assert lttb(rows, threshold) == [rows[i] for i in reference_lttb(points, threshold)]
+
+@pytest.mark.parametrize('count, threshold', [(1000, 100), (1001, 3), (100, 99)])
+def test_min_max_keeps_bucket_extremes(count, threshold):
+    rows = hourly_rows(count, seed=threshold)
+    selected = min_max(rows, threshold)
+    assert len(selected) <= threshold
+    assert selected == sorted(selected, key=lambda row: row['DataCreationDate'])
+    selected_ids = {id(row) for row in selected}
+    buckets = threshold // 2
+    for bucket in range(buckets):
+        bucket_rows = rows[bucket * count // buckets:(bucket + 1) * count // buckets]
+        kept = [row['AQI'] for row in bucket_rows if id(row) in selected_ids]
+        assert 1 <= len(kept) <= 2
+        assert min(kept) == min(row['AQI'] for row in bucket_rows)
+        assert max(kept) == max(row['AQI'] for row in bucket_rows)
+    assert max(row['AQI'] for row in rows) == max(row['AQI'] for row in selected)
+
+@pytest.mark.parametrize('downsample', [lttb, min_max])
+def test_short_series_is_returned_unchanged(downsample):
+    rows = hourly_rows(10, seed=0)
+    assert downsample(rows, 10) is rows and downsample(rows, 500) is rows
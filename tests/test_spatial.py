@@ -0,0 +1,68 @@
+# aqi/spatial.py：網格索引的查詢結果與逐一比對所有測站相同
+
+import random
+import pytest
+from aqi.spatial import StationIndex, haversine_km
+
+
+def random_stations(seed, count=300):
+    rng = random.Random(seed)
+    stations = []
+    for site_id in range(count):
+        missing = rng.random() < 0.05
+        stations.append({
+            'SiteId': site_id,
+            'Latitude': None if missing else rng.uniform(21.8, 26.4),
+            'Longitude': None if missing else rng.uniform(118.2, 122.1),
+            'AQI': None if rng.random() < 0.2 else rng.randrange(0, 200),
+        })
+    return stations
+
+def linear_nearest(stations, lat, lon, k, with_aqi=False):
+    candidates = [(haversine_km(lat, lon, s['Latitude'], s['Longitude']), s) for s in stations
+                  if s['Latitude'] is not None and not (with_aqi and s['AQI'] is None)]
+    return sorted(candidates, key=lambda candidate: candidate[0])[:k]
+
+# 網格內、網格外 (海上) 與遠離所有測站的查詢點
+QUERY_POINTS = [(25.03, 121.56), (22.6, 120.3), (23.5, 119.5), (24.0, 123.5), (18.0, 115.0), (35.0, 140.0)]
+
+
+@pytest.mark.parametrize('cell_degrees', [0.05, 0.2, 1.0])
+@pytest.mark.parametrize('k', [1, 5, 50])
+def test_nearest_matches_linear_scan(cell_degrees, k):
+    stations = random_stations(seed=k)
+    index = StationIndex(stations, cell_degrees)
+    rng = random.Random(cell_degrees)
+    points = QUERY_POINTS + [(rng.uniform(21, 27), rng.uniform(117, 123)) for _ in range(50)]
+    for lat, lon in points:
+        for with_aqi in (False, True):
+            found = index.nearest(lat, lon, k, with_aqi=with_aqi)
+            expected = linear_nearest(stations, lat, lon, k, with_aqi)
+            assert [row['SiteId'] for _, row in found] == [row['SiteId'] for _, row in expected]
+            assert [distance for distance, _ in found] == pytest.approx([distance for distance, _ in expected])
+
+def test_within_matches_linear_scan():
+    stations = random_stations(seed=1)
+    index = StationIndex(stations)
+    assert len(index) == sum(1 for s in stations if s['Latitude'] is not None)
+    for bbox in [(120.9, 24.6, 121.9, 25.3), (118.0, 21.0, 123.0, 27.0), (121.0, 23.0, 121.0001, 23.0001)]:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        expected = {s['SiteId'] for s in stations if s['Latitude'] is not None
+                    and min_lat <= s['Latitude'] <= max_lat and min_lon <= s['Longitude'] <= max_lon}
+        assert {row['SiteId'] for row in index.within(*bbox)} == expected
+
+def test_estimate_weights_and_same_point():
+    stations = random_stations(seed=2)
+    index = StationIndex(stations)
+    value, neighbours = index.estimate(24.0, 121.0, k=5)
+    assert len(neighbours) == 5 and sum(weight for _, weight, _ in neighbours) == pytest.approx(1.0)
+    assert value == pytest.approx(sum(weight * row['AQI'] for _, weight, row in neighbours))
+
+    station = next(s for s in stations if s['Latitude'] is not None and s['AQI'] is not None)
+    value, neighbours = index.estimate(station['Latitude'], station['Longitude'])
+    assert value == station['AQI'] and neighbours[0][2] is station
+
+def test_empty_index():
+    index = StationIndex([{'SiteId': 1, 'Latitude': None, 'Longitude': None}])
+    assert index.nearest(25.0, 121.5) == [] and index.within(120, 24, 122, 26) == []
+    assert index.estimate(25.0, 121.5) == (None, [])